@@ -29,9 +29,14 @@ import sitkUtils
 import subprocess
 import qt
 import json
+import re
 import math
 #from pylab import *
 import shutil
+import sys
+import time
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
 
 # end Olivier
 
@@ -194,6 +199,7 @@ class t_ZoomRoiWidget(ScriptedLoadableModuleWidget, VTKObservationMixin):
         # Create logic class. Logic implements all computations that should be possible to run
         # in batch mode, without a graphical user interface.
         self.logic = t_ZoomRoiLogic()
+        self.logic.jobProgressCallback = self.onJobProgress
 
         # begin code Olivier        
         # ROI markups
@@ -256,6 +262,8 @@ class t_ZoomRoiWidget(ScriptedLoadableModuleWidget, VTKObservationMixin):
         print("setup self.logic.programDirectory = ", self.logic.programDirectory)
         if self.logic.programDirectory !=  None:
             self.ui.programDirectoryPathLineEdit.setCurrentPath(self.logic.programDirectory)      
+        self.ui.checkBoxResizeInProcess.checked = self.logic.resizeInProcess
+        self.ui.checkBoxSharedMemory.checked = self.logic.sharedMemoryTransfer
         
        
         # end code Olivier
@@ -269,8 +277,13 @@ class t_ZoomRoiWidget(ScriptedLoadableModuleWidget, VTKObservationMixin):
         # begin code Olivier        
         self.ui.inputVolumeSelector.connect("currentNodeChanged(vtkMRMLNode*)", self.updateParameterNodeFromGUI)
         self.ui.buttonCreateROI.connect("clicked(bool)", self.onCreateROIButton)
+        self.ui.buttonCancelJob.connect("clicked(bool)", self.onCancelJobButton)
         self.ui.buttonResize.connect("clicked(bool)", self.onResizeButton)
+        self.ui.buttonBuildPyramid.connect("clicked(bool)", self.onBuildPyramidButton)
+        self.ui.buttonBuildBricks.connect("clicked(bool)", self.onBuildBricksButton)
         self.ui.buttonZoom.connect("clicked(bool)", self.onZoomButton)
+        self.ui.buttonCreateZoomRois.connect("clicked(bool)", self.onCreateZoomRoisButton)
+        self.ui.buttonCreateMarkupsRois.connect("clicked(bool)", self.onCreateMarkupsRoisButton)
         self.ui.buttonProfile.connect("clicked(bool)", self.onProfileButton)
         self.ui.buttonDisplayProfile.connect("clicked(bool)", self.onDisplayProfileButton)        
         self.ui.buttonOpenFile.connect("clicked(bool)", self.onOpenFileButton)
@@ -279,6 +292,8 @@ class t_ZoomRoiWidget(ScriptedLoadableModuleWidget, VTKObservationMixin):
         self.ui.inputFilePathLineEdit.currentPathChanged.connect(self.onInputFilePathLineEditChanged)
         self.ui.inputDirectoryPathLineEdit.connect('currentPathChanged(const QString&)', self.onInputDirectoryPathLineEditChanged)
         self.ui.programDirectoryPathLineEdit.connect('currentPathChanged(const QString&)', self.onProgramDirectoryPathLineEditChanged)
+        self.ui.checkBoxResizeInProcess.toggled.connect(self.onCheckBoxResizeInProcessChanged)
+        self.ui.checkBoxSharedMemory.toggled.connect(self.onCheckBoxSharedMemoryChanged)
         #self.ui.editPointX.textEdited.connect(self.editPointXChanged) # TODO compute the matrix IJK to RAS
         #self.ui.editPointY.textEdited.connect(self.editPointYChanged)
         #self.ui.editPointZ.textEdited.connect(self.editPointZChanged)   
@@ -314,6 +329,12 @@ class t_ZoomRoiWidget(ScriptedLoadableModuleWidget, VTKObservationMixin):
         self.ui.radioButtonProfileMax.toggled.connect(self.onradioButtonProfileMax)
         self.ui.radioButtonProfileBlock.toggled.connect(self.onradioButtonProfileBlock)
         self.ui.radioButtonProfilePlan.toggled.connect(self.onradioButtonProfilePlan)
+        self.ui.checkBoxLiveProfile.toggled.connect(self.onCheckBoxLiveProfileChanged)
+        self.ui.checkBoxProfileDisk.toggled.connect(self.onCheckBoxProfileDiskChanged)
+        self.profileTimer = qt.QTimer()
+        self.profileTimer.setSingleShot(True)
+        self.profileTimer.setInterval(150) # the profile is computed once the markup stops moving for 150 ms
+        self.profileTimer.timeout.connect(self.updateLiveProfile)
 
         self.logic.imageWidget = self.ui.label_profileDisplay # to display the profile
 
@@ -338,6 +359,8 @@ class t_ZoomRoiWidget(ScriptedLoadableModuleWidget, VTKObservationMixin):
         """Called when the application closes and the module widget is destroyed."""
         print("cleanup begin")
         self.removeObservers()        
+        self.logic.cancelAllJobs()
+        self.profileTimer.stop()
         print("cleanup end")
 
     def enter(self) -> None:
@@ -599,7 +622,8 @@ class t_ZoomRoiWidget(ScriptedLoadableModuleWidget, VTKObservationMixin):
         if not self.logic.inputVolume: 
             slicer.util.warningDisplay("Please load and select an input volume!\n")
             return
-        if not self.logic.inputDirectory: 
+        fromFile = self.logic.fileDirectory == "f" and self.logic.inputVolumeIsInputFile()
+        if not self.logic.inputDirectory and not fromFile: 
             slicer.util.warningDisplay("Please select an input directory!\n")
             return
         if not self.logic.outputFile: 
@@ -608,7 +632,7 @@ class t_ZoomRoiWidget(ScriptedLoadableModuleWidget, VTKObservationMixin):
         if not self.logic.createdRoi:
             slicer.util.warningDisplay("Please create a ROI!\n")
             return
-        if not self.logic.programDirectory:
+        if not self.logic.programDirectory and not fromFile:
             slicer.util.warningDisplay("Please select a program directory!\n")
             return       
                 
@@ -623,6 +647,46 @@ class t_ZoomRoiWidget(ScriptedLoadableModuleWidget, VTKObservationMixin):
         print("onCreateROIButton centerRoi = ", centerRoi)
         print("onCreateROIButton sizeRoi = ", sizeRoi)      
         self.logic.createRoi(centerRoi, sizeRoi)        
+
+    def onCancelJobButton(self):
+        """
+        Handles the event triggered by clicking the cancel button of the jobs.
+
+        This method kills the running external program, the next queued job is then started. If the job is the 
+        extraction of a ROI at full resolution, its preview stays displayed.
+
+        Returns:
+        None
+        """
+        print("Button Cancel job clicked")
+        self.logic.cancelJob()
+
+    def onJobProgress(self, name, done, total, queued):
+        """
+        Displays the progress of the running job in the progress bar, called by the job runner of the logic.
+
+        Parameters:
+        name (str): The name of the running job, None if no job is running.
+        done (int): The number of steps done, for example the number of slices read.
+        total (int): The number of steps of the job, 0 if it is not known yet.
+        queued (int): The number of jobs waiting in the queue.
+
+        Returns:
+        None
+        """
+        if name is None:
+            self.ui.progressBarJob.setMaximum(100)
+            self.ui.progressBarJob.setValue(0)
+            self.ui.progressBarJob.setFormat("No job")
+            self.ui.buttonCancelJob.enabled = False
+            return
+        self.ui.progressBarJob.setMaximum(total)
+        self.ui.progressBarJob.setValue(done)
+        text = name + " %p%"
+        if queued > 0:
+            text += " (" + str(queued) + " queued)"
+        self.ui.progressBarJob.setFormat(text)
+        self.ui.buttonCancelJob.enabled = True
        
 
     def onPointModifiedEvent(self, caller, eventId):
@@ -736,6 +800,103 @@ class t_ZoomRoiWidget(ScriptedLoadableModuleWidget, VTKObservationMixin):
         self.changeSliceOffset(2, "Red", coord[2])
         self.changeSliceOffset(1, "Green", coord[1]) 
         self.changeSliceOffset(0, "Yellow", coord[0])    
+        if self.logic.profileLiveUpdate:
+            self.profileTimer.start()
+
+    def onCheckBoxLiveProfileChanged(self):
+        """"
+        Event handler for changes of the "Live profile" check box.
+
+        When the box is checked, the profile is computed again each time the origin or the end point is moved, 
+        if the volume of the profile is loaded in 3D Slicer (see `updateLiveProfile`).
+
+        Returns:
+        None
+        """
+        print("onCheckBoxLiveProfileChanged")
+        self.logic.profileLiveUpdate = self.ui.checkBoxLiveProfile.checked
+        print("self.logic.profileLiveUpdate = ", self.logic.profileLiveUpdate)
+
+    def onCheckBoxProfileDiskChanged(self):
+        """"
+        Event handler for changes of the "Disk" check box.
+
+        When the box is checked, the neighborhood in the orthogonal plan is the disk of radius the neighborhood 
+        distance instead of the square (see `profileNeighborhood`).
+
+        Returns:
+        None
+        """
+        print("onCheckBoxProfileDiskChanged")
+        self.logic.profileDisk = self.ui.checkBoxProfileDisk.checked
+        print("self.logic.profileDisk = ", self.logic.profileDisk)
+
+    def updateLiveProfile(self):
+        """"
+        Computes the profile again after a move of the origin or the end point.
+
+        It is called by `profileTimer` when the markup stops moving. Nothing is displayed if the parameters of 
+        the profile are not complete, and the profile is only computed in 3D Slicer (see `computeProfileValues`): 
+        no program is started while the markups are moved.
+
+        Returns:
+        None
+        """
+        print("updateLiveProfile")
+        if self.ui.editProfileX.text == "" or self.ui.editProfileY.text == "" or self.ui.editProfileZ.text == "":
+            return
+        if self.logic.profileOutputFile is None or self.logic.profileNormalDirection not in ("n", "d"):
+            return
+        if self.logic.profileNormalDirection == "d" and (self.ui.editProfileXDestination.text == "" or self.ui.editProfileYDestination.text == "" or self.ui.editProfileZDestination.text == ""):
+            return
+        if self.logic.profileVolumeArray() is None:
+            return
+        self.updateProfileStatistics()
+        if self.logic.parseStatistics(self.logic.profileMeasurementArgument()) is None:
+            return
+        x = int(self.ui.editProfileX.text)
+        y = int(self.ui.editProfileY.text)
+        z = int(self.ui.editProfileZ.text)
+        vector = self.profileVector(x, y, z)
+        if vector is None:
+            return
+        self.logic.computeProfile(x, y, z, vector, self.logic.profileOutputFile, liveUpdate=True)
+
+    def profileVector(self, x, y, z):
+        """"
+        Returns the direction vector of the profile, the normal at the origin point or the direction to the end point.
+
+        For a direction vector, the number of points of the profile is set to the distance between the two points 
+        if it is 0.
+
+        Parameters:
+        x (int): The x-coordinate of the origin point.
+        y (int): The y-coordinate of the origin point.
+        z (int): The z-coordinate of the origin point.
+
+        Returns:
+        list: The direction vector [vx, vy, vz], or None if the origin and the end point are the same or if 
+              the normal can't be computed.
+        """
+        print("profileVector")
+        if self.logic.profileNormalDirection == "n":            
+            vector = self.logic.computeNormals(x,y,z)        
+            if vector is None or vector == [0, 0, 0]:
+                return None
+            vector[0] = -1 * vector[0]
+            vector[1] = -1 * vector[1]
+            vector[2] = -1 * vector[2]
+            return vector
+        xD = int(self.ui.editProfileXDestination.text)
+        yD = int(self.ui.editProfileYDestination.text)
+        zD = int(self.ui.editProfileZDestination.text)
+        if (xD, yD, zD) == (x, y, z):
+            return None
+        vector, nbPoints = self.logic.computeDirection(x,y,z,xD,yD,zD)
+        if self.logic.sliderStep == 0:
+            self.logic.sliderStep = nbPoints
+        print("profileVector nbPoints  = ",nbPoints)        
+        return vector
 
     def onInputFilePathLineEditChanged(self):
         """
@@ -793,6 +954,39 @@ class t_ZoomRoiWidget(ScriptedLoadableModuleWidget, VTKObservationMixin):
         print("self.logic.programDirectory = ", self.logic.programDirectory)
         self.logic.saveConfiguration()
 
+
+    def onCheckBoxResizeInProcessChanged(self):
+        """"
+        Event handler for changes of the "Resize in 3D Slicer" check box.
+
+        This function is called when the user checks or unchecks the box. It updates the logic layer's
+        `resizeInProcess` attribute and saves the configuration so that the choice is preserved for 
+        future sessions.
+
+        Returns:
+        None
+        """
+        print("onCheckBoxResizeInProcessChanged")
+        self.logic.resizeInProcess = self.ui.checkBoxResizeInProcess.checked
+        print("self.logic.resizeInProcess = ", self.logic.resizeInProcess)
+        self.logic.saveConfiguration()
+
+    def onCheckBoxSharedMemoryChanged(self):
+        """"
+        Event handler for changes of the "Transfer by shared memory" check box.
+
+        This function is called when the user checks or unchecks the box. It updates the logic layer's
+        `sharedMemoryTransfer` attribute and saves the configuration so that the choice is preserved for 
+        future sessions.
+
+        Returns:
+        None
+        """
+        print("onCheckBoxSharedMemoryChanged")
+        self.logic.sharedMemoryTransfer = self.ui.checkBoxSharedMemory.checked
+        print("self.logic.sharedMemoryTransfer = ", self.logic.sharedMemoryTransfer)
+        self.logic.saveConfiguration()
+
     
     def updateMaxSlider(self):
         """
@@ -1521,10 +1715,10 @@ class t_ZoomRoiWidget(ScriptedLoadableModuleWidget, VTKObservationMixin):
         if self.logic.fileDirectory == "f" and self.logic.inputFile is None: 
             slicer.util.warningDisplay("Please select an input file!\n")
             return
-        if not self.logic.outputFileResized: 
+        if not self.logic.outputFileResized and not self.logic.resizeInProcess: 
             slicer.util.warningDisplay("Please select an 3D resized output file!\n")
             return
-        if not self.logic.programDirectory:
+        if not self.logic.programDirectory and not self.logic.resizeInProcess and self.logic.fileDirectory != "f":
             slicer.util.warningDisplay("Please select a program directory!\n")
             return
         
@@ -1532,9 +1726,56 @@ class t_ZoomRoiWidget(ScriptedLoadableModuleWidget, VTKObservationMixin):
         print("onResizeButton self.logic.endSlice = ", self.logic.endSlice)
         print("onResizeButton self.logic.sliderFactorResizeValue = ", self.logic.sliderFactorResizeValue)
         print("onResizeButton self.logic.outputFileResized = ", self.logic.outputFileResized)
+        def onResized(res):
+            if res == 0 and self.logic.resizedVolumeNode is not None:
+                self.showVolumeNode(self.logic.resizedVolumeNode)
         if self.logic.fileDirectory == "d":
-            self.logic.create3DFileResized(self.logic.beginSlice, self.logic.endSlice, self.logic.inputDirectory, self.logic.sliderFactorResizeValue, self.logic.outputFileResized)  
+            self.logic.create3DFileResized(self.logic.beginSlice, self.logic.endSlice, self.logic.inputDirectory, self.logic.sliderFactorResizeValue, self.logic.outputFileResized, onResized)  
+        elif self.logic.fileDirectory == "f":
+            self.logic.create3DFileResized(self.logic.beginSlice, self.logic.endSlice, self.logic.inputFile, self.logic.sliderFactorResizeValue, self.logic.outputFileResized, onResized)  
         
+    def onBuildPyramidButton(self):
+        """
+        Handles the event triggered by clicking the build pyramid button.
+
+        This method checks that an input directory and the program directory are selected, then builds the 
+        volumes of the input directory resized by 2, 4, 8, 16 and 32 with `buildPyramid`. These volumes are then 
+        used by the Create 3D resized file and zoom buttons.
+
+        Returns:
+        None
+        """
+        print("Button build pyramid clicked")
+        if self.logic.inputDirectory is None:
+            slicer.util.warningDisplay("Please select an input directory!\n")
+            return
+        if not self.logic.programDirectory:
+            slicer.util.warningDisplay("Please select a program directory!\n")
+            return
+        if self.logic.buildPyramid(self.logic.inputDirectory) != 0:
+            slicer.util.warningDisplay("The pyramid of " + self.logic.inputDirectory + " can't be built!\n")
+
+    def onBuildBricksButton(self):
+        """
+        Handles the event triggered by clicking the build bricks button.
+
+        This method checks that an input directory and the program directory are selected, then cuts the slices 
+        of the input directory in compressed bricks with `buildBricks`. The C++ tools then read only the bricks 
+        they need to create a ROI or a resized volume.
+
+        Returns:
+        None
+        """
+        print("Button build bricks clicked")
+        if self.logic.inputDirectory is None:
+            slicer.util.warningDisplay("Please select an input directory!\n")
+            return
+        if not self.logic.programDirectory:
+            slicer.util.warningDisplay("Please select a program directory!\n")
+            return
+        if self.logic.buildBricks(self.logic.inputDirectory) != 0:
+            slicer.util.warningDisplay("The bricks of " + self.logic.inputDirectory + " can't be built!\n")
+
     def onZoomButton(self):
         """"
         Handles the event triggered by clicking the zoom button.
@@ -1567,7 +1808,7 @@ class t_ZoomRoiWidget(ScriptedLoadableModuleWidget, VTKObservationMixin):
             print("No level 1 of zoom selected.")
             slicer.util.warningDisplay("Please select a level1 of zoom!\n")
             exit
-        if not self.logic.programDirectory:
+        if not self.logic.programDirectory and not self.logic.resizeInProcess:
             slicer.util.warningDisplay("Please select a program directory!\n")
             return
         begin =0
@@ -1595,16 +1836,86 @@ class t_ZoomRoiWidget(ScriptedLoadableModuleWidget, VTKObservationMixin):
         outputFile = self.logic.directoryTemp + name + ".nrrd"
         end = self.logic.retrieveSizeDirectory(path)
         print("self.logic.create3DFileResized(", begin," ,", end," ,", path,", ", factorResize,", ", outputFile, ")")
-        res = self.logic.create3DFileResized(begin, end, path, factorResize, outputFile)
-        if res == -1:
-            return
-        self.openFile(outputFile)
-        self.logic.inputVolumeFileName = self.ui.inputVolumeSelector.currentNode().GetStorageNode().GetFileName()
-        print("onZoomButton self.logic.inputVolumeFileName = ", self.logic.inputVolumeFileName)
-        self.logic.retrieveSizeImageNrrd()
-        self.majFileInfo()
+        if self.logic.resizeInProcess or self.logic.sharedMemoryTransfer:
+            outputFile = None
+
+        def onResized(res):
+            if res == -1:
+                return
+            if self.logic.resizedVolumeNode is not None:
+                self.showVolumeNode(self.logic.resizedVolumeNode)
+                self.majFileInfo()
+                return
+            self.openFile(outputFile)
+            self.logic.inputVolumeFileName = self.ui.inputVolumeSelector.currentNode().GetStorageNode().GetFileName()
+            print("onZoomButton self.logic.inputVolumeFileName = ", self.logic.inputVolumeFileName)
+            self.logic.retrieveSizeImageNrrd()
+            self.majFileInfo()
+        self.logic.create3DFileResized(begin, end, path, factorResize, outputFile, onResized)
         
 
+    def onCreateZoomRoisButton(self):
+        """
+        Handles the event triggered by clicking the create zoom ROIs button.
+
+        This method checks that the zoom areas, the input directory, the output file and the program directory 
+        are selected, then creates the ROIs of all the level 1 zoom areas in one pass over the slices with 
+        `createRoiBatch`. The ROIs are written in the directory of the output file, one file by area named after it.
+
+        Returns:
+        None
+        """
+        print("Button create zoom ROIs clicked")
+        if not self.logic.zoomJsonExist:
+            slicer.util.warningDisplay("There are no zoom areas for this input directory!\n")
+            return
+        if not self.logic.inputDirectory: 
+            slicer.util.warningDisplay("Please select an input directory!\n")
+            return
+        if not self.logic.outputFile: 
+            slicer.util.warningDisplay("Please select an output file!\n")
+            return
+        if not self.logic.programDirectory:
+            slicer.util.warningDisplay("Please select a program directory!\n")
+            return
+        rois = self.logic.roisFromZoom(os.path.dirname(self.logic.outputFile))
+        if self.logic.createRoiBatch(rois) != 0:
+            slicer.util.warningDisplay("Some ROIs of the zoom areas can't be created!\n")
+
+    def onCreateMarkupsRoisButton(self):
+        """
+        Handles the event triggered by clicking the create markups ROIs button.
+
+        This method checks that the input volume, the input directory, the output file and the program directory 
+        are selected, then creates the ROIs of all the ROI markups placed on the displayed volume, except the profile 
+        and zoom markups of the module, in one pass over the slices with `createRoiBatch`. The ROIs are written in 
+        the directory of the output file, one file by markup named after it.
+
+        Returns:
+        None
+        """
+        print("Button create markups ROIs clicked")
+        if not self.logic.inputVolume: 
+            slicer.util.warningDisplay("Please select an input volume!\n")
+            return
+        if not self.logic.inputDirectory: 
+            slicer.util.warningDisplay("Please select an input directory!\n")
+            return
+        if not self.logic.outputFile: 
+            slicer.util.warningDisplay("Please select an output file!\n")
+            return
+        if not self.logic.programDirectory:
+            slicer.util.warningDisplay("Please select a program directory!\n")
+            return
+        excluded = [self.profileMarkupsNodeOrigin, self.profileMarkupsNodeDestination] + list(self.logic.markupsZoom)
+        roiNodes = [node for node in slicer.util.getNodesByClass("vtkMRMLMarkupsROINode") if node not in excluded]
+        if not roiNodes:
+            slicer.util.warningDisplay("There are no ROI markups!\n")
+            return
+        rois = self.logic.roisFromMarkups(roiNodes, os.path.dirname(self.logic.outputFile))
+        if self.logic.createRoiBatch(rois) != 0:
+            slicer.util.warningDisplay("Some ROIs of the markups can't be created!\n")
+
     def onProfileButton(self):
         """"
         Handles the event triggered by clicking the profile button.
@@ -1653,23 +1964,18 @@ class t_ZoomRoiWidget(ScriptedLoadableModuleWidget, VTKObservationMixin):
         if self.logic.profileNormalDirection == "no": 
             slicer.util.warningDisplay("Please select Normal vector  or Direction vector!\n")
             return
+        self.updateProfileStatistics()
+        if self.logic.parseStatistics(self.logic.profileMeasurementArgument()) is None:
+            slicer.util.warningDisplay("Please select a measurement or give valid statistics (example: m,d,s,p90)!\n")
+            return
         
         x = int(self.ui.editProfileX.text)
         y = int(self.ui.editProfileY.text)
         z = int(self.ui.editProfileZ.text)
-        if self.logic.profileNormalDirection == "n":            
-            vector = self.logic.computeNormals(x,y,z)        
-            vector[0] = -1 * vector[0]
-            vector[1] = -1 * vector[1]
-            vector[2] = -1 * vector[2]
-        else:
-            xD = int(self.ui.editProfileXDestination.text)
-            yD = int(self.ui.editProfileYDestination.text)
-            zD = int(self.ui.editProfileZDestination.text)
-            vector, nbPoints = self.logic.computeDirection(x,y,z,xD,yD,zD)
-            if self.logic.sliderStep == 0:
-                self.logic.sliderStep = nbPoints
-            print("onProfileButton nbPoints  = ",nbPoints)        
+        vector = self.profileVector(x, y, z)
+        if vector is None:
+            slicer.util.warningDisplay("The direction of the profile can't be computed: the origin and the end point are the same, or the volume has no gradient at the origin!\n")
+            return
         self.logic.computeProfile(x,y,z, vector, self.logic.profileOutputFile)
 
     def onDisplayProfileButton(self):
@@ -1686,8 +1992,21 @@ class t_ZoomRoiWidget(ScriptedLoadableModuleWidget, VTKObservationMixin):
         None
         """
         print("onDisplayProfileButton")
+        self.updateProfileStatistics()
         self.logic.displayProfile(self.logic.profileFile)
 
+    def updateProfileStatistics(self):
+        """"
+        Copies the statistics to compute and the statistics to draw from the user interface to the logic layer.
+
+        Returns:
+        None
+        """
+        print("updateProfileStatistics")
+        self.logic.profileStatistics = self.ui.editProfileStatistics.text
+        self.logic.profilePlotted = self.ui.editProfilePlotted.text
+        print("self.logic.profileStatistics = ", self.logic.profileStatistics, " self.logic.profilePlotted = ", self.logic.profilePlotted)
+
     
     def onSaveImageProfile(self):
         """"
@@ -1879,7 +2198,7 @@ class t_ZoomRoiWidget(ScriptedLoadableModuleWidget, VTKObservationMixin):
             self.logic.markupsZoom[i].GetDisplayNode().SetPointLabelsVisibility(True)
             self.logic.markupsZoom[i].GetDisplayNode().SetVisibility(True)
             self.logic.markupsZoom[i].LockedOn() # it can't be modified     
-            self.logic.markupsZoom[i].SetSize(int(400/self.logic.factorResize), int(600/self.logic.factorResize), int(200/self.logic.factorResize))
+            self.logic.markupsZoom[i].SetSize(int(self.logic.zoomAreaSize[0]/self.logic.factorResize), int(self.logic.zoomAreaSize[1]/self.logic.factorResize), int(self.logic.zoomAreaSize[2]/self.logic.factorResize))
             self.logic.markupsZoom[i].SetCenter(centerR, centerA, centerS)            
             i = i+1
         self.addNameAreaZoom(self.logic.list8um, self.ui.comboBoxZoom1)
@@ -2071,6 +2390,34 @@ class t_ZoomRoiWidget(ScriptedLoadableModuleWidget, VTKObservationMixin):
         self.radioButtonDirectory = False        
         self.logic.factorResize = 1        
         self.logic.profileFileDirectory = "f"
+
+    def showVolumeNode(self, volumeNode):
+        """"
+        Displays a volume node built in 3D Slicer and updates the UI and logic states accordingly.
+
+        This method is the counterpart of `openFile` for volumes that are created in memory by the 
+        in-process resize engine: the node is already in the scene, so nothing is read from disk.
+
+        Args:
+            volumeNode (vtkMRMLScalarVolumeNode): The volume node to display.
+
+        Returns:
+        None
+        """
+        print("showVolumeNode")
+        if volumeNode is None:
+            return
+        self.logic.fileDirectory = "f"
+        self.ui.inputVolumeSelector.setCurrentNode(volumeNode)
+        self.ui.radioButtonFile.setChecked(True)
+        self.radioButtonFile = True        
+        self.radioButtonDirectory = False        
+        self.logic.factorResize = 1        
+        self.logic.profileFileDirectory = "f"
+        self.logic.inputVolumeFileName = None
+        if volumeNode.GetStorageNode() is not None:
+            self.logic.inputVolumeFileName = volumeNode.GetStorageNode().GetFileName()
+        self.logic.sizeImageInputVolume = volumeNode.GetImageData().GetDimensions()
     
         
     def onradioButtonProfileNormal(self):
@@ -2277,6 +2624,14 @@ class t_ZoomRoiLogic(ScriptedLoadableModuleLogic):
         self.resizeImageProgram = "resizeImageParall"
         self.createRoiProgram = "createRoiImage3D"
         self.computeProfileProgram = "computeProfile"
+        self.computeProfileBatchProgram = "computeProfileBatch"
+        self.profileJobsFileName = "profileJobs.txt"
+        self.buildPyramidProgram = "buildPyramid"
+        self.pyramidDirectoryName = "citrusSkinPyramid"
+        self.pyramidManifestName = "pyramid.json"
+        self.buildBricksProgram = "buildBricks"
+        self.bricksDirectoryName = "citrusSkinBricks"
+        self.bricksMemoryMB = 2000
         self.displayProfileProgram = "displayProfile"
         self.pythonProgram = "python3"
         self.directoryConfig = ".citrusSkin"
@@ -2290,6 +2645,44 @@ class t_ZoomRoiLogic(ScriptedLoadableModuleLogic):
         self.profileNormalDirection = "no"
         self.profileMeasurement = "no"
         self.profileTypeBlock = "3"
+        self.profileDisk = False
+        self.resizeInProcess = False
+        self.resizedVolumeNode = None
+        self.sharedMemoryTransfer = False
+        self.sharedMemoryDirectory = "/dev/shm"
+        self.streamResizeProgram = "resizeImageParallStream"
+        self.numberOfThreads = os.cpu_count()
+        self.ioThreads = 0
+        self.decodeThreads = 0
+        self.profileLiveUpdate = True
+        self.profileChunkValues = 4 * 1000 * 1000
+        self.profileTableValues = 16 * 1000 * 1000
+        self.profileStatistics = ""
+        self.normalSigma = 2.0
+        self.normalChunkSize = 64
+        self.normalChunks = {}
+        self.normalFieldKey = None
+        self.profilePlotted = ""
+        self.bytesPerPixel = 4
+        self.sliceIndexName = "citrusSkinSliceIndex.txt"
+        self.sliceIndex = None
+        self.metadataCache = {}
+        self.roiCacheDirectoryName = "roiCache"
+        self.roiCacheManifestName = "roiCache.json"
+        self.roiCacheMaxSizeMB = 4000
+        self.createRoiBatchProgram = "createRoiBatch"
+        self.roiBatchFileName = "roiBatch.txt"
+        self.zoomAreaSize = [400, 600, 200]
+        self.roiPreviewVoxels = 16 * 1000 * 1000
+        self.roiPreviewFileName = "roiPreview.nrrd"
+        self.roiVolumeNode = None
+        self.jobQueue = []
+        self.currentJob = None
+        self.jobProcess = None
+        self.jobProgressCallback = None
+        self.toolsItkModuleName = "citrusToolsItk"
+        self.toolsItkModule = None
+        self.removeStaleSharedVolumes()
 
         # end code Olivier
 
@@ -2344,7 +2737,8 @@ class t_ZoomRoiLogic(ScriptedLoadableModuleLogic):
 
         The function resizes the center and size of the ROI based on a predefined resize factor, ensures 
         the dimensions are even, checks if the ROI fits within the image boundaries, and calls an external 
-        program to perform further computations.
+        program to perform further computations. When the module `citrusToolsItk` is available, the ROI is 
+        extracted in 3D Slicer instead (see `createRoiInProcess`).
 
         Parameters:
         center (list of int ): A list of 3 coordinates representing the center of the ROI in the 
@@ -2355,12 +2749,15 @@ class t_ZoomRoiLogic(ScriptedLoadableModuleLogic):
         print("create ROI")
         print("center = ", center)
         print("size = ", size)
-        center[0] = round(center[0] * self.factorResize)        
-        center[1] = round(center[1] * self.factorResize)
-        center[2] = round(center[2] * self.factorResize)
-        size[0] = round(size[0] * self.factorResize)              
-        size[1] = round(size[1] * self.factorResize)
-        size[2] = round(size[2] * self.factorResize)
+        # the ROI is cut from the file of the input volume only if this volume is loaded, its voxels are not resized
+        fromFile = self.fileDirectory == "f" and self.inputVolumeIsInputFile()
+        factor = 1 if fromFile else self.factorResize
+        center[0] = round(center[0] * factor)        
+        center[1] = round(center[1] * factor)
+        center[2] = round(center[2] * factor)
+        size[0] = round(size[0] * factor)              
+        size[1] = round(size[1] * factor)
+        size[2] = round(size[2] * factor)
         if size[0] %2  == 1:
             size[0] = size[0]+1
         if size[1] % 2 == 1:
@@ -2369,6 +2766,12 @@ class t_ZoomRoiLogic(ScriptedLoadableModuleLogic):
             size[2] = size[2]+1  
         print("logic.createRoi center = ", center)
         print("logic.createRoi size = ", size)        
+        if fromFile:
+            begin = [int(center[k] - size[k]//2) for k in range(3)]
+            end = [int(begin[k] + size[k] - 1) for k in range(3)]
+            if self.createRoiFromFile(self.inputFile, begin, end, self.outputFile) == 0:
+                self.showRoiVolume(self.outputFile, begin, 1, volumeFactor=1)
+            return
         difX = center[0]-size[0]/2
         difY = center[1]-size[1]/2
         difZ = center[2]-size[2]/2
@@ -2379,6 +2782,15 @@ class t_ZoomRoiLogic(ScriptedLoadableModuleLogic):
             msg = "The ROI is outside of the image!"                 
             slicer.util.messageBox(msg)
             return
+        begin = [int(center[k] - size[k]//2) for k in range(3)]
+        end = [int(begin[k] + size[k] - 1) for k in range(3)]
+        signature = self.slicesSignature(self.inputDirectory)
+        entry = self.findRoiInCache(self.inputDirectory, begin, end, signature)
+        if entry is not None:
+            print("logic.createRoi ROI cropped from the cache", entry["file"])
+            if self.cropRoiFromCache(entry, begin, end, self.outputFile) == 0:
+                self.showRoiVolume(self.outputFile, begin, 1)
+                return
         sizeRoi, timeRoi = self.computeSizeTimeRoi(size)
         min = int(timeRoi/60)
         sec = timeRoi-min*60
@@ -2387,102 +2799,678 @@ class t_ZoomRoiLogic(ScriptedLoadableModuleLogic):
         print(self.programDirectory + "/" + self.createRoiProgram + " " + self.inputDirectory + "/ " + str(size[0]) + " " + str(size[1]) + " " +  str(size[2]) + " " + str(center[0]) + " " +  str(center[1]) + " " +  str(center[2]) + " c" + " " + self.outputFile + " 1" + " " + self.inputDirectoryExtension)               
         if not slicer.util.confirmYesNoDisplay(msg):
             return
-        if not os.path.exists(self.programDirectory + "/" + self.createRoiProgram):
+        if self.loadToolsItkModule() is None and not os.path.exists(self.programDirectory + "/" + self.createRoiProgram):
             slicer.util.warningDisplay(self.programDirectory + "/" + self.createRoiProgram + " does not exist!\n")
             return
-        result = subprocess.run([self.programDirectory + "/" + self.createRoiProgram, self.inputDirectory + "/", str(size[0]), str(size[1]), str(size[2]), str(center[0]), str(center[1]), str(center[2]), "c", self.outputFile, "1", self.inputDirectoryExtension], capture_output=True, text=True)        
-        print("stdout:", result.stdout)
-        print("stderr:", result.stderr)
+        self.createRoiPreview(center, size, begin)
+        outputFile = self.outputFile
+        inputDirectory = self.inputDirectory
+        roiArray = self.createRoiInProcess(center, size, 1)
+        if roiArray is not None:
+            self.showRoiVolume(outputFile, begin, 1, roiArray)
+            self.addRoiToCache(inputDirectory, begin, end, outputFile, signature)
+            return
+        self.submitJob("ROI", [self.programDirectory + "/" + self.createRoiProgram, inputDirectory + "/", str(size[0]), str(size[1]), str(size[2]), str(center[0]), str(center[1]), str(center[2]), "c", outputFile, "1", self.inputDirectoryExtension] + self.threadArguments(), 
+                       lambda returncode, output: self.onRoiRefineFinished(returncode, outputFile, begin, end, inputDirectory, signature))
 
-    def retrieveSizeImage(self):
+    def createRoiPreview(self, center, size, begin):
         """
-        Retrieve the dimensions of the input image volume from the specified directory and handle NRRD files.
+        Creates and displays a low resolution preview of a ROI before its extraction at full resolution.
 
-        This function reads image files from the input directory, processes the directory contents, and 
-        retrieves the size of the input image. If the input volume is a NRRD file, it delegates the retrieval 
-        to the `retrieveSizeImageNrrd` method. The method also handles file extensions and sorts directory 
-        contents for further processing.
+        `createRoiImage3D` is run by the job runner (see `submitJob`) with a reduction factor chosen so that the 
+        preview has about `roiPreviewVoxels` pixels: only one slice out of factor is decoded and only the window 
+        of the ROI. The factor is rounded up to a power of two, so the JPEG 2000 slices are decoded at a reduced 
+        resolution (see `readImageReduced`). The preview job is queued before the extraction at full resolution, 
+        it is displayed in place of the ROI over the input volume when it ends (see `showRoiVolume`).
+        When the module `citrusToolsItk` is available, the preview is computed at once in 3D Slicer 
+        (see `createRoiInProcess`) and the program is not started.
 
         Parameters:
-        None
+        center (list of int): The center of the ROI in pixels of the slices, [x, y, z].
+        size (list of int): The size of the ROI in pixels of the slices, [width, height, depth].
+        begin (list of int): The first pixel of the ROI, [x, y, z].
 
         Returns:
-        None: The function prints status messages and updates internal attributes like `self.sizeImageInputOrigin`, 
-          which stores the dimensions of the image, and `self.sizeZImageInputOrigin`, which refers to the z-dimension.
+        dict: The job of the preview, or None if the preview is computed in 3D Slicer.
+        """
+        print("createRoiPreview")
+        factor = max(2, math.ceil((size[0] * size[1] * size[2] / self.roiPreviewVoxels) ** (1/3)))
+        factor = 2 ** math.ceil(math.log2(factor))
+        previewFile = os.path.join(self.directoryTemp, self.roiPreviewFileName)
+        print("createRoiPreview factor =", factor)
+        previewArray = self.createRoiInProcess(center, size, factor)
+        if previewArray is not None:
+            self.showRoiVolume(None, begin, factor, previewArray)
+            slicer.app.processEvents() # the preview is displayed while the ROI is extracted at full resolution
+            return None
+
+        def onFinished(returncode, output):
+            if returncode == 0 and os.path.exists(previewFile):
+                self.showRoiVolume(previewFile, begin, factor)
+        return self.submitJob("ROI preview", [self.programDirectory + "/" + self.createRoiProgram, self.inputDirectory + "/", str(size[0]), str(size[1]), str(size[2]), str(center[0]), str(center[1]), str(center[2]), "c", previewFile, str(factor), self.inputDirectoryExtension] + self.threadArguments(), 
+                              onFinished)
+
+    def createRoiInProcess(self, center, size, factor):
+        """
+        Extracts a ROI of the slices of the input directory in 3D Slicer with the module `citrusToolsItk`.
 
-        Attributes Modified:
-        - `self.dirList`: List of files in the input directory, sorted and cleaned based on the file extension.
-        - `self.inputDirectoryExtension`: The extension of the input image files (e.g., `.nrrd`, `.nii`).
-        - `self.sizeImageInputOrigin`: The size (dimensions) of the first image file in the directory.
-        - `self.sizeZImageInputOrigin`: The z-dimension of the input image.
+        The ROI is the volume of the program `createRoiImage3D`, it is decoded directly into a NumPy array without 
+        starting a program. At full resolution (factor 1) it is also written in `self.outputFile` for the ROI cache.
 
-        Exceptions:
-        - If the input volume or input filename is set and is a NRRD file, the method will call `retrieveSizeImageNrrd`.
-        - If there is an issue reading the directory or the input image, an error message is printed 
-          specifying the exception encountered.
+        Parameters:
+        center (list of int): The center of the ROI in pixels of the slices, [x, y, z].
+        size (list of int): The size of the ROI in pixels of the slices, [width, height, depth].
+        factor (int): The reduction factor of the ROI, 1 for the full resolution.
+
+        Returns:
+        numpy.ndarray: The ROI indexed [z, y, x], or None if the module is not available or the ROI can't be 
+                       extracted, the program is then used.
         """
-        print("retrieveSizeImage")        
-        if self.inputVolume is not None and self.inputVolumeFileName is not None:            
-            self.retrieveSizeImageNrrd()
-        
+        print("createRoiInProcess")
+        toolsItk = self.loadToolsItkModule()
+        if toolsItk is None:
+            return None
         try:
-            self.dirList = os.listdir(self.inputDirectory)
-            self.dirList.sort()
-            self.inputDirectoryExtension = self.retrieveExtension(self.inputDirectory, self.dirList) 
-            self.dirList = self.cleanList(self.inputDirectory, self.dirList, self.inputDirectoryExtension)
-            self.sizeZImageInputOrigin = len(self.dirList)
-            print("dirList[0] = ", self.dirList[0])
-            print("dirList[0] = ", self.inputDirectory + "/" + self.dirList[0])
-            imageInputOrigin = sitk.ReadImage(self.inputDirectory + "/" + self.dirList[0])
-            self.sizeImageInputOrigin = imageInputOrigin.GetSize()
-            print("self.sizeImageInputOrigin = ", self.sizeImageInputOrigin)       
-            print("self.sizeZImageInputOrigin = ", self.sizeZImageInputOrigin)        
-                
+            roiArray = toolsItk.createRoi(self.inputDirectory + "/", [int(value) for value in size], [int(value) for value in center], "c", int(factor), 
+                                          self.inputDirectoryExtension, self.ioThreads, self.decodeThreads)
+            if factor == 1:
+                sitk.WriteImage(sitk.GetImageFromArray(roiArray), self.outputFile)
         except Exception as e:
-            print("Can't read input Origin image", str(e))
-    
-    def cleanList(self, inputDirectory,list, inputDirectoryExtension):
-        """
-        Filters a list of files in the input directory based on the specified file extension.
+            print("createRoiInProcess citrusToolsItk error: ", str(e))
+            return None
+        return roiArray
 
-        This function iterates through the list of files and keeps only those that match the given 
-        file extension. It constructs the full path of each file and compares its extension to 
-        the `inputDirectoryExtension` parameter.
+    def onRoiRefineFinished(self, returncode, outputFile, begin, end, inputDirectory, signature):
+        """
+        Called by the job runner when the extraction of a ROI at full resolution has ended, displays it in place 
+        of the preview and adds it to the ROI cache.
 
         Parameters:
-        inputDirectory (str): The directory where the files are located.
-        list (list of str): A list of filenames to be filtered.
-        inputDirectoryExtension (str): The file extension (without the dot) to filter by (e.g., 'jp2').
+        returncode (int): The return code of `createRoiImage3D`.
+        outputFile (str): The file of the ROI.
+        begin (list of int): The first pixel of the ROI, [x, y, z].
+        end (list of int): The last pixel of the ROI, [x, y, z].
+        inputDirectory (str): The directory of the slices when the job was submitted.
+        signature (str): The signature of the slices when the job was submitted (see `slicesSignature`).
 
         Returns:
-        list of str: A new list containing only the filenames that have the specified extension.
+        None
         """
-        print("cleanList")
-        listTemp = []
-        for item in list:
-            split = os.path.splitext(inputDirectory + item)
-            extension = split[1]           
-            if extension == ("." + inputDirectoryExtension):
-                listTemp.append(item)        
-        return listTemp
-        
-    def retrieveExtension(self, inputDirectory, list):
+        print("onRoiRefineFinished")
+        if returncode != 0:
+            slicer.util.warningDisplay("The ROI can't be created!\n")
+            return
+        self.showRoiVolume(outputFile, begin, 1)
+        self.addRoiToCache(inputDirectory, begin, end, outputFile, signature)
+
+    def threadArguments(self):
         """
-        Determines the most common file extension in a list of files from the input directory.
+        Returns the arguments of the threads of the programs which stack the slices.
 
-        This function scans the provided list of filenames, extracts their extensions, and counts 
-        how many times each extension appears. It returns the extension that occurs the most frequently.
+        The programs read the compressed slices with `ioThreads` threads and decode them with `decodeThreads` 
+        threads at the same time, 0 is the default of the programs (2 threads to read, one thread by core to 
+        decode). On a network file system, more threads to read keep the cores busy. The values are read from 
+        the fields `ioThreads` and `decodeThreads` of the configuration file.
+
+        Returns:
+        list of str: The optional arguments `ioThreads decodeThreads`, empty if both are 0.
+        """
+        print("threadArguments")
+        if self.ioThreads <= 0 and self.decodeThreads <= 0:
+            return []
+        return [str(self.ioThreads), str(self.decodeThreads)]
+
+    def submitJob(self, name, command, onFinished=None, onCleanup=None):
+        """
+        Queues the run of an external program, the programs are run one after the other with `QProcess`.
+
+        3D Slicer stays responsive while the program runs. Its output is printed as it comes and the lines 
+        "progress i/n" written by the C++ programs are sent to `jobProgressCallback`.
 
         Parameters:
-        inputDirectory (str): The directory where the files are located.
-        list (list of str): A list of filenames from which to retrieve and count extensions.
+        name (str): The name of the job, displayed with its progress.
+        command (list of str): The program and its arguments.
+        onFinished (function): Called with the return code and the output of the program when it ends, 
+                               it is not called if the job is cancelled or if the program can't be started.
+        onCleanup (function): Called without argument once the job is over, after onFinished, even if the 
+                              job is cancelled, fails or is removed from the queue: it removes the temporary 
+                              files of the job.
 
         Returns:
-        str: The most common file extension found in the list (without the leading dot).
+        dict: The job.
         """
-        print("retrieveExtension")
-        extension = "jp2"
-        extensions = {}
+        print("submitJob", name, " ".join(command))
+        job = {"name": name, "command": command, "onFinished": onFinished, "onCleanup": onCleanup, "output": "", "cancelled": False, "done": 0, "total": 0}
+        self.jobQueue.append(job)
+        if self.currentJob is None:
+            self.startNextJob()
+        else:
+            self.notifyJobProgress()
+        return job
+
+    def startNextJob(self):
+        """
+        Starts the first job of the queue, if any.
+
+        Returns:
+        None
+        """
+        self.currentJob = None
+        self.jobProcess = None
+        if len(self.jobQueue) == 0:
+            self.notifyJobProgress()
+            return
+        self.currentJob = self.jobQueue.pop(0)
+        print("startNextJob", self.currentJob["name"])
+        self.jobProcess = qt.QProcess()
+        self.currentJob["process"] = self.jobProcess # kept alive until the end of its finished signal
+        self.jobProcess.setProcessChannelMode(qt.QProcess.MergedChannels)
+        self.jobProcess.connect("readyReadStandardOutput()", self.onJobOutput)
+        self.jobProcess.connect("finished(int,QProcess::ExitStatus)", self.onJobFinished)
+        self.jobProcess.connect("errorOccurred(QProcess::ProcessError)", self.onJobError)
+        self.jobProcess.start(self.currentJob["command"][0], self.currentJob["command"][1:])
+        self.notifyJobProgress()
+
+    def onJobOutput(self):
+        """
+        Reads the output of the running program, prints it and updates the progress of the job.
+
+        Returns:
+        None
+        """
+        if self.jobProcess is None:
+            return
+        text = self.jobProcess.readAllStandardOutput().data().decode(errors="replace")
+        self.currentJob["output"] += text
+        for line in text.splitlines():
+            match = re.match(r"progress (\d+)/(\d+)", line)
+            if match:
+                self.currentJob["done"] = int(match.group(1))
+                self.currentJob["total"] = int(match.group(2))
+        print(text, end="")
+        self.notifyJobProgress()
+
+    def onJobFinished(self, exitCode, exitStatus):
+        """
+        Called when the running program ends, starts the next job and calls the function of the ended one.
+
+        Parameters:
+        exitCode (int): The return code of the program.
+        exitStatus (QProcess.ExitStatus): NormalExit, or CrashExit if the program has crashed or has been killed.
+
+        Returns:
+        None
+        """
+        job = self.currentJob
+        if job is None:
+            return
+        self.onJobOutput()
+        returncode = exitCode if exitStatus == qt.QProcess.NormalExit else -1
+        print("onJobFinished", job["name"], "returncode =", returncode, "cancelled =", job["cancelled"])
+        self.startNextJob()
+        try:
+            if job["onFinished"] is not None and not job["cancelled"]:
+                job["onFinished"](returncode, job["output"])
+        finally:
+            self.cleanupJob(job)
+
+    def onJobError(self, error):
+        """
+        Called when the running program has an error. If it can't be started, `finished` is not emitted: the 
+        failure is reported, the job is cleaned up and the next job is started. The other errors (crash, kill) 
+        are followed by `finished` and handled by `onJobFinished`.
+
+        Parameters:
+        error (QProcess.ProcessError): The error of the program.
+
+        Returns:
+        None
+        """
+        job = self.currentJob
+        if job is None or error != qt.QProcess.FailedToStart:
+            return
+        message = self.jobProcess.errorString()
+        print("onJobError", job["name"], "can't be started:", message)
+        self.startNextJob()
+        try:
+            if not job["cancelled"]:
+                slicer.util.warningDisplay("The job " + job["name"] + " can't be started: " + job["command"][0] + "\n" + message + "\n")
+        finally:
+            self.cleanupJob(job)
+
+    def cleanupJob(self, job):
+        """
+        Calls the cleanup function of a job once (see `submitJob`).
+
+        Parameters:
+        job (dict): The job.
+
+        Returns:
+        None
+        """
+        onCleanup = job.get("onCleanup")
+        job["onCleanup"] = None
+        if onCleanup is not None:
+            onCleanup()
+
+    def cancelJob(self):
+        """
+        Cancels the running job, its program is killed and the next job of the queue is started.
+
+        Returns:
+        None
+        """
+        if self.currentJob is None:
+            return
+        print("cancelJob", self.currentJob["name"])
+        self.currentJob["cancelled"] = True
+        self.jobProcess.kill()
+
+    def cancelAllJobs(self):
+        """
+        Empties the queue of the jobs and kills the running program, waiting for its end.
+
+        Returns:
+        None
+        """
+        print("cancelAllJobs")
+        queue = self.jobQueue
+        self.jobQueue = []
+        for job in queue:
+            self.cleanupJob(job)
+        if self.currentJob is None:
+            return
+        process = self.jobProcess
+        self.cancelJob()
+        process.waitForFinished(3000)
+
+    def notifyJobProgress(self):
+        """
+        Sends the progress of the running job to `jobProgressCallback`.
+
+        Returns:
+        None
+        """
+        if self.jobProgressCallback is None:
+            return
+        if self.currentJob is None:
+            self.jobProgressCallback(None, 0, 0, 0)
+            return
+        self.jobProgressCallback(self.currentJob["name"], self.currentJob["done"], self.currentJob["total"], len(self.jobQueue))
+
+    def showRoiVolume(self, imageFile, begin, factor, volumeArray=None, volumeFactor=None):
+        """
+        Displays a ROI in place over the input volume, in the volume node `roiVolumeNode`.
+
+        The IJK to RAS matrix of the ROI is the one of the input volume composed with the position of the ROI 
+        (begin) and its sampling (factor), both in pixels of the slices, divided by the factor of the input volume. 
+        The image of the node is replaced when it already exists, so the preview is swapped for the full resolution.
+
+        Parameters:
+        imageFile (str): The file of the ROI, not read if volumeArray is given.
+        begin (list of int): The first pixel of the ROI, [x, y, z].
+        factor (int): The sampling of the ROI, 1 for the full resolution.
+        volumeArray (numpy.ndarray): The ROI indexed [z, y, x] when it is computed in 3D Slicer, optional.
+        volumeFactor (int): The factor of the input volume, `self.factorResize` if None, 1 for a ROI of the input file.
+
+        Returns:
+        None
+        """
+        print("showRoiVolume")
+        if self.inputVolume is None or self.factorResize is None:
+            return
+        if volumeFactor is None:
+            volumeFactor = self.factorResize
+        if volumeArray is None:
+            volumeArray = sitk.GetArrayFromImage(sitk.ReadImage(imageFile))
+        volumeIjkToRas = vtk.vtkMatrix4x4()
+        self.inputVolume.GetIJKToRASMatrix(volumeIjkToRas)
+        roiToVolume = vtk.vtkMatrix4x4()
+        for k in range(3):
+            roiToVolume.SetElement(k, k, factor / volumeFactor)
+            roiToVolume.SetElement(k, 3, begin[k] / volumeFactor)
+        roiIjkToRas = vtk.vtkMatrix4x4()
+        vtk.vtkMatrix4x4.Multiply4x4(volumeIjkToRas, roiToVolume, roiIjkToRas)
+        if self.roiVolumeNode is None or slicer.mrmlScene.GetNodeByID(self.roiVolumeNode.GetID()) is None:
+            self.roiVolumeNode = slicer.util.addVolumeFromArray(volumeArray, name="ROI")
+        else:
+            slicer.util.updateVolumeFromArray(self.roiVolumeNode, volumeArray)
+        self.roiVolumeNode.SetIJKToRASMatrix(roiIjkToRas)
+        slicer.util.setSliceViewerLayers(foreground=self.roiVolumeNode, foregroundOpacity=1.0)
+
+    def roisFromZoom(self, outputDirectory):
+        """
+        Returns the ROIs of the level 1 zoom areas of the zoom JSON file, for `createRoiBatch`.
+
+        Parameters:
+        outputDirectory (str): The directory of the ROI files, each file is named after its zoom area.
+
+        Returns:
+        list of dict: The ROIs with the keys "center" and "size" (in pixels of the slices) and "outputFile".
+        """
+        print("roisFromZoom")
+        rois = []
+        if not self.zoomJsonExist:
+            return rois
+        for zoom8um in self.paramZoom["8um"]:
+            rois.append({"center": list(zoom8um["center"]), "size": list(self.zoomAreaSize), 
+                         "outputFile": os.path.join(outputDirectory, zoom8um["Name"] + ".nrrd")})
+        return rois
+
+    def roisFromMarkups(self, roiNodes, outputDirectory):
+        """
+        Returns the ROIs of several ROI markups placed on the displayed volume, for `createRoiBatch`.
+
+        The center and the size of the markups are converted to pixels of the slices with the factor of 
+        the displayed volume, as in `createRoi`.
+
+        Parameters:
+        roiNodes (list of vtkMRMLMarkupsROINode): The ROI markups.
+        outputDirectory (str): The directory of the ROI files, each file is named after its markup.
+
+        Returns:
+        list of dict: The ROIs with the keys "center" and "size" (in pixels of the slices) and "outputFile".
+        """
+        print("roisFromMarkups")
+        rois = []
+        volumeRasToIjk = vtk.vtkMatrix4x4()
+        self.inputVolume.GetRASToIJKMatrix(volumeRasToIjk)
+        for roiNode in roiNodes:
+            pointIjk = [0, 0, 0, 1]
+            volumeRasToIjk.MultiplyPoint(np.append(roiNode.GetCenter(), 1.0), pointIjk)
+            rois.append({"center": [round(c * self.factorResize) for c in pointIjk[0:3]], "size": [round(c * self.factorResize) for c in roiNode.GetSize()], 
+                         "outputFile": os.path.join(outputDirectory, roiNode.GetName() + ".nrrd")})
+        return rois
+
+    def createRoiBatch(self, rois):
+        """
+        Creates several ROIs with the external program `createRoiBatch`, which decodes each needed slice once, 
+        run in the background by the job runner (see `submitJob`).
+
+        The ROIs contained in a ROI of the cache are cropped from the cache (see `findRoiInCache`), the other ones are 
+        written in the file `roiBatch.txt` of the temporary directory, one by line, and extracted in one pass over 
+        the slices. The sizes are made even as in `createRoi`.
+
+        Parameters:
+        rois (list of dict): The ROIs with the keys "center" and "size" (in pixels of the slices) and "outputFile".
+
+        Returns:
+        int: Returns 0 on success, or -1 if a ROI is outside of the image or if the program is missing.
+        """
+        print("createRoiBatch")
+        res = 0
+        toExtract = []
+        inputDirectory = self.inputDirectory
+        signature = self.slicesSignature(inputDirectory)
+        for roi in rois:
+            size = [int(value) + int(value) % 2 for value in roi["size"]]
+            center = [int(value) for value in roi["center"]]
+            begin = [center[k] - size[k]//2 for k in range(3)]
+            end = [begin[k] + size[k] - 1 for k in range(3)]
+            if min(begin) < 0 or end[0] >= self.sizeImageInputOrigin[0] or end[1] >= self.sizeImageInputOrigin[1] or end[2] >= self.sizeZImageInputOrigin:
+                print("createRoiBatch the ROI is outside of the image", roi["outputFile"])
+                res = -1
+                continue
+            entry = self.findRoiInCache(inputDirectory, begin, end, signature)
+            if entry is not None and self.cropRoiFromCache(entry, begin, end, roi["outputFile"]) == 0:
+                continue
+            toExtract.append((size, center, begin, end, roi["outputFile"]))
+        print("createRoiBatch ROIs to extract =", len(toExtract))
+        if len(toExtract) == 0:
+            return res
+        if not os.path.exists(self.programDirectory + "/" + self.createRoiBatchProgram):
+            slicer.util.warningDisplay(self.programDirectory + "/" + self.createRoiBatchProgram + " does not exist!\n")
+            return -1
+        roiFile = os.path.join(self.directoryTemp, self.roiBatchFileName)
+        with open(roiFile, "w") as outfile:
+            for size, center, begin, end, outputFile in toExtract:
+                outfile.write(" ".join(str(value) for value in size + center) + " c " + outputFile + "\n")
+
+        def onFinished(returncode, output):
+            for size, center, begin, end, outputFile in toExtract:
+                if os.path.exists(outputFile):
+                    self.addRoiToCache(inputDirectory, begin, end, outputFile, signature)
+            if returncode != 0:
+                slicer.util.warningDisplay("Some ROIs can't be created!\n")
+        self.submitJob("ROIs", [self.programDirectory + "/" + self.createRoiBatchProgram, inputDirectory + "/", roiFile, self.inputDirectoryExtension], onFinished)
+        return res
+
+    def roiCacheDirectory(self):
+        """
+        Returns the directory of the ROI cache, the subdirectory `roiCache` of the temporary directory.
+
+        Returns:
+        str: The path of the ROI cache directory.
+        """
+        return os.path.join(self.directoryTemp, self.roiCacheDirectoryName)
+
+    def loadRoiCache(self):
+        """
+        Loads the manifest of the ROI cache.
+
+        Each entry of the manifest describes a ROI extracted by `createRoiImage3D`: the absolute path of the 
+        acquisition directory and the signature of its slices (see `slicesSignature`), the first and last pixels of the box ("begin" and "end", 
+        [x, y, z]), the file of the ROI in the cache, its size in bytes and the time of its last use.
+
+        Returns:
+        dict: The manifest with the key "entries", the entries whose file is missing are removed.
+        """
+        manifestFile = os.path.join(self.roiCacheDirectory(), self.roiCacheManifestName)
+        cache = {"entries": []}
+        if os.path.exists(manifestFile):
+            try:
+                with open(manifestFile, "r") as openfile:
+                    cache = json.load(openfile)
+            except Exception as e:
+                print("loadRoiCache can't read", manifestFile, str(e))
+        cache["entries"] = [entry for entry in cache["entries"] if os.path.exists(os.path.join(self.roiCacheDirectory(), entry["file"]))]
+        return cache
+
+    def saveRoiCache(self, cache):
+        """
+        Saves the manifest of the ROI cache.
+
+        Parameters:
+        cache (dict): The manifest with the key "entries".
+
+        Returns:
+        None
+        """
+        manifestFile = os.path.join(self.roiCacheDirectory(), self.roiCacheManifestName)
+        with open(manifestFile + ".tmp", "w") as outfile:
+            json.dump(cache, outfile, indent=4)
+        os.replace(manifestFile + ".tmp", manifestFile)
+
+    def findRoiInCache(self, inputDirectory, begin, end, signature=None):
+        """
+        Looks for a ROI of the cache which contains the box begin to end of an acquisition directory.
+
+        The ROIs of the directory which were extracted from other slices (a slice added, removed or rewritten, 
+        see `slicesSignature`) are ignored. Among the ROIs which contain the box, the smallest one is returned 
+        and its time of last use is updated.
+
+        Parameters:
+        inputDirectory (str): The directory containing the image slices.
+        begin (list of int): The first pixel of the box, [x, y, z].
+        end (list of int): The last pixel of the box, [x, y, z].
+        signature (str): The current signature of the slices, computed if it is None.
+
+        Returns:
+        dict: The entry of the cache, or None if no ROI contains the box.
+        """
+        print("findRoiInCache")
+        directory = os.path.abspath(inputDirectory)
+        if signature is None:
+            signature = self.slicesSignature(inputDirectory)
+        cache = self.loadRoiCache()
+        found = None
+        for entry in cache["entries"]:
+            if entry["inputDirectory"] != directory or entry.get("slicesSignature") != signature:
+                continue
+            if all(entry["begin"][k] <= begin[k] and end[k] <= entry["end"][k] for k in range(3)):
+                if found is None or entry["size"] < found["size"]:
+                    found = entry
+        if found is not None:
+            found["lastAccess"] = time.time()
+            self.saveRoiCache(cache)
+        return found
+
+    def addRoiToCache(self, inputDirectory, begin, end, roiFile, signature):
+        """
+        Copies a ROI extracted by `createRoiImage3D` in the cache, then evicts the least recently used ROIs 
+        until the size of the cache is under `roiCacheMaxSizeMB`.
+
+        Parameters:
+        inputDirectory (str): The directory containing the image slices.
+        begin (list of int): The first pixel of the ROI, [x, y, z].
+        end (list of int): The last pixel of the ROI, [x, y, z].
+        roiFile (str): The file of the ROI.
+        signature (str): The signature of the slices the ROI was extracted from, taken when its job was submitted.
+
+        Returns:
+        None
+        """
+        print("addRoiToCache")
+        if not os.path.exists(roiFile):
+            return
+        os.makedirs(self.roiCacheDirectory(), exist_ok=True)
+        directory = os.path.abspath(inputDirectory)
+        cache = self.loadRoiCache()
+        name = "roi_" + hashlib.md5(directory.encode()).hexdigest()[:8] + "_" + "_".join(str(value) for value in begin + end) + os.path.splitext(roiFile)[1]
+        shutil.copyfile(roiFile, os.path.join(self.roiCacheDirectory(), name))
+        cache["entries"] = [entry for entry in cache["entries"] if entry["file"] != name]
+        cache["entries"].append({"inputDirectory": directory, "slicesSignature": signature, "begin": begin, "end": end, 
+                                 "file": name, "size": os.path.getsize(roiFile), "lastAccess": time.time()})
+        cache["entries"].sort(key=lambda entry: entry["lastAccess"])
+        total = sum(entry["size"] for entry in cache["entries"])
+        while total > self.roiCacheMaxSizeMB * 1000 * 1000 and len(cache["entries"]) > 1:
+            entry = cache["entries"].pop(0)
+            print("addRoiToCache evict", entry["file"])
+            os.remove(os.path.join(self.roiCacheDirectory(), entry["file"]))
+            total -= entry["size"]
+        self.saveRoiCache(cache)
+
+    def cropRoiFromCache(self, entry, begin, end, outputFile):
+        """
+        Crops the box begin to end from a ROI of the cache and writes it in the output file.
+
+        The output has the origin of the ROIs written by `createRoiImage3D`, as if it had been extracted from the slices.
+
+        Parameters:
+        entry (dict): The entry of the cache which contains the box (see `findRoiInCache`).
+        begin (list of int): The first pixel of the box, [x, y, z].
+        end (list of int): The last pixel of the box, [x, y, z].
+        outputFile (str): The output file.
+
+        Returns:
+        int: Returns 0 on success, or -1 if the ROI of the cache can't be read.
+        """
+        print("cropRoiFromCache")
+        try:
+            image = sitk.ReadImage(os.path.join(self.roiCacheDirectory(), entry["file"]))
+        except Exception as e:
+            print("cropRoiFromCache can't read", entry["file"], str(e))
+            return -1
+        start = [begin[k] - entry["begin"][k] for k in range(3)]
+        stop = [end[k] - entry["begin"][k] + 1 for k in range(3)]
+        roi = image[start[0]:stop[0], start[1]:stop[1], start[2]:stop[2]]
+        roi.SetOrigin(image.GetOrigin())
+        sitk.WriteImage(roi, outputFile)
+        return 0
+
+    def retrieveSizeImage(self):
+        """
+        Retrieve the dimensions of the input image volume from the specified directory and handle NRRD files.
+
+        This function reads the slice index of the input directory and retrieves the size of the input image 
+        from the header of the first slice (see `readImageMetadata`), the pixels are not decoded. If the input volume is a NRRD file, it delegates the retrieval 
+        to the `retrieveSizeImageNrrd` method. The method also handles file extensions and sorts directory 
+        contents for further processing.
+
+        Parameters:
+        None
+
+        Returns:
+        None: The function prints status messages and updates internal attributes like `self.sizeImageInputOrigin`, 
+          which stores the dimensions of the image, and `self.sizeZImageInputOrigin`, which refers to the z-dimension.
+
+        Attributes Modified:
+        - `self.dirList`: List of files in the input directory, sorted and cleaned based on the file extension, 
+          read from the slice index of the directory (see `loadSliceIndex`).
+        - `self.inputDirectoryExtension`: The extension of the input image files (e.g., `.nrrd`, `.nii`).
+        - `self.sizeImageInputOrigin`: The size (dimensions) of the first image file in the directory.
+        - `self.sizeZImageInputOrigin`: The z-dimension of the input image.
+        - `self.bytesPerPixel`: The number of bytes of a pixel of the slices, used to estimate the size of the 3D files.
+
+        Exceptions:
+        - If the input volume or input filename is set and is a NRRD file, the method will call `retrieveSizeImageNrrd`.
+        - If there is an issue reading the directory or the input image, an error message is printed 
+          specifying the exception encountered.
+        """
+        print("retrieveSizeImage")        
+        if self.inputVolume is not None and self.inputVolumeFileName is not None:            
+            self.retrieveSizeImageNrrd()
+        
+        try:
+            index = self.loadSliceIndex(self.inputDirectory)
+            self.dirList = [item["name"] for item in index["slices"]]
+            self.inputDirectoryExtension = index["extension"]
+            self.sizeZImageInputOrigin = len(self.dirList)
+            print("dirList[0] = ", self.dirList[0])
+            print("dirList[0] = ", self.inputDirectory + "/" + self.dirList[0])
+            metadata = self.readImageMetadata(self.inputDirectory + "/" + self.dirList[0])
+            self.sizeImageInputOrigin = metadata["size"]
+            # the C++ programs keep the pixel type of the slices, the 64 bits types are converted to 32 bits
+            self.bytesPerPixel = min(metadata["bytesPerPixel"], 4)
+            print("self.sizeImageInputOrigin = ", self.sizeImageInputOrigin)       
+            print("self.bytesPerPixel = ", self.bytesPerPixel)
+            print("self.sizeZImageInputOrigin = ", self.sizeZImageInputOrigin)        
+                
+        except Exception as e:
+            print("Can't read input Origin image", str(e))
+    
+    def cleanList(self, inputDirectory,list, inputDirectoryExtension):
+        """
+        Filters a list of files in the input directory based on the specified file extension.
+
+        This function iterates through the list of files and keeps only those that match the given 
+        file extension. It constructs the full path of each file and compares its extension to 
+        the `inputDirectoryExtension` parameter.
+
+        Parameters:
+        inputDirectory (str): The directory where the files are located.
+        list (list of str): A list of filenames to be filtered.
+        inputDirectoryExtension (str): The file extension (without the dot) to filter by (e.g., 'jp2').
+
+        Returns:
+        list of str: A new list containing only the filenames that have the specified extension.
+        """
+        print("cleanList")
+        listTemp = []
+        for item in list:
+            split = os.path.splitext(inputDirectory + item)
+            extension = split[1]           
+            if extension == ("." + inputDirectoryExtension):
+                listTemp.append(item)        
+        return listTemp
+        
+    def retrieveExtension(self, inputDirectory, list):
+        """
+        Determines the most common file extension in a list of files from the input directory.
+
+        This function scans the provided list of filenames, extracts their extensions, and counts 
+        how many times each extension appears. It returns the extension that occurs the most frequently.
+
+        Parameters:
+        inputDirectory (str): The directory where the files are located.
+        list (list of str): A list of filenames from which to retrieve and count extensions.
+
+        Returns:
+        str: The most common file extension found in the list (without the leading dot).
+        """
+        print("retrieveExtension")
+        extension = "jp2"
+        extensions = {}
         for item in list:
             split = os.path.splitext(inputDirectory + item)
             extension = split[1]
@@ -2500,12 +3488,195 @@ class t_ZoomRoiLogic(ScriptedLoadableModuleLogic):
         print("retrieveExtension extension", extension)
         return extension
     
+    def readImageMetadata(self, filename):
+        """
+        Reads the metadata of an image file from its header, without reading the pixel data.
+
+        The result is cached with the modification time and the size of the file, so switching back to 
+        a volume or a directory already seen doesn't read the file again.
+
+        Parameters:
+        filename (str): The path of the image file (a slice or a 3D volume).
+
+        Returns:
+        dict: The metadata with the keys "size", "spacing", "origin", "pixelID", "pixelType" (name of the 
+              SimpleITK pixel type), "numberOfComponents", "bytesPerPixel" (size of a component) and "dtype" 
+              (NumPy type of a component).
+        """
+        stat = os.stat(filename)
+        key = (os.path.abspath(filename), stat.st_mtime_ns, stat.st_size)
+        if key in self.metadataCache:
+            return self.metadataCache[key]
+        reader = sitk.ImageFileReader()
+        reader.SetFileName(filename)
+        reader.ReadImageInformation()
+        pixelID = reader.GetPixelID()
+        # a 1 pixel image gives the size and the NumPy type of the components
+        arrayPixel = sitk.GetArrayViewFromImage(sitk.Image([1] * reader.GetDimension(), pixelID, reader.GetNumberOfComponents()))
+        metadata = {
+            "size": reader.GetSize(),
+            "spacing": reader.GetSpacing(),
+            "origin": reader.GetOrigin(),
+            "pixelID": pixelID,
+            "pixelType": sitk.GetPixelIDValueAsString(pixelID).replace(" ", "_"),
+            "numberOfComponents": reader.GetNumberOfComponents(),
+            "bytesPerPixel": arrayPixel.dtype.itemsize,
+            "dtype": arrayPixel.dtype,
+        }
+        self.metadataCache[key] = metadata
+        return metadata
+
+    def sliceIndexFile(self, inputDirectory):
+        """
+        Returns the path of the slice index of an acquisition directory.
+
+        The index is stored in the acquisition directory. If the directory is read only, it is stored in 
+        `$HOME/.citrusSkin/sliceIndex/` under the path of the directory where "/" is replaced by "_". 
+        The C++ programs look for the index at the same places.
+
+        Parameters:
+        inputDirectory (str): The directory containing the image slices.
+
+        Returns:
+        str: The path of the index file.
+        """
+        directory = os.path.abspath(inputDirectory)
+        indexFile = os.path.join(directory, self.sliceIndexName)
+        if os.path.exists(indexFile) or os.access(directory, os.W_OK):
+            return indexFile
+        directoryIndex = os.getenv("HOME") + "/" + self.directoryConfig + "/sliceIndex"
+        if not os.path.exists(directoryIndex):
+            os.makedirs(directoryIndex)
+        return os.path.join(directoryIndex, directory.replace("/", "_") + ".txt")
+
+    def readSliceIndex(self, indexFile):
+        """
+        Reads a slice index file.
+
+        The file is a text file: a line "citrusSkinSliceIndex 1", the lines "directoryMtime", "extension" 
+        and "slices" followed by one line per slice with the name, the modification time (ns), the size in bytes, 
+        the dimensions x and y and the pixel type, separated by tabulations.
+
+        Parameters:
+        indexFile (str): The path of the index file.
+
+        Returns:
+        dict: The index with the keys "directoryMtime", "extension" and "slices" (list of dict), 
+              or None if the file doesn't exist or can't be read.
+        """
+        try:
+            with open(indexFile, "r") as openfile:
+                lines = openfile.read().splitlines()
+            index = {}
+            for line in lines[1:4]:
+                key, value = line.split(" ", 1)
+                index[key] = value
+            index["directoryMtime"] = int(index["directoryMtime"])
+            index["slices"] = []
+            for line in lines[4:]:
+                name, mtime, size, sizeX, sizeY, pixelType = line.split("\t")
+                index["slices"].append({"name": name, "mtime": int(mtime), "size": int(size), "sizeX": int(sizeX), "sizeY": int(sizeY), "pixelType": pixelType})
+            return index
+        except Exception as e:
+            print("Can't read slice index", indexFile, str(e))
+            return None
+
+    def writeSliceIndex(self, inputDirectory, index):
+        """
+        Writes the slice index of an acquisition directory.
+
+        The file is created empty first, so that the modification time of the directory recorded in the index 
+        is the one after the creation of the index.
+
+        Parameters:
+        inputDirectory (str): The directory containing the image slices.
+        index (dict): The index with the keys "extension" and "slices", the key "directoryMtime" is updated.
+
+        Returns:
+        None
+        """
+        indexFile = self.sliceIndexFile(inputDirectory)
+        try:
+            if not os.path.exists(indexFile):
+                open(indexFile, "w").close()
+            index["directoryMtime"] = os.stat(inputDirectory).st_mtime_ns
+            with open(indexFile, "w") as openfile:
+                openfile.write("citrusSkinSliceIndex 1\n")
+                openfile.write("directoryMtime " + str(index["directoryMtime"]) + "\n")
+                openfile.write("extension " + index["extension"] + "\n")
+                openfile.write("slices " + str(len(index["slices"])) + "\n")
+                for item in index["slices"]:
+                    openfile.write("\t".join([item["name"], str(item["mtime"]), str(item["size"]), str(item["sizeX"]), str(item["sizeY"]), item["pixelType"]]) + "\n")
+        except Exception as e:
+            print("Can't write slice index", indexFile, str(e))
+
+    def loadSliceIndex(self, inputDirectory):
+        """
+        Returns the index of the slices of an acquisition directory, refreshing it if the directory has changed.
+
+        If the modification time of the directory is the one recorded in the index, the index is used as is 
+        without listing the directory. Otherwise the directory is listed once, the slices whose modification time 
+        and size are unchanged keep their entry and only the headers of the new or modified slices are read.
+
+        Parameters:
+        inputDirectory (str): The directory containing the image slices.
+
+        Returns:
+        dict: The index with the keys "directoryMtime", "extension" and "slices", the slices are sorted by name.
+        """
+        print("loadSliceIndex")
+        indexFile = self.sliceIndexFile(inputDirectory)
+        index = None
+        if os.path.exists(indexFile):
+            index = self.readSliceIndex(indexFile)
+        if index is not None and index["directoryMtime"] == os.stat(inputDirectory).st_mtime_ns:
+            print("loadSliceIndex index up to date", len(index["slices"]))
+            self.sliceIndex = index
+            return index
+        entries = {}
+        with os.scandir(inputDirectory) as iterator:
+            for entry in iterator:
+                if entry.is_file() and entry.name != self.sliceIndexName:
+                    stat = entry.stat()
+                    entries[entry.name] = (stat.st_mtime_ns, stat.st_size)
+        names = sorted(entries)
+        extension = self.retrieveExtension(inputDirectory, names)
+        names = self.cleanList(inputDirectory, names, extension)
+        previous = {}
+        if index is not None and index["extension"] == extension:
+            previous = {item["name"]: item for item in index["slices"]}
+        slices = []
+        newSlices = []
+        for name in names:
+            mtime, size = entries[name]
+            item = previous.get(name)
+            if item is None or item["mtime"] != mtime or item["size"] != size:
+                item = {"name": name, "mtime": mtime, "size": size, "sizeX": 0, "sizeY": 0, "pixelType": "unknown"}
+                newSlices.append(item)
+            slices.append(item)
+
+        def readHeader(item):
+            try:
+                metadata = self.readImageMetadata(os.path.join(inputDirectory, item["name"]))
+                item["sizeX"], item["sizeY"] = metadata["size"][0:2]
+                item["pixelType"] = metadata["pixelType"]
+            except Exception as e:
+                print("Can't read header", item["name"], str(e))
+
+        print("loadSliceIndex slices =", len(slices), "new or modified =", len(newSlices))
+        with ThreadPoolExecutor(max_workers=self.numberOfThreads) as executor:
+            list(executor.map(readHeader, newSlices))
+        index = {"extension": extension, "slices": slices}
+        self.writeSliceIndex(inputDirectory, index)
+        self.sliceIndex = index
+        return index
+
     def retrieveSizeImageNrrd(self):
         """
         Retrieves the size (dimensions) of an NRRD image file from the input volume filename.
 
-        This function reads the NRRD image specified by `self.inputVolumeFileName`, extracts its dimensions, 
-        and stores them in `self.sizeImageInputVolume`. If the file cannot be read, an error message is printed.
+        This function reads the header of the NRRD image specified by `self.inputVolumeFileName` (see 
+        `readImageMetadata`), extracts its dimensions, and stores them in `self.sizeImageInputVolume`. If the file cannot be read, an error message is printed.
 
         Parameters:
         None
@@ -2524,8 +3695,7 @@ class t_ZoomRoiLogic(ScriptedLoadableModuleLogic):
         print("retrieveSizeImageNrrd")
         print("retrieveSizeImageNrrd self.inputVolumeFileName = ", self.inputVolumeFileName)
         try:
-            imageInputVolume = sitk.ReadImage(self.inputVolumeFileName)
-            self.sizeImageInputVolume = imageInputVolume.GetSize()
+            self.sizeImageInputVolume = self.readImageMetadata(self.inputVolumeFileName)["size"]
             print("retrieveSizeImageNrrd self.sizeImageInputVolume = ", self.sizeImageInputVolume)            
         except Exception as e:
             print("Can't read input Volume image", str(e))
@@ -2534,8 +3704,8 @@ class t_ZoomRoiLogic(ScriptedLoadableModuleLogic):
         """
         Retrieves the number of image slices (Z-dimension) in the specified input directory.
 
-        This function lists the files in the input directory, filters them by the most common extension, 
-        and calculates the number of image slices based on the number of files in the directory. 
+        This function reads the slice index of the input directory (see `loadSliceIndex`), which holds the files 
+        filtered by the most common extension, and calculates the number of image slices. 
         The last slice index is returned.
 
         Parameters:
@@ -2555,10 +3725,9 @@ class t_ZoomRoiLogic(ScriptedLoadableModuleLogic):
         print("retrieveSizeDirectory")
         lastSlice =0
         try:
-            dirList = os.listdir(inputDirectory)
-            dirList.sort()
-            self.inputDirectoryExtension = self.retrieveExtension(self.inputDirectory, self.dirList) 
-            dirList = self.cleanList(inputDirectory, dirList, self.inputDirectoryExtension)         
+            index = self.loadSliceIndex(inputDirectory)
+            dirList = [item["name"] for item in index["slices"]]
+            self.inputDirectoryExtension = index["extension"]
             sizeZImageInputOrigin = len(dirList)
             print("dirList[0] = ", dirList[0])
             print("dirList[0] = ", inputDirectory + "/" + dirList[0])            
@@ -2593,91 +3762,747 @@ class t_ZoomRoiLogic(ScriptedLoadableModuleLogic):
     def computeSizeTimeRoi(self,sizeRoi):
         time = sizeRoi[2] * self.sizeImageInputOrigin[0] * self.sizeImageInputOrigin[1] * 0.000000072  # estimation  pour décompresser et charger une image  
         #time = sizeRoi[2] * 1.0  # TODO trouver une bonne estimation , estimation  pour décompresser et charger une image      
-        size = sizeRoi[0] * sizeRoi[1] * sizeRoi[2] * 4 /(1000*1000) # en Mo
+        size = sizeRoi[0] * sizeRoi[1] * sizeRoi[2] * self.bytesPerPixel /(1000*1000) # en Mo
         return round(size), round(time)
     
     def computeSizeTimeResize(self, nbSlices, factorResize):
         time = nbSlices / factorResize * 1.0 # estimation 1s pour charger et parcourir une image 
-        size = self.sizeImageInputOrigin[0] * self.sizeImageInputOrigin[1] * 4 * nbSlices /(factorResize * factorResize * factorResize * (1000*1000))
+        size = self.sizeImageInputOrigin[0] * self.sizeImageInputOrigin[1] * self.bytesPerPixel * nbSlices /(factorResize * factorResize * factorResize * (1000*1000))
         return round(size), round(time)
     
     def computeTime(self, sizeX, sizeY, sizeZ, factorResize): # TODO à vérifier pour la rendre générique
         time = sizeZ * sizeX * sizeY * 0.000000072  # estimation  pour décompresser et charger une image  
-        size = sizeX * sizeY * 4 * sizeZ /(factorResize * factorResize * factorResize * (1000*1000))
+        size = sizeX * sizeY * self.bytesPerPixel * sizeZ /(factorResize * factorResize * factorResize * (1000*1000))
         return round(size), round(time)
     
     def displayJsonData(self):
         """
-        Displays the key-value pairs stored in the class's dictionary attribute.
+        Displays the key-value pairs stored in the class's dictionary attribute.
+
+        This function iterates through the `self.dictionary` attribute, which is expected to hold 
+        JSON-like data, and prints each key along with its corresponding value.
+
+        Parameters:
+        None
+
+        Returns:
+        None: The function prints each key-value pair in the dictionary to the console.
+
+        Attributes Accessed:
+        - `self.dictionary`: A dictionary containing the data to be displayed, with keys representing 
+        data fields and values representing their associated values.
+        """
+        print("displayJsonData")
+        for key, value in self.dictionary.items():
+            print("key = ", key, ", value = ", value)
+    
+    def create3DFileResized(self, begin, end, inputDirectory, factorResize, outputFile, onFinished=None) :
+        """
+        Creates a resized 3D image file by processing image slices from the input directory.
+
+        This function processes a subset of image slices, specified by the `begin` and `end` indices, and resizes 
+        them by a given `factorResize`. It estimates the size for the resized 3D image, asks 
+    f   or user confirmation, and then calls an external program to create the resized 3D image file.
+
+        Parameters:
+        begin (int): The index of the first slice to be processed.
+        end (int): The index of the last slice to be processed.
+        inputDirectory (str): The directory containing the image slices.
+        factorResize (float): The resize factor applied to the slices.
+        outputFile (str): The path where the output 3D image file will be saved.
+        onFinished (function): Called with 0 when the file is created, or -1 if the external program fails. The 
+                               external program is run in the background by the job runner (see `submitJob`).
+
+        Returns:
+        int: Returns 0 on success (the file may still be in progress), or -1 if the process is aborted or an error occurs.
+
+        Attributes Accessed:
+        - `self.programDirectory`: The directory containing the external resizing program.
+        - `self.resizeImageProgram`: The name of the external program to perform the resizing.
+        - `self.inputDirectoryExtension`: The file extension of the input image slices.
+        - `self.fileDirectory`: Determines whether the process involves a directory ('d') or a file ('f'). For a 
+          file, `inputDirectory` is the path of the 3D file and the volume is built by `create3DFileResizedFromFile`.
+        - `self.resizeInProcess`: If True, the volume is built in 3D Slicer by `create3DVolumeResized` and 
+          stored in `self.resizedVolumeNode`, the external program is not used.
+        - `self.sharedMemoryTransfer`: If True, the external program `streamResizeProgram` writes the volume in 
+          shared memory and it is loaded in `self.resizedVolumeNode` by `loadSharedVolume`. The output file is 
+          only written if it is given. If there is not enough shared memory and no output file is given, the 
+          volume is built by `create3DVolumeResized`.
+
+        If a pyramid has been built for the input directory (see `buildPyramid`), the volume is taken from the 
+        nearest stored level by `create3DFileFromPyramid` and the slices are not read.
+
+        Exceptions:
+        - If the user does not confirm the operation, the function exits early with a return value of -1.
+        - If the external resizing program is missing, an error message is displayed and the function returns -1.
+        """
+        print("create3DFileResized")
+        print(str(begin) + " " + str(end) + " " +  str(factorResize) + " " + str(outputFile))
+        if self.fileDirectory == "f":
+            res = self.create3DFileResizedFromFile(begin, end, inputDirectory, factorResize, outputFile)
+            if res == 0 and onFinished is not None:
+                onFinished(0)
+            return res
+        nbSlices = end-begin+1
+        sizeRoi, timeRoi = self.computeSizeTimeResize(nbSlices, factorResize)
+        min = int(timeRoi/60)
+        sec = timeRoi-min*60
+        msg = "Size of the 3D file " + str(sizeRoi) + " Mo.\nDo you want to continue?"
+        print(msg)        
+        print(str(self.programDirectory) + "/" + self.resizeImageProgram + " " + inputDirectory + "/ " + str(begin) + " " + str(end) + " " + str(factorResize) + " " + str(outputFile) + " " + self.inputDirectoryExtension)        
+        if not slicer.util.confirmYesNoDisplay(msg):
+            return -1
+        if onFinished is None:
+            onFinished = lambda res: None
+        self.resizedVolumeNode = None
+        if self.fileDirectory != "f" and self.create3DFileFromPyramid(begin, end, inputDirectory, factorResize, outputFile) == 0:
+            onFinished(0)
+            return 0
+        sharedMemory = self.sharedMemoryTransfer and self.fileDirectory != "f" and self.sharedMemoryAvailable(sizeRoi)
+        if (self.resizeInProcess or (self.sharedMemoryTransfer and not sharedMemory and not outputFile)) and self.fileDirectory != "f":
+            self.resizedVolumeNode = self.create3DVolumeResized(begin, end, inputDirectory, factorResize, outputFile)
+            if self.resizedVolumeNode is None:
+                return -1
+            onFinished(0)
+            return 0
+        if sharedMemory:
+            name = os.path.basename(os.path.normpath(inputDirectory)) + "_" + str(int(factorResize))
+            if outputFile:
+                name = os.path.splitext(os.path.basename(outputFile))[0]
+            sharedFile = self.sharedMemoryDirectory + "/citrusSkin_" + str(os.getpid()) + "_" + str(int(time.time() * 1000)) + ".nhdr"
+            def onSharedFinished(returncode, output):
+                if returncode == 0:
+                    self.resizedVolumeNode = self.loadSharedVolume(sharedFile, name)
+                self.removeSharedVolume(sharedFile)
+                if self.resizedVolumeNode is None:
+                    onFinished(-1)
+                    return
+                if outputFile:
+                    slicer.util.saveNode(self.resizedVolumeNode, outputFile)
+                onFinished(0)
+            self.submitJob("Resize", [self.programDirectory + "/" + self.streamResizeProgram, inputDirectory + "/", str(begin), str(end), str(factorResize), sharedFile, self.inputDirectoryExtension] + self.threadArguments(), 
+                           onSharedFinished, lambda: self.removeSharedVolume(sharedFile))
+            return 0
+        if not os.path.exists(self.programDirectory + "/" + self.resizeImageProgram):
+            slicer.util.warningDisplay(self.programDirectory + "/" + self.resizeImageProgram + " does not exist!\n")
+            return  -1   
+        if self.fileDirectory == "d":            
+            self.submitJob("Resize", [self.programDirectory + "/" + self.resizeImageProgram, inputDirectory + "/", str(begin), str(end), str(factorResize), outputFile, self.inputDirectoryExtension] + self.threadArguments(), 
+                           lambda returncode, output: onFinished(0 if returncode == 0 else -1))
+        else:
+            print("create3DFileResized select Directory or File")
+        return 0 
+
+    def openVolumeFile(self, inputFile):
+        """
+        Opens a 3D file as an array without reading the voxels if possible.
+
+        A raw NRRD file (.nrrd or .nhdr) is mapped in memory by `memmapNrrd`, so only the pages used by the views 
+        of the array are read. The other files (compressed NRRD, ...) are read entirely with SimpleITK.
+
+        Parameters:
+        inputFile (str): The path of the 3D file.
+
+        Returns:
+        tuple: The array indexed [z, y, x] and the 4x4 IJK to RAS matrix of the volume (NumPy array).
+        """
+        print("openVolumeFile")
+        try:
+            return self.memmapNrrd(inputFile)
+        except ValueError as e:
+            print("openVolumeFile the file is read entirely: ", str(e))
+        image = sitk.ReadImage(inputFile)
+        ijkToRas = np.eye(4)
+        ijkToRas[0:3, 0:3] = np.array(image.GetDirection()).reshape(3, 3) * np.array(image.GetSpacing())
+        ijkToRas[0:3, 3] = image.GetOrigin()
+        ijkToRas[0:2, :] *= -1 # SimpleITK works in LPS, 3D Slicer in RAS
+        return sitk.GetArrayViewFromImage(image), ijkToRas
+
+    def create3DFileResizedFromFile(self, begin, end, inputFile, factorResize, outputFile=None):
+        """
+        Creates a resized 3D volume from a 3D file, the counterpart of `create3DVolumeResized` for a file.
+
+        The volume is taken from the file opened by `openVolumeFile` with a strided view: one voxel every 
+        `factorResize` voxels in the three dimensions, between the slices begin and end. For a raw NRRD file 
+        only the pages of the kept slices are read. The volume is loaded in 3D Slicer in `self.resizedVolumeNode` 
+        and is written to the output file if it is given.
+
+        Parameters:
+        begin (int): The index of the first slice to be processed.
+        end (int): The index of the last slice to be processed, it is limited to the last slice of the file.
+        inputFile (str): The path of the 3D file.
+        factorResize (float): The resize factor applied to the volume.
+        outputFile (str): The path where the volume is saved, the volume is not written to disk if it is None or empty.
+
+        Returns:
+        int: Returns 0 on success, or -1 if the file can't be read or the user cancels.
+        """
+        print("create3DFileResizedFromFile")
+        factorResize = int(factorResize)
+        try:
+            volumeArray, ijkToRas = self.openVolumeFile(inputFile)
+        except Exception as e:
+            print("create3DFileResizedFromFile can't read ", inputFile, str(e))
+            slicer.util.warningDisplay("Can't read " + str(inputFile) + "\n")
+            return -1
+        begin = max(0, min(int(begin), volumeArray.shape[0] - 1))
+        end = volumeArray.shape[0] - 1 if end is None else max(begin, min(int(end), volumeArray.shape[0] - 1))
+        resizedArray = volumeArray[begin:end+1:factorResize, ::factorResize, ::factorResize]
+        sizeVolume = resizedArray.size * resizedArray.itemsize / (1000 * 1000)
+        msg = "Size of the 3D file " + str(round(sizeVolume)) + " Mo.\nDo you want to continue?"
+        if not slicer.util.confirmYesNoDisplay(msg):
+            return -1
+        ijkToRas = ijkToRas.copy()
+        ijkToRas[0:3, 3] += ijkToRas[0:3, 2] * begin
+        ijkToRas[0:3, 0:3] *= factorResize
+        name = os.path.splitext(os.path.basename(inputFile))[0] + "_" + str(factorResize)
+        if outputFile:
+            name = os.path.splitext(os.path.basename(outputFile))[0]
+        self.resizedVolumeNode = slicer.util.addVolumeFromArray(np.ascontiguousarray(resizedArray), ijkToRAS=ijkToRas, name=name)
+        del volumeArray, resizedArray
+        if outputFile:
+            slicer.util.saveNode(self.resizedVolumeNode, outputFile)
+        print("create3DFileResizedFromFile volume size = ", self.resizedVolumeNode.GetImageData().GetDimensions())
+        return 0
+
+    def createRoiFromFile(self, inputFile, begin, end, outputFile):
+        """
+        Creates a ROI from a 3D file and writes it in the output file.
+
+        The box is a view of the file opened by `openVolumeFile`, for a raw NRRD file only the pages of the box 
+        are read. The output has the origin of the ROIs written by `createRoiImage3D`.
+
+        Parameters:
+        inputFile (str): The path of the 3D file.
+        begin (list of int): The first voxel of the ROI, [x, y, z].
+        end (list of int): The last voxel of the ROI, [x, y, z].
+        outputFile (str): The output file.
+
+        Returns:
+        int: Returns 0 on success, or -1 if the file can't be read or the ROI is outside of the volume.
+        """
+        print("createRoiFromFile")
+        try:
+            volumeArray, ijkToRas = self.openVolumeFile(inputFile)
+        except Exception as e:
+            print("createRoiFromFile can't read ", inputFile, str(e))
+            return -1
+        shape = volumeArray.shape[::-1]
+        if min(begin) < 0 or any(end[k] >= shape[k] for k in range(3)):
+            slicer.util.messageBox("The ROI is outside of the image!")
+            return -1
+        roi = np.ascontiguousarray(volumeArray[begin[2]:end[2]+1, begin[1]:end[1]+1, begin[0]:end[0]+1])
+        del volumeArray
+        sitk.WriteImage(sitk.GetImageFromArray(roi), outputFile)
+        return 0
+
+    def sharedMemoryAvailable(self, sizeVolume):
+        """
+        Checks that a volume can be transferred from the external programs by shared memory.
+
+        The shared memory is the directory `self.sharedMemoryDirectory` (/dev/shm under Linux), the files written 
+        there stay in memory and are never written to disk. The program `streamResizeProgram` must exist and the 
+        directory must have room for the volume.
+
+        Parameters:
+        sizeVolume (float): The estimated size of the volume in Mo.
+
+        Returns:
+        bool: True if the volume can be transferred by shared memory.
+        """
+        print("sharedMemoryAvailable")
+        if not self.programDirectory or not os.path.exists(self.programDirectory + "/" + self.streamResizeProgram):
+            return False
+        if not os.path.isdir(self.sharedMemoryDirectory) or not os.access(self.sharedMemoryDirectory, os.W_OK):
+            return False
+        free = shutil.disk_usage(self.sharedMemoryDirectory).free / (1000 * 1000)
+        print("sharedMemoryAvailable free = ", free, " Mo, size = ", sizeVolume, " Mo")
+        return free > sizeVolume * 1.1
+
+    def readNrrdHeader(self, filename):
+        """
+        Reads the header of a NRRD file, attached (.nrrd) or detached (.nhdr).
+
+        Parameters:
+        filename (str): The path of the .nrrd or .nhdr file.
+
+        Returns:
+        dict: The fields of the header with their names in lower case, plus "dataFile" the path of the file 
+              that contains the voxels and "offset" the position of the first voxel in this file.
+
+        Exceptions:
+        - ValueError if the file is not a NRRD file.
+        """
+        print("readNrrdHeader")
+        header = {}
+        with open(filename, "rb") as f:
+            magic = f.readline()
+            if not magic.startswith(b"NRRD"):
+                raise ValueError(filename + " is not a NRRD file")
+            offset = len(magic)
+            for line in f:
+                offset += len(line)
+                line = line.decode("latin-1").rstrip("\r\n")
+                if line == "":
+                    break
+                if line.startswith("#"):
+                    continue
+                key, sep, value = line.partition(":=")
+                if not sep:
+                    key, sep, value = line.partition(":")
+                header[key.strip().lower()] = value.strip()
+        dataFile = header.get("data file", header.get("datafile"))
+        if dataFile:
+            if not os.path.isabs(dataFile):
+                dataFile = os.path.join(os.path.dirname(filename), dataFile)
+            header["dataFile"] = dataFile
+            header["offset"] = 0
+        else:
+            header["dataFile"] = filename
+            header["offset"] = offset
+        skip = int(header.get("byte skip", "0"))
+        if skip > 0:
+            header["offset"] += skip
+        return header
+
+    def memmapNrrd(self, filename):
+        """
+        Maps the voxels of a raw 3D NRRD file in memory, without reading them.
+
+        The pages of the file are only read when the voxels are accessed, so a crop or a strided view of the 
+        array reads only the part of the file it uses.
+
+        Parameters:
+        filename (str): The path of the .nrrd or .nhdr file, the encoding must be raw.
+
+        Returns:
+        tuple: The read only array indexed [z, y, x] and the 4x4 IJK to RAS matrix of the volume (NumPy array).
+
+        Exceptions:
+        - ValueError if the file is not a raw 3D NRRD file.
+        """
+        print("memmapNrrd")
+        header = self.readNrrdHeader(filename)
+        types = {"unsigned char": "u1", "uchar": "u1", "uint8": "u1", "uint8_t": "u1", 
+                 "signed char": "i1", "int8": "i1", "int8_t": "i1",
+                 "unsigned short": "u2", "ushort": "u2", "uint16": "u2", "uint16_t": "u2", "unsigned short int": "u2",
+                 "short": "i2", "int16": "i2", "int16_t": "i2", "short int": "i2", "signed short": "i2",
+                 "unsigned int": "u4", "uint": "u4", "uint32": "u4", "uint32_t": "u4",
+                 "int": "i4", "int32": "i4", "int32_t": "i4", "signed int": "i4",
+                 "float": "f4", "double": "f8"}
+        if header.get("encoding") != "raw":
+            raise ValueError(filename + " is not a raw NRRD file, encoding: " + str(header.get("encoding")))
+        if header.get("dimension") != "3" or header.get("type") not in types:
+            raise ValueError(filename + " is not a 3D NRRD file of a known type")
+        dtype = np.dtype(types[header["type"]])
+        if dtype.itemsize > 1:
+            dtype = dtype.newbyteorder("<" if header.get("endian", "little") == "little" else ">")
+        sizes = [int(v) for v in header["sizes"].split()]
+        volumeArray = np.memmap(header["dataFile"], dtype=dtype, mode="r", offset=header["offset"], shape=(sizes[2], sizes[1], sizes[0]))
+
+        ijkToRas = np.eye(4)
+        if "space directions" in header:
+            directions = re.findall(r"\(([^)]*)\)", header["space directions"])
+            for axis, direction in enumerate(directions[:3]):
+                ijkToRas[0:3, axis] = [float(v) for v in direction.split(",")]
+        else:
+            ijkToRas[0:3, 0:3] = np.diag([float(v) for v in header.get("spacings", "1 1 1").split()])
+        if "space origin" in header:
+            ijkToRas[0:3, 3] = [float(v) for v in header["space origin"].strip("()").split(",")]
+        if header.get("space", "").lower() in ("left-posterior-superior", "lps"):
+            ijkToRas[0:2, :] *= -1 # 3D Slicer works in RAS
+        return volumeArray, ijkToRas
+
+    def loadSharedVolume(self, headerFile, name):
+        """
+        Creates a volume node from a volume written in shared memory by an external program.
+
+        The volume is a detached NRRD file (.nhdr and .raw) written by `streamResizeProgram` in 
+        `self.sharedMemoryDirectory`. The voxels are mapped with `memmapNrrd` and given to the node by 
+        `slicer.util.updateVolumeFromArray`, so the volume is neither compressed nor read back from disk.
+
+        Parameters:
+        headerFile (str): The path of the .nhdr file.
+        name (str): The name of the volume node.
+
+        Returns:
+        vtkMRMLScalarVolumeNode: The created volume node, or None if an error occurs.
+        """
+        print("loadSharedVolume")
+        try:
+            volumeArray, ijkToRas = self.memmapNrrd(headerFile)
+        except Exception as e:
+            print("loadSharedVolume can't read ", headerFile, str(e))
+            return None
+        volumeNode = slicer.mrmlScene.AddNewNodeByClass("vtkMRMLScalarVolumeNode", name)
+        slicer.util.updateVolumeFromArray(volumeNode, volumeArray)
+        volumeNode.SetIJKToRASMatrix(slicer.util.vtkMatrixFromArray(ijkToRas))
+        volumeNode.CreateDefaultDisplayNodes()
+        print("loadSharedVolume volume size = ", volumeNode.GetImageData().GetDimensions())
+        return volumeNode
+
+    def removeSharedVolume(self, headerFile):
+        """
+        Removes a volume written in shared memory, the .nhdr file and its .raw file.
+
+        Parameters:
+        headerFile (str): The path of the .nhdr file.
+
+        Returns:
+        None
+        """
+        print("removeSharedVolume")
+        for filename in [headerFile, os.path.splitext(headerFile)[0] + ".raw"]:
+            if os.path.exists(filename):
+                os.remove(filename)
+
+    def removeStaleSharedVolumes(self):
+        """
+        Removes the volumes left in shared memory by the sessions of 3D Slicer which have ended without removing 
+        them (crash, program killed). The files are named citrusSkin_<pid>_<time>, the files of the processes 
+        which still run are kept. It is called when the logic is created.
+
+        Returns:
+        None
+        """
+        print("removeStaleSharedVolumes")
+        if not os.path.isdir(self.sharedMemoryDirectory):
+            return
+        for filename in os.listdir(self.sharedMemoryDirectory):
+            match = re.match(r"citrusSkin_(\d+)_\d+\.(nhdr|raw)$", filename)
+            if match is None:
+                continue
+            pid = int(match.group(1))
+            if pid == os.getpid(): # a job of this session, after a reload of the module
+                continue
+            try:
+                os.kill(pid, 0)
+                continue
+            except ProcessLookupError:
+                pass
+            except OSError: # the process exists but belongs to another user
+                continue
+            try:
+                os.remove(os.path.join(self.sharedMemoryDirectory, filename))
+                print("removeStaleSharedVolumes removed ", filename)
+            except OSError as e:
+                print("removeStaleSharedVolumes can't remove ", filename, e)
+
+    def pyramidDirectory(self, inputDirectory):
+        """
+        Returns the directory of the pyramid of an acquisition directory.
+
+        The pyramid is stored in the subdirectory `citrusSkinPyramid` of the acquisition directory. If the 
+        acquisition directory is read only, it is stored in `$HOME/.citrusSkin/pyramid/` under the path of the 
+        directory where "/" is replaced by "_".
+
+        Parameters:
+        inputDirectory (str): The directory containing the image slices.
+
+        Returns:
+        str: The path of the pyramid directory.
+        """
+        directory = os.path.abspath(inputDirectory)
+        directoryPyramid = os.path.join(directory, self.pyramidDirectoryName)
+        if os.path.exists(directoryPyramid) or os.access(directory, os.W_OK):
+            return directoryPyramid
+        return os.path.join(os.getenv("HOME"), self.directoryConfig, "pyramid", directory.replace("/", "_"))
+
+    def buildPyramid(self, inputDirectory):
+        """
+        Builds the pyramid of an acquisition directory with the external program `buildPyramid`, run in the 
+        background by the job runner (see `submitJob`).
+
+        The program reads each slice once and writes the volumes resized by 2, 4, 8, 16 and 32 of all the slices 
+        with the manifest `pyramid.json` in the pyramid directory (see `pyramidDirectory`). When the job succeeds, 
+        the input directory and the signature of the slices taken when the job was submitted (see `slicesSignature`) 
+        are added to the manifest, so a pyramid built before a slice was changed is not used.
+
+        Parameters:
+        inputDirectory (str): The directory containing the image slices.
+
+        Returns:
+        int: Returns 0 if the job is queued, or -1 if the program is missing.
+        """
+        print("buildPyramid")
+        if not os.path.exists(self.programDirectory + "/" + self.buildPyramidProgram):
+            slicer.util.warningDisplay(self.programDirectory + "/" + self.buildPyramidProgram + " does not exist!\n")
+            return -1
+        index = self.loadSliceIndex(inputDirectory)
+        end = len(index["slices"]) - 1
+        directoryPyramid = self.pyramidDirectory(inputDirectory)
+        signature = self.slicesSignature(inputDirectory)
+        print(self.programDirectory + "/" + self.buildPyramidProgram + " " + inputDirectory + "/ 0 " + str(end) + " " + directoryPyramid + " " + index["extension"])
+        def onFinished(returncode, output):
+            if returncode != 0:
+                slicer.util.warningDisplay("The pyramid of " + inputDirectory + " can't be built!\n")
+                return
+            manifestFile = os.path.join(directoryPyramid, self.pyramidManifestName)
+            try:
+                with open(manifestFile, "r") as openfile:
+                    manifest = json.load(openfile)
+                manifest["inputDirectory"] = os.path.abspath(inputDirectory)
+                manifest["slicesSignature"] = signature
+                with open(manifestFile + ".tmp", "w") as outfile:
+                    json.dump(manifest, outfile, indent=4)
+                os.replace(manifestFile + ".tmp", manifestFile)
+            except Exception as e:
+                print("Can't complete the pyramid manifest", str(e))
+        self.submitJob("Pyramid", [self.programDirectory + "/" + self.buildPyramidProgram, inputDirectory + "/", "0", str(end), directoryPyramid, index["extension"]], onFinished)
+        return 0
+
+    def bricksDirectory(self, inputDirectory):
+        """
+        Returns the directory of the brick store of an acquisition directory.
+
+        The store is written in the subdirectory `citrusSkinBricks` of the acquisition directory, or in 
+        `$HOME/.citrusSkin/bricks/` if the acquisition directory is read only (same rule as `pyramidDirectory`).
+
+        Parameters:
+        inputDirectory (str): The directory containing the image slices.
+
+        Returns:
+        str: The path of the brick store.
+        """
+        directory = os.path.abspath(inputDirectory)
+        directoryBricks = os.path.join(directory, self.bricksDirectoryName)
+        if os.path.exists(directoryBricks) or os.access(directory, os.W_OK):
+            return directoryBricks
+        return os.path.join(os.getenv("HOME"), self.directoryConfig, "bricks", directory.replace("/", "_"))
+
+    def buildBricks(self, inputDirectory):
+        """
+        Builds the brick store of an acquisition directory with the external program `buildBricks`, run in the 
+        background by the job runner (see `submitJob`).
+
+        The slices are cut in bricks of 64x64x64 pixels compressed with zlib, with the index `bricks.idx` and the 
+        description `bricks.json`. `createRoiImage3D` and the resize programs use the store when it exists.
+
+        Parameters:
+        inputDirectory (str): The directory containing the image slices.
+
+        Returns:
+        int: Returns 0 if the job is queued, or -1 if the program is missing.
+        """
+        print("buildBricks")
+        if not os.path.exists(self.programDirectory + "/" + self.buildBricksProgram):
+            slicer.util.warningDisplay(self.programDirectory + "/" + self.buildBricksProgram + " does not exist!\n")
+            return -1
+        index = self.loadSliceIndex(inputDirectory)
+        directoryBricks = self.bricksDirectory(inputDirectory)
+        print(self.programDirectory + "/" + self.buildBricksProgram + " " + inputDirectory + "/ " + directoryBricks + " " + index["extension"] + " " + str(self.bricksMemoryMB))
+        def onFinished(returncode, output):
+            if returncode != 0:
+                slicer.util.warningDisplay("The bricks of " + inputDirectory + " can't be built!\n")
+        self.submitJob("Bricks", [self.programDirectory + "/" + self.buildBricksProgram, inputDirectory + "/", directoryBricks, index["extension"], str(self.bricksMemoryMB)], onFinished)
+        return 0
+
+    def slicesSignature(self, inputDirectory):
+        """
+        Returns a signature of the slices of an acquisition directory, which changes when a slice is added, 
+        removed, renamed or rewritten.
 
-        This function iterates through the `self.dictionary` attribute, which is expected to hold 
-        JSON-like data, and prints each key along with its corresponding value.
+        The slices are the ones of the slice index (see `loadSliceIndex`), each one is stat'ed again so a slice 
+        rewritten in place, which doesn't change the modification time of the directory, changes the signature.
 
         Parameters:
-        None
+        inputDirectory (str): The directory containing the image slices.
 
         Returns:
-        None: The function prints each key-value pair in the dictionary to the console.
+        str: The number of slices and the SHA-1 of their names, sizes and modification times, "count:hex".
+        """
+        print("slicesSignature")
+        index = self.loadSliceIndex(inputDirectory)
+        digest = hashlib.sha1()
+        for item in index["slices"]:
+            try:
+                stat = os.stat(os.path.join(inputDirectory, item["name"]))
+                digest.update((item["name"] + " " + str(stat.st_size) + " " + str(stat.st_mtime_ns) + "\n").encode())
+            except OSError:
+                digest.update((item["name"] + " missing\n").encode())
+        return str(len(index["slices"])) + ":" + digest.hexdigest()
+
+    def loadPyramidManifest(self, inputDirectory):
+        """
+        Loads the manifest of the pyramid of an acquisition directory.
 
-        Attributes Accessed:
-        - `self.dictionary`: A dictionary containing the data to be displayed, with keys representing 
-        data fields and values representing their associated values.
+        The pyramid is out of date if the signature of the slices recorded in the manifest (see `buildPyramid`) 
+        is not the current one, or if there is no signature (pyramid built outside of the module).
+
+        Parameters:
+        inputDirectory (str): The directory containing the image slices.
+
+        Returns:
+        dict: The manifest, or None if there is no pyramid or if the slices of the directory have changed since it was built.
         """
-        print("displayJsonData")
-        for key, value in self.dictionary.items():
-            print("key = ", key, ", value = ", value)
-    
-    def create3DFileResized(self, begin, end, inputDirectory, factorResize, outputFile) :
+        manifestFile = os.path.join(self.pyramidDirectory(inputDirectory), self.pyramidManifestName)
+        if not os.path.exists(manifestFile):
+            return None
+        with open(manifestFile, "r") as openfile:
+            manifest = json.load(openfile)
+        if manifest.get("slicesSignature") != self.slicesSignature(inputDirectory):
+            print("loadPyramidManifest the pyramid of", inputDirectory, "is out of date")
+            return None
+        return manifest
+
+    def create3DFileFromPyramid(self, begin, end, inputDirectory, factorResize, outputFile):
         """
-        Creates a resized 3D image file by processing image slices from the input directory.
+        Creates a resized 3D volume from the nearest level of the pyramid of the input directory.
 
-        This function processes a subset of image slices, specified by the `begin` and `end` indices, and resizes 
-        them by a given `factorResize`. It estimates the size for the resized 3D image, asks 
-    f   or user confirmation, and then calls an external program to create the resized 3D image file.
+        The level used is the largest factor of the pyramid which divides `factorResize` and whose slices are 
+        the slices `begin`, `begin + factorResize`, ... It is mapped in memory (see `memmapNrrd`), so only the 
+        pages of the kept slices are read, subsampled by `factorResize / factor` in the three dimensions and 
+        written to `outputFile` with the spacing `factorResize`. The volume has ceil(size / factorResize) pixels 
+        in each dimension, as in `create3DVolumeResized`: the extra row and column of the stored levels are 
+        removed, also when the level is used as is. If `self.resizeInProcess` is True or no output file is 
+        given, the volume is loaded in 3D Slicer and stored in `self.resizedVolumeNode`.
 
         Parameters:
         begin (int): The index of the first slice to be processed.
         end (int): The index of the last slice to be processed.
         inputDirectory (str): The directory containing the image slices.
         factorResize (float): The resize factor applied to the slices.
-        outputFile (str): The path where the output 3D image file will be saved.
+        outputFile (str): The path where the output 3D image file will be saved, the volume is not written to disk if it is None or empty.
 
         Returns:
-        int: Returns 0 on success, or -1 if the process is aborted or an error occurs.
+        int: Returns 0 on success, or -1 if no level of the pyramid can be used.
+        """
+        print("create3DFileFromPyramid")
+        factorResize = int(factorResize)
+        try:
+            manifest = self.loadPyramidManifest(inputDirectory)
+        except Exception as e:
+            print("Can't read the pyramid manifest", str(e))
+            return -1
+        if manifest is None or begin < manifest["begin"] or end > manifest["end"]:
+            return -1
+        levels = [level for level in manifest["levels"] if factorResize % level["factor"] == 0 and (begin - manifest["begin"]) % level["factor"] == 0]
+        if len(levels) == 0:
+            return -1
+        level = max(levels, key=lambda level: level["factor"])
+        step = factorResize // level["factor"]
+        print("create3DFileFromPyramid level", level["factor"], "step", step)
+        levelFile = os.path.join(self.pyramidDirectory(inputDirectory), level["file"])
+        try:
+            # the levels are raw NRRD files written by NrrdStreamWriter, only the pages of the kept slices are read
+            arrayLevel, _ = self.memmapNrrd(levelFile)
+        except Exception as e:
+            print("Can't read the pyramid level", levelFile, str(e))
+            return -1
+        # the levels have one more row and column than the data, they are removed as in create3DVolumeResized
+        nbSlices = math.ceil((end - begin + 1) / factorResize)
+        nbRows = math.ceil(manifest["size"][1] / factorResize)
+        nbCols = math.ceil(manifest["size"][0] / factorResize)
+        first = (begin - manifest["begin"]) // level["factor"]
+        volumeArray = np.ascontiguousarray(arrayLevel[first::step, ::step, ::step][:nbSlices, :nbRows, :nbCols])
+        del arrayLevel
+        if self.resizeInProcess or not outputFile:
+            name = os.path.basename(os.path.normpath(inputDirectory)) + "_" + str(factorResize)
+            if outputFile:
+                name = os.path.splitext(os.path.basename(outputFile))[0]
+            self.resizedVolumeNode = slicer.util.addVolumeFromArray(volumeArray, name=name)
+            self.resizedVolumeNode.SetSpacing(factorResize, factorResize, factorResize)
+            if outputFile:
+                slicer.util.saveNode(self.resizedVolumeNode, outputFile)
+        else:
+            image = sitk.GetImageFromArray(volumeArray)
+            image.SetSpacing([float(factorResize)] * 3) # a voxel of the volume is factorResize voxels of the slices
+            sitk.WriteImage(image, outputFile)
+        return 0
 
-        Attributes Accessed:
-        - `self.programDirectory`: The directory containing the external resizing program.
-        - `self.resizeImageProgram`: The name of the external program to perform the resizing.
-        - `self.inputDirectoryExtension`: The file extension of the input image slices.
-        - `self.fileDirectory`: Determines whether the process involves a directory ('d') or a file ('f').
+    def loadToolsItkModule(self):
+        """
+        Loads the Python module `citrusToolsItk` built with the C++ programs.
 
-        Exceptions:
-        - If the user does not confirm the operation, the function exits early with a return value of -1.
-        - If the external resizing program is missing, an error message is displayed and the function returns -1.
+        The module exposes the functions of ToolsItk (stack of the slices, ROI, density profile) which exchange 
+        the volumes as NumPy arrays, so they run in the process of 3D Slicer without starting a program and 
+        writing an intermediate file. It is searched in `self.programDirectory` and is loaded only once. The 
+        module is optional, it is built only if pybind11 is found by CMake.
+
+        Returns:
+        module: The loaded module, or None if it is not available.
         """
-        print("create3DFileResized")
-        print(str(begin) + " " + str(end) + " " +  str(factorResize) + " " + outputFile)
-        nbSlices = end-begin+1
-        sizeRoi, timeRoi = self.computeSizeTimeResize(nbSlices, factorResize)
-        min = int(timeRoi/60)
-        sec = timeRoi-min*60
-        msg = "Size of the 3D file " + str(sizeRoi) + " Mo.\nDo you want to continue?"
-        print(msg)        
-        print(self.programDirectory + "/" + self.resizeImageProgram + " " + inputDirectory + "/ " + str(begin) + " " + str(end) + " " + str(factorResize) + " " + outputFile + " " + self.inputDirectoryExtension)        
-        if not slicer.util.confirmYesNoDisplay(msg):
-            return -1
-        if not os.path.exists(self.programDirectory + "/" + self.resizeImageProgram):
-            slicer.util.warningDisplay(self.programDirectory + "/" + self.resizeImageProgram + " does not exist!\n")
-            return  -1   
-        if self.fileDirectory == "d":            
-            result = subprocess.run([self.programDirectory + "/" + self.resizeImageProgram, inputDirectory + "/", str(begin), str(end), str(factorResize), outputFile, self.inputDirectoryExtension], capture_output=True, text=True)        
-        elif self.fileDirectory == "f":
-            print("create3DFileResized resize from file")
+        print("loadToolsItkModule")
+        if self.toolsItkModule is not None:
+            return self.toolsItkModule
+        if not self.programDirectory:
+            return None
+        if self.programDirectory not in sys.path:
+            sys.path.append(self.programDirectory)
+        try:
+            self.toolsItkModule = __import__(self.toolsItkModuleName)
+        except ImportError as e:
+            print("loadToolsItkModule module not available: ", str(e))
+            return None
+        return self.toolsItkModule
+
+    def create3DVolumeResized(self, begin, end, inputDirectory, factorResize, outputFile=None):
+        """
+        Creates a resized 3D volume directly in 3D Slicer from the image slices of the input directory.
+
+        This is the in-process counterpart of the `resizeImageParall` program. The slices are decoded by a 
+        pool of threads (SimpleITK releases the GIL while decoding), each one is downsampled by taking one 
+        pixel every `factorResize` pixels and is copied into a preallocated NumPy array. One slice every 
+        `factorResize` slices is kept. The array is then pushed into a new `vtkMRMLScalarVolumeNode`, so 
+        the volume is displayed without writing and reading back an intermediate file. When the module 
+        `citrusToolsItk` is available, the slices are stacked by ToolsItk directly into the NumPy array.
+
+        Parameters:
+        begin (int): The index of the first slice to be processed.
+        end (int): The index of the last slice to be processed.
+        inputDirectory (str): The directory containing the image slices.
+        factorResize (float): The resize factor applied to the slices.
+        outputFile (str): The path where the volume is saved, the volume is not written to disk if it is None or empty.
+
+        Returns:
+        vtkMRMLScalarVolumeNode: The created volume node, or None if an error occurs.
+        """
+        print("create3DVolumeResized")
+        factorResize = int(factorResize)
+        try:
+            index = self.loadSliceIndex(inputDirectory)
+            dirList = [item["name"] for item in index["slices"]]
+            slices = dirList[int(begin):int(end)+1:factorResize]
+            metadata = self.readImageMetadata(inputDirectory + "/" + slices[0])
+        except Exception as e:
+            print("Can't read input Origin image", str(e))
+            return None
+        print("create3DVolumeResized number of slices = ", len(slices))
+        # one voxel by kept pixel: ceil(size / factorResize) voxels by axis
+        shape = (len(slices), math.ceil(metadata["size"][1] / factorResize), math.ceil(metadata["size"][0] / factorResize))
+        toolsItk = self.loadToolsItkModule()
+        if toolsItk is not None:
+            try:
+                volumeArray = toolsItk.stack2Dto3DParallV2(inputDirectory + "/", -1, -1, -1, -1, int(begin), int(end), factorResize > 1, factorResize, index["extension"], 
+                                                           self.ioThreads, self.decodeThreads)
+            except Exception as e:
+                print("create3DVolumeResized citrusToolsItk error: ", str(e))
+                return None
+            # ToolsItk allocates size / factorResize + 1 voxels by axis, the last one is empty when the size is a 
+            # multiple of factorResize: the array is cut to the kept pixels as in the NumPy branch
+            volumeArray = volumeArray[:shape[0], :shape[1], :shape[2]]
         else:
-            print("create3DFileResized select Directory or File")
-        print("stdout:", result.stdout)
-        print("stderr:", result.stderr)
-        return 0 
+            volumeArray = np.empty(shape, dtype=metadata["dtype"])
+
+            def loadSlice(k):
+                image = sitk.ReadImage(inputDirectory + "/" + slices[k])
+                volumeArray[k] = sitk.GetArrayViewFromImage(image)[::factorResize, ::factorResize]
+
+            try:
+                with ThreadPoolExecutor(max_workers=self.numberOfThreads) as executor:
+                    list(executor.map(loadSlice, range(len(slices))))
+            except Exception as e:
+                print("create3DVolumeResized can't read a slice: ", str(e))
+                return None
+
+        name = os.path.basename(os.path.normpath(inputDirectory)) + "_" + str(factorResize)
+        if outputFile:
+            name = os.path.splitext(os.path.basename(outputFile))[0]
+        volumeNode = slicer.util.addVolumeFromArray(volumeArray, name=name)
+        if outputFile:
+            slicer.util.saveNode(volumeNode, outputFile)
+        print("create3DVolumeResized volume size = ", volumeNode.GetImageData().GetDimensions())
+        return volumeNode
 
     def createDirectory(self, directory, varDirectory):
         """
@@ -2794,13 +4619,24 @@ class t_ZoomRoiLogic(ScriptedLoadableModuleLogic):
             print("param = ", param)
         if param["pathProgram"] != "None":
             self.programDirectory = param["pathProgram"]
+        self.resizeInProcess = param.get("resizeInProcess", "False") == "True"
+        self.sharedMemoryTransfer = param.get("sharedMemoryTransfer", "False") == "True"
+        self.ioThreads = int(param.get("ioThreads", self.ioThreads))
+        self.decodeThreads = int(param.get("decodeThreads", self.decodeThreads))
+        if self.decodeThreads > 0:
+            self.numberOfThreads = self.decodeThreads
+        self.resizeImageProgram = param.get("resizeImageProgram", self.resizeImageProgram)
             
     def saveConfiguration(self):
         """
-        Saves the current configuration to a JSON file, updating the program path.
+        Saves the current configuration to a JSON file, updating the program path and the options.
 
         This function loads the existing configuration from the specified JSON file, updates 
-        the `pathProgram` field with the current value of `self.programDirectory`, and then 
+        the `pathProgram` field with the current value of `self.programDirectory`, the 
+        `resizeInProcess` field with the current value of `self.resizeInProcess`, the 
+        `sharedMemoryTransfer` field with the current value of `self.sharedMemoryTransfer`, the `ioThreads` 
+        and `decodeThreads` fields with the threads used by the programs to read and decode the slices, and the 
+        `resizeImageProgram` field with the program used to build the resized 3D files, and then 
         saves the updated configuration back to the file.
 
         Returns:
@@ -2813,6 +4649,11 @@ class t_ZoomRoiLogic(ScriptedLoadableModuleLogic):
             print("param = ", param)
         print("saveConfiguration self.programDirectory = ", self.programDirectory)    
         param["pathProgram"] = self.programDirectory
+        param["resizeInProcess"] = str(self.resizeInProcess)
+        param["sharedMemoryTransfer"] = str(self.sharedMemoryTransfer)
+        param["ioThreads"] = self.ioThreads
+        param["decodeThreads"] = self.decodeThreads
+        param["resizeImageProgram"] = self.resizeImageProgram
         with open(os.getenv("HOME") + "/" + self.directoryConfig + "/" + self.fileConfig, "w") as openfile:
             json_object = json.dumps(param, indent=4)
             openfile.write(json_object)
@@ -2820,15 +4661,87 @@ class t_ZoomRoiLogic(ScriptedLoadableModuleLogic):
 
     def computeNormals(self,x,y,z):
         """
-        todo, not implemented
+        Computes the normal to the skin at a point, from the smoothed gradient of the volume loaded in 3D Slicer.
+
+        The normal is the opposite of the gradient of the density, it points from the fruit towards the outside. 
+        It is read in the normal field of the loaded volume (see `normalsAt`), the point is given in the 
+        coordinates of the profile and converted to the loaded volume with the resize factor.
+
+        Parameters:
+        x (int): The x-coordinate of the point.
+        y (int): The y-coordinate of the point.
+        z (int): The z-coordinate of the point.
+
+        Returns:
+        list: The unit normal [nx, ny, nz], [0, 0, 0] if the gradient is null, or None if no volume is loaded.
         """
         print("computeNormals")
-        normal = []
-        normal.append(-1)
-        normal.append(-1)
-        normal.append(-1)
+        normals = self.normalsAt(np.array([[x, y, z]], dtype=np.float64))
+        if normals is None:
+            return None
+        normal = [float(value) for value in normals[0]]
         print("computeNormals normal = ", normal)        
         return normal
+
+    def normalsAt(self, points):
+        """
+        Returns the normals to the skin at several points, in O(1) by point once the field is computed.
+
+        The field of the normals of the loaded volume is computed by chunks of `normalChunkSize` voxels, when 
+        a point of the chunk is queried for the first time (see `computeNormalChunk`), and kept in memory in 
+        float16. It is computed again if the loaded volume or `normalSigma` change.
+
+        Parameters:
+        points (numpy.ndarray): The points [x, y, z] in the coordinates of the profile, one by row.
+
+        Returns:
+        numpy.ndarray: The unit normals [nx, ny, nz], one by row, or None if no volume is loaded.
+        """
+        if self.inputVolume is None or self.inputVolume.GetImageData() is None:
+            return None
+        key = (self.inputVolume.GetID(), self.inputVolume.GetImageData().GetMTime(), self.normalSigma, self.normalChunkSize)
+        if self.normalFieldKey != key:
+            self.normalFieldKey = key
+            self.normalChunks = {}
+        volumeArray = slicer.util.arrayFromVolume(self.inputVolume)
+        scale = self.factorResize if self.fileDirectory != "f" and self.factorResize else 1
+        indexes = self.roundHalfAway(np.asarray(points, dtype=np.float64) / scale)
+        indexes = np.clip(indexes, 0, np.array(volumeArray.shape[::-1]) - 1)
+        chunks = indexes // self.normalChunkSize
+        normals = np.zeros((len(indexes), 3), dtype=np.float32)
+        for chunk in np.unique(chunks, axis=0):
+            chunk = tuple(int(value) for value in chunk)
+            if chunk not in self.normalChunks:
+                self.normalChunks[chunk] = self.computeNormalChunk(volumeArray, chunk)
+            selection = np.all(chunks == chunk, axis=1)
+            local = indexes[selection] - np.array(chunk) * self.normalChunkSize
+            normals[selection] = self.normalChunks[chunk][local[:, 2], local[:, 1], local[:, 0]]
+        return normals
+
+    def computeNormalChunk(self, volumeArray, chunk):
+        """
+        Computes the normals of a chunk of the loaded volume from the gradient of the volume smoothed by a 
+        gaussian of standard deviation `normalSigma` voxels (SimpleITK GradientRecursiveGaussian). The chunk is 
+        extended by a margin of 4 sigma so that the gradient at its border does not depend on the chunks.
+
+        Parameters:
+        volumeArray (numpy.ndarray): The loaded volume indexed [z, y, x].
+        chunk (tuple): The index [cx, cy, cz] of the chunk.
+
+        Returns:
+        numpy.ndarray: The unit normals of the chunk in float16, indexed [z, y, x, component x y z].
+        """
+        print("computeNormalChunk", chunk)
+        margin = int(math.ceil(4 * self.normalSigma))
+        begin = [c * self.normalChunkSize for c in chunk]
+        end = [min(b + self.normalChunkSize, size) for b, size in zip(begin, volumeArray.shape[::-1])]
+        first = [max(b - margin, 0) for b in begin]
+        last = [min(e + margin, size) for e, size in zip(end, volumeArray.shape[::-1])]
+        image = sitk.GetImageFromArray(np.ascontiguousarray(volumeArray[first[2]:last[2], first[1]:last[1], first[0]:last[0]], dtype=np.float32))
+        gradient = sitk.GetArrayFromImage(sitk.GradientRecursiveGaussian(image, self.normalSigma))
+        gradient = gradient[begin[2]-first[2]:end[2]-first[2], begin[1]-first[1]:end[1]-first[1], begin[0]-first[0]:end[0]-first[0]]
+        norm = np.linalg.norm(gradient, axis=-1, keepdims=True)
+        return np.divide(-gradient, norm, out=np.zeros_like(gradient), where=norm > 1e-3).astype(np.float16) # null in the flat areas
     
     def computeDirection(self,xO,yO,zO, xD,yD,zD):
         """"
@@ -2863,11 +4776,15 @@ class t_ZoomRoiLogic(ScriptedLoadableModuleLogic):
         return vector, nbPoints
     
        
-    def computeProfile(self,x,y,z,vector,profileOutputFile):
+    def computeProfile(self,x,y,z,vector,profileOutputFile, liveUpdate=False):
         """"
         Computes a profile based on specified coordinates and a direction vector.
 
-        This function runs an external program to compute a profile from a 3D dataset. 
+        If the volume of the profile is loaded in 3D Slicer, the profile is computed at once on its array by 
+        `computeProfileValues`. Otherwise, if the module `citrusToolsItk` is available, the file of the profile is 
+        opened by `openVolumeFile` and the profile is computed in 3D Slicer in the same way. Otherwise this function 
+        runs an external program in the background (see `submitJob`) to compute a profile from a 3D dataset, the 
+        profile is drawn when it ends. 
         It takes the coordinates of a point in space, a direction vector, and various parameters 
         related to the profile computation, and executes the specified program.
 
@@ -2877,22 +4794,564 @@ class t_ZoomRoiLogic(ScriptedLoadableModuleLogic):
         z (int): The z-coordinate of the point from which to compute the profile.
         vector (list): A list containing the direction vector components (vx, vy, vz) for profile computation.
         profileOutputFile (str): The file path where the computed profile output will be saved.
+        liveUpdate (bool): True when the profile follows a move of the markups, the external program is then 
+                           not used.
 
         Returns:
         int: Returns 0 if the computation is successful, or -1 if the required program is not found.
         """
         print("computeProfile")
+        volumeArray = self.profileVolumeArray()
+        if volumeArray is None and not liveUpdate and self.inputFile and self.loadToolsItkModule() is not None:
+            try:
+                volumeArray, ijkToRas = self.openVolumeFile(self.inputFile)
+            except Exception as e:
+                print("computeProfile can't open ", self.inputFile, str(e))
+        if volumeArray is not None:
+            # the volume is already loaded in 3D Slicer, the profile is computed on its array
+            statistics = self.parseStatistics(self.profileMeasurementArgument())
+            if statistics is None:
+                return -1
+            points, columns = self.computeProfileStatistics(volumeArray, x, y, z, vector, int(self.sliderStep), int(self.sliderNeighbor), 
+                                                            statistics, int(self.profileTypeBlock))
+            self.writeProfile(profileOutputFile, points, statistics, columns)
+            self.drawProfile(profileOutputFile)
+            return 0
+        if liveUpdate:
+            return -1
         if not os.path.exists(self.programDirectory + "/" + self.computeProfileProgram):
             slicer.util.warningDisplay(self.programDirectory + "/" + self.computeProfileProgram + " does not exist!\n")
             return  -1        
-        print("computeProfile " + self.programDirectory + "/" + self.computeProfileProgram + " " + str(x) + " " + str(y) + " " +  str(z) + " " + str(vector[0]) +  " " + str(vector[1]) + " " + str(vector[2]) + " " + str(self.sliderStep) + " " + profileOutputFile + " " + self.inputFile + " " + str(self.sliderNeighbor) + " " + self.profileMeasurement + " " + self.profileTypeBlock)
-        result = subprocess.run([self.programDirectory + "/" + self.computeProfileProgram, str(x), str(y), str(z), str(vector[0]), str(vector[1]), str(vector[2]), str(self.sliderStep), profileOutputFile, self.inputFile, str(self.sliderNeighbor), self.profileMeasurement, self.profileTypeBlock], capture_output=True, text=True)        
-        print("stdout:", result.stdout)
-        print("stderr:", result.stderr)
-        
-        self.drawProfile(profileOutputFile)
+        print("computeProfile " + self.programDirectory + "/" + self.computeProfileProgram + " " + str(x) + " " + str(y) + " " +  str(z) + " " + str(vector[0]) +  " " + str(vector[1]) + " " + str(vector[2]) + " " + str(self.sliderStep) + " " + profileOutputFile + " " + self.inputFile + " " + str(self.sliderNeighbor) + " " + self.profileMeasurementArgument() + " " + " ".join(self.profileBlockArguments()))
+        def onFinished(returncode, output):
+            if returncode == 0:
+                self.drawProfile(profileOutputFile)
+        self.submitJob("Profile", [self.programDirectory + "/" + self.computeProfileProgram, str(x), str(y), str(z), str(vector[0]), str(vector[1]), str(vector[2]), str(self.sliderStep), profileOutputFile, self.inputFile, str(self.sliderNeighbor), self.profileMeasurementArgument()] + self.profileBlockArguments(), onFinished)
         return 0 
 
+    def computeProfileBatch(self, jobs, profileOutputFile, onComputed=None):
+        """
+        Computes many profiles on the same volume, with the statistics, the neighborhood and the shape of the 
+        current profile.
+
+        If the volume of the profiles is loaded in 3D Slicer, the profiles are computed on its array by 
+        `computeProfileStatistics` in parallel threads. Otherwise the profiles are written in the file 
+        `profileJobs.txt` of the temporary directory, one by line, and the external program `computeProfileBatch` 
+        reads the volume once and computes them on all the cores, in the background (see `submitJob`).
+        The output file has the format of `writeProfileBatch`.
+
+        Parameters:
+        jobs (list of dict): The profiles with the keys "origin" ([x, y, z]), "vector" ([vx, vy, vz]) and "nbpoints".
+        profileOutputFile (str): The file path where the profiles will be saved.
+        onComputed (callable): Called with the output file when the profiles are computed, optional.
+
+        Returns:
+        int: Returns 0 on success, or -1 if the statistics are not valid or if the program is missing.
+        """
+        print("computeProfileBatch")
+        measurement = self.profileMeasurementArgument()
+        statistics = self.parseStatistics(measurement)
+        if statistics is None or len(jobs) == 0:
+            return -1
+        volumeArray = self.profileVolumeArray()
+        if volumeArray is not None:
+            def computeJob(job):
+                return self.computeProfileStatistics(volumeArray, job["origin"][0], job["origin"][1], job["origin"][2], job["vector"], int(job["nbpoints"]), 
+                                                     int(self.sliderNeighbor), statistics, int(self.profileTypeBlock))
+            with ThreadPoolExecutor(max_workers=self.numberOfThreads) as executor:
+                results = list(executor.map(computeJob, jobs))
+            self.writeProfileBatch(profileOutputFile, statistics, results)
+            if onComputed is not None:
+                onComputed(profileOutputFile)
+            return 0
+        if not os.path.exists(self.programDirectory + "/" + self.computeProfileBatchProgram):
+            slicer.util.warningDisplay(self.programDirectory + "/" + self.computeProfileBatchProgram + " does not exist!\n")
+            return -1
+        jobsFile = os.path.join(self.directoryTemp, self.profileJobsFileName)
+        with open(jobsFile, "w") as outfile:
+            for job in jobs:
+                outfile.write(" ".join(str(int(value)) for value in job["origin"]) + " " + " ".join(str(float(value)) for value in job["vector"]) + " " + str(int(job["nbpoints"])) + "\n")
+
+        def onFinished(returncode, output):
+            if returncode == 0 and onComputed is not None:
+                onComputed(profileOutputFile)
+            elif returncode != 0:
+                slicer.util.warningDisplay("The profiles can't be computed!\n")
+        self.submitJob("Profiles", [self.programDirectory + "/" + self.computeProfileBatchProgram, jobsFile, profileOutputFile, self.inputFile, 
+                                    str(self.sliderNeighbor), measurement] + self.profileBlockArguments(), onFinished)
+        return 0
+
+    def writeProfileBatch(self, profileOutputFile, statistics, results):
+        """
+        Writes the profiles of a batch as the program computeProfileBatch: the line "# profile x y z" followed by 
+        the names of the statistics, then a line by point with the number of its profile, its coordinates and 
+        a column by statistic. If the file name ends with .npy, the profiles are saved as a NumPy array of 
+        records with the field profile first (see `profileDtype`).
+
+        Parameters:
+        profileOutputFile (str): The path of the output file.
+        statistics (list): The statistics, see `parseStatistics`.
+        results (list): For each profile, its points and its columns (see `computeProfileStatistics`).
+
+        Returns:
+        None
+        """
+        if profileOutputFile.endswith(".npy"):
+            records = np.empty(sum(len(points) for points, columns in results), dtype=self.profileDtype(statistics, True))
+            first = 0
+            for profile, (points, columns) in enumerate(results):
+                last = first + len(points)
+                records["profile"][first:last] = profile
+                for i, field in enumerate(("x", "y", "z")):
+                    records[field][first:last] = points[:, i]
+                for field, column in zip(records.dtype.names[4:], columns):
+                    records[field][first:last] = column
+                first = last
+            np.save(profileOutputFile, records)
+            return
+        with open(profileOutputFile, "w") as f:
+            f.write("# profile x y z " + " ".join(self.statisticName(statistic) for statistic in statistics) + "\n")
+            for profile, (points, columns) in enumerate(results):
+                for point, values in zip(points.tolist(), zip(*[column.tolist() for column in columns])):
+                    f.write(str(profile) + " " + " ".join(str(coordinate) for coordinate in point) + " " + " ".join("{:.12g}".format(value) for value in values) + "\n")
+
+    def readProfileBatch(self, profileFile):
+        """
+        Reads the profiles of a batch (see `writeProfileBatch`). A .npy file is mapped in memory, without reading 
+        its values, and each profile is a view of its records without the field profile.
+
+        Parameters:
+        profileFile (str): The path of the file of the profiles.
+
+        Returns:
+        tuple: The names of the statistics and, for each profile, its rows [x, y, z, value1, value2...].
+        """
+        if profileFile.endswith(".npy"):
+            data = np.load(profileFile, mmap_mode="r")
+            fields = list(data.dtype.names[1:])
+            numbers = data["profile"]
+            bounds = np.searchsorted(numbers, np.arange(int(numbers[-1]) + 2 if len(numbers) else 1))
+            view = data[fields]
+            return fields[3:], [view[bounds[p]:bounds[p+1]] for p in range(len(bounds) - 1)]
+        names = []
+        profiles = []
+        with open(profileFile, 'r') as f:
+            for line in f:
+                l = line.split()
+                if not l:
+                    continue
+                if l[0] == "#":
+                    names = l[5:]
+                    continue
+                profile = int(l[0])
+                while len(profiles) <= profile:
+                    profiles.append([])
+                profiles[profile].append([float(v) if "." in v or "e" in v else int(v) for v in l[1:]])
+        return names, profiles
+
+    def profileMeasurementArgument(self):
+        """
+        Returns the statistics of the profile: the statistics given by the user, or the measurement chosen.
+
+        Returns:
+        str: The statistics separated by commas (see `parseStatistics`).
+        """
+        if self.profileStatistics.strip() != "":
+            return self.profileStatistics
+        return self.profileMeasurement
+
+    def profileBlockArguments(self):
+        """
+        Returns the last arguments of the programs computeProfile and computeProfileBatch: the shape of the 
+        neighborhood, followed by the summed table and the disk flags for a disk in the orthogonal plane.
+
+        Returns:
+        list: The arguments, as strings.
+        """
+        if self.profileDisk and self.profileTypeBlock == "2":
+            return [self.profileTypeBlock, "1", "1"]
+        return [self.profileTypeBlock]
+
+    def profileVolumeArray(self):
+        """
+        Returns the array of the volume of the profile if it is loaded in 3D Slicer.
+
+        The volume of the profile is the file `self.inputFile`, it is used if it is the file of the input volume.
+
+        Returns:
+        numpy.ndarray: The array [z, y, x] of the input volume (no copy), or None if the volume is not loaded.
+        """
+        if not self.inputVolumeIsInputFile():
+            return None
+        return slicer.util.arrayFromVolume(self.inputVolume)
+
+    def inputVolumeIsInputFile(self):
+        """
+        Checks if the input volume loaded in 3D Slicer is the file `self.inputFile`.
+
+        Returns:
+        bool: True if the storage node of the input volume reads `self.inputFile`.
+        """
+        if self.inputVolume is None or self.inputVolume.GetStorageNode() is None or not self.inputFile:
+            return False
+        return os.path.normpath(str(self.inputVolume.GetStorageNode().GetFileName())) == os.path.normpath(self.inputFile)
+
+    def computeBaseVectors(self, vector):
+        """
+        Computes the basis vectors of the plane orthogonal to a direction vector, as the program computeProfile.
+
+        Parameters:
+        vector (list): The direction vector [vx, vy, vz].
+
+        Returns:
+        tuple: The two basis vectors of the orthogonal plane, NumPy arrays of 3 values.
+        """
+        baseVector1 = np.array([0.0, 1.0, 0.0])
+        baseVector2 = np.array([1.0, 0.0, 0.0])
+        if vector[2] != 0:
+            baseVector1[2] = -1.0 * vector[1] / vector[2]
+            baseVector2[2] = -1.0 * vector[0] / vector[2]
+        return baseVector1 / np.linalg.norm(baseVector1), baseVector2 / np.linalg.norm(baseVector2)
+
+    def computeProfileValues(self, volumeArray, x, y, z, vector, nbpoints, distanceNeighbors, measurement, typeBlock):
+        """
+        Computes the density profile on the array of a volume, the NumPy counterpart of the program computeProfile.
+
+        All the points of the profile and of their neighborhoods are computed at once: the indexes form an array 
+        (points x neighbors x 3), the voxels are gathered with one fancy indexing and the statistic is computed 
+        along the neighbors. The points are processed by groups of at most `profileChunkValues` voxels to bound 
+        the memory. The indexes are rounded half away from zero like the program, and the neighbors outside of 
+        the volume are replaced by the nearest voxel of the border.
+        The means of the 3D blocks inside the volume are computed with summed volume tables (see `computeBlockMeans`).
+        When the module `citrusToolsItk` is available, the values of an unsigned volume are computed by ToolsItk on 
+        the array without copy.
+
+        Parameters:
+        volumeArray (numpy.ndarray): The volume indexed [z, y, x].
+        x (int): The x-coordinate of the origin point.
+        y (int): The y-coordinate of the origin point.
+        z (int): The z-coordinate of the origin point.
+        vector (list): The direction vector [vx, vy, vz].
+        nbpoints (int): The number of points of the profile.
+        distanceNeighbors (int): The neighborhood distance, 0 for the value of the voxel.
+        measurement (str): The statistic of the neighborhood, m for mean, d for median, n for min, x for max.
+        typeBlock (int): The shape of the neighborhood, 3 for a 3D block, 2 for the orthogonal plane.
+
+        Returns:
+        tuple: The points of the profile (nbpoints x 3 array of [x, y, z]) and their values (array of nbpoints integers).
+        """
+        print("computeProfileValues")
+        toolsItk = self.loadToolsItkModule()
+        if toolsItk is not None and volumeArray.dtype in (np.uint8, np.uint16, np.uint32):
+            try:
+                values = toolsItk.computeProfile(volumeArray, [int(x), int(y), int(z)], [float(value) for value in vector], int(nbpoints), int(distanceNeighbors), 
+                                                 measurement, int(typeBlock), bool(self.profileDisk))
+                points, offsets = self.profileNeighborhood(x, y, z, vector, nbpoints, 0, typeBlock)
+                return points, np.array(values, dtype=np.int64)
+            except Exception as e:
+                print("computeProfileValues citrusToolsItk error: ", str(e))
+        points, offsets = self.profileNeighborhood(x, y, z, vector, nbpoints, distanceNeighbors, typeBlock)
+        nbNeighbors = len(offsets)
+        upper = np.array(volumeArray.shape[::-1]) - 1
+        values = np.zeros(nbpoints, dtype=np.int64)
+        remaining = np.arange(nbpoints)
+        if distanceNeighbors > 0 and typeBlock != 2 and measurement == "m":
+            # the block means are computed with summed volume tables, the blocks crossing the border are gathered
+            inside = np.all((points - distanceNeighbors >= 0) & (points + distanceNeighbors <= upper), axis=1)
+            values[inside] = self.computeBlockMeans(volumeArray, points[inside], distanceNeighbors)
+            remaining = remaining[~inside]
+        chunk = max(1, self.profileChunkValues // nbNeighbors)
+        for first in range(0, len(remaining), chunk):
+            selection = remaining[first:first+chunk]
+            neighbors = self.gatherNeighbors(volumeArray, points[selection], offsets)
+            if distanceNeighbors <= 0:
+                values[selection] = neighbors[:, 0]
+            elif measurement == "m":
+                values[selection] = neighbors.sum(axis=1, dtype=np.int64) // nbNeighbors
+            elif measurement == "d":
+                values[selection] = np.partition(neighbors, nbNeighbors // 2, axis=1)[:, nbNeighbors // 2]
+            elif measurement == "n":
+                values[selection] = neighbors.min(axis=1)
+            elif measurement == "x":
+                values[selection] = neighbors.max(axis=1)
+            else:
+                print("Problem with the value of measurement!")
+        return points, values
+
+    def roundHalfAway(self, values):
+        """
+        Rounds values half away from zero, like the function round of C++.
+
+        Parameters:
+        values (numpy.ndarray): The values to round.
+
+        Returns:
+        numpy.ndarray: The rounded values, as 64 bits integers.
+        """
+        return (np.sign(values) * np.floor(np.abs(values) + 0.5)).astype(np.int64)
+
+    def profileNeighborhood(self, x, y, z, vector, nbpoints, distanceNeighbors, typeBlock):
+        """
+        Computes the points of a profile and the offsets of the voxels of their neighborhood.
+
+        Parameters:
+        x (int): The x-coordinate of the origin point.
+        y (int): The y-coordinate of the origin point.
+        z (int): The z-coordinate of the origin point.
+        vector (list): The direction vector [vx, vy, vz].
+        nbpoints (int): The number of points of the profile.
+        distanceNeighbors (int): The neighborhood distance, 0 for the value of the voxel.
+        typeBlock (int): The shape of the neighborhood, 3 for a 3D block, 2 for the orthogonal plane.
+
+        The offsets of the orthogonal plane are computed once for the profile as the program computeProfile: 
+        floor(k1 * baseVector1 + k2 * baseVector2 + 0.5), which gives the voxels round(point + k1 * baseVector1 + k2 * baseVector2). 
+        A voxel reached by several (k1, k2) is counted once, and the plane is the disk of radius distanceNeighbors 
+        if `profileDisk` is True.
+
+        Returns:
+        tuple: The points of the profile (nbpoints x 3 array of [x, y, z]) and the integer offsets [x, y, z] of the neighbors.
+        """
+        steps = np.arange(nbpoints, dtype=np.float64)[:, None]
+        points = self.roundHalfAway(np.array([x, y, z], dtype=np.float64) + steps * np.asarray(vector, dtype=np.float64))
+        distances = np.arange(-distanceNeighbors, distanceNeighbors + 1)
+        if distanceNeighbors <= 0:
+            offsets = np.zeros((1, 3), dtype=np.int64)
+        elif typeBlock == 2:
+            baseVector1, baseVector2 = self.computeBaseVectors(vector)
+            k1, k2 = np.meshgrid(distances, distances, indexing="ij")
+            k1, k2 = k1.ravel(), k2.ravel()
+            if self.profileDisk:
+                inside = k1 * k1 + k2 * k2 <= distanceNeighbors * distanceNeighbors
+                k1, k2 = k1[inside], k2[inside]
+            offsets = np.floor(k1[:, None] * baseVector1 + k2[:, None] * baseVector2 + 0.5).astype(np.int64)
+            offsets = np.unique(offsets, axis=0)
+        else:
+            dz, dy, dx = np.meshgrid(distances, distances, distances, indexing="ij")
+            offsets = np.stack([dx.ravel(), dy.ravel(), dz.ravel()], axis=1).astype(np.int64)
+        return points, offsets
+
+    def gatherNeighbors(self, volumeArray, points, offsets):
+        """
+        Reads the voxels of the neighborhoods of points, the neighbors outside of the volume are replaced by 
+        the nearest voxel of the border.
+
+        Parameters:
+        volumeArray (numpy.ndarray): The volume indexed [z, y, x].
+        points (numpy.ndarray): The points [x, y, z].
+        offsets (numpy.ndarray): The integer offsets [x, y, z] of the neighbors (see `profileNeighborhood`).
+
+        Returns:
+        numpy.ndarray: The voxels, one row by point and one column by neighbor.
+        """
+        upper = np.array(volumeArray.shape[::-1]) - 1
+        indexes = np.clip(points[:, None, :] + offsets[None, :, :], 0, upper)
+        return volumeArray[indexes[..., 2], indexes[..., 1], indexes[..., 0]]
+
+    def parseStatistics(self, measurement):
+        """
+        Reads the statistics of a profile, as the program computeProfile.
+
+        Parameters:
+        measurement (str): The statistics separated by commas: m for mean, d for median, n for min, x for max, 
+                           v for variance, s for standard deviation, p followed by a number between 0 and 100 
+                           for a percentile (p90).
+
+        Returns:
+        list: The statistics, or None if a statistic is unknown.
+        """
+        statistics = [statistic.strip() for statistic in measurement.split(",") if statistic.strip() != ""]
+        for statistic in statistics:
+            if statistic in ("m", "d", "n", "x", "v", "s"):
+                continue
+            try:
+                percentile = float(statistic[1:]) if statistic[0] == "p" else -1
+            except ValueError:
+                percentile = -1
+            if percentile < 0 or percentile > 100:
+                print("Problem with the value of measurement: ", statistic)
+                return None
+        return statistics if statistics else None
+
+    def statisticName(self, statistic):
+        """
+        Returns the name of a statistic in the header of a profile file, as the program computeProfile.
+
+        Parameters:
+        statistic (str): The statistic, see `parseStatistics`.
+
+        Returns:
+        str: The name: mean, median, min, max, variance, std or the percentile as given (p90).
+        """
+        return {"m": "mean", "d": "median", "n": "min", "x": "max", "v": "variance", "s": "std"}.get(statistic, statistic)
+
+    def computeProfileStatistics(self, volumeArray, x, y, z, vector, nbpoints, distanceNeighbors, statistics, typeBlock):
+        """
+        Computes several statistics of the neighborhoods of the points of a profile, each neighborhood is read once.
+
+        The neighborhoods are sorted once for the median, the min, the max and the percentiles. The percentile q 
+        is the value of rank q * size / 100 in the sorted values, as the program computeProfile.
+
+        Parameters:
+        volumeArray (numpy.ndarray): The volume indexed [z, y, x].
+        x (int): The x-coordinate of the origin point.
+        y (int): The y-coordinate of the origin point.
+        z (int): The z-coordinate of the origin point.
+        vector (list): The direction vector [vx, vy, vz].
+        nbpoints (int): The number of points of the profile.
+        distanceNeighbors (int): The neighborhood distance, 0 for the value of the voxel.
+        statistics (list): The statistics, see `parseStatistics`.
+        typeBlock (int): The shape of the neighborhood, 3 for a 3D block, 2 for the orthogonal plane.
+
+        Returns:
+        tuple: The points of the profile (nbpoints x 3 array of [x, y, z]) and the values, one array of nbpoints 
+               values by statistic.
+        """
+        print("computeProfileStatistics")
+        if len(statistics) == 1 and statistics[0] in ("m", "d", "n", "x"):
+            points, values = self.computeProfileValues(volumeArray, x, y, z, vector, nbpoints, distanceNeighbors, statistics[0], typeBlock)
+            return points, [values]
+        points, offsets = self.profileNeighborhood(x, y, z, vector, nbpoints, distanceNeighbors, typeBlock)
+        nbNeighbors = len(offsets)
+        columns = [np.zeros(nbpoints, dtype=np.float64 if statistic == "s" else np.int64) for statistic in statistics]
+        chunk = max(1, self.profileChunkValues // nbNeighbors)
+        for first in range(0, nbpoints, chunk):
+            neighbors = np.sort(self.gatherNeighbors(volumeArray, points[first:first+chunk], offsets), axis=1)
+            sums = neighbors.sum(axis=1, dtype=np.float64)
+            variances = np.maximum(0.0, np.square(neighbors, dtype=np.float64).sum(axis=1) / nbNeighbors - np.square(sums / nbNeighbors))
+            for column, statistic in zip(columns, statistics):
+                if statistic == "m":
+                    column[first:first+chunk] = neighbors.sum(axis=1, dtype=np.int64) // nbNeighbors
+                elif statistic == "v":
+                    column[first:first+chunk] = variances
+                elif statistic == "s":
+                    column[first:first+chunk] = np.sqrt(variances)
+                else:
+                    rank = {"d": nbNeighbors // 2, "n": 0, "x": nbNeighbors - 1}.get(statistic)
+                    if rank is None:
+                        rank = min(nbNeighbors - 1, int(float(statistic[1:]) * nbNeighbors / 100))
+                    column[first:first+chunk] = neighbors[:, rank]
+        return points, columns
+
+    def writeProfile(self, profileOutputFile, points, statistics, columns):
+        """
+        Writes a profile file as the program computeProfile: the line "# x y z" followed by the names of the 
+        statistics, then a line by point with its coordinates and a column by statistic. If the file name ends 
+        with .npy, the profile is saved as a NumPy array of records (see `profileDtype`).
+
+        Parameters:
+        profileOutputFile (str): The path of the profile file.
+        points (numpy.ndarray): The points [x, y, z] of the profile.
+        statistics (list): The statistics, see `parseStatistics`.
+        columns (list): The values, one array by statistic.
+
+        Returns:
+        None
+        """
+        if profileOutputFile.endswith(".npy"):
+            records = np.empty(len(points), dtype=self.profileDtype(statistics))
+            for i, field in enumerate(("x", "y", "z")):
+                records[field] = points[:, i]
+            for field, column in zip(records.dtype.names[3:], columns):
+                records[field] = column
+            np.save(profileOutputFile, records)
+            return
+        with open(profileOutputFile, "w") as f:
+            f.write("# x y z " + " ".join(self.statisticName(statistic) for statistic in statistics) + "\n")
+            for point, values in zip(points.tolist(), zip(*[column.tolist() for column in columns])):
+                f.write(" ".join(str(coordinate) for coordinate in point) + " " + " ".join("{:.12g}".format(value) for value in values) + "\n")
+
+    def readProfile(self, profileFile):
+        """
+        Reads a profile file. The files without the header line "# x y z ..." have one column named value.
+        A .npy file is mapped in memory (numpy.load with mmap_mode="r"), its values are read when they are used.
+
+        Parameters:
+        profileFile (str): The path of the profile file.
+
+        Returns:
+        tuple: The names of the statistics and the rows [x, y, z, value1, value2...], numbers, or the array of 
+               records of a .npy file.
+        """
+        if profileFile.endswith(".npy"):
+            data = np.load(profileFile, mmap_mode="r")
+            return list(data.dtype.names[3:]), data
+        names = None
+        data = []
+        with open(profileFile, 'r') as f:
+            for line in f:
+                l = line.split()
+                if not l:
+                    continue
+                if l[0] == "#":
+                    names = l[4:]
+                    continue
+                data.append([float(v) if "." in v or "e" in v else int(v) for v in l])
+        if names is None:
+            names = ["value"] * (len(data[0]) - 3 if data else 1)
+        return names, data
+
+    def profileDtype(self, statistics, batch=False):
+        """
+        Returns the type of the records of a .npy profile file, as the program computeProfile: x, y, z in int32 
+        then a float64 field by statistic, named as in the header of the text files. The names which appear 
+        twice get a number (mean, mean_2).
+
+        Parameters:
+        statistics (list): The statistics, see `parseStatistics`.
+        batch (bool): True to start the records with the number of their profile (see `writeProfileBatch`).
+
+        Returns:
+        numpy.dtype: The type of the records.
+        """
+        fields = [("profile", "<i4")] if batch else []
+        fields += [("x", "<i4"), ("y", "<i4"), ("z", "<i4")]
+        names = [self.statisticName(statistic) for statistic in statistics]
+        for i, name in enumerate(names):
+            count = names[:i].count(name) + 1
+            fields.append((name if count == 1 else name + "_" + str(count), "<f8"))
+        return np.dtype(fields)
+
+    def computeBlockMeans(self, volumeArray, points, distanceNeighbors):
+        """
+        Computes the means of the 3D blocks around points of a profile with summed volume tables.
+
+        A summed volume table contains for each voxel of a box the sum of the voxels between the first corner 
+        of the box and this voxel, the sum of a block is then computed from its 8 corners whatever its size. 
+        The consecutive points are grouped so that the table of the box of their blocks has at most 
+        `profileTableValues` values, one table is computed for each group.
+
+        Parameters:
+        volumeArray (numpy.ndarray): The volume indexed [z, y, x].
+        points (numpy.ndarray): The points [x, y, z] of the profile, their blocks must be in the volume.
+        distanceNeighbors (int): The neighborhood distance, the side of a block is 2 * distanceNeighbors + 1.
+
+        Returns:
+        numpy.ndarray: The integer mean of the block of each point.
+        """
+        print("computeBlockMeans")
+        values = np.zeros(len(points), dtype=np.int64)
+        nbNeighbors = (2 * distanceNeighbors + 1) ** 3
+        first = 0
+        while first < len(points):
+            lower = np.minimum.accumulate(points[first:], axis=0) - distanceNeighbors
+            higher = np.maximum.accumulate(points[first:], axis=0) + distanceNeighbors
+            sizes = np.prod(higher - lower + 2, axis=1)
+            last = first + max(1, int(np.searchsorted(sizes, self.profileTableValues, side="right")))
+            begin = lower[last - first - 1]
+            end = higher[last - first - 1]
+            table = np.zeros(tuple(end[::-1] - begin[::-1] + 2), dtype=np.int64)
+            table[1:, 1:, 1:] = volumeArray[begin[2]:end[2]+1, begin[1]:end[1]+1, begin[0]:end[0]+1].cumsum(axis=0, dtype=np.int64).cumsum(axis=1).cumsum(axis=2)
+            low = points[first:last] - distanceNeighbors - begin
+            high = points[first:last] + distanceNeighbors + 1 - begin
+            sums = np.zeros(last - first, dtype=np.int64)
+            for cornerZ, signZ in ((high[:, 2], 1), (low[:, 2], -1)):
+                for cornerY, signY in ((high[:, 1], 1), (low[:, 1], -1)):
+                    for cornerX, signX in ((high[:, 0], 1), (low[:, 0], -1)):
+                        sums += signZ * signY * signX * table[cornerZ, cornerY, cornerX]
+            values[first:last] = sums // nbNeighbors
+            first = last
+        return values
+
     def displayProfile(self, profileFile):        
         """
         Displays the profile data from the specified file.
@@ -2916,12 +5375,13 @@ class t_ZoomRoiLogic(ScriptedLoadableModuleLogic):
         """
         Draws a density profile graph from a specified file and displays it in the UI.
 
-        This method reads profile data from a text file, processes the data into a graph using `matplotlib`,
+        This method reads profile data from a text or .npy file, processes the data into a graph using `matplotlib`,
         and then displays the graph in a QLabel widget (`imageWidget`) in the UI.
 
         Args:
             filename (str): Path to the file containing the profile data. The file should contain lines where 
-                        each line represents a set of coordinates (x, y, z) and a pixel value.        
+                        each line represents a set of coordinates (x, y, z) and the values of the statistics
+                        (see `readProfile`). The statistics named in `profilePlotted` are drawn, all if it is empty.        
         """
         print("drawProfile")
         try:
@@ -2931,28 +5391,35 @@ class t_ZoomRoiLogic(ScriptedLoadableModuleLogic):
             import matplotlib
 
         matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
 
         print("filename = ", filename)
-        data = []
-        with open(filename, 'r') as f:            
-            for line in f:                
-                l = line.split()
-                x,y,z,valPixel = map(int, l[:])
-                data.append((x, y, z, valPixel))
+        names, data = self.readProfile(filename)
+        plotted = [name.strip() for name in self.profilePlotted.split(",") if name.strip() != ""]
+        columns = [i for i, name in enumerate(names) if not plotted or name in plotted]
+        if not columns:
+            print("drawProfile no statistic to draw in ", names)
+            columns = list(range(len(names)))
 
 
         x_abscisses = list(range(1, len(data)+1))
-        valPixels = [d[3] for d in data]
-        clf()
-        plot(x_abscisses, valPixels, linestyle='-', marker='o')
+        plt.clf()
+        for i in columns:
+            if isinstance(data, np.ndarray):
+                valPixels = data[data.dtype.names[3+i]]
+            else:
+                valPixels = [d[3+i] for d in data]
+            plt.plot(x_abscisses, valPixels, linestyle='-', marker='o', label=names[i])
+        if len(columns) > 1:
+            plt.legend()
 
 
-        xlabel('(x ,y, z)')
-        ylabel('valeur du pixel')
-        title('Courbe du profil de densité')
+        plt.xlabel('(x ,y, z)')
+        plt.ylabel('valeur du pixel')
+        plt.title('Courbe du profil de densité')
 
         self.imageFilename = "imageProfileTemp.png"
-        savefig(self.imageFilename)
+        plt.savefig(self.imageFilename)
         pm = qt.QPixmap(self.imageFilename)
         self.imageWidget.setPixmap(pm)
         self.imageWidget.setScaledContents(True)        
@@ -2964,7 +5431,7 @@ class t_ZoomRoiLogic(ScriptedLoadableModuleLogic):
         Saves the generated profile plot image to a file.
 
         This method takes the profile file as input and saves the currently displayed profile image (`imageFilename`)
-        as a PNG file with the same base name as the profile file, replacing the `.txt` extension with `.png`.
+        as a PNG file with the same base name as the profile file, replacing the `.txt` or `.npy` extension with `.png`.
 
         Args:
             profileFile (str): Path to the profile text file (.txt) whose name will be used to generate the output image file name.
@@ -2973,9 +5440,9 @@ class t_ZoomRoiLogic(ScriptedLoadableModuleLogic):
         """
         print("saveImageProfile")        
         if profileFile != None:
-            outputImageProfile = profileFile.replace(".txt", ".png")
+            outputImageProfile = os.path.splitext(profileFile)[0] + ".png"
         else:
-            outputImageProfile = self.profileOutputFile.replace(".txt", ".png")        
+            outputImageProfile = os.path.splitext(self.profileOutputFile)[0] + ".png"        
         shutil.copy(self.imageFilename, outputImageProfile)
     
 
@@ -3020,8 +5487,169 @@ class t_ZoomRoiTest(ScriptedLoadableModuleTest):
     def runTest(self):
         """Run as few or as many tests as needed here."""
         self.setUp()
+        self.test_MemmapNrrd()
+        self.test_ProfileValues()
+        self.test_ProfileStatistics()
         self.test_t_ZoomRoi1()
 
+    def referenceProfile(self, volumeArray, x, y, z, vector, nbpoints, distanceNeighbors, statistics, typeBlock, disk=False):
+        """
+        Computes a profile voxel by voxel as the program computeProfile, the reference of the NumPy engine.
+
+        Parameters:
+        volumeArray (numpy.ndarray): The volume indexed [z, y, x].
+        x (int): The x-coordinate of the origin point.
+        y (int): The y-coordinate of the origin point.
+        z (int): The z-coordinate of the origin point.
+        vector (list): The direction vector [vx, vy, vz].
+        nbpoints (int): The number of points of the profile.
+        distanceNeighbors (int): The neighborhood distance, 0 for the value of the voxel.
+        statistics (list): The statistics, see `parseStatistics`.
+        typeBlock (int): The shape of the neighborhood, 3 for a 3D block, 2 for the orthogonal plane.
+        disk (bool): True if the orthogonal plane is the disk of radius distanceNeighbors.
+
+        Returns:
+        list: The rows [x, y, z, value1, value2...] of the profile.
+        """
+        def roundHalfAway(value):
+            return int(math.copysign(math.floor(abs(value) + 0.5), value))
+
+        def voxel(i, j, k):
+            i = min(max(i, 0), volumeArray.shape[2] - 1)
+            j = min(max(j, 0), volumeArray.shape[1] - 1)
+            k = min(max(k, 0), volumeArray.shape[0] - 1)
+            return int(volumeArray[k, j, i])
+
+        baseVector1 = [0.0, 1.0, 0.0]
+        baseVector2 = [1.0, 0.0, 0.0]
+        if vector[2] != 0:
+            baseVector1[2] = -1.0 * vector[1] / vector[2]
+            baseVector2[2] = -1.0 * vector[0] / vector[2]
+        norm1 = math.sqrt(sum(v * v for v in baseVector1))
+        norm2 = math.sqrt(sum(v * v for v in baseVector2))
+        baseVector1 = [v / norm1 for v in baseVector1]
+        baseVector2 = [v / norm2 for v in baseVector2]
+        distances = range(-distanceNeighbors, distanceNeighbors + 1)
+        rows = []
+        for n in range(nbpoints):
+            point = [roundHalfAway(c + n * v) for c, v in zip((x, y, z), vector)]
+            if distanceNeighbors <= 0:
+                values = [voxel(*point)]
+            elif typeBlock == 2:
+                neighbors = set()
+                for k1 in distances:
+                    for k2 in distances:
+                        if disk and k1 * k1 + k2 * k2 > distanceNeighbors * distanceNeighbors:
+                            continue
+                        neighbors.add(tuple(p + math.floor(k1 * b1 + k2 * b2 + 0.5) for p, b1, b2 in zip(point, baseVector1, baseVector2)))
+                values = [voxel(*neighbor) for neighbor in neighbors]
+            else:
+                values = [voxel(point[0] + i, point[1] + j, point[2] + k) for i in distances for j in distances for k in distances]
+            values.sort()
+            size = len(values)
+            mean = sum(values) / size
+            variance = sum((value - mean) ** 2 for value in values) / size
+            row = list(point)
+            for statistic in statistics:
+                if statistic == "m":
+                    row.append(sum(values) // size)
+                elif statistic == "d":
+                    row.append(values[size // 2])
+                elif statistic == "n":
+                    row.append(values[0])
+                elif statistic == "x":
+                    row.append(values[-1])
+                elif statistic == "v":
+                    row.append(int(variance))
+                elif statistic == "s":
+                    row.append(math.sqrt(variance))
+                else:
+                    row.append(values[min(size - 1, int(float(statistic[1:]) * size / 100))])
+            rows.append(row)
+        return rows
+
+    def test_ProfileValues(self):
+        """Compares the values of the NumPy profile engine with the reference computed voxel by voxel, inside the 
+        volume and across its border, for the orthogonal plane (square and disk) and the 3D block."""
+        self.delayDisplay("Starting the test of the profile values")
+        logic = t_ZoomRoiLogic()
+        logic.profileChunkValues = 50 # several groups of points
+        volumeArray = np.random.default_rng(18).integers(0, 65536, size=(30, 25, 20), dtype=np.uint16)
+        profiles = [(3, 4, 5, [0.8, 0.5, 0.6], 25), (18, 22, 27, [-0.3, -0.7, -1.0], 30), (10, 12, 15, [1.0, 0.0, 0.0], 12)]
+        measurements = ["m", "d", "n", "x"]
+        for x, y, z, vector, nbpoints in profiles:
+            for typeBlock in (2, 3):
+                for distanceNeighbors in (0, 1, 2):
+                    for disk in (False, True):
+                        logic.profileDisk = disk
+                        reference = np.array(self.referenceProfile(volumeArray, x, y, z, vector, nbpoints, distanceNeighbors, measurements, typeBlock, disk))
+                        for i, measurement in enumerate(measurements):
+                            points, values = logic.computeProfileValues(volumeArray, x, y, z, vector, nbpoints, distanceNeighbors, measurement, typeBlock)
+                            np.testing.assert_array_equal(points, reference[:, 0:3])
+                            np.testing.assert_array_equal(values, reference[:, 3 + i])
+        self.delayDisplay("Test passed")
+
+    def test_ProfileStatistics(self):
+        """Compares the statistics computed in one pass by the NumPy profile engine with the reference computed 
+        voxel by voxel."""
+        self.delayDisplay("Starting the test of the profile statistics")
+        logic = t_ZoomRoiLogic()
+        logic.profileChunkValues = 50 # several groups of points
+        volumeArray = np.random.default_rng(21).integers(0, 65536, size=(30, 25, 20), dtype=np.uint16)
+        profiles = [(3, 4, 5, [0.8, 0.5, 0.6], 25), (18, 22, 27, [-0.3, -0.7, -1.0], 30)]
+        statistics = logic.parseStatistics("m,d,n,x,v,s,p10,p90")
+        for x, y, z, vector, nbpoints in profiles:
+            for typeBlock in (2, 3):
+                for distanceNeighbors in (0, 1, 2):
+                    reference = np.array(self.referenceProfile(volumeArray, x, y, z, vector, nbpoints, distanceNeighbors, statistics, typeBlock))
+                    points, columns = logic.computeProfileStatistics(volumeArray, x, y, z, vector, nbpoints, distanceNeighbors, statistics, typeBlock)
+                    np.testing.assert_array_equal(points, reference[:, 0:3])
+                    for i, (statistic, column) in enumerate(zip(statistics, columns)):
+                        if statistic == "s":
+                            np.testing.assert_allclose(column, reference[:, 3 + i], rtol=1e-9, atol=1e-6)
+                        elif statistic == "v":
+                            # the engine computes the variance from the sums, one unit may differ after the truncation
+                            np.testing.assert_allclose(column, reference[:, 3 + i], atol=1)
+                        else:
+                            np.testing.assert_array_equal(column, reference[:, 3 + i])
+        self.delayDisplay("Test passed")
+
+    def test_MemmapNrrd(self):
+        """Maps a .nrrd file written by SimpleITK and a .nhdr file with its .raw file, and compares the arrays 
+        and the IJK to RAS matrices with the volume written."""
+        self.delayDisplay("Starting the test of memmapNrrd")
+        import tempfile
+        logic = t_ZoomRoiLogic()
+        volumeArray = np.random.default_rng(16).integers(0, 65536, size=(7, 6, 5), dtype=np.uint16)
+        image = sitk.GetImageFromArray(volumeArray)
+        image.SetSpacing((0.5, 0.25, 2.0))
+        image.SetOrigin((10.0, -20.0, 30.0))
+        expected = np.array([[-0.5, 0, 0, -10.0], [0, -0.25, 0, 20.0], [0, 0, 2.0, 30.0], [0, 0, 0, 1]])
+        with tempfile.TemporaryDirectory() as directory:
+            nrrdFile = os.path.join(directory, "volume.nrrd")
+            sitk.WriteImage(image, nrrdFile, useCompression=False)
+            mapped, ijkToRas = logic.memmapNrrd(nrrdFile)
+            np.testing.assert_array_equal(mapped, volumeArray)
+            np.testing.assert_allclose(ijkToRas, expected)
+            del mapped
+
+            volumeArray.astype(">u2").tofile(os.path.join(directory, "volume.raw"))
+            nhdrFile = os.path.join(directory, "volume.nhdr")
+            with open(nhdrFile, "w") as f:
+                f.write("NRRD0004\ntype: unsigned short\ndimension: 3\nspace: left-posterior-superior\nsizes: 5 6 7\n")
+                f.write("space directions: (0.5,0,0) (0,0.25,0) (0,0,2)\nendian: big\nencoding: raw\n")
+                f.write("space origin: (10,-20,30)\ndata file: volume.raw\n\n")
+            mapped, ijkToRas = logic.memmapNrrd(nhdrFile)
+            np.testing.assert_array_equal(mapped, volumeArray)
+            np.testing.assert_allclose(ijkToRas, expected)
+            del mapped
+
+            with open(nhdrFile, "w") as f:
+                f.write("NRRD0004\ntype: unsigned short\ndimension: 3\nsizes: 5 6 7\nencoding: gzip\ndata file: volume.raw\n\n")
+            with self.assertRaises(ValueError):
+                logic.memmapNrrd(nhdrFile)
+        self.delayDisplay("Test passed")
+
     def test_t_ZoomRoi1(self):
         """Ideally you should have several levels of tests.  At the lowest level
         tests should exercise the functionality of the logic with different inputs
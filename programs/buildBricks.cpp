@@ -0,0 +1,67 @@
+
+#include <string>
+#include <filesystem>
+#include <chrono>
+
+using namespace std;
+
+#include "itkImage.h"
+#include "itkImageFileReader.h"
+#include "itkMemoryProbe.h"
+#include "itkImageFileWriter.h"
+
+#include "tools/ToolsItk.h"
+
+int
+main(int argc, char * argv[])
+{
+
+  // Verify command line arguments
+  if (argc < 4)
+  {
+    std::cerr << "Usage: " << std::endl;
+    std::cerr << argv[0] << " inputDirectory outputDirectory extension [memoryMB]" << "  the slices are cut in compressed bricks of 64x64x64 pixels written in outputDirectory with bricks.idx and bricks.json" <<std::endl;
+    return EXIT_FAILURE;
+  }
+
+  std::string inputDirectory = argv[1];
+  std::string outputDirectory = argv[2];
+  std::string extension = argv[3];
+  int memoryMB = 2000;
+  if (argc > 4) {
+    memoryMB = atoi(argv[4]);
+  }
+
+  std::cout << "inputDirectory = " << inputDirectory << std::endl;
+  std::cout << "outputDirectory = " << outputDirectory << std::endl;
+  std::cout << "memoryMB = " << memoryMB << std::endl;
+  
+  itk::MemoryProbe memoryProbe;
+
+  std::cout << "We are measuring " << memoryProbe.GetType();
+  std::cout << " in units of MB"  << ".\n" << std::endl;  
+  memoryProbe.Start();
+  auto start_timeP = std::chrono::high_resolution_clock::now(); 
+
+  ToolsItk tool ;
+  int res = tool.buildBricks(inputDirectory, outputDirectory, extension, memoryMB);
+  std::cout << "res :" << res << std::endl;
+
+  auto end_timeP = std::chrono::high_resolution_clock::now();
+    std::chrono::duration<double> parallel_duration  = end_timeP - start_timeP;
+    std::cout << "Parallel duration: "
+              << parallel_duration.count() << " seconds"
+              << std::endl; 
+
+  memoryProbe.Stop();  
+  std::cout << "** After allocation **" << std::endl;
+  std::cout << "Mean: " << memoryProbe.GetMean()/1012 << std::endl;
+  std::cout << "Total: " << memoryProbe.GetTotal()/1012 << std::endl;
+  std::cout << "Max: " << memoryProbe.GetMaximum()/1012 << std::endl;
+  std::cout << std::endl;
+  
+  if (res != 0) {
+    return EXIT_FAILURE;
+  }
+ return EXIT_SUCCESS;
+}
@@ -0,0 +1,66 @@
+
+#include <string>
+#include <filesystem>
+#include <chrono>
+
+using namespace std;
+
+#include "itkImage.h"
+#include "itkImageFileReader.h"
+#include "itkMemoryProbe.h"
+#include "itkImageFileWriter.h"
+
+#include "tools/ToolsItk.h"
+
+int
+main(int argc, char * argv[])
+{
+
+  // Verify command line arguments
+  if (argc < 6)
+  {
+    std::cerr << "Usage: " << std::endl;
+    std::cerr << argv[0] << " inputDirectory begin end outputDirectory extension" << "  the volumes resized by 2, 4, 8, 16 and 32 are written in outputDirectory with the manifest pyramid.json" <<std::endl;
+    return EXIT_FAILURE;
+  }
+
+  std::string inputDirectory = argv[1];
+  int begin = atoi(argv[2]);
+  int end = atoi(argv[3]);  
+  std::string outputDirectory = argv[4];
+  std::string extension = argv[5];
+
+  std::cout << "inputDirectory = " << inputDirectory << std::endl;
+  std::cout << "begin = " << begin << std::endl;
+  std::cout << "end = " << end << std::endl;
+  std::cout << "outputDirectory = " << outputDirectory << std::endl;
+  
+  itk::MemoryProbe memoryProbe;
+
+  std::cout << "We are measuring " << memoryProbe.GetType();
+  std::cout << " in units of MB"  << ".\n" << std::endl;  
+  memoryProbe.Start();
+  auto start_timeP = std::chrono::high_resolution_clock::now(); 
+
+  ToolsItk tool ;
+  int res = tool.buildPyramid(inputDirectory, begin, end, outputDirectory, extension);
+  std::cout << "res :" << res << std::endl;
+
+  auto end_timeP = std::chrono::high_resolution_clock::now();
+    std::chrono::duration<double> parallel_duration  = end_timeP - start_timeP;
+    std::cout << "Parallel duration: "
+              << parallel_duration.count() << " seconds"
+              << std::endl; 
+
+  memoryProbe.Stop();  
+  std::cout << "** After allocation **" << std::endl;
+  std::cout << "Mean: " << memoryProbe.GetMean()/1012 << std::endl;
+  std::cout << "Total: " << memoryProbe.GetTotal()/1012 << std::endl;
+  std::cout << "Max: " << memoryProbe.GetMaximum()/1012 << std::endl;
+  std::cout << std::endl;
+  
+  if (res != 0) {
+    return EXIT_FAILURE;
+  }
+ return EXIT_SUCCESS;
+}
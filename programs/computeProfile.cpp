@@ -19,8 +19,11 @@ main(int argc, char * argv[])
   if (argc < 13)
   {
     std::cerr << "Usage: " << std::endl;
-    std::cerr << argv[0] << " x y z vectorX vectorY vectorZ nbpoints outputFilename inputFile neighbors measurement typeBlock" <<std::endl;
-    std::cout << "measurement: m for mean, d for median, n for min, x for max"  << std::endl;
+    std::cerr << argv[0] << " x y z vectorX vectorY vectorZ nbpoints outputFilename inputFile neighbors measurement typeBlock [summedTable [disk]]" <<std::endl;
+    std::cout << "measurement: m for mean, d for median, n for min, x for max, v for variance, s for standard deviation, p90 for the percentile 90"  << std::endl;
+    std::cout << "             several statistics separated by commas are computed in one pass, example: m,d,n,x,s,p10,p90"  << std::endl;
+    std::cout << "summedTable: 1 (default) to compute the means and variances of the 3D blocks with a summed volume table, 0 otherwise"  << std::endl;
+    std::cout << "disk: 1 for a disk of radius neighbors in the orthogonal plan (typeBlock 2), 0 (default) for a square"  << std::endl;
     return EXIT_FAILURE;
   }
 
@@ -34,8 +37,10 @@ main(int argc, char * argv[])
   std::string outputFilename = argv[8];  
   std::string inputFile = argv[9];  
   int neighbors = atoi(argv[10]);
-  char measurement = argv[11][0];
+  std::string measurement = argv[11];
   int typeBlock = atoi(argv[12]);
+  bool summedTable = argc > 13 ? atoi(argv[13]) != 0 : true;
+  bool disk = argc > 14 ? atoi(argv[14]) != 0 : false;
   
 
   std::cout << "(" << x << ", " << y << ", " << z  << ")" << std::endl;
@@ -46,6 +51,8 @@ main(int argc, char * argv[])
   std::cout << "neighbors  = " << neighbors  << std::endl;
   std::cout << "measurement = " << measurement << std::endl;
   std::cout << "typeBlock = " << typeBlock << std::endl;
+  std::cout << "summedTable = " << summedTable << std::endl;
+  std::cout << "disk = " << disk << std::endl;
   
   itk::MemoryProbe memoryProbe;
 
@@ -55,6 +62,8 @@ main(int argc, char * argv[])
   auto start_timeP = std::chrono::high_resolution_clock::now(); 
 
   ToolsItk tool ;
+  tool.setSummedTable(summedTable);
+  tool.setDiskFootprint(disk);
   //int res = tool.computeProfile(x, y, z, vectorX, vectorY, vectorZ, nbpoints, filename, extension, inputDirectory, isDirectory, neighbors, measurement, typeBlock);
   int res = tool.computeProfile(x, y, z, vectorX, vectorY, vectorZ, nbpoints, outputFilename, inputFile, neighbors, measurement, typeBlock);
   std::cout << "res :" << res << std::endl;
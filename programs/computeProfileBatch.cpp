@@ -0,0 +1,76 @@
+#include <string>
+#include <filesystem>
+#include <chrono>
+
+using namespace std;
+
+#include "itkImage.h"
+#include "itkImageFileReader.h"
+#include "itkMemoryProbe.h"
+#include "itkImageFileWriter.h"
+
+#include "tools/ToolsItk.h"
+
+int
+main(int argc, char * argv[])
+{
+
+  // Verify command line arguments
+  if (argc < 7)
+  {
+    std::cerr << "Usage: " << std::endl;
+    std::cerr << argv[0] << " jobsFile outputFilename inputFile neighbors measurement typeBlock [summedTable [disk]]" <<std::endl;
+    std::cout << "jobsFile: one profile by line: x y z vectorX vectorY vectorZ nbpoints"  << std::endl;
+    std::cout << "measurement: m for mean, d for median, n for min, x for max, v for variance, s for standard deviation, p90 for the percentile 90"  << std::endl;
+    std::cout << "             several statistics separated by commas are computed in one pass, example: m,d,n,x,s,p10,p90"  << std::endl;
+    std::cout << "summedTable: 1 (default) to compute the means and variances of the 3D blocks with a summed volume table, 0 otherwise"  << std::endl;
+    std::cout << "disk: 1 for a disk of radius neighbors in the orthogonal plan (typeBlock 2), 0 (default) for a square"  << std::endl;
+    return EXIT_FAILURE;
+  }
+
+  std::string jobsFile = argv[1];
+  std::string outputFilename = argv[2];
+  std::string inputFile = argv[3];
+  int neighbors = atoi(argv[4]);
+  std::string measurement = argv[5];
+  int typeBlock = atoi(argv[6]);
+  bool summedTable = argc > 7 ? atoi(argv[7]) != 0 : true;
+  bool disk = argc > 8 ? atoi(argv[8]) != 0 : false;
+
+  std::cout << "jobs file = " << jobsFile << std::endl;
+  std::cout << "output filename = " << outputFilename << std::endl;
+  std::cout << "input file = " << inputFile << std::endl;
+  std::cout << "neighbors  = " << neighbors  << std::endl;
+  std::cout << "measurement = " << measurement << std::endl;
+  std::cout << "typeBlock = " << typeBlock << std::endl;
+  std::cout << "summedTable = " << summedTable << std::endl;
+  std::cout << "disk = " << disk << std::endl;
+
+  itk::MemoryProbe memoryProbe;
+
+  std::cout << "We are measuring " << memoryProbe.GetType();
+  std::cout << " in units of MB"  << ".\n" << std::endl;
+  memoryProbe.Start();
+  auto start_timeP = std::chrono::high_resolution_clock::now();
+
+  ToolsItk tool ;
+  tool.setSummedTable(summedTable);
+  tool.setDiskFootprint(disk);
+  int res = tool.computeProfileBatch(jobsFile, outputFilename, inputFile, neighbors, measurement, typeBlock);
+  std::cout << "res :" << res << std::endl;
+
+  auto end_timeP = std::chrono::high_resolution_clock::now();
+    std::chrono::duration<double> parallel_duration  = end_timeP - start_timeP;
+    std::cout << "Parallel duration: "
+              << parallel_duration.count() << " seconds"
+              << std::endl;
+
+  memoryProbe.Stop();
+  std::cout << "** After allocation **" << std::endl;
+  std::cout << "Mean: " << memoryProbe.GetMean()/1012 << std::endl;
+  std::cout << "Total: " << memoryProbe.GetTotal()/1012 << std::endl;
+  std::cout << "Max: " << memoryProbe.GetMaximum()/1012 << std::endl;
+  std::cout << std::endl;
+
+  return res == 0 ? EXIT_SUCCESS : EXIT_FAILURE;
+}
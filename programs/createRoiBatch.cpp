@@ -0,0 +1,61 @@
+#include <string>
+#include <filesystem>
+#include <vector>
+#include <chrono>
+using namespace std;
+
+#include "itkImage.h"
+#include "itkImageFileReader.h"
+#include "itkMemoryProbe.h"
+#include "itkTileImageFilter.h"
+#include "itkImageFileWriter.h"
+
+#include "tools/ToolsItk.h"
+
+int
+main(int argc, char * argv[])
+{
+  
+    // Verify command line arguments
+  if (argc < 4)
+  {
+    std::cerr << "Usage: " << std::endl;
+    std::cerr << argv[0] << " inputdirectory" << " roiFile extension"<< " / one ROI by line in roiFile: sizex sizey sizez px py pz posInArea outputFile, positionInArea = c for center or o for origin" <<std::endl;
+    return EXIT_FAILURE;
+  }
+
+  std::string inputDirectory = argv[1];
+  std::string roiFile = argv[2];
+  std::string extension = argv[3];
+  
+  itk::MemoryProbe memoryProbe;
+  
+  std::cout << "We are measuring " << memoryProbe.GetType();
+  //std::cout << " in units of " << memoryProbe.GetUnit() << ".\n" << std::endl;
+  std::cout << " in units of MB"  << ".\n" << std::endl;
+  
+  memoryProbe.Start();
+  auto start_timeP = std::chrono::high_resolution_clock::now(); 
+
+  ToolsItk tool ;
+  int res = tool.createRoiBatch(inputDirectory, roiFile, extension);
+  std::cout << "res :" << res << std::endl;
+  auto end_timeP = std::chrono::high_resolution_clock::now();
+  std::chrono::duration<double> parallel_duration  = end_timeP - start_timeP;
+  std::cout << "duration: "
+              << parallel_duration.count() << " seconds"
+              << std::endl; 
+
+  memoryProbe.Stop();  
+  std::cout << "** After allocation **" << std::endl;
+  std::cout << "Mean: " << memoryProbe.GetMean()/1000 << std::endl;
+  std::cout << "Total: " << memoryProbe.GetTotal()/1000 << std::endl;
+  std::cout << "Max: " << memoryProbe.GetMaximum()/1000 << std::endl;
+  std::cout << std::endl;
+  
+  if (res != 0) {
+    return EXIT_FAILURE;
+  }
+  return EXIT_SUCCESS;
+}
+  
\ No newline at end of file
@@ -20,7 +20,7 @@ main(int argc, char * argv[])
   if (argc < 12)
   {
     std::cerr << "Usage: " << std::endl;
-    std::cerr << argv[0] << " inputdirectory" << " sizex sizey sizez px py pz posInArea outputFile factorResize extension"<< " / positionInArea = c for center or o for origin" <<std::endl;
+    std::cerr << argv[0] << " inputdirectory" << " sizex sizey sizez px py pz posInArea outputFile factorResize extension [ioThreads decodeThreads]"<< " / positionInArea = c for center or o for origin" <<std::endl;
     return EXIT_FAILURE;
   }
 
@@ -46,6 +46,9 @@ main(int argc, char * argv[])
   auto start_timeP = std::chrono::high_resolution_clock::now(); 
 
   ToolsItk tool ;
+  if (argc > 12) { // threads which read and decode the slices, 0 for the default
+    tool.setThreads(atoi(argv[12]), argc > 13 ? atoi(argv[13]) : 0);
+  }
   int res = tool.createRoi(inputDirectory, sizeX, sizeY, sizeZ, px, py, pz, positionInArea, outputFilename, factorResize, extension);
   std::cout << "res :" << res << std::endl;
   auto end_timeP = std::chrono::high_resolution_clock::now();
@@ -7,20 +7,38 @@ if len( sys.argv ) < 2:
     exit()
 
 filename = sys.argv[1]
+names = None
 data = []
-with open(filename, 'r') as f:            
-            for line in f:
-                #print(line)
-                l = line.split()
-                x,y,z,valPixel = map(int, l[:])
-                data.append((x, y, z, valPixel))
+if filename.endswith(".npy"): # array of records x, y, z, mean, median... written by computeProfile
+    import numpy as np
+    data = np.load(filename, mmap_mode="r")
+    names = list(data.dtype.names[3:])
+else:
+    with open(filename, 'r') as f:            
+        for line in f:
+            #print(line)
+            l = line.split()
+            if not l:
+                continue
+            if l[0] == "#": # header: # x y z mean median...
+                names = l[4:]
+                continue
+            data.append([float(v) for v in l])
+if names is None:
+    names = ["value"] * (len(data[0]) - 3 if data else 1)
 
 
 x_abscisses = list(range(1, len(data)+1))
-valPixels = [d[3] for d in data]
 
 plt.figure()
-plt.plot(x_abscisses, valPixels, linestyle='-', marker='o')
+for i, name in enumerate(names):
+    if filename.endswith(".npy"):
+        valPixels = data[data.dtype.names[3+i]]
+    else:
+        valPixels = [d[3+i] for d in data]
+    plt.plot(x_abscisses, valPixels, linestyle='-', marker='o', label=name)
+if len(names) > 1:
+    plt.legend()
 
 
 plt.xlabel('(x ,y, z)')
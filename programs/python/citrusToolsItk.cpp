@@ -0,0 +1,272 @@
+/**
+ * @file citrusToolsItk.cpp
+ * @brief Python module of the functions of ToolsItk, the volumes are exchanged as NumPy arrays.
+ *
+ * The module is loaded once by the 3D Slicer extension: the slices are decoded in the process of 3D Slicer, 
+ * without starting a program, registering the ITK factories again and writing an intermediate file. The arrays 
+ * are indexed [z, y, x] like the arrays of slicer.util.arrayFromVolume. The input arrays are used without copy 
+ * when they are C contiguous and of the expected type, and the output arrays share the memory of the ITK images 
+ * or are filled directly by the slices.
+ */
+#include <string>
+#include <vector>
+#include <cstring>
+#include <stdexcept>
+
+#include <pybind11/pybind11.h>
+#include <pybind11/numpy.h>
+#include <pybind11/stl.h>
+
+#include "itkImage.h"
+
+#include "../tools/ToolsItk.h"
+
+namespace py = pybind11;
+
+
+/** 
+ * @brief create a NumPy array filled with 0 of the ITK pixel type
+ * 
+ * @param componentType the ITK pixel type
+ * @param shape the shape of the array
+ * @return the array
+*/
+static py::array newArray(itk::ImageIOBase::IOComponentEnum componentType, std::vector<py::ssize_t> shape) {
+    py::array array;
+    switch(componentType) {
+        case itk::ImageIOBase::IOComponentEnum::UCHAR:
+            array = py::array_t<unsigned char>(shape);
+            break;
+        case itk::ImageIOBase::IOComponentEnum::CHAR:
+            array = py::array_t<char>(shape);
+            break;
+        case itk::ImageIOBase::IOComponentEnum::USHORT:
+            array = py::array_t<unsigned short>(shape);
+            break;
+        case itk::ImageIOBase::IOComponentEnum::SHORT:
+            array = py::array_t<short>(shape);
+            break;
+        case itk::ImageIOBase::IOComponentEnum::INT:
+            array = py::array_t<int>(shape);
+            break;
+        case itk::ImageIOBase::IOComponentEnum::FLOAT:
+            array = py::array_t<float>(shape);
+            break;
+        default:
+            array = py::array_t<unsigned int>(shape);
+            break;
+    }
+    std::memset(array.mutable_data(), 0, array.nbytes());
+    return array;
+}
+
+
+/** 
+ * @brief wrap a NumPy array in an ITK image without copy
+ * 
+ * @param array the array, indexed [z, y, x] or [y, x], C contiguous, it can be read-only (memory map) as the image is only read
+ * @return the image, it uses the memory of the array which must stay alive
+*/
+template <typename TPixel, unsigned int VDimension>
+typename itk::Image<TPixel, VDimension>::Pointer wrapArray(py::array_t<TPixel, py::array::c_style | py::array::forcecast> &array) {
+    using ImageType = itk::Image<TPixel, VDimension>;
+    if(array.ndim() != VDimension) {
+        throw std::invalid_argument("the array must have " + std::to_string(VDimension) + " dimensions");
+    }
+    typename ImageType::SizeType size;
+    for(unsigned int d=0; d<VDimension; d++) {
+        size[d] = array.shape(VDimension-1-d);
+    }
+    typename ImageType::IndexType corner;
+    corner.Fill(0);
+    typename ImageType::RegionType region(corner, size);
+    typename ImageType::Pointer image = ImageType::New();
+    image->SetRegions(region);
+    image->GetPixelContainer()->SetImportPointer(const_cast<TPixel *>(array.data()), array.size(), false);
+    return image;
+}
+
+
+/** 
+ * @brief return the buffer of an ITK image as a NumPy array without copy
+ * 
+ * @param image the image, the array keeps it alive
+ * @return the array, indexed [z, y, x] or [y, x]
+*/
+template <typename TPixel, unsigned int VDimension>
+py::array toArray(typename itk::Image<TPixel, VDimension>::Pointer image) {
+    using PointerType = typename itk::Image<TPixel, VDimension>::Pointer;
+    typename itk::Image<TPixel, VDimension>::SizeType size = image->GetBufferedRegion().GetSize();
+    std::vector<py::ssize_t> shape;
+    for(int d=VDimension-1; d>=0; d--) {
+        shape.push_back(size[d]);
+    }
+    PointerType * owner = new PointerType(image);
+    py::capsule capsule(owner, [](void * pointer) { delete reinterpret_cast<PointerType *>(pointer); });
+    return py::array_t<TPixel>(shape, image->GetBufferPointer(), capsule);
+}
+
+
+/** 
+ * @brief stack the slices of a directory in a NumPy array, same volume as the file written by stack2Dto3DParallV2
+ * 
+ * @param inputDirectory the directory that contains all the slices
+ * @param beginX the first position of the pixel in the x axis, -1 for the whole slice
+ * @param endX the last position of the pixel in the x axis
+ * @param beginY the first position of the pixel in the y axis, -1 for the whole slice
+ * @param endY the last position of the pixel in the y axis
+ * @param beginZ the first slice
+ * @param endZ the last slice
+ * @param resize true if the image must be reduced
+ * @param factorResize the image reduction factor 
+ * @param extension the format of the slices to be processed, example: jp2
+ * @param ioThreads the number of threads which read the slices, 0 for the default
+ * @param decodeThreads the number of threads which decode the slices, 0 for the number of cores
+ * @return the array [z, y, x] with the pixel type of the slices
+*/
+static py::object stack2Dto3DParallV2(std::string inputDirectory, int beginX, int endX, int beginY, int endY, int beginZ, int endZ, bool resize, int factorResize, std::string extension, 
+        int ioThreads, int decodeThreads) {
+    ToolsItk tool;
+    tool.setThreads(ioThreads, decodeThreads);
+    py::object result = py::none();
+    int res = 0;
+    {
+        py::gil_scoped_release release; // the slices are decoded by the OpenMP threads
+        res = tool.stack2Dto3DParallBuffer(inputDirectory, beginX, endX, beginY, endY, beginZ, endZ, resize, factorResize, extension, 
+            [&](uint nbCols, uint nbRows, uint nbSlices, itk::ImageIOBase::IOComponentEnum componentType) -> void * {
+                py::gil_scoped_acquire acquire;
+                py::array array = newArray(componentType, {(py::ssize_t)nbSlices, (py::ssize_t)nbRows, (py::ssize_t)nbCols});
+                result = array;
+                return array.mutable_data();
+            });
+    }
+    if(res != 0) {
+        throw std::runtime_error("the slices of " + inputDirectory + " can't be stacked");
+    }
+    return result;
+}
+
+
+/** 
+ * @brief create a region of interest (ROI) in a NumPy array, same volume as the file written by createRoiImage3D
+ * 
+ * @param inputDirectory the directory that contains all the slices
+ * @param size the dimensions of the area [sizeX, sizeY, sizeZ]
+ * @param position the position of the area [px, py, pz]
+ * @param positionInArea the nature of the position, c for center or o for origin
+ * @param factorResize the image reduction factor 
+ * @param extension the format of the slices to be processed, example: jp2
+ * @param ioThreads the number of threads which read the slices, 0 for the default
+ * @param decodeThreads the number of threads which decode the slices, 0 for the number of cores
+ * @return the array [z, y, x] with the pixel type of the slices
+*/
+static py::object createRoi(std::string inputDirectory, std::vector<int> size, std::vector<int> position, std::string positionInArea, int factorResize, std::string extension, 
+        int ioThreads, int decodeThreads) {
+    if(size.size() != 3 || position.size() != 3) {
+        throw std::invalid_argument("size and position must have 3 values");
+    }
+    std::vector<int> begin = position;
+    if(positionInArea.compare("c")==0) {
+        for(int d=0; d<3; d++) {
+            begin[d] = position[d] - size[d]/2;
+        }
+    }
+    if(begin[0] < 0 || begin[1] < 0 || begin[2] < 0) {
+        throw std::invalid_argument("The point can't be in the area.");
+    }
+    return stack2Dto3DParallV2(inputDirectory, begin[0], begin[0] + size[0] - 1, begin[1], begin[1] + size[1] - 1, begin[2], begin[2] + size[2] - 1, 
+        true, factorResize, extension, ioThreads, decodeThreads);
+}
+
+
+/** 
+ * @brief compute the density profile in a volume given as a NumPy array
+ * 
+ * @param volume the volume [z, y, x], used without copy if it is C contiguous
+ * @param point the origin point [x, y, z]
+ * @param vector the direction vector [vx, vy, vz]
+ * @param nbpoints the number of points of the profile
+ * @param distanceNeighbors the neighborhood distance
+ * @param measurement the nature of the  statistical instrument, m for mean, d for median, n for min, x for max
+ * @param typeBlock the shape of the neighborhood, 3 for a 3D block, 2 for an orthogonal plan 
+ * @param disk true for a disk in the orthogonal plan instead of a square
+ * @return the values of the profile, one by point
+*/
+template <typename TPixel>
+std::vector<int> computeProfileTyped(py::array_t<TPixel, py::array::c_style | py::array::forcecast> volume, std::vector<int> point, std::vector<double> vector, 
+        int nbpoints, int distanceNeighbors, char measurement, int typeBlock, bool disk) {
+    if(point.size() != 3 || vector.size() != 3) {
+        throw std::invalid_argument("point and vector must have 3 values");
+    }
+    typename itk::Image<TPixel, 3>::Pointer image3D = wrapArray<TPixel, 3>(volume);
+    ToolsItk tool;
+    tool.setDiskFootprint(disk);
+    std::vector<int> values;
+    {
+        py::gil_scoped_release release;
+        tool.computeProfileValues<TPixel>(image3D, point[0], point[1], point[2], vector[0], vector[1], vector[2], nbpoints, distanceNeighbors, measurement, typeBlock, values);
+    }
+    return values;
+}
+
+// the volumes of 3D Slicer (uint8, uint16) are read in place, the other types are converted to uint32
+static std::vector<int> computeProfile(py::array volume, std::vector<int> point, std::vector<double> vector, 
+        int nbpoints, int distanceNeighbors, char measurement, int typeBlock, bool disk) {
+    if(py::isinstance<py::array_t<unsigned char>>(volume)) return computeProfileTyped<unsigned char>(volume, point, vector, nbpoints, distanceNeighbors, measurement, typeBlock, disk);
+    if(py::isinstance<py::array_t<unsigned short>>(volume)) return computeProfileTyped<unsigned short>(volume, point, vector, nbpoints, distanceNeighbors, measurement, typeBlock, disk);
+    return computeProfileTyped<unsigned int>(volume, point, vector, nbpoints, distanceNeighbors, measurement, typeBlock, disk);
+}
+
+
+/** 
+ * @brief resize or crop a slice given as a NumPy array
+ * 
+ * @param image the slice [y, x], used without copy if it is C contiguous
+ * @param factorResize the image reduction factor
+ * @param beginX the first position of the pixel in the x axis, -1 for the whole slice
+ * @param endX the last position of the pixel in the x axis
+ * @param beginY the first position of the pixel in the y axis, -1 for the whole slice
+ * @param endY the last position of the pixel in the y axis
+ * @return the resized slice [y, x]
+*/
+template <typename TPixel>
+py::array changeSizeImageTyped(py::array_t<TPixel, py::array::c_style | py::array::forcecast> image, int factorResize, int beginX, int endX, int beginY, int endY) {
+    using ImageType2D = itk::Image<TPixel, 2>;
+    typename ImageType2D::Pointer imageOrigin = wrapArray<TPixel, 2>(image);
+    typename ImageType2D::Pointer imageNew = ImageType2D::New();
+    ToolsItk tool;
+    int res = 0;
+    {
+        py::gil_scoped_release release;
+        res = tool.changeSizeImage<TPixel>(imageOrigin, imageNew, factorResize, beginX, endX, beginY, endY);
+    }
+    if(res != 0) {
+        throw std::invalid_argument("The point can't be in the area.");
+    }
+    return toArray<TPixel, 2>(imageNew);
+}
+
+static py::array changeSizeImage(py::array image, int factorResize, int beginX, int endX, int beginY, int endY) {
+    if(py::isinstance<py::array_t<unsigned char>>(image)) return changeSizeImageTyped<unsigned char>(image, factorResize, beginX, endX, beginY, endY);
+    if(py::isinstance<py::array_t<char>>(image)) return changeSizeImageTyped<char>(image, factorResize, beginX, endX, beginY, endY);
+    if(py::isinstance<py::array_t<unsigned short>>(image)) return changeSizeImageTyped<unsigned short>(image, factorResize, beginX, endX, beginY, endY);
+    if(py::isinstance<py::array_t<short>>(image)) return changeSizeImageTyped<short>(image, factorResize, beginX, endX, beginY, endY);
+    if(py::isinstance<py::array_t<int>>(image)) return changeSizeImageTyped<int>(image, factorResize, beginX, endX, beginY, endY);
+    if(py::isinstance<py::array_t<float>>(image)) return changeSizeImageTyped<float>(image, factorResize, beginX, endX, beginY, endY);
+    return changeSizeImageTyped<unsigned int>(image, factorResize, beginX, endX, beginY, endY);
+}
+
+
+PYBIND11_MODULE(citrusToolsItk, m) {
+    m.doc() = "Functions of ToolsItk for the citrus skins 3D Slicer extension, the volumes are NumPy arrays [z, y, x]";
+    m.def("stack2Dto3DParallV2", &stack2Dto3DParallV2, "Stack the slices of a directory in an array, same volume as the resize programs", 
+        py::arg("inputDirectory"), py::arg("beginX"), py::arg("endX"), py::arg("beginY"), py::arg("endY"), py::arg("beginZ"), py::arg("endZ"), 
+        py::arg("resize"), py::arg("factorResize"), py::arg("extension"), py::arg("ioThreads") = 0, py::arg("decodeThreads") = 0);
+    m.def("createRoi", &createRoi, "Create a region of interest in an array, same volume as createRoiImage3D", 
+        py::arg("inputDirectory"), py::arg("size"), py::arg("position"), py::arg("positionInArea") = "c", py::arg("factorResize") = 1, py::arg("extension") = "jp2", 
+        py::arg("ioThreads") = 0, py::arg("decodeThreads") = 0);
+    m.def("computeProfile", &computeProfile, "Compute the density profile in a volume", 
+        py::arg("volume"), py::arg("point"), py::arg("vector"), py::arg("nbpoints"), py::arg("distanceNeighbors") = 0, py::arg("measurement") = 'm', py::arg("typeBlock") = 3, py::arg("disk") = false);
+    m.def("changeSizeImage", &changeSizeImage, "Resize or crop a slice", 
+        py::arg("image"), py::arg("factorResize"), py::arg("beginX") = -1, py::arg("endX") = 0, py::arg("beginY") = -1, py::arg("endY") = 0);
+}
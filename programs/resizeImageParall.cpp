@@ -19,7 +19,7 @@ main(int argc, char * argv[])
   if (argc < 7)
   {
     std::cerr << "Usage: " << std::endl;
-    std::cerr << argv[0] << " inputDirectory begin end factorResize outputImage extension" << "  example factorResize = 8 to divide the size by 8" <<std::endl;
+    std::cerr << argv[0] << " inputDirectory begin end factorResize outputImage extension [ioThreads decodeThreads]" << "  example factorResize = 8 to divide the size by 8" <<std::endl;
     return EXIT_FAILURE;
   }
 
@@ -44,6 +44,9 @@ main(int argc, char * argv[])
   auto start_timeP = std::chrono::high_resolution_clock::now(); 
 
   ToolsItk tool ;
+  if (argc > 7) { // threads which read and decode the slices, 0 for the default
+    tool.setThreads(atoi(argv[7]), argc > 8 ? atoi(argv[8]) : 0);
+  }
   int res = tool.resizeImageParall(inputDirectory, begin, end, factorResize, outputImage, extension);
   std::cout << "res :" << res << std::endl;
 
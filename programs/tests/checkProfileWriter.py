@@ -0,0 +1,37 @@
+"""
+Reads the profiles written by testProfileWriter with numpy.load(mmap_mode="r") and compares them with the 
+text files and with the expected values.
+
+Usage: python checkProfileWriter.py outputDirectory
+"""
+import os
+import sys
+
+import numpy as np
+
+
+def check(outputDirectory):
+    errors = 0
+    for name in ("profile", "batch"):
+        profile = np.load(os.path.join(outputDirectory, name + ".npy"), mmap_mode="r")
+        text = np.loadtxt(os.path.join(outputDirectory, name + ".txt"), ndmin=2)
+        fields = (["profile"] if name == "batch" else []) + ["x", "y", "z", "mean", "median", "mean_2"]
+        k = np.arange(10)
+        expected = {"profile": k // 4, "x": k, "y": 2 * k, "z": 3 * k, "mean": k + 0.0, "median": k + 0.1, "mean_2": k + 0.2}
+        if not isinstance(profile, np.memmap) or list(profile.dtype.names) != fields or profile.shape != (10,):
+            print(name, "wrong array", type(profile), profile.dtype, profile.shape)
+            errors += 1
+            continue
+        for column, field in enumerate(fields):
+            if profile.dtype[field] != (np.int32 if field in ("profile", "x", "y", "z") else np.float64):
+                print(name, field, "wrong type", profile.dtype[field])
+                errors += 1
+            if not np.allclose(profile[field], expected[field]) or not np.allclose(profile[field], text[:, column]):
+                print(name, field, "wrong values", profile[field])
+                errors += 1
+    print("checkProfileWriter errors =", errors)
+    return errors
+
+
+if __name__ == "__main__":
+    sys.exit(1 if check(sys.argv[1]) else 0)
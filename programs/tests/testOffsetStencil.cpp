@@ -0,0 +1,90 @@
+/**
+ * \file testOffsetStencil.cpp
+ * @brief Compare the neighbors read by OffsetStencil with the rounded positions p + k1 * b1 + k2 * b2
+ *
+ * \author Olivier Riverain
+ * \version 1.0
+ * \date october 2026
+ * @copyright   GNU Public License
+ *
+ */
+
+#include <iostream>
+#include <vector>
+#include <set>
+#include <array>
+#include <random>
+#include <cmath>
+
+#include "OffsetStencil.h"
+
+
+using namespace std;
+
+int
+main(int argc, char * argv[])
+{
+  const int bufferIndex[3] = {10, 20, 30};
+  const int bufferSize[3] = {40, 35, 30};
+  std::vector<unsigned int> buffer((size_t)bufferSize[0] * bufferSize[1] * bufferSize[2]);
+  for(size_t v=0; v<buffer.size(); v++) {
+    buffer[v] = (unsigned int)v; // the value gives the position of the voxel
+  }
+  std::mt19937 generator(24);
+  std::uniform_real_distribution<double> direction(-1.0, 1.0);
+  int errors = 0;
+  for(int n=0; n<200; n++) {
+    // orthonormal base of the plane orthogonal to a random vector
+    double vector[3] = {direction(generator), direction(generator), direction(generator)};
+    double norm = std::sqrt(vector[0]*vector[0] + vector[1]*vector[1] + vector[2]*vector[2]);
+    for(double &c : vector) c /= norm;
+    double other[3] = {1, 0, 0};
+    if(std::fabs(vector[0]) > 0.9) { other[0] = 0; other[1] = 1; }
+    double b1[3] = {vector[1]*other[2] - vector[2]*other[1], vector[2]*other[0] - vector[0]*other[2], vector[0]*other[1] - vector[1]*other[0]};
+    norm = std::sqrt(b1[0]*b1[0] + b1[1]*b1[1] + b1[2]*b1[2]);
+    for(double &c : b1) c /= norm;
+    double b2[3] = {vector[1]*b1[2] - vector[2]*b1[1], vector[2]*b1[0] - vector[0]*b1[2], vector[0]*b1[1] - vector[1]*b1[0]};
+    int distance = 1 + n % 5;
+    bool disk = n % 2 == 1;
+    OffsetStencil stencil;
+    stencil.buildPlane(b1, b2, distance, disk);
+    stencil.setBuffer(buffer.data(), bufferIndex, bufferSize);
+    int point[3] = {30 + n % 7, 37 + n % 5, 45 + n % 3};
+
+    // reference: the distinct voxels round(p + k1 * b1 + k2 * b2)
+    std::set<std::array<int, 3>> expected;
+    for(int k1=-distance; k1<distance+1; k1++) {
+      for(int k2=-distance; k2<distance+1; k2++) {
+        if(disk && k1 * k1 + k2 * k2 > distance * distance) continue;
+        std::array<int, 3> voxel;
+        for(int i=0; i<3; i++) {
+          voxel[i] = (int)std::lround(point[i] + k1 * b1[i] + k2 * b2[i]);
+        }
+        expected.insert(voxel);
+      }
+    }
+    std::vector<unsigned int> values;
+    if(!stencil.gather(point[0], point[1], point[2], values)) {
+      std::cerr << "gather failed inside the buffer" << std::endl;
+      errors++;
+      continue;
+    }
+    std::set<std::array<int, 3>> gathered;
+    for(unsigned int value : values) {
+      std::array<int, 3> voxel = {(int)(value % bufferSize[0]) + bufferIndex[0], (int)(value / bufferSize[0] % bufferSize[1]) + bufferIndex[1], 
+                                  (int)(value / bufferSize[0] / bufferSize[1]) + bufferIndex[2]};
+      gathered.insert(voxel);
+    }
+    if(gathered != expected || values.size() != expected.size() || stencil.size() != expected.size()) {
+      std::cerr << "neighborhood " << n << " differs: " << values.size() << " voxels, " << expected.size() << " expected" << std::endl;
+      errors++;
+    }
+    std::vector<unsigned int> outside;
+    if(stencil.gather(bufferIndex[0] - 1, point[1], point[2], outside) || !outside.empty()) { // the point itself is outside
+      std::cerr << "gather outside of the buffer must fail" << std::endl;
+      errors++;
+    }
+  }
+  std::cout << "testOffsetStencil errors = " << errors << std::endl;
+  return errors == 0 ? 0 : 1;
+}
@@ -0,0 +1,60 @@
+/**
+ * \file testProfileWriter.cpp
+ * @brief Write a profile and a batch of profiles with ProfileWriter, checkProfileWriter.py reads them back with NumPy
+ *
+ * \author Olivier Riverain
+ * \version 1.0
+ * \date october 2026
+ * @copyright   GNU Public License
+ *
+ * The values written are a function of the row: x = k, y = 2k, z = 3k and the statistic i is k + i / 10, 
+ * the profile of the batch is k / 4. The names of the statistics contain a duplicate.
+ *
+ */
+
+#include <iostream>
+#include <vector>
+#include <string>
+
+#include "ProfileWriter.h"
+
+
+using namespace std;
+
+int
+main(int argc, char * argv[])
+{
+  if(argc < 2) {
+    std::cerr << argv[0] << " outputDirectory" << std::endl;
+    return 1;
+  }
+  std::string outputDirectory = argv[1];
+  std::vector<std::string> names = {"mean", "median", "mean"};
+  int nbRows = 10;
+  std::vector<std::vector<double>> columns(names.size(), std::vector<double>(nbRows));
+  for(size_t i=0; i<names.size(); i++) {
+    for(int k=0; k<nbRows; k++) {
+      columns[i][k] = k + i / 10.0;
+    }
+  }
+  int error = 0;
+  for(std::string name : {"profile.npy", "profile.txt", "batch.npy", "batch.txt"}) {
+    bool batch = name.compare(0, 5, "batch") == 0;
+    ProfileWriter writer;
+    if(writer.open(outputDirectory + "/" + name, names, batch, nbRows) != 0) {
+      return 1;
+    }
+    for(int k=0; k<nbRows; k++) {
+      writer.write(k / 4, k, 2 * k, 3 * k, columns, k);
+    }
+    if(writer.close() != 0) {
+      error = 1;
+    }
+  }
+  if(ProfileWriter::fieldNames(names) != std::vector<std::string>({"mean", "median", "mean_2"}) 
+     || !ProfileWriter::isBinary("a.npy") || ProfileWriter::isBinary("a.txt")) {
+    std::cerr << "fieldNames or isBinary is wrong" << std::endl;
+    error = 1;
+  }
+  return error;
+}
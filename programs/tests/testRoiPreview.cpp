@@ -0,0 +1,100 @@
+/**
+ * \file testRoiPreview.cpp
+ * @brief Check the size and the voxels of a ROI extracted with a reduction factor, as the preview of a ROI
+ *
+ * \author Olivier Riverain
+ * \version 1.0
+ * \date october 2026
+ * @copyright   GNU Public License
+ *
+ * The slices are written in the directory given as argument, the voxel (x, y, z) is x + 100 * y + 3000 * z.
+ * The ROI reduced by factorResize has one voxel every factorResize voxels of its window: ceil(size / factorResize)
+ * voxels by axis.
+ *
+ */
+
+#include <iostream>
+#include <string>
+#include <filesystem>
+
+#include "itkImage.h"
+#include "itkImageFileReader.h"
+#include "itkImageFileWriter.h"
+
+#include "ToolsItk.h"
+
+
+using namespace std;
+
+int
+main(int argc, char * argv[])
+{
+  if(argc < 2) {
+    std::cerr << argv[0] << " outputDirectory" << std::endl;
+    return 1;
+  }
+  using SliceType = itk::Image<unsigned short, 2>;
+  using VolumeType = itk::Image<unsigned short, 3>;
+  std::string inputDirectory = std::string(argv[1]) + "/roiPreviewSlices/";
+  std::filesystem::remove_all(inputDirectory);
+  std::filesystem::create_directories(inputDirectory);
+  const int nbCols = 23;
+  const int nbRows = 19;
+  const int nbSlices = 9;
+  for(int z=0; z<nbSlices; z++) {
+    auto slice = SliceType::New();
+    SliceType::SizeType size = {{(itk::SizeValueType)nbCols, (itk::SizeValueType)nbRows}};
+    slice->SetRegions(SliceType::RegionType(size));
+    slice->Allocate();
+    for(int y=0; y<nbRows; y++) {
+      for(int x=0; x<nbCols; x++) {
+        slice->SetPixel({{x, y}}, x + 100 * y + 3000 * z);
+      }
+    }
+    char name[32];
+    snprintf(name, sizeof(name), "slice_%03d.tif", z);
+    itk::WriteImage(slice, inputDirectory + name);
+  }
+
+  // window of 13 x 10 x 7 voxels from (3, 2, 1)
+  const int origin[3] = {3, 2, 1};
+  const int size[3] = {13, 10, 7};
+  int errors = 0;
+  for(int factorResize : {1, 2, 4}) {
+    std::string outputFile = std::string(argv[1]) + "/roiPreview_" + std::to_string(factorResize) + ".nrrd";
+    ToolsItk tool;
+    if(tool.createRoi(inputDirectory, size[0], size[1], size[2], origin[0], origin[1], origin[2], "o", outputFile, factorResize, "tif") != 0) {
+      std::cerr << "createRoi failed, factor " << factorResize << std::endl;
+      errors++;
+      continue;
+    }
+    VolumeType::Pointer roi = itk::ReadImage<VolumeType>(outputFile);
+    VolumeType::SizeType roiSize = roi->GetLargestPossibleRegion().GetSize();
+    bool sizeOk = true;
+    for(int i=0; i<3; i++) {
+      if((int)roiSize[i] != (size[i] + factorResize - 1) / factorResize) {
+        sizeOk = false;
+      }
+    }
+    if(!sizeOk) {
+      std::cerr << "factor " << factorResize << " size " << roiSize << " instead of ceil(" << size[0] << " " << size[1] << " " << size[2] << " / factor)" << std::endl;
+      errors++;
+      continue;
+    }
+    bool voxelsOk = true; // one message by factor
+    for(int z=0; z<(int)roiSize[2] && voxelsOk; z++) {
+      for(int y=0; y<(int)roiSize[1] && voxelsOk; y++) {
+        for(int x=0; x<(int)roiSize[0] && voxelsOk; x++) {
+          int expected = (origin[0] + x * factorResize) + 100 * (origin[1] + y * factorResize) + 3000 * (origin[2] + z * factorResize);
+          if(roi->GetPixel({{x, y, z}}) != expected) {
+            std::cerr << "factor " << factorResize << " voxel " << x << " " << y << " " << z << " = " << roi->GetPixel({{x, y, z}}) << " instead of " << expected << std::endl;
+            errors++;
+            voxelsOk = false;
+          }
+        }
+      }
+    }
+  }
+  std::cout << "testRoiPreview errors = " << errors << std::endl;
+  return errors == 0 ? 0 : 1;
+}
@@ -0,0 +1,73 @@
+/**
+ * \file testSlidingHistogram.cpp
+ * @brief Compare the k-th, min and max of SlidingHistogram with a sorted copy of the voxels of a sliding window
+ *
+ * \author Olivier Riverain
+ * \version 1.0
+ * \date october 2026
+ * @copyright   GNU Public License
+ *
+ */
+
+#include <iostream>
+#include <vector>
+#include <deque>
+#include <random>
+#include <algorithm>
+
+#include "SlidingHistogram.h"
+
+
+using namespace std;
+
+int
+main(int argc, char * argv[])
+{
+  std::mt19937 generator(20);
+  // small values give many duplicates, large values many empty blocks
+  std::uniform_int_distribution<unsigned int> distributions[2] = {std::uniform_int_distribution<unsigned int>(0, 40), 
+                                                                  std::uniform_int_distribution<unsigned int>(0, 200000)};
+  int errors = 0;
+  for(auto &distribution : distributions) {
+    SlidingHistogram histogram;
+    std::deque<unsigned int> window;
+    for(int step=0; step<2000; step++) {
+      unsigned int value = distribution(generator);
+      if(!histogram.add(value)) {
+        std::cerr << "add refused " << value << std::endl;
+        return 1;
+      }
+      window.push_back(value);
+      if(window.size() > 37) { // the neighborhood moves: the oldest voxel leaves it
+        histogram.remove(window.front());
+        window.pop_front();
+      }
+      std::vector<unsigned int> sorted(window.begin(), window.end());
+      std::sort(sorted.begin(), sorted.end());
+      if(histogram.count() != sorted.size() || histogram.min() != sorted.front() || histogram.max() != sorted.back()) {
+        std::cerr << "step " << step << " count, min or max differs" << std::endl;
+        errors++;
+        continue;
+      }
+      for(unsigned int k=0; k<sorted.size(); k++) {
+        if(histogram.kth(k) != sorted[k]) {
+          std::cerr << "step " << step << " rank " << k << " " << histogram.kth(k) << " != " << sorted[k] << std::endl;
+          errors++;
+          break;
+        }
+      }
+    }
+    histogram.clear();
+    if(histogram.count() != 0 || histogram.min() != 0 || histogram.max() != 0) {
+      std::cerr << "clear is wrong" << std::endl;
+      errors++;
+    }
+  }
+  SlidingHistogram histogram;
+  if(histogram.add(SlidingHistogram::maxBins)) {
+    std::cerr << "a value too large is added" << std::endl;
+    errors++;
+  }
+  std::cout << "testSlidingHistogram errors = " << errors << std::endl;
+  return errors == 0 ? 0 : 1;
+}
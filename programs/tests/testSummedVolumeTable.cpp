@@ -0,0 +1,90 @@
+/**
+ * \file testSummedVolumeTable.cpp
+ * @brief Compare the block sums and variances of SummedVolumeTable with a direct sum of the voxels
+ *
+ * \author Olivier Riverain
+ * \version 1.0
+ * \date october 2026
+ * @copyright   GNU Public License
+ *
+ */
+
+#include <iostream>
+#include <vector>
+#include <random>
+#include <cmath>
+#include <cstdint>
+
+#include "SummedVolumeTable.h"
+
+
+using namespace std;
+
+int
+main(int argc, char * argv[])
+{
+  // buffer of 20 x 17 x 13 voxels placed at (5, 3, 2) in the volume, the table covers a box inside it
+  const int bufferIndex[3] = {5, 3, 2};
+  const int bufferSize[3] = {20, 17, 13};
+  std::mt19937 generator(19);
+  std::uniform_int_distribution<unsigned int> distribution(0, 65535);
+  std::vector<unsigned int> buffer((size_t)bufferSize[0] * bufferSize[1] * bufferSize[2]);
+  for(unsigned int &value : buffer) {
+    value = distribution(generator);
+  }
+  auto voxel = [&](int x, int y, int z) {
+    return buffer[((size_t)(z - bufferIndex[2]) * bufferSize[1] + (y - bufferIndex[1])) * bufferSize[0] + (x - bufferIndex[0])];
+  };
+  int box[6] = {7, 22, 4, 18, 3, 13};
+  SummedVolumeTable table;
+  if(table.build(buffer.data(), bufferIndex, bufferSize, box[0], box[1], box[2], box[3], box[4], box[5], true) != 0) {
+    std::cerr << "build failed" << std::endl;
+    return 1;
+  }
+  if(table.contains(box[0]-1, box[1], box[2], box[3], box[4], box[5]) || !table.contains(box[0], box[1], box[2], box[3], box[4], box[5])) {
+    std::cerr << "contains is wrong" << std::endl;
+    return 1;
+  }
+
+  int errors = 0;
+  std::uniform_int_distribution<int> coordinate(0, 1000);
+  for(int n=0; n<500; n++) {
+    int block[6];
+    for(int i=0; i<3; i++) {
+      int size = box[2*i+1] - box[2*i] + 1;
+      int first = box[2*i] + coordinate(generator) % size;
+      int last = box[2*i] + coordinate(generator) % size;
+      block[2*i] = std::min(first, last);
+      block[2*i+1] = std::max(first, last);
+    }
+    uint64_t sum = 0;
+    uint64_t sumSquares = 0;
+    for(int z=block[4]; z<=block[5]; z++) {
+      for(int y=block[2]; y<=block[3]; y++) {
+        for(int x=block[0]; x<=block[1]; x++) {
+          sum += voxel(x, y, z);
+          sumSquares += (uint64_t)voxel(x, y, z) * voxel(x, y, z);
+        }
+      }
+    }
+    double size = double(block[1] - block[0] + 1) * (block[3] - block[2] + 1) * (block[5] - block[4] + 1);
+    double mean = sum / size;
+    double variance = 0;
+    for(int z=block[4]; z<=block[5]; z++) {
+      for(int y=block[2]; y<=block[3]; y++) {
+        for(int x=block[0]; x<=block[1]; x++) {
+          variance += (voxel(x, y, z) - mean) * (voxel(x, y, z) - mean);
+        }
+      }
+    }
+    variance /= size;
+    if(table.blockSum(block[0], block[1], block[2], block[3], block[4], block[5]) != sum
+       || table.blockSumSquares(block[0], block[1], block[2], block[3], block[4], block[5]) != sumSquares
+       || std::fabs(table.blockVariance(block[0], block[1], block[2], block[3], block[4], block[5]) - variance) > 1e-6 * std::max(1.0, variance)) {
+      std::cerr << "block " << block[0] << "-" << block[1] << " " << block[2] << "-" << block[3] << " " << block[4] << "-" << block[5] << " differs" << std::endl;
+      errors++;
+    }
+  }
+  std::cout << "testSummedVolumeTable errors = " << errors << std::endl;
+  return errors == 0 ? 0 : 1;
+}
@@ -0,0 +1,257 @@
+/**
+ * \file BrickStore.cpp
+ * @brief Volume stored in compressed bricks for random access reads
+ * 
+ * \author Olivier Riverain
+ * \version 1.0
+ * \date october 2026
+ * @copyright   GNU Public License
+ *
+ * The volume is cut in cubic bricks (64 x 64 x 64 pixels by default), each brick is compressed with zlib. 
+ * The store is a directory with three files:
+ * - bricks.json: the size of the volume, the size of the bricks, the pixel type and the signature of the slices
+ * - bricks.dat: the compressed bricks one after the other, in the order they have been written
+ * - bricks.idx: for each brick (x first, then y, then z) its offset and its size in bricks.dat, two uint64
+ * A box of the volume is read by decompressing only the bricks which intersect it.
+ *
+ */
+
+#include <iostream>
+#include <string>
+#include <filesystem>
+#include <cstring>
+#include <sstream>
+#include <omp.h>
+
+#include "itk_zlib.h"
+
+#include "BrickStore.h"
+
+
+using namespace std;
+
+
+/** 
+ * @brief check if a directory contains a brick store
+ * 
+ * @param directory the directory of the store
+ * @return returns true if the files bricks.json, bricks.dat and bricks.idx exist
+*/
+bool BrickStore::exists(std::string directory) {
+    return std::filesystem::exists(directory + "/bricks.json") && std::filesystem::exists(directory + "/bricks.dat") 
+        && std::filesystem::exists(directory + "/bricks.idx");
+}
+
+
+/** 
+ * @brief create a brick store, the directory is created if it doesn't exist
+ * 
+ * @param directory the directory of the store
+ * @param sizeX the number of columns of the volume
+ * @param sizeY the number of rows of the volume
+ * @param sizeZ the number of slices of the volume
+ * @param componentType the ITK name of the pixel type, example: unsigned_short
+ * @param bytesPerPixel the number of bytes of a pixel
+ * @param brickSize the size of the side of a brick
+ * @return returns 0 if no problem encountered, -1 if the store can't be created
+*/
+int BrickStore::create(std::string directory, uint sizeX, uint sizeY, uint sizeZ, std::string componentType, uint bytesPerPixel, uint brickSize) {
+    this->directory = directory;
+    this->sizeX = sizeX;
+    this->sizeY = sizeY;
+    this->sizeZ = sizeZ;
+    this->componentType = componentType;
+    this->bytesPerPixel = bytesPerPixel;
+    this->brickSize = brickSize;
+    nbBricksX = (sizeX + brickSize - 1) / brickSize;
+    nbBricksY = (sizeY + brickSize - 1) / brickSize;
+    nbBricksZ = (sizeZ + brickSize - 1) / brickSize;
+    offsets.assign((size_t)nbBricksX * nbBricksY * nbBricksZ, 0);
+    sizes.assign((size_t)nbBricksX * nbBricksY * nbBricksZ, 0);
+    dataSize = 0;
+    std::filesystem::create_directories(directory);
+    std::filesystem::remove(directory + "/bricks.json"); // the store is not valid until it is closed
+    dataFile.open(directory + "/bricks.dat", std::ios::out | std::ios::binary | std::ios::trunc);
+    if(!dataFile) {
+        std::cerr << "BrickStore can't create " << directory << "/bricks.dat" << std::endl;
+        return -1;
+    }
+    std::cout << "BrickStore create " << directory << " " << nbBricksX << " x " << nbBricksY << " x " << nbBricksZ << " bricks" << std::endl;
+    return 0;
+}
+
+
+/** 
+ * @brief compress and append a brick, the function can be called by several threads and in any order
+ * 
+ * @param bx the index of the brick in the x axis
+ * @param by the index of the brick in the y axis
+ * @param bz the index of the brick in the z axis
+ * @param buffer the pixels of the brick, brickSize^3 values, x first, the pixels outside the volume are 0
+ * @return returns 0 if no problem encountered, -1 otherwise
+*/
+int BrickStore::writeBrick(uint bx, uint by, uint bz, const void * buffer) {
+    uLong nbBytes = (uLong)brickSize * brickSize * brickSize * bytesPerPixel;
+    uLongf nbBytesCompressed = compressBound(nbBytes);
+    std::vector<Bytef> compressed(nbBytesCompressed);
+    if(compress2(compressed.data(), &nbBytesCompressed, reinterpret_cast<const Bytef *>(buffer), nbBytes, 1) != Z_OK) {
+        std::cerr << "BrickStore can't compress the brick " << bx << " " << by << " " << bz << std::endl;
+        return -1;
+    }
+    size_t numBrick = ((size_t)bz * nbBricksY + by) * nbBricksX + bx;
+    std::lock_guard<std::mutex> lock(mutexData);
+    offsets[numBrick] = dataSize;
+    sizes[numBrick] = nbBytesCompressed;
+    dataFile.write(reinterpret_cast<const char *>(compressed.data()), nbBytesCompressed);
+    dataSize += nbBytesCompressed;
+    return dataFile ? 0 : -1;
+}
+
+
+/** 
+ * @brief close the data file and write the index and the description of the store
+ * 
+ * @return returns 0 if no problem encountered, -1 otherwise
+*/
+int BrickStore::close() {
+    dataFile.close();
+    std::ofstream indexFile(directory + "/bricks.idx", std::ios::out | std::ios::binary | std::ios::trunc);
+    for(size_t k=0; k<offsets.size(); k++) {
+        indexFile.write(reinterpret_cast<const char *>(&offsets[k]), sizeof(uint64_t));
+        indexFile.write(reinterpret_cast<const char *>(&sizes[k]), sizeof(uint64_t));
+    }
+    indexFile.close();
+    std::ofstream description(directory + "/bricks.json");
+    description << "{" << std::endl;
+    description << "    \"size\": [" << sizeX << ", " << sizeY << ", " << sizeZ << "]," << std::endl;
+    description << "    \"brickSize\": " << brickSize << "," << std::endl;
+    description << "    \"componentType\": \"" << componentType << "\"," << std::endl;
+    description << "    \"bytesPerPixel\": " << bytesPerPixel << "," << std::endl;
+    description << "    \"codec\": \"zlib\"," << std::endl;
+    description << "    \"slicesSignature\": \"" << slicesSignature << "\"," << std::endl;
+    description << "    \"data\": \"bricks.dat\"," << std::endl;
+    description << "    \"index\": \"bricks.idx\"" << std::endl;
+    description << "}" << std::endl;
+    std::cout << "BrickStore close " << directory << " " << dataSize/(1000*1000) << " Mo" << std::endl;
+    return (indexFile && description) ? 0 : -1;
+}
+
+
+/** 
+ * @brief open an existing brick store to read it
+ * 
+ * @param directory the directory of the store
+ * @return returns 0 if no problem encountered, -1 if the store doesn't exist or can't be read
+*/
+int BrickStore::open(std::string directory) {
+    if(!exists(directory)) {
+        return -1;
+    }
+    this->directory = directory;
+    std::ifstream description(directory + "/bricks.json");
+    std::stringstream buffer;
+    buffer << description.rdbuf();
+    std::string text = buffer.str();
+    // the file is written by close, one key per line
+    auto value = [&text](std::string key) {
+        size_t position = text.find("\"" + key + "\":");
+        return position == std::string::npos ? std::string("") : text.substr(position + key.size() + 3);
+    };
+    std::istringstream sizeText(value("size"));
+    char separator;
+    sizeText >> separator >> sizeX >> separator >> sizeY >> separator >> sizeZ;
+    brickSize = std::stoi(value("brickSize"));
+    bytesPerPixel = std::stoi(value("bytesPerPixel"));
+    std::string componentText = value("componentType");
+    componentType = componentText.substr(componentText.find('"') + 1);
+    componentType = componentType.substr(0, componentType.find('"'));
+    std::string signatureText = value("slicesSignature");
+    slicesSignature = signatureText.empty() ? "" : signatureText.substr(signatureText.find('"') + 1);
+    slicesSignature = slicesSignature.substr(0, slicesSignature.find('"'));
+    nbBricksX = (sizeX + brickSize - 1) / brickSize;
+    nbBricksY = (sizeY + brickSize - 1) / brickSize;
+    nbBricksZ = (sizeZ + brickSize - 1) / brickSize;
+    size_t nbBricks = (size_t)nbBricksX * nbBricksY * nbBricksZ;
+    offsets.assign(nbBricks, 0);
+    sizes.assign(nbBricks, 0);
+    std::ifstream indexFile(directory + "/bricks.idx", std::ios::in | std::ios::binary);
+    for(size_t k=0; k<nbBricks; k++) {
+        indexFile.read(reinterpret_cast<char *>(&offsets[k]), sizeof(uint64_t));
+        indexFile.read(reinterpret_cast<char *>(&sizes[k]), sizeof(uint64_t));
+    }
+    if(!indexFile) {
+        std::cerr << "BrickStore can't read the index of " << directory << std::endl;
+        return -1;
+    }
+    std::cout << "BrickStore open " << directory << " " << sizeX << " x " << sizeY << " x " << sizeZ << " " << componentType << std::endl;
+    return 0;
+}
+
+
+/** 
+ * @brief read a box of the volume, only the bricks which intersect the box are read and decompressed
+ * 
+ * @param beginX the first position of the pixel in the x axis
+ * @param endX the last position of the pixel in the x axis
+ * @param beginY the first position of the pixel in the y axis
+ * @param endY the last position of the pixel in the y axis
+ * @param beginZ the first position of the pixel in the z axis
+ * @param endZ the last position of the pixel in the z axis 
+ * @param buffer the pixels of the box, x first, (endX-beginX+1)*(endY-beginY+1)*(endZ-beginZ+1) values of bytesPerPixel bytes
+ * @return returns 0 if no problem encountered, -1 if the box is outside the volume or a brick can't be read
+*/
+int BrickStore::readBox(int beginX, int endX, int beginY, int endY, int beginZ, int endZ, void * buffer) {
+    if(beginX < 0 || beginY < 0 || beginZ < 0 || endX >= (int)sizeX || endY >= (int)sizeY || endZ >= (int)sizeZ 
+        || beginX > endX || beginY > endY || beginZ > endZ) {
+        std::cerr << "BrickStore the box is outside the volume" << std::endl;
+        return -1;
+    }
+    size_t boxX = endX - beginX + 1;
+    size_t boxY = endY - beginY + 1;
+    std::vector<uint> bricks;
+    for(uint bz=beginZ/brickSize; bz<=endZ/brickSize; bz++) {
+        for(uint by=beginY/brickSize; by<=endY/brickSize; by++) {
+            for(uint bx=beginX/brickSize; bx<=endX/brickSize; bx++) {
+                bricks.push_back((bz * nbBricksY + by) * nbBricksX + bx);
+            }
+        }
+    }
+    int error = 0;
+    char * bytesBox = reinterpret_cast<char *>(buffer);
+    #pragma omp parallel for schedule(dynamic)
+    for(size_t k=0; k<bricks.size(); k++) {
+        uint numBrick = bricks[k];
+        uint bx = numBrick % nbBricksX;
+        uint by = (numBrick / nbBricksX) % nbBricksY;
+        uint bz = numBrick / (nbBricksX * nbBricksY);
+        std::ifstream dataFile(directory + "/bricks.dat", std::ios::in | std::ios::binary);
+        std::vector<Bytef> compressed(sizes[numBrick]);
+        dataFile.seekg(offsets[numBrick]);
+        dataFile.read(reinterpret_cast<char *>(compressed.data()), sizes[numBrick]);
+        uLongf nbBytes = (uLongf)brickSize * brickSize * brickSize * bytesPerPixel;
+        std::vector<char> brick(nbBytes);
+        if(!dataFile || uncompress(reinterpret_cast<Bytef *>(brick.data()), &nbBytes, compressed.data(), sizes[numBrick]) != Z_OK) {
+            #pragma omp atomic write
+            error = -1;
+            continue;
+        }
+        // intersection of the brick and the box
+        int x0 = std::max<int>(beginX, bx*brickSize);
+        int x1 = std::min<int>(endX, (bx+1)*brickSize-1);
+        int y0 = std::max<int>(beginY, by*brickSize);
+        int y1 = std::min<int>(endY, (by+1)*brickSize-1);
+        int z0 = std::max<int>(beginZ, bz*brickSize);
+        int z1 = std::min<int>(endZ, (bz+1)*brickSize-1);
+        for(int z=z0; z<=z1; z++) {
+            for(int y=y0; y<=y1; y++) {
+                size_t positionBrick = (((size_t)(z - bz*brickSize) * brickSize + (y - by*brickSize)) * brickSize + (x0 - bx*brickSize)) * bytesPerPixel;
+                size_t positionBox = (((size_t)(z - beginZ) * boxY + (y - beginY)) * boxX + (x0 - beginX)) * bytesPerPixel;
+                memcpy(bytesBox + positionBox, brick.data() + positionBrick, (size_t)(x1 - x0 + 1) * bytesPerPixel);
+            }
+        }
+    }
+    if(error != 0) {
+        std::cerr << "BrickStore can't read the bricks of " << directory << std::endl;
+    }
+    return error;
+}
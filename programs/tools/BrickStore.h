@@ -0,0 +1,43 @@
+#ifndef BRICKSTORE_H
+#define BRICKSTORE_H
+
+#include <string>
+#include <vector>
+#include <mutex>
+#include <fstream>
+#include <cstdint>
+
+
+// Define class BrickStore
+class BrickStore{
+
+public:
+    static bool exists(std::string directory);
+    int create(std::string directory, uint sizeX, uint sizeY, uint sizeZ, std::string componentType, uint bytesPerPixel, uint brickSize = 64);
+    int writeBrick(uint bx, uint by, uint bz, const void * buffer);
+    int close();
+    int open(std::string directory);
+    int readBox(int beginX, int endX, int beginY, int endY, int beginZ, int endZ, void * buffer);
+
+    uint sizeX = 0;
+    uint sizeY = 0;
+    uint sizeZ = 0;
+    uint brickSize = 64;
+    uint bytesPerPixel = 0;
+    std::string componentType;
+    std::string slicesSignature; // signature of the slices of the store when it was built, see ToolsItk::slicesSignature
+    uint nbBricksX = 0;
+    uint nbBricksY = 0;
+    uint nbBricksZ = 0;
+
+protected:
+
+private:
+    std::string directory;
+    std::ofstream dataFile;
+    uint64_t dataSize = 0;
+    std::vector<uint64_t> offsets;
+    std::vector<uint64_t> sizes;
+    std::mutex mutexData;
+};
+#endif
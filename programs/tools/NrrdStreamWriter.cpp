@@ -0,0 +1,182 @@
+/**
+ * \file NrrdStreamWriter.cpp
+ * @brief Write a 3D NRRD file slice by slice
+ * 
+ * \author Olivier Riverain
+ * \version 1.0
+ * \date october 2026
+ * @copyright   GNU Public License
+ *
+ * The header is written first, then the slices are appended in order as soon as they are contiguous,
+ * so only the slices arrived ahead of the next one to write are kept in memory. At most capacity slices are 
+ * kept, the threads which give a slice too far ahead wait until the missing slices are written.
+ *
+ */
+
+#include <iostream>
+#include <string>
+#include <filesystem>
+#include <cstring>
+
+#include "NrrdStreamWriter.h"
+
+
+using namespace std;
+
+
+/** 
+ * @brief create the file and write the header, the data are raw and in the endianness of the machine
+ * 
+ * If the name ends with .nhdr, the header is detached and the data are written in a .raw file next to it.
+ * 
+ * @param filename the name of the output file, .nrrd or .nhdr
+ * @param sizeX the number of columns
+ * @param sizeY the number of rows
+ * @param sizeZ the number of slices
+ * @param type the NRRD type of the pixels, example: unsigned short
+ * @param bytesPerPixel the number of bytes of a pixel
+ * @return returns 0 if no problem encountered, -1 if the file can't be created
+*/
+int NrrdStreamWriter::open(std::string filename, uint sizeX, uint sizeY, uint sizeZ, std::string type, uint bytesPerPixel) {
+    this->bytesPerPixel = bytesPerPixel;
+    this->sizeX = sizeX;
+    this->sizeY = sizeY;
+    this->sizeZ = sizeZ;
+    nextSlice = 0;
+    maxPendingSlices = 0;
+    pendingSlices.clear();
+    uint16_t one = 1;
+    bool littleEndian = *reinterpret_cast<uint8_t *>(&one) == 1;
+    std::filesystem::path pathFile(filename);
+    bool detached = pathFile.extension() == ".nhdr";
+    std::ofstream header(filename, std::ios::out | std::ios::binary | std::ios::trunc);
+    if(!header) {
+        std::cerr << "NrrdStreamWriter can't create " << filename << std::endl;
+        return -1;
+    }
+    header << "NRRD0004" << "\n";
+    header << "type: " << type << "\n";
+    header << "dimension: 3" << "\n";
+    header << "space: left-posterior-superior" << "\n";
+    header << "sizes: " << sizeX << " " << sizeY << " " << sizeZ << "\n";
+    header << "space directions: (1,0,0) (0,1,0) (0,0,1)" << "\n";
+    header << "kinds: domain domain domain" << "\n";
+    header << "endian: " << (littleEndian ? "little" : "big") << "\n";
+    header << "encoding: raw" << "\n";
+    header << "space origin: (0,0,0)" << "\n";
+    if(detached) {
+        std::filesystem::path pathData = pathFile;
+        pathData.replace_extension(".raw");
+        header << "data file: " << pathData.filename().string() << "\n";
+        header.close();
+        file.open(pathData.string(), std::ios::out | std::ios::binary | std::ios::trunc);
+        if(!file) {
+            std::cerr << "NrrdStreamWriter can't create " << pathData << std::endl;
+            return -1;
+        }
+    } else {
+        header << "\n"; // an empty line separates the attached header from the data
+        file = std::move(header);
+    }
+    std::cout << "NrrdStreamWriter open " << filename << " " << sizeX << " x " << sizeY << " x " << sizeZ << std::endl;
+    return 0;
+}
+
+
+/** 
+ * @brief define the maximum number of slices kept in memory waiting for a missing one
+ * 
+ * The threads which give the slices must not all wait for a slice which only one of them can give: the 
+ * capacity must be larger than the number of slices which can be in progress before the missing one.
+ * 
+ * @param capacity the number of slices, at least 1
+*/
+void NrrdStreamWriter::setCapacity(size_t capacity) {
+    std::lock_guard<std::mutex> lock(mutexSlices);
+    this->capacity = std::max<size_t>(1, capacity);
+    sliceWritten.notify_all();
+}
+
+
+/** 
+ * @brief append the pixels of a slice to the file, or 0 if the slice is missing
+ * 
+ * @param data the pixels of the slice, empty for a missing slice
+ * @param nbBytes the number of bytes of a slice
+*/
+void NrrdStreamWriter::writeData(const std::vector<char> &data, size_t nbBytes) {
+    if(data.empty()) {
+        std::vector<char> zeros(nbBytes, 0);
+        file.write(zeros.data(), nbBytes);
+    } else {
+        file.write(data.data(), nbBytes);
+    }
+}
+
+
+/** 
+ * @brief give a slice to the writer, the function can be called by several threads and in any order
+ * 
+ * The slice is written at once if it is the next one in the file, otherwise it is copied and waits 
+ * for the missing slices. If capacity slices are already waiting, the calling thread waits until the 
+ * slice fits. A slice which can't be computed must be given with a null buffer, it is written with 0 
+ * so the slices after it don't wait forever.
+ * 
+ * @param z the index of the slice in the output volume
+ * @param buffer the pixels of the slice, sizeX * sizeY values of bytesPerPixel bytes, or nullptr for a missing slice
+ * @return returns 0 if no problem encountered, -1 if the index is out of the volume or the writing fails
+*/
+int NrrdStreamWriter::writeSlice(uint z, const void * buffer) {
+    size_t nbBytes = static_cast<size_t>(sizeX) * sizeY * bytesPerPixel;
+    std::unique_lock<std::mutex> lock(mutexSlices);
+    if(z >= sizeZ || z < nextSlice || pendingSlices.count(z) != 0) {
+        std::cerr << "NrrdStreamWriter slice " << z << " out of the volume" << std::endl;
+        return -1;
+    }
+    sliceWritten.wait(lock, [&] { return z < nextSlice + capacity; });
+    std::vector<char> data;
+    if(buffer != nullptr) {
+        const char * bytes = reinterpret_cast<const char *>(buffer);
+        if(z == nextSlice) {
+            file.write(bytes, nbBytes);
+            nextSlice++;
+        } else {
+            data.assign(bytes, bytes + nbBytes);
+        }
+    }
+    if(z >= nextSlice) {
+        pendingSlices[z] = std::move(data);
+        maxPendingSlices = std::max(maxPendingSlices, pendingSlices.size());
+    }
+    while(!pendingSlices.empty() && pendingSlices.begin()->first == nextSlice) {
+        writeData(pendingSlices.begin()->second, nbBytes);
+        pendingSlices.erase(pendingSlices.begin());
+        nextSlice++;
+    }
+    sliceWritten.notify_all();
+    return file ? 0 : -1;
+}
+
+
+/** 
+ * @brief close the file, the slices never given are filled with 0
+ * 
+ * @return returns 0 if no problem encountered, -1 if some slices are still waiting or the writing fails
+*/
+int NrrdStreamWriter::close() {
+    std::lock_guard<std::mutex> lock(mutexSlices);
+    if(!pendingSlices.empty()) {
+        std::cerr << "NrrdStreamWriter " << pendingSlices.size() << " slices waiting, slice " << nextSlice << " is missing" << std::endl;
+        file.close();
+        return -1;
+    }
+    std::vector<char> zeros(static_cast<size_t>(sizeX) * sizeY * bytesPerPixel, 0);
+    while(nextSlice < sizeZ) {
+        file.write(zeros.data(), zeros.size());
+        nextSlice++;
+    }
+    std::cout << "NrrdStreamWriter max slices waiting = " << maxPendingSlices << std::endl;
+    bool ok = static_cast<bool>(file);
+    file.close();
+    return ok ? 0 : -1;
+}
@@ -0,0 +1,64 @@
+#ifndef NRRDSTREAMWRITER_H
+#define NRRDSTREAMWRITER_H
+
+#include <string>
+#include <fstream>
+#include <map>
+#include <vector>
+#include <mutex>
+#include <condition_variable>
+#include <type_traits>
+
+#include "ToolsItk.h"
+
+
+// Define class NrrdStreamWriter
+class NrrdStreamWriter{
+
+public:
+    template <typename TPixel>
+    int open(std::string filename, uint sizeX, uint sizeY, uint sizeZ);
+    int open(std::string filename, uint sizeX, uint sizeY, uint sizeZ, std::string type, uint bytesPerPixel);
+    int writeSlice(uint z, const void * buffer);
+    int close();
+    void setCapacity(size_t capacity);
+
+protected:
+
+private:
+    std::ofstream file;
+    uint sizeX = 0;
+    uint sizeY = 0;
+    uint sizeZ = 0;
+    uint bytesPerPixel = sizeof(PixelType);
+    uint nextSlice = 0;
+    size_t maxPendingSlices = 0;
+    size_t capacity = 32; // maximum number of slices kept in memory waiting for a missing one
+    std::map<uint, std::vector<char>> pendingSlices; // an empty vector is a missing slice, written with 0
+    std::mutex mutexSlices;
+    std::condition_variable sliceWritten;
+    void writeData(const std::vector<char> &data, size_t nbBytes);
+};
+
+
+/** 
+ * @brief create the file and write the header, the NRRD type is given by the pixel type of the slices
+ * 
+ * @param filename the name of the output file, .nrrd or .nhdr
+ * @param sizeX the number of columns
+ * @param sizeY the number of rows
+ * @param sizeZ the number of slices
+ * @return returns 0 if no problem encountered, -1 if the file can't be created
+*/
+template <typename TPixel>
+int NrrdStreamWriter::open(std::string filename, uint sizeX, uint sizeY, uint sizeZ) {
+    std::string type = "unsigned int";
+    if(std::is_same<TPixel, unsigned char>::value) type = "unsigned char";
+    if(std::is_same<TPixel, char>::value) type = "signed char";
+    if(std::is_same<TPixel, unsigned short>::value) type = "unsigned short";
+    if(std::is_same<TPixel, short>::value) type = "short";
+    if(std::is_same<TPixel, int>::value) type = "int";
+    if(std::is_same<TPixel, float>::value) type = "float";
+    return open(filename, sizeX, sizeY, sizeZ, type, sizeof(TPixel));
+}
+#endif
@@ -0,0 +1,150 @@
+/**
+ * \file OffsetStencil.cpp
+ * @brief Integer offsets of the voxels of a neighborhood, computed once for all the points of a profile
+ *
+ * \author Olivier Riverain
+ * \version 1.0
+ * \date october 2026
+ * @copyright   GNU Public License
+ *
+ * The neighborhood of a point in the orthogonal plane is the set of the voxels round(p + k1 * b1 + k2 * b2).
+ * The base vectors b1 and b2 are the same for all the points of a profile and p is a voxel, so the offsets of
+ * the voxels are computed once, without the voxels which appear twice. Each offset is also converted to an
+ * offset in the buffer of the image, a point then reads its neighbors without floating point computations.
+ *
+ */
+
+#include <iostream>
+#include <algorithm>
+#include <array>
+#include <cmath>
+
+#include "OffsetStencil.h"
+
+
+using namespace std;
+
+
+/**
+ * @brief compute the offsets of the neighborhood in the orthogonal plane
+ *
+ * The offset of (k1, k2) is floor(k1 * b1 + k2 * b2 + 0.5): for a point p of the volume, p + offset is
+ * round(p + k1 * b1 + k2 * b2) as computed by listOfValuesFromNeighbors2D before.
+ *
+ * @param baseVector1 the coordinates of the first base vector of the orthogonal plane
+ * @param baseVector2 the coordinates of the second base vector of the orthogonal plane
+ * @param distance the distance before and after the point along the base vectors
+ * @param disk true to keep only the (k1, k2) of the disk of radius distance, false for the square
+ * @return returns the number of voxels of the neighborhood
+*/
+int OffsetStencil::buildPlane(const double baseVector1[3], const double baseVector2[3], int distance, bool disk) {
+    std::vector<std::array<int, 3>> voxels;
+    for(int k1=-distance; k1<distance+1; k1++) {
+        for(int k2=-distance; k2<distance+1; k2++) {
+            if(disk && k1 * k1 + k2 * k2 > distance * distance) {
+                continue;
+            }
+            std::array<int, 3> voxel;
+            for(int i=0; i<3; i++) {
+                voxel[i] = static_cast<int>(floor(k1 * baseVector1[i] + k2 * baseVector2[i] + 0.5));
+            }
+            voxels.push_back(voxel);
+        }
+    }
+    std::sort(voxels.begin(), voxels.end());
+    voxels.erase(std::unique(voxels.begin(), voxels.end()), voxels.end());
+
+    offsets.clear();
+    for(int i=0; i<3; i++) {
+        minOffset[i] = 0;
+        maxOffset[i] = 0;
+    }
+    for(const std::array<int, 3> &voxel : voxels) {
+        for(int i=0; i<3; i++) {
+            offsets.push_back(voxel[i]);
+            minOffset[i] = std::min(minOffset[i], voxel[i]);
+            maxOffset[i] = std::max(maxOffset[i], voxel[i]);
+        }
+    }
+    if(buffer != nullptr) {
+        computeLinearOffsets();
+    }
+    return size();
+}
+
+
+/**
+ * @brief define the buffer of the image read by gather and compute the offsets in the buffer
+ *
+ * @param buffer the voxels of the image, x first, then y, then z, unsigned char, unsigned short or unsigned int
+ * @param bufferIndex the coordinates of the first voxel of the buffer in the volume
+ * @param bufferSize the number of columns, rows and slices of the buffer
+*/
+template <typename TPixel>
+void OffsetStencil::setBuffer(const TPixel * buffer, const int bufferIndex[3], const int bufferSize[3]) {
+    this->buffer = buffer;
+    this->pixelSize = sizeof(TPixel);
+    for(int i=0; i<3; i++) {
+        this->bufferIndex[i] = bufferIndex[i];
+        this->bufferSize[i] = bufferSize[i];
+    }
+    computeLinearOffsets();
+}
+
+
+/**
+ * @brief compute the offsets of the voxels of the neighborhood in the buffer
+*/
+void OffsetStencil::computeLinearOffsets() {
+    linearOffsets.resize(size());
+    for(size_t v=0; v<size(); v++) {
+        linearOffsets[v] = (int64_t(offsets[3*v+2]) * bufferSize[1] + offsets[3*v+1]) * bufferSize[0] + offsets[3*v];
+    }
+}
+
+
+/**
+ * @brief read the voxels of the neighborhood of a point, they are added at the end of values
+ *
+ * @param px the x coordinate of the point
+ * @param py the y coordinate of the point
+ * @param pz the z coordinate of the point
+ * @param values the values of the voxels
+ * @return returns false if the neighborhood is not in the buffer or TPixel is not the pixel type of the buffer, 
+ *         values is then unchanged
+*/
+template <typename TPixel>
+bool OffsetStencil::gather(int px, int py, int pz, std::vector<unsigned int> &values) const {
+    int point[3] = {px, py, pz};
+    if(buffer == nullptr || pixelSize != sizeof(TPixel)) {
+        return false;
+    }
+    for(int i=0; i<3; i++) {
+        if(point[i] + minOffset[i] < bufferIndex[i] || point[i] + maxOffset[i] >= bufferIndex[i] + bufferSize[i]) {
+            return false;
+        }
+    }
+    const TPixel * center = static_cast<const TPixel *>(buffer) + (int64_t(pz - bufferIndex[2]) * bufferSize[1] + (py - bufferIndex[1])) * bufferSize[0] + (px - bufferIndex[0]);
+    for(int64_t offset : linearOffsets) {
+        values.push_back(center[offset]);
+    }
+    return true;
+}
+
+
+/**
+ * @brief give the number of voxels of the neighborhood
+ *
+ * @return returns the number of voxels
+*/
+size_t OffsetStencil::size() const {
+    return offsets.size() / 3;
+}
+
+
+template void OffsetStencil::setBuffer<unsigned char>(const unsigned char *, const int[3], const int[3]);
+template void OffsetStencil::setBuffer<unsigned short>(const unsigned short *, const int[3], const int[3]);
+template void OffsetStencil::setBuffer<unsigned int>(const unsigned int *, const int[3], const int[3]);
+template bool OffsetStencil::gather<unsigned char>(int, int, int, std::vector<unsigned int> &) const;
+template bool OffsetStencil::gather<unsigned short>(int, int, int, std::vector<unsigned int> &) const;
+template bool OffsetStencil::gather<unsigned int>(int, int, int, std::vector<unsigned int> &) const;
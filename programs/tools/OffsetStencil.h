@@ -0,0 +1,34 @@
+#ifndef OFFSETSTENCIL_H
+#define OFFSETSTENCIL_H
+
+#include <vector>
+#include <cstdint>
+#include <cstddef>
+
+
+// Define class OffsetStencil
+class OffsetStencil{
+
+public:
+    int buildPlane(const double baseVector1[3], const double baseVector2[3], int distance, bool disk);
+    template <typename TPixel>
+    void setBuffer(const TPixel * buffer, const int bufferIndex[3], const int bufferSize[3]);
+    template <typename TPixel = unsigned int>
+    bool gather(int px, int py, int pz, std::vector<unsigned int> &values) const;
+    size_t size() const;
+
+    std::vector<int> offsets; // x, y, z of each voxel of the neighborhood, relative to the point
+
+protected:
+
+private:
+    void computeLinearOffsets();
+    std::vector<int64_t> linearOffsets;
+    int minOffset[3] = {0, 0, 0};
+    int maxOffset[3] = {0, 0, 0};
+    const void * buffer = nullptr;
+    size_t pixelSize = 0; // the size of the voxels of the buffer, gather reads the pixel type given to setBuffer
+    int bufferIndex[3] = {0, 0, 0};
+    int bufferSize[3] = {0, 0, 0};
+};
+#endif
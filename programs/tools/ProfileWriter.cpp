@@ -0,0 +1,158 @@
+/**
+ * \file ProfileWriter.cpp
+ * @brief Output file of the profiles, text or NumPy .npy
+ *
+ * \author Olivier Riverain
+ * \version 1.0
+ * \date october 2026
+ * @copyright   GNU Public License
+ *
+ * The text file has the header "# x y z mean ..." then a line by point. If the file name ends with .npy, the
+ * profile is written as a NumPy array of records: x, y, z in int32 then a float64 field by statistic, and the
+ * number of the profile first for a batch. The records are packed, numpy.load(mmap_mode="r") reads the file
+ * without parsing it.
+ *
+ */
+
+#include <iostream>
+#include <iomanip>
+#include <sstream>
+#include <cstring>
+
+#include "ProfileWriter.h"
+
+
+using namespace std;
+
+
+/**
+ * @brief check if a profile file is written in the NumPy format
+ *
+ * @param filename the name of the file
+ * @return returns true if the name ends with .npy
+*/
+bool ProfileWriter::isBinary(std::string filename) {
+    return filename.size() >= 4 && filename.compare(filename.size() - 4, 4, ".npy") == 0;
+}
+
+
+/**
+ * @brief give the names of the fields of the statistics in a .npy file, the names which appear twice get a number
+ *
+ * @param names the names of the statistics
+ * @return returns the names of the fields, mean, mean_2...
+*/
+std::vector<std::string> ProfileWriter::fieldNames(const std::vector<std::string> &names) {
+    std::vector<std::string> fields;
+    for(size_t i=0; i<names.size(); i++) {
+        int count = 1;
+        for(size_t j=0; j<i; j++) {
+            if(names[j] == names[i]) {
+                count++;
+            }
+        }
+        fields.push_back(count == 1 ? names[i] : names[i] + "_" + std::to_string(count));
+    }
+    return fields;
+}
+
+
+/**
+ * @brief create the file and write its header
+ *
+ * @param filename the name of the file, .npy for the NumPy format, text otherwise
+ * @param names the names of the statistics, see ToolsItk::statisticName
+ * @param batch true if the rows start with the number of their profile, see ToolsItk::computeProfileBatch
+ * @param nbRows the number of points which will be written, the size of the NumPy array
+ * @return returns 0 if no problem encountered, -1 if the file can't be created
+*/
+int ProfileWriter::open(std::string filename, const std::vector<std::string> &names, bool batch, uint64_t nbRows) {
+    this->binary = isBinary(filename);
+    this->batch = batch;
+    out.open(filename, binary ? std::ios::binary : std::ios::out);
+    if(!out) {
+        std::cerr << "Can't create the profile file " << filename << std::endl;
+        return -1;
+    }
+    if(!binary) {
+        out << (batch ? "# profile x y z" : "# x y z");
+        for(const std::string &name : names) {
+            out << " " << name;
+        }
+        out << std::endl << std::setprecision(12);
+        return 0;
+    }
+
+    std::ostringstream header;
+    header << "{'descr': [";
+    if(batch) {
+        header << "('profile', '<i4'), ";
+    }
+    header << "('x', '<i4'), ('y', '<i4'), ('z', '<i4')";
+    for(const std::string &field : fieldNames(names)) {
+        header << ", ('" << field << "', '<f8')";
+    }
+    header << "], 'fortran_order': False, 'shape': (" << nbRows << ",), }";
+    std::string dictionary = header.str();
+    // magic string, version 1.0, length of the header, then the header padded with spaces to 64 bytes and a newline
+    size_t length = 10 + dictionary.size() + 1;
+    dictionary.append((64 - length % 64) % 64, ' ');
+    dictionary.push_back('\n');
+    uint16_t headerLength = static_cast<uint16_t>(dictionary.size());
+    out.write("\x93NUMPY\x01\x00", 8);
+    char lengthBytes[2] = {static_cast<char>(headerLength & 0xff), static_cast<char>(headerLength >> 8)};
+    out.write(lengthBytes, 2);
+    out.write(dictionary.data(), dictionary.size());
+    record.resize((batch ? 16 : 12) + 8 * names.size());
+    return 0;
+}
+
+
+/**
+ * @brief write a point of a profile
+ *
+ * @param profile the number of the profile, written for a batch only
+ * @param x the x coordinate of the point
+ * @param y the y coordinate of the point
+ * @param z the z coordinate of the point
+ * @param columns the values of the profile, one column by statistic
+ * @param k the number of the point in the columns
+*/
+void ProfileWriter::write(int profile, int x, int y, int z, const std::vector<std::vector<double>> &columns, int k) {
+    if(!binary) {
+        if(batch) {
+            out << profile << " ";
+        }
+        out << x << " " << y << " " << z;
+        for(const std::vector<double> &column : columns) {
+            out << " " << column[k];
+        }
+        out << "\n";
+        return;
+    }
+    // the fields are little endian, as the processors of the computers of the extension
+    int32_t coordinates[4] = {profile, x, y, z};
+    char * position = record.data();
+    std::memcpy(position, batch ? coordinates : coordinates + 1, batch ? 16 : 12);
+    position += batch ? 16 : 12;
+    for(const std::vector<double> &column : columns) {
+        std::memcpy(position, &column[k], 8);
+        position += 8;
+    }
+    out.write(record.data(), record.size());
+}
+
+
+/**
+ * @brief close the file
+ *
+ * @return returns 0 if no problem encountered, -1 if the file could not be written
+*/
+int ProfileWriter::close() {
+    out.close();
+    if(out.fail()) {
+        std::cerr << "Problem while writing the profile file" << std::endl;
+        return -1;
+    }
+    return 0;
+}
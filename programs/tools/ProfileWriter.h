@@ -0,0 +1,28 @@
+#ifndef PROFILEWRITER_H
+#define PROFILEWRITER_H
+
+#include <vector>
+#include <string>
+#include <fstream>
+#include <cstdint>
+
+
+// Define class ProfileWriter
+class ProfileWriter{
+
+public:
+    int open(std::string filename, const std::vector<std::string> &names, bool batch, uint64_t nbRows);
+    void write(int profile, int x, int y, int z, const std::vector<std::vector<double>> &columns, int k);
+    int close();
+    static bool isBinary(std::string filename);
+    static std::vector<std::string> fieldNames(const std::vector<std::string> &names);
+
+protected:
+
+private:
+    std::ofstream out;
+    bool binary = false; // .npy file, text otherwise
+    bool batch = false; // the rows start with the number of their profile
+    std::vector<char> record;
+};
+#endif
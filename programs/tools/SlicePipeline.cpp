@@ -0,0 +1,105 @@
+/**
+ * \file SlicePipeline.cpp
+ * @brief Read, decode and pack the slices in separate stages
+ * 
+ * \author Olivier Riverain
+ * \version 1.0
+ * \date october 2026
+ * @copyright   GNU Public License
+ *
+ * On a network file system (NFS, Lustre) the threads which read and decode a slice wait for the disk while 
+ * the cores are idle. The reading of the compressed files is done by a few I/O threads, ahead of the decode 
+ * threads, so that the disk and the cores are used at the same time. The readers of ITK take a file name, 
+ * the I/O threads read the file with pread before it is decoded, the decode threads then find its bytes in 
+ * the cache of the system. When only a part of each slice is decoded (region of interest, reduced resolution), 
+ * only the header of the file is read ahead: for JPEG 2000 the main header up to the first tile, which the 
+ * codec reads to find the bytes of the tiles and of the resolutions it decodes.
+ *
+ */
+
+#include <iostream>
+#include <algorithm>
+#include <string>
+#include <vector>
+#include <thread>
+#include <cstring>
+#include <fcntl.h>
+#include <unistd.h>
+
+#include "SlicePipeline.h"
+
+
+using namespace std;
+
+
+/** 
+ * @brief define the number of threads of each stage
+ * 
+ * @param ioThreads the number of threads which read the files, 2 if 0 or less
+ * @param decodeThreads the number of threads which decode the slices, the number of cores if 0 or less
+ * @param queueSize the maximum number of slices waiting between two stages, twice the decode threads if 0 or less
+*/
+SlicePipeline::SlicePipeline(int ioThreads, int decodeThreads, int queueSize) {
+    this->ioThreads = ioThreads > 0 ? ioThreads : 2;
+    this->decodeThreads = decodeThreads > 0 ? decodeThreads : std::max(1u, std::thread::hardware_concurrency());
+    this->queueSize = queueSize > 0 ? queueSize : 2 * this->decodeThreads;
+}
+
+
+/** 
+ * @brief read a file ahead so that its bytes are in the cache of the system when it is decoded
+ * 
+ * The JPEG 2000 header ends at the first SOT marker (0xFF90), the header of the other formats is the first block.
+ * 
+ * @param file the name of the file
+ * @param wholeFile true to read the whole file, false to read only its header
+ * @param buffer the buffer of the thread, blockSize bytes, its content is not used
+ * @return returns 0 if no problem encountered, -1 if the file can't be opened or read
+*/
+int SlicePipeline::readAhead(const std::string &file, bool wholeFile, std::vector<char> &buffer) {
+    int descriptor = open(file.c_str(), O_RDONLY);
+    if(descriptor < 0) {
+        std::cerr << "SlicePipeline can't read " << file << std::endl;
+        return -1;
+    }
+    const unsigned char jp2Signature[] = {0x00, 0x00, 0x00, 0x0C, 'j', 'P', ' ', ' '};
+    const unsigned char codestreamSignature[] = {0xFF, 0x4F, 0xFF, 0x51};
+    bool jpeg2000 = false;
+    unsigned char previous = 0; // last byte of the previous block, a marker can be across two blocks
+    off_t offset = 0;
+    int res = 0;
+    while(true) {
+        ssize_t count = pread(descriptor, buffer.data(), buffer.size(), offset);
+        if(count < 0) {
+            std::cerr << "SlicePipeline can't read " << file << std::endl;
+            res = -1;
+            break;
+        }
+        if(count == 0) {
+            break;
+        }
+        if(wholeFile) {
+            offset += count;
+            continue;
+        }
+        const unsigned char * bytes = reinterpret_cast<const unsigned char *>(buffer.data());
+        if(offset == 0) {
+            jpeg2000 = (count >= (ssize_t)sizeof(jp2Signature) && std::memcmp(bytes, jp2Signature, sizeof(jp2Signature)) == 0)
+                || (count >= (ssize_t)sizeof(codestreamSignature) && std::memcmp(bytes, codestreamSignature, sizeof(codestreamSignature)) == 0);
+        }
+        if(!jpeg2000) {
+            break;
+        }
+        bool tileFound = previous == 0xFF && bytes[0] == 0x90;
+        for(ssize_t i=0; i+1<count && !tileFound; i++) {
+            tileFound = bytes[i] == 0xFF && bytes[i+1] == 0x90;
+        }
+        previous = bytes[count-1];
+        offset += count;
+        if(tileFound || offset >= (off_t)maxHeaderSize) {
+            break;
+        }
+    }
+    close(descriptor);
+    return res;
+}
@@ -0,0 +1,185 @@
+#ifndef SLICEPIPELINE_H
+#define SLICEPIPELINE_H
+
+#include <string>
+#include <vector>
+#include <deque>
+#include <mutex>
+#include <condition_variable>
+#include <thread>
+#include <atomic>
+#include <functional>
+#include <iostream>
+#include <algorithm>
+#include <exception>
+
+
+// Define class BoundedQueue, a queue shared by threads whose size is limited
+template <typename T>
+class BoundedQueue{
+
+public:
+    BoundedQueue(size_t capacity) : capacity(capacity) {}
+    bool push(T value);
+    bool pop(T &value);
+    void close();
+
+private:
+    size_t capacity;
+    bool closed = false;
+    std::deque<T> values;
+    std::mutex mutexValues;
+    std::condition_variable notFull;
+    std::condition_variable notEmpty;
+};
+
+
+// Define class SlicePipeline
+class SlicePipeline{
+
+public:
+    SlicePipeline(int ioThreads = 0, int decodeThreads = 0, int queueSize = 0);
+    template <typename TSlice>
+    int run(const std::vector<std::string> &files, std::function<int(size_t k, TSlice &slice)> decode, std::function<int(size_t k, TSlice &slice)> pack, bool wholeFiles = true);
+    int getIoThreads() { return ioThreads; }
+    int getDecodeThreads() { return decodeThreads; }
+    int getQueueSize() { return queueSize; }
+
+protected:
+
+private:
+    int readAhead(const std::string &file, bool wholeFile, std::vector<char> &buffer);
+    static constexpr size_t blockSize = 1 << 20; // bytes read at once by the I/O threads
+    static constexpr size_t maxHeaderSize = 16 << 20; // bytes read at most to find the first tile of a JPEG 2000 file
+    int ioThreads;
+    int decodeThreads;
+    int queueSize;
+};
+
+
+/** 
+ * @brief add a value at the end of the queue, wait while the queue is full
+ * 
+ * @param value the value
+ * @return returns false if the queue is closed
+*/
+template <typename T>
+bool BoundedQueue<T>::push(T value) {
+    std::unique_lock<std::mutex> lock(mutexValues);
+    notFull.wait(lock, [&] { return closed || values.size() < capacity; });
+    if(closed) {
+        return false;
+    }
+    values.push_back(std::move(value));
+    notEmpty.notify_one();
+    return true;
+}
+
+/** 
+ * @brief remove the first value of the queue, wait while the queue is empty
+ * 
+ * @param value the removed value
+ * @return returns false if the queue is closed and empty
+*/
+template <typename T>
+bool BoundedQueue<T>::pop(T &value) {
+    std::unique_lock<std::mutex> lock(mutexValues);
+    notEmpty.wait(lock, [&] { return closed || !values.empty(); });
+    if(values.empty()) {
+        return false;
+    }
+    value = std::move(values.front());
+    values.pop_front();
+    notFull.notify_one();
+    return true;
+}
+
+/** 
+ * @brief close the queue, no more value can be added and the threads waiting are woken up
+*/
+template <typename T>
+void BoundedQueue<T>::close() {
+    std::lock_guard<std::mutex> lock(mutexValues);
+    closed = true;
+    notFull.notify_all();
+    notEmpty.notify_all();
+}
+
+
+/** 
+ * @brief process the slices in three stages which run at the same time
+ * 
+ * - the I/O threads read the compressed files ahead, in the order of the list, so they are in the cache of the system
+ * - the decode threads decode the slices already read (decode), as many as cores by default
+ * - the calling thread packs the decoded slices in the output (pack), in the order they are decoded
+ * The queues between the stages are bounded, so at most queueSize slices wait between two stages.
+ * 
+ * @param files the files of the slices
+ * @param decode called by the decode threads with the index of the slice in files, fills slice
+ * @param pack called by the calling thread with the index of the slice and the decoded slice
+ * @param wholeFiles true if decode reads the whole files, false if it reads only a part of them (region, reduced 
+ *                   resolution), only the header of the files is then read ahead
+ * @return returns 0 if no problem encountered, -1 if a file can't be read or decode or pack fails, the other slices are processed
+*/
+template <typename TSlice>
+int SlicePipeline::run(const std::vector<std::string> &files, std::function<int(size_t k, TSlice &slice)> decode, std::function<int(size_t k, TSlice &slice)> pack, bool wholeFiles) {
+    std::cout << "SlicePipeline ioThreads = " << ioThreads << " decodeThreads = " << decodeThreads << " queueSize = " << queueSize << " wholeFiles = " << wholeFiles << std::endl;
+    BoundedQueue<size_t> readQueue(queueSize);
+    BoundedQueue<std::pair<size_t, TSlice>> decodedQueue(queueSize);
+    std::atomic<size_t> nextFile(0);
+    std::atomic<int> ioRunning(ioThreads);
+    std::atomic<int> decodeRunning(decodeThreads);
+    std::atomic<int> error(0);
+
+    std::vector<std::thread> threads;
+    for(int t=0; t<ioThreads; t++) {
+        threads.emplace_back([&] {
+            std::vector<char> buffer(blockSize); // the bytes are only read, the readers of ITK find them in the cache
+            for(size_t k = nextFile++; k < files.size(); k = nextFile++) {
+                if(readAhead(files[k], wholeFiles, buffer) != 0) { // the slice is still decoded, decode reports the error
+                    error = -1;
+                }
+                if(!readQueue.push(k)) {
+                    break;
+                }
+            }
+            if(--ioRunning == 0) {
+                readQueue.close();
+            }
+        });
+    }
+    for(int t=0; t<decodeThreads; t++) {
+        threads.emplace_back([&] {
+            size_t k;
+            while(readQueue.pop(k)) {
+                TSlice slice;
+                try {
+                    if(decode(k, slice) != 0) {
+                        error = -1;
+                        continue;
+                    }
+                } catch (const std::exception & excp) { // the exceptions of ITK must not stop the other slices
+                    std::cerr << "SlicePipeline " << files[k] << " " << excp.what() << std::endl;
+                    error = -1;
+                    continue;
+                }
+                decodedQueue.push(std::make_pair(k, std::move(slice)));
+            }
+            if(--decodeRunning == 0) {
+                decodedQueue.close();
+            }
+        });
+    }
+    std::pair<size_t, TSlice> decoded;
+    while(decodedQueue.pop(decoded)) {
+        if(pack(decoded.first, decoded.second) != 0) {
+            error = -1;
+        }
+        decoded.second = TSlice(); // the slice is released before the next one is waited
+    }
+    for(auto &thread : threads) {
+        thread.join();
+    }
+    return error;
+}
+#endif
@@ -0,0 +1,132 @@
+/**
+ * \file SlidingHistogram.cpp
+ * @brief Histogram of the voxels of a neighborhood which moves along a profile
+ *
+ * \author Olivier Riverain
+ * \version 1.0
+ * \date october 2026
+ * @copyright   GNU Public License
+ *
+ * Two consecutive points of a profile share almost all the voxels of their neighborhoods. The histogram is
+ * updated with the voxels which leave and enter the neighborhood, then the median, the min and the max are
+ * read in the histogram instead of sorting all the voxels. The bins are grouped in blocks of 256 bins with
+ * their total, a value of a given rank is found by walking the blocks then the bins of one block.
+ *
+ */
+
+#include <iostream>
+#include <algorithm>
+
+#include "SlidingHistogram.h"
+
+
+using namespace std;
+
+
+/**
+ * @brief add a voxel to the histogram, the bins are created up to its value
+ *
+ * @param value the value of the voxel
+ * @return returns false if the value is too large for the histogram (see maxBins), the histogram is unchanged
+*/
+bool SlidingHistogram::add(unsigned int value) {
+    if(value >= maxBins) {
+        return false;
+    }
+    if(value >= bins.size()) {
+        size_t nbBlocks = (value >> blockBits) + 1;
+        bins.resize(nbBlocks << blockBits, 0);
+        blocks.resize(nbBlocks, 0);
+    }
+    bins[value]++;
+    blocks[value >> blockBits]++;
+    total++;
+    return true;
+}
+
+
+/**
+ * @brief remove a voxel from the histogram
+ *
+ * @param value the value of the voxel, it must have been added
+*/
+void SlidingHistogram::remove(unsigned int value) {
+    bins[value]--;
+    blocks[value >> blockBits]--;
+    total--;
+}
+
+
+/**
+ * @brief remove all the voxels, the bins are kept for the next neighborhood
+*/
+void SlidingHistogram::clear() {
+    std::fill(bins.begin(), bins.end(), 0);
+    std::fill(blocks.begin(), blocks.end(), 0);
+    total = 0;
+}
+
+
+/**
+ * @brief give the number of voxels in the histogram
+ *
+ * @return returns the number of voxels
+*/
+unsigned int SlidingHistogram::count() const {
+    return total;
+}
+
+
+/**
+ * @brief find the value of a given rank, as in the sorted list of the voxels
+ *
+ * @param k the rank, from 0 to count()-1
+ * @return returns the value of rank k, 0 if the histogram has less voxels
+*/
+unsigned int SlidingHistogram::kth(unsigned int k) const {
+    if(k >= total) {
+        return 0;
+    }
+    size_t block = 0;
+    while(k >= blocks[block]) {
+        k -= blocks[block];
+        block++;
+    }
+    size_t value = block << blockBits;
+    while(k >= bins[value]) {
+        k -= bins[value];
+        value++;
+    }
+    return value;
+}
+
+
+/**
+ * @brief find the smallest value
+ *
+ * @return returns the smallest value, 0 if the histogram is empty
+*/
+unsigned int SlidingHistogram::min() const {
+    return kth(0);
+}
+
+
+/**
+ * @brief find the largest value, the blocks are walked from the end
+ *
+ * @return returns the largest value, 0 if the histogram is empty
+*/
+unsigned int SlidingHistogram::max() const {
+    if(total == 0) {
+        return 0;
+    }
+    size_t block = blocks.size() - 1;
+    while(blocks[block] == 0) {
+        block--;
+    }
+    size_t value = ((block + 1) << blockBits) - 1;
+    while(bins[value] == 0) {
+        value--;
+    }
+    return value;
+}
@@ -0,0 +1,30 @@
+#ifndef SLIDINGHISTOGRAM_H
+#define SLIDINGHISTOGRAM_H
+
+#include <vector>
+#include <cstdint>
+
+
+// Define class SlidingHistogram
+class SlidingHistogram{
+
+public:
+    bool add(unsigned int value);
+    void remove(unsigned int value);
+    void clear();
+    unsigned int count() const;
+    unsigned int kth(unsigned int k) const;
+    unsigned int min() const;
+    unsigned int max() const;
+
+    static const unsigned int maxBins = 1 << 24; // the values must be smaller, 64 MB of counts
+
+protected:
+
+private:
+    static const int blockBits = 8; // a block counts the values of 256 bins
+    std::vector<unsigned int> bins;
+    std::vector<unsigned int> blocks;
+    unsigned int total = 0;
+};
+#endif
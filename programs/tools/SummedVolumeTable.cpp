@@ -0,0 +1,220 @@
+/**
+ * \file SummedVolumeTable.cpp
+ * @brief Sum of the voxels of any block of a box of the volume in constant time
+ *
+ * \author Olivier Riverain
+ * \version 1.0
+ * \date october 2026
+ * @copyright   GNU Public License
+ *
+ * The table contains for each voxel (x, y, z) of the box the sum of the voxels of the box between its first
+ * voxel and (x, y, z), with a first row, column and slice of zeros. The sum of a block is then computed with
+ * the 8 corners of the block, whatever its size. A second table with the squares of the voxels gives the variance.
+ *
+ */
+
+#include <iostream>
+#include <algorithm>
+#include <omp.h>
+
+#include "SummedVolumeTable.h"
+
+
+using namespace std;
+
+
+/**
+ * @brief compute the number of values of the table of a box
+ *
+ * @param beginX the first column of the box
+ * @param endX the last column of the box
+ * @param beginY the first row of the box
+ * @param endY the last row of the box
+ * @param beginZ the first slice of the box
+ * @param endZ the last slice of the box
+ * @return returns the number of values of the table
+*/
+uint64_t SummedVolumeTable::tableSize(int beginX, int endX, int beginY, int endY, int beginZ, int endZ) {
+    if(endX < beginX || endY < beginY || endZ < beginZ) {
+        return 0;
+    }
+    return uint64_t(endX - beginX + 2) * uint64_t(endY - beginY + 2) * uint64_t(endZ - beginZ + 2);
+}
+
+
+/**
+ * @brief build the table of a box of a volume
+ *
+ * @param buffer the voxels of the volume, x first, then y, then z, unsigned char, unsigned short or unsigned int
+ * @param bufferIndex the coordinates of the first voxel of the buffer in the volume
+ * @param bufferSize the number of columns, rows and slices of the buffer
+ * @param beginX the first column of the box
+ * @param endX the last column of the box
+ * @param beginY the first row of the box
+ * @param endY the last row of the box
+ * @param beginZ the first slice of the box
+ * @param endZ the last slice of the box
+ * @param squares true to build also the table of the squares of the voxels, for the variance
+ * @return returns 0 if no problem encountered, -1 if the box is not in the buffer
+*/
+template <typename TPixel>
+int SummedVolumeTable::build(const TPixel * buffer, const int bufferIndex[3], const int bufferSize[3], int beginX, int endX, int beginY, int endY, int beginZ, int endZ, bool squares) {
+    if(beginX < bufferIndex[0] || beginY < bufferIndex[1] || beginZ < bufferIndex[2] || endX >= bufferIndex[0] + bufferSize[0]
+        || endY >= bufferIndex[1] + bufferSize[1] || endZ >= bufferIndex[2] + bufferSize[2] || endX < beginX || endY < beginY || endZ < beginZ) {
+        std::cout << "The box is not in the volume" << std::endl;
+        return -1;
+    }
+    this->beginX = beginX;
+    this->beginY = beginY;
+    this->beginZ = beginZ;
+    this->sizeX = endX - beginX + 1;
+    this->sizeY = endY - beginY + 1;
+    this->sizeZ = endZ - beginZ + 1;
+    const int64_t strideY = sizeX + 1;
+    const int64_t strideZ = strideY * (sizeY + 1);
+    sums.assign(strideZ * (sizeZ + 1), 0);
+    sumsSquares.assign(squares ? sums.size() : 0, 0);
+
+    // cumulative sums along x, then y, then z, the first row, column and slice stay at 0
+    #pragma omp parallel for
+    for(int z=1; z<=sizeZ; z++) {
+        for(int y=1; y<=sizeY; y++) {
+            const TPixel * row = buffer + (int64_t(beginZ + z - 1 - bufferIndex[2]) * bufferSize[1] + (beginY + y - 1 - bufferIndex[1])) * bufferSize[0]
+                + (beginX - bufferIndex[0]);
+            uint64_t * line = sums.data() + z * strideZ + y * strideY;
+            uint64_t * lineSquares = squares ? sumsSquares.data() + z * strideZ + y * strideY : nullptr;
+            uint64_t sum = 0;
+            uint64_t sumSquares = 0;
+            for(int x=1; x<=sizeX; x++) {
+                uint64_t value = row[x-1];
+                sum += value;
+                line[x] = sum;
+                if(squares) {
+                    sumSquares += value * value;
+                    lineSquares[x] = sumSquares;
+                }
+            }
+        }
+    }
+    std::vector<uint64_t> * tables[2] = {&sums, &sumsSquares};
+    for(int t=0; t<(squares ? 2 : 1); t++) {
+        uint64_t * table = tables[t]->data();
+        #pragma omp parallel for
+        for(int z=1; z<=sizeZ; z++) {
+            for(int y=2; y<=sizeY; y++) {
+                for(int x=1; x<=sizeX; x++) {
+                    table[z * strideZ + y * strideY + x] += table[z * strideZ + (y-1) * strideY + x];
+                }
+            }
+        }
+        #pragma omp parallel for
+        for(int y=1; y<=sizeY; y++) {
+            for(int z=2; z<=sizeZ; z++) {
+                for(int x=1; x<=sizeX; x++) {
+                    table[z * strideZ + y * strideY + x] += table[(z-1) * strideZ + y * strideY + x];
+                }
+            }
+        }
+    }
+    return 0;
+}
+
+
+/**
+ * @brief check if a block is in the box of the table
+ *
+ * @param beginX the first column of the block
+ * @param endX the last column of the block
+ * @param beginY the first row of the block
+ * @param endY the last row of the block
+ * @param beginZ the first slice of the block
+ * @param endZ the last slice of the block
+ * @return returns true if the block is in the box
+*/
+bool SummedVolumeTable::contains(int beginX, int endX, int beginY, int endY, int beginZ, int endZ) const {
+    return !sums.empty() && beginX >= this->beginX && beginY >= this->beginY && beginZ >= this->beginZ
+        && endX < this->beginX + sizeX && endY < this->beginY + sizeY && endZ < this->beginZ + sizeZ;
+}
+
+
+/**
+ * @brief compute the sum of the values of a table for a block, with its 8 corners
+ *
+ * @param table the table of the sums or of the sums of the squares
+ * @param beginX the first column of the block, it must be in the box (see contains)
+ * @param endX the last column of the block
+ * @param beginY the first row of the block
+ * @param endY the last row of the block
+ * @param beginZ the first slice of the block
+ * @param endZ the last slice of the block
+ * @return returns the sum
+*/
+uint64_t SummedVolumeTable::corners(const std::vector<uint64_t> &table, int beginX, int endX, int beginY, int endY, int beginZ, int endZ) const {
+    const int64_t strideY = sizeX + 1;
+    const int64_t strideZ = strideY * (sizeY + 1);
+    const int64_t x0 = beginX - this->beginX;
+    const int64_t x1 = endX - this->beginX + 1;
+    const int64_t y0 = (beginY - this->beginY) * strideY;
+    const int64_t y1 = (endY - this->beginY + 1) * strideY;
+    const int64_t z0 = (beginZ - this->beginZ) * strideZ;
+    const int64_t z1 = (endZ - this->beginZ + 1) * strideZ;
+    // the unsigned differences are exact, the intermediate results wrap around
+    return table[z1 + y1 + x1] - table[z1 + y1 + x0] - table[z1 + y0 + x1] + table[z1 + y0 + x0]
+         - table[z0 + y1 + x1] + table[z0 + y1 + x0] + table[z0 + y0 + x1] - table[z0 + y0 + x0];
+}
+
+
+/**
+ * @brief compute the sum of the voxels of a block
+ *
+ * @param beginX the first column of the block, it must be in the box (see contains)
+ * @param endX the last column of the block
+ * @param beginY the first row of the block
+ * @param endY the last row of the block
+ * @param beginZ the first slice of the block
+ * @param endZ the last slice of the block
+ * @return returns the sum of the voxels
+*/
+uint64_t SummedVolumeTable::blockSum(int beginX, int endX, int beginY, int endY, int beginZ, int endZ) const {
+    return corners(sums, beginX, endX, beginY, endY, beginZ, endZ);
+}
+
+
+/**
+ * @brief compute the sum of the squares of the voxels of a block, the table must be built with the squares
+ *
+ * @param beginX the first column of the block, it must be in the box (see contains)
+ * @param endX the last column of the block
+ * @param beginY the first row of the block
+ * @param endY the last row of the block
+ * @param beginZ the first slice of the block
+ * @param endZ the last slice of the block
+ * @return returns the sum of the squares of the voxels
+*/
+uint64_t SummedVolumeTable::blockSumSquares(int beginX, int endX, int beginY, int endY, int beginZ, int endZ) const {
+    return corners(sumsSquares, beginX, endX, beginY, endY, beginZ, endZ);
+}
+
+
+/**
+ * @brief compute the variance of the voxels of a block, the table must be built with the squares
+ *
+ * @param beginX the first column of the block, it must be in the box (see contains)
+ * @param endX the last column of the block
+ * @param beginY the first row of the block
+ * @param endY the last row of the block
+ * @param beginZ the first slice of the block
+ * @param endZ the last slice of the block
+ * @return returns the variance of the voxels
+*/
+double SummedVolumeTable::blockVariance(int beginX, int endX, int beginY, int endY, int beginZ, int endZ) const {
+    double size = double(endX - beginX + 1) * (endY - beginY + 1) * (endZ - beginZ + 1);
+    double mean = blockSum(beginX, endX, beginY, endY, beginZ, endZ) / size;
+    double variance = blockSumSquares(beginX, endX, beginY, endY, beginZ, endZ) / size - mean * mean;
+    return std::max(0.0, variance);
+}
+
+
+template int SummedVolumeTable::build<unsigned char>(const unsigned char *, const int[3], const int[3], int, int, int, int, int, int, bool);
+template int SummedVolumeTable::build<unsigned short>(const unsigned short *, const int[3], const int[3], int, int, int, int, int, int, bool);
+template int SummedVolumeTable::build<unsigned int>(const unsigned int *, const int[3], const int[3], int, int, int, int, int, int, bool);
@@ -0,0 +1,35 @@
+#ifndef SUMMEDVOLUMETABLE_H
+#define SUMMEDVOLUMETABLE_H
+
+#include <vector>
+#include <cstdint>
+
+
+// Define class SummedVolumeTable
+class SummedVolumeTable{
+
+public:
+    static uint64_t tableSize(int beginX, int endX, int beginY, int endY, int beginZ, int endZ);
+    template <typename TPixel>
+    int build(const TPixel * buffer, const int bufferIndex[3], const int bufferSize[3], int beginX, int endX, int beginY, int endY, int beginZ, int endZ, bool squares);
+    bool contains(int beginX, int endX, int beginY, int endY, int beginZ, int endZ) const;
+    uint64_t blockSum(int beginX, int endX, int beginY, int endY, int beginZ, int endZ) const;
+    uint64_t blockSumSquares(int beginX, int endX, int beginY, int endY, int beginZ, int endZ) const;
+    double blockVariance(int beginX, int endX, int beginY, int endY, int beginZ, int endZ) const;
+
+    static const uint64_t maxTableSize = 1 << 26; // 512 MB of sums, twice with the squares
+
+protected:
+
+private:
+    uint64_t corners(const std::vector<uint64_t> &table, int beginX, int endX, int beginY, int endY, int beginZ, int endZ) const;
+    int beginX = 0;
+    int beginY = 0;
+    int beginZ = 0;
+    int sizeX = 0;
+    int sizeY = 0;
+    int sizeZ = 0;
+    std::vector<uint64_t> sums;
+    std::vector<uint64_t> sumsSquares;
+};
+#endif
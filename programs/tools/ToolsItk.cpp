@@ -18,9 +18,18 @@
 #include <chrono>
 #include <cstdlib>
 #include <cmath>
+#include <fstream>
+#include <sstream>
+#include <sys/stat.h>
+#include <algorithm>
+#include <iomanip>
+#include <mutex>
+#include <climits>
 
 
 #include "ToolsItk.h"
+#include "NrrdStreamWriter.h"
+#include "SlicePipeline.h"
 
 #include "itkImage.h"
 #include "itkTileImageFilter.h"
@@ -29,6 +38,11 @@
 #include "itkMinimumMaximumImageCalculator.h"
 #include "itkImageRegionIterator.h"
 #include "itkOffset.h"
+#include "itkImageIOFactory.h"
+
+#ifdef CITRUS_WITH_OPENJPEG
+#include <openjpeg.h>
+#endif
 
 
 using namespace std;
@@ -58,6 +72,145 @@ int ToolsItk::resizeImage(std::string inputDirectory, int begin, int end, int fa
 }
 
 
+/** 
+ * @brief return the sorted list of the slices of a directory
+ * 
+ * The list is read from the slice index written by the extension (file citrusSkinSliceIndex.txt in the directory, 
+ * or in $HOME/.citrusSkin/sliceIndex/ if the directory is read only) when the modification time of the directory 
+ * is the one recorded in the index. Otherwise the directory is listed and sorted.
+ * 
+ * @param inputDirectory the directory that contains all the slices
+ * @param extension the format of the slices, example: jp2
+ * @param names the list of the slices with their path
+ * @return returns 0 if the list comes from the index, 1 if the directory has been listed
+*/
+int ToolsItk::listSlices(std::string inputDirectory, std::string extension, std::vector<std::string> &names) {
+    names.clear();
+    std::string directory = std::filesystem::absolute(inputDirectory).lexically_normal().string();
+    while(directory.size() > 1 && directory.back() == '/') directory.pop_back();
+    std::string nameIndex = directory;
+    std::replace(nameIndex.begin(), nameIndex.end(), '/', '_');
+    std::vector<std::string> indexFiles;
+    indexFiles.push_back(directory + "/citrusSkinSliceIndex.txt");
+    if(getenv("HOME") != NULL) {
+        indexFiles.push_back(std::string(getenv("HOME")) + "/.citrusSkin/sliceIndex/" + nameIndex + ".txt");
+    }
+    struct stat statDirectory;
+    if(stat(directory.c_str(), &statDirectory) == 0) {
+#ifdef __APPLE__
+        long long directoryMtime = (long long)statDirectory.st_mtimespec.tv_sec * 1000000000LL + statDirectory.st_mtimespec.tv_nsec;
+#else
+        long long directoryMtime = (long long)statDirectory.st_mtim.tv_sec * 1000000000LL + statDirectory.st_mtim.tv_nsec;
+#endif
+        for(uint k=0; k<indexFiles.size() && names.size() == 0; k++) {
+            std::ifstream indexFile(indexFiles.at(k));
+            if(!indexFile) continue;
+            std::string line, key, extensionIndex;
+            long long mtimeIndex = -1;
+            size_t nbSlices = 0;
+            std::getline(indexFile, line); // citrusSkinSliceIndex version
+            while(std::getline(indexFile, line) && line.rfind("slices", 0) != 0) {
+                std::istringstream fields(line);
+                fields >> key;
+                if(key == "directoryMtime") fields >> mtimeIndex;
+                if(key == "extension") fields >> extensionIndex;
+            }
+            std::istringstream fields(line);
+            fields >> key >> nbSlices;
+            if(mtimeIndex != directoryMtime || extensionIndex != extension) {
+                std::cout << "listSlices index " << indexFiles.at(k) << " is out of date" << std::endl;
+                continue;
+            }
+            while(std::getline(indexFile, line) && names.size() < nbSlices) {
+                names.push_back(directory + "/" + line.substr(0, line.find('\t')));
+            }
+            if(names.size() != nbSlices) names.clear();
+        }
+    }
+    if(names.size() > 0) {
+        std::cout << "listSlices " << names.size() << " slices read from the index" << std::endl;
+        return 0;
+    }
+    for (const auto & entry : std::filesystem::directory_iterator(inputDirectory))
+        {  
+        names.push_back(entry.path());      
+        }
+    std::sort(names.begin(), names.end()); // sort
+    return 1;
+}
+
+
+/** 
+ * @brief read the type of the pixels of the first slice of a directory, only the header is read
+ * 
+ * @param inputDirectory the directory that contains all the slices
+ * @param extension the format of the slices, example: jp2
+ * @return returns the component type of the pixels, UNKNOWNCOMPONENTTYPE if no slice can be read
+*/
+itk::ImageIOBase::IOComponentEnum ToolsItk::readComponentType(std::string inputDirectory, std::string extension) {
+    std::vector<std::string> names;
+    std::vector<std::string> namesClean;
+    listSlices(inputDirectory, extension, names); // sorted list of the slices, from the slice index if it is up to date
+    cleanList(names, namesClean, extension);
+    if(namesClean.size() == 0) {
+        return itk::ImageIOBase::IOComponentEnum::UNKNOWNCOMPONENTTYPE;
+    }
+    itk::ImageIOBase::Pointer imageIO = itk::ImageIOFactory::CreateImageIO(namesClean.at(0).c_str(), itk::ImageIOFactory::IOFileModeEnum::ReadMode);
+    if(!imageIO) {
+        return itk::ImageIOBase::IOComponentEnum::UNKNOWNCOMPONENTTYPE;
+    }
+    imageIO->SetFileName(namesClean.at(0));
+    imageIO->ReadImageInformation();
+    std::cout << "component type = " << itk::ImageIOBase::GetComponentTypeAsString(imageIO->GetComponentType()) << std::endl;
+    return imageIO->GetComponentType();
+}
+
+
+/** 
+ * @brief call a function templated on the pixel type of the slices, so that the output volume keeps the type of the slices
+ * 
+ * The function receives a value of the pixel type, its type is retrieved with decltype. 
+ * The types not listed (64 bits integers, double) are processed as unsigned int.
+ * 
+ * @param inputDirectory the directory that contains all the slices
+ * @param extension the format of the slices, example: jp2
+ * @param function the generic function to call
+ * @return the return value of the function 
+*/
+template <typename TFunction>
+int ToolsItk::dispatchPixelType(std::string inputDirectory, std::string extension, TFunction function) {
+    return dispatchComponentType(readComponentType(inputDirectory, extension), function);
+}
+
+
+/** 
+ * @brief call a function templated on a pixel type given by its ITK component type
+ * 
+ * @param componentType the component type of the pixels
+ * @param function the generic function to call, it receives a value of the pixel type
+ * @return the return value of the function 
+*/
+template <typename TFunction>
+int ToolsItk::dispatchComponentType(itk::ImageIOBase::IOComponentEnum componentType, TFunction function) {
+    switch(componentType) {
+        case itk::ImageIOBase::IOComponentEnum::UCHAR:
+            return function((unsigned char)0);
+        case itk::ImageIOBase::IOComponentEnum::CHAR:
+            return function((char)0);
+        case itk::ImageIOBase::IOComponentEnum::USHORT:
+            return function((unsigned short)0);
+        case itk::ImageIOBase::IOComponentEnum::SHORT:
+            return function((short)0);
+        case itk::ImageIOBase::IOComponentEnum::INT:
+            return function((int)0);
+        case itk::ImageIOBase::IOComponentEnum::FLOAT:
+            return function((float)0);
+        default:
+            return function((unsigned int)0);
+    }
+}
+
+
 /** 
  * @brief Resize and stack several 2D images in a 3D image (parallelized version)
  * 
@@ -70,6 +223,11 @@ int ToolsItk::resizeImage(std::string inputDirectory, int begin, int end, int fa
  * @return the return value of the function stack2Dto3DParall 
 */
 int ToolsItk::resizeImageParall(std::string inputDirectory, int begin, int end, int factorResize, std::string output, std::string extension) {
+    std::string storeDirectory = findBrickStore(inputDirectory, extension);
+    std::string outputExtension = std::filesystem::path(output).extension().string();
+    if(storeDirectory != "" && (outputExtension == ".nrrd" || outputExtension == ".nhdr")) { // only the bricks of the slices are read
+        return resizeImageBricks(storeDirectory, begin, end, factorResize, output);
+    }
     
     int res =0;
     if(factorResize == 1) {
@@ -113,12 +271,7 @@ int ToolsItk::stack2Dto3D(std::string inputDirectory,  int beginX, int endX, int
 
     using TilerType = itk::TileImageFilter<InputImageType, OutputImageType>;
   
-    for (const auto & entry : std::filesystem::directory_iterator(inputDirectory))
-        {  
-        names.push_back(entry.path());      
-        }
-  
-    std::sort(names.begin(), names.end()); // sort
+    listSlices(inputDirectory, extension, names); // sorted list of the slices, from the slice index if it is up to date
   //std::vector<std::string>::iterator nit;  
   /*for (nit = names.begin(); nit != names.end(); ++nit)
   {
@@ -186,7 +339,7 @@ int ToolsItk::stack2Dto3D(std::string inputDirectory,  int beginX, int endX, int
             InputImageType::Pointer imageNew;
             imageNew = ImageType2D::New();
             //std::cout << "stack2Dto3D avant  changeSizeImage" << std::endl;            
-            int res = changeSizeImage(inputImageTile, imageNew, factorResize, beginX, endX, beginY, endY);
+            int res = changeSizeImage<PixelType>(inputImageTile, imageNew, factorResize, beginX, endX, beginY, endY);
             //std::cout << "stack2Dto3D après changeSizeImage" << std::endl;            
             ImageType2D::RegionType regionNew = imageNew->GetLargestPossibleRegion();            
             ImageType2D::SizeType sizeNew = regionNew.GetSize();            
@@ -219,7 +372,7 @@ int ToolsItk::stack2Dto3D(std::string inputDirectory,  int beginX, int endX, int
                 InputImageType::Pointer imageNew;
                 imageNew = ImageType2D::New();
                 //std::cout << "stack2Dto3D avant  changeSizeImage" << std::endl;            
-                int res = changeSizeImage(inputImageTile, imageNew, factorResize, beginX, endX, beginY, endY);
+                int res = changeSizeImage<PixelType>(inputImageTile, imageNew, factorResize, beginX, endX, beginY, endY);
                 //std::cout << "stack2Dto3D après changeSizeImage" << std::endl;            
                 //ImageType2D::RegionType regionNew = imageNew->GetLargestPossibleRegion();            
                 //ImageType2D::SizeType sizeNew = regionNew.GetSize();            
@@ -253,6 +406,29 @@ int ToolsItk::stack2Dto3D(std::string inputDirectory,  int beginX, int endX, int
     return 0;  
 }
 
+/** 
+ * @brief stack several 2D images in a 3D image (parallelized version 1), the pixel type of the slices is kept
+ * 
+ * @param inputDirectory the directory that contains all the slices
+ * @param beginX the first position of the pixel in the x axis
+ * @param endX the last position of the pixel in the x axis
+ * @param beginY the first position of the pixel in the y axis
+ * @param endY the last position of the pixel in the y axis
+ * @param beginZ the first position of the pixel in the z axis
+ * @param endZ the last position of the pixel in the z axis 
+ * @param output the name of the ouput file
+ * @param resize true if the image must be reduced
+ * @param factorResize the image reduction factor 
+ * @param extension the format of the slices to be processed, example: jp2
+ * @return the return value of the function stack2Dto3DParallTyped 
+*/
+int ToolsItk::stack2Dto3DParall(std::string inputDirectory,  int beginX, int endX, int beginY, int endY, int beginZ, int endZ, std::string output, bool resize, int factorResize, std::string extension) {
+    return dispatchPixelType(inputDirectory, extension, [&](auto pixel) {
+        return stack2Dto3DParallTyped<decltype(pixel)>(inputDirectory, beginX, endX, beginY, endY, beginZ, endZ, output, resize, factorResize, extension);
+    });
+}
+
+
 /** 
  * @brief stack several 2D images in a 3D image (parallelized version 1)
  * 
@@ -269,29 +445,24 @@ int ToolsItk::stack2Dto3D(std::string inputDirectory,  int beginX, int endX, int
  * @param extension the format of the slices to be processed, example: jp2
  * @return returns 0 if no problem encountered during image manipulation 
 */
-int ToolsItk::stack2Dto3DParall(std::string inputDirectory,  int beginX, int endX, int beginY, int endY, int beginZ, int endZ, std::string output, bool resize, int factorResize, std::string extension) {
-    std::cout << "omp_get_num_procs () = " << omp_get_num_procs() << std::endl;
-    omp_set_num_threads(omp_get_num_procs()); // pour définir le nombre de threads voir si on rajoute un paramètre dans la fonction
-    //std::cout << "number of threads = " << omp_get_num_threads() << std::endl;    
+template <typename TPixel>
+int ToolsItk::stack2Dto3DParallTyped(std::string inputDirectory,  int beginX, int endX, int beginY, int endY, int beginZ, int endZ, std::string output, bool resize, int factorResize, std::string extension) {
+    using PixelType = TPixel;
+    using ImageType2D = itk::Image<PixelType, 2>;
+    using ImageType3D = itk::Image<PixelType, 3>;
+    using ImageReaderType = itk::ImageFileReader<ImageType2D>;
     std::vector<std::string> names ;
     std::vector<std::string> namesClean;
-    using PixelType = unsigned int;  
     constexpr unsigned int InputImageDimension = 2;
     constexpr unsigned int OutputImageDimension = 3;    
 
     using InputImageType = itk::Image<PixelType, InputImageDimension>;
     using OutputImageType = itk::Image<PixelType, OutputImageDimension>;
 
-    using ImageReaderType = itk::ImageFileReader<InputImageType>;
 
     using TilerType = itk::TileImageFilter<InputImageType, OutputImageType>;
   
-    for (const auto & entry : std::filesystem::directory_iterator(inputDirectory))
-        {  
-        names.push_back(entry.path());      
-        }
-  
-    std::sort(names.begin(), names.end()); // sort
+    listSlices(inputDirectory, extension, names); // sorted list of the slices, from the slice index if it is up to date
   //std::vector<std::string>::iterator nit;  
   /*for (nit = names.begin(); nit != names.end(); ++nit)
   {
@@ -337,11 +508,11 @@ int ToolsItk::stack2Dto3DParall(std::string inputDirectory,  int beginX, int end
 
     auto reader = ImageReaderType::New();
 
-    InputImageType::Pointer inputImageTile;
-    InputImageType::RegionType region;
+    typename InputImageType::Pointer inputImageTile;
+    typename InputImageType::RegionType region;
     int cpt =0;
 
-    std::vector<ImageType2D::Pointer> tabImages((endZ-beginZ+1)/factorResize+1);
+    std::vector<typename ImageType2D::Pointer> tabImages((endZ-beginZ+1)/factorResize+1);
     std::vector<int> tabIndex((endZ-beginZ+1)/factorResize+1);
     std::cout << "tabImages size = " << tabImages.size() << std::endl;
     std::cout << "tabIndex size = " << tabIndex.size() << std::endl;
@@ -361,54 +532,79 @@ int ToolsItk::stack2Dto3DParall(std::string inputDirectory,  int beginX, int end
     double totalStack = 0;
     std::chrono::duration<double> duration_write;
     double totalWrite = 0;
-    //#pragma omp parallel for ordered shared(stack) private(th_id)
-    #pragma omp parallel for  shared(stack) private(th_id) schedule(dynamic, 4)
-    for (int i=beginZ; i<endZ+1; i= i +factorResize)
-    {            
-        th_id = omp_get_thread_num();
-        //printf("Hello World 0 from thread %d i = %d imod = %d stack = %d\n", th_id, i, (i-beginZ)/factorResize, stack);
-        auto start_timeLoad = std::chrono::high_resolution_clock::now();          
-        ImageType2D::Pointer image = itk::ReadImage<ImageType2D>(namesClean.at(i));
-        auto end_timeLoad = std::chrono::high_resolution_clock::now();
-        duration_load = end_timeLoad - start_timeLoad;
-        totalTimeLoad += duration_load.count();
-        if (resize) {
-            ImageType2D::Pointer imageNew;
-            imageNew = ImageType2D::New();
-            auto start_changeSizeImage = std::chrono::high_resolution_clock::now();             
-            int res = changeSizeImage(image, imageNew, factorResize, beginX, endX, beginY, endY);
-            auto end_changeSizeImage = std::chrono::high_resolution_clock::now();
-            duration_changeSizeImage = end_changeSizeImage - start_changeSizeImage;
-            totalTimeChangeSizeImage +=  duration_changeSizeImage.count();                       
-            tabImages[(i-beginZ)/factorResize] = imageNew;            
-        } else {
-            tabImages[i-beginZ] = image;                
-        }
-            
-        tabIndex[(i-beginZ)/factorResize] = 1;
-            printf("Hello World from thread %d i = %d imod = %d stack = %d\n", th_id, i, (i-beginZ)/factorResize, stack);
-            std::cout << "tabIndex : ";
-            for(uint i=0; i<tabIndex.size(); i++ ) {
-                std::cout << tabIndex[i] << " ";
+    // size of the resized slices computed from the full resolution, the slices decoded at a lower resolution must have the same size
+    int nbColsResized = -1;
+    int nbRowsResized = -1;
+    if(resize && beginX == -1 && beginY == -1) {
+        typename ImageReaderType::Pointer readerInfo = ImageReaderType::New();
+        readerInfo->SetFileName(namesClean.at(beginZ));
+        readerInfo->UpdateOutputInformation();
+        typename ImageType2D::SizeType sizeInfo = readerInfo->GetOutput()->GetLargestPossibleRegion().GetSize();
+        nbColsResized = sizeInfo[0]/factorResize+1;
+        nbRowsResized = sizeInfo[1]/factorResize+1;
+    } else if(resize && beginX != -1 && beginY != -1) { // one pixel every factorResize pixels of the window, as stackSlicesTyped
+        nbColsResized = (endX - beginX)/factorResize+1;
+        nbRowsResized = (endY - beginY)/factorResize+1;
+    }
+    std::vector<std::string> files;
+    for (int i=beginZ; i<endZ+1; i= i +factorResize) {
+        files.push_back(namesClean.at(i));
+    }
+    std::mutex mutexTime;
+    int slicesDone = 0; // number of slices stacked, for the progress of the job
+    // the files are read ahead entirely only if the decode reads the whole slices, else only their header
+    bool wholeSlices = !(resize && beginX == -1 && beginY == -1) && !(beginX != -1 && beginY != -1);
+    SlicePipeline pipeline(ioThreads, decodeThreads);
+    int error = pipeline.run<typename ImageType2D::Pointer>(files, 
+        [&](size_t k, typename ImageType2D::Pointer &image) -> int { // decode threads
+            auto start_timeLoad = std::chrono::high_resolution_clock::now();          
+            int factorDecoded = 1;
+            if (resize && beginX == -1 && beginY == -1) { // the whole slice is resized, the codec can skip the finest resolutions
+                image = readImageReduced<PixelType>(files[k], factorResize, factorDecoded);
+            } else if (beginX != -1 && beginY != -1 && resize) { // only the window is decoded, at the lowest resolution level compatible with factorResize
+                image = readImageReduced<PixelType>(files[k], factorResize, factorDecoded, beginX, endX, beginY, endY);
+            } else if (beginX != -1 && beginY != -1) { // only the window of the region of interest is decoded
+                image = readImageRegion<PixelType>(files[k], beginX, endX, beginY, endY);
+            } else {
+                image = itk::ReadImage<ImageType2D>(files[k]);
             }
-            std::cout << std::endl;       
-        
-        #pragma omp critical
-        {
-        auto start_stack = std::chrono::high_resolution_clock::now();
-        while(tabIndex[stack+1] == 1) {
-            //std::cout << namesClean.at((stack+1)*factorResize+beginZ) << std::endl;                        
-            tiler->SetInput(inputImageNumber++, tabImages[stack+1]);   
-            tabImages[stack+1] = NULL;
-            tabIndex[stack+1] = -1;
-            stack++;                              
-        }
-        auto end_stack = std::chrono::high_resolution_clock::now();
-        duration_stack = end_stack - start_stack;
-        totalStack +=  duration_stack.count(); 
-        }
-
-        cpt++;
+            auto end_timeLoad = std::chrono::high_resolution_clock::now();
+            std::chrono::duration<double> duration_load = end_timeLoad - start_timeLoad;
+            double timeChangeSizeImage = 0;
+            if (resize) {
+                typename ImageType2D::Pointer imageNew;
+                imageNew = ImageType2D::New();
+                auto start_changeSizeImage = std::chrono::high_resolution_clock::now();             
+                int res = changeSizeImage<PixelType>(image, imageNew, factorResize/factorDecoded, beginX == -1 ? -1 : beginX/factorDecoded, endX/factorDecoded, beginY == -1 ? -1 : beginY/factorDecoded, endY/factorDecoded, nbColsResized, nbRowsResized);
+                auto end_changeSizeImage = std::chrono::high_resolution_clock::now();
+                std::chrono::duration<double> duration_changeSizeImage = end_changeSizeImage - start_changeSizeImage;
+                timeChangeSizeImage = duration_changeSizeImage.count();
+                image = imageNew;
+            }
+            std::lock_guard<std::mutex> lock(mutexTime);
+            totalTimeLoad += duration_load.count();
+            totalTimeChangeSizeImage += timeChangeSizeImage;
+            return 0;
+        },
+        [&](size_t k, typename ImageType2D::Pointer &image) -> int { // calling thread, the slices are given to the tiler in order
+            tabImages[k] = image;
+            tabIndex[k] = 1;
+            auto start_stack = std::chrono::high_resolution_clock::now();
+            while(tabIndex[stack+1] == 1) {
+                tiler->SetInput(inputImageNumber++, tabImages[stack+1]);   
+                tabImages[stack+1] = NULL;
+                tabIndex[stack+1] = -1;
+                stack++;                              
+            }
+            auto end_stack = std::chrono::high_resolution_clock::now();
+            duration_stack = end_stack - start_stack;
+            totalStack +=  duration_stack.count(); 
+            slicesDone++;
+            std::cout << "progress " << slicesDone << "/" << files.size() << std::endl;
+            return 0;
+        }, wholeSlices);
+    if(error != 0) {
+        return -1;
     }
     std::cout << "Time load mean = " << totalTimeLoad/((endZ-beginZ+1)/factorResize) << std::endl;
     std::cout << "Time changeSizeImage mean = " << totalTimeChangeSizeImage/((endZ-beginZ+1)/factorResize) << std::endl;
@@ -472,13 +668,18 @@ int ToolsItk::cleanList(std::vector<std::string> names, std::vector<std::string>
  * @param endX the last position of the pixel in the x axis
  * @param beginY the first position of the pixel in the y axis
  * @param endY the last position of the pixel in the y axis
+ * @param numCols the number of columns of the new image, -1 to compute it from the original image
+ * @param numRows the number of rows of the new image, -1 to compute it from the original image
  * @return returns 0 if no problem encountered during image manipulation 
 */
-int ToolsItk::changeSizeImage(ImageType2D::Pointer imageOrigin, ImageType2D::Pointer imageNew, int factorResize, int beginX, int endX, int beginY, int endY) {
+template <typename TPixel>
+int ToolsItk::changeSizeImage(typename itk::Image<TPixel, 2>::Pointer imageOrigin, typename itk::Image<TPixel, 2>::Pointer imageNew, int factorResize, int beginX, int endX, int beginY, int endY, int numCols, int numRows) {
+    using PixelType = TPixel;
+    using ImageType2D = itk::Image<PixelType, 2>;
     using IndexType = itk::Index<2>; 
     IndexType indexOrigin;
-    ImageType2D::RegionType regionOrigin = imageOrigin->GetLargestPossibleRegion();
-    ImageType2D::SizeType sizeOrigin = regionOrigin.GetSize();
+    typename ImageType2D::RegionType regionOrigin = imageOrigin->GetLargestPossibleRegion();
+    typename ImageType2D::SizeType sizeOrigin = regionOrigin.GetSize();
     //std::cout << "x sizeOrigin[0] = " << sizeOrigin[0] << std::endl;
     //std::cout << "y sizeOrigin[1] = " << sizeOrigin[1] << std::endl;
     if(endX > sizeOrigin[0]-1) {
@@ -489,8 +690,8 @@ int ToolsItk::changeSizeImage(ImageType2D::Pointer imageOrigin, ImageType2D::Poi
         std::cout << "The point can't be in the area, axis y, "  << endY << " > " << sizeOrigin[1]-1 << std::endl;
         return -1;
     }
-    ImageType2D::IndexType corner = { { 0, 0 } };
-    ImageType2D::SizeType sizeNew;
+    typename ImageType2D::IndexType corner = { { 0, 0 } };
+    typename ImageType2D::SizeType sizeNew;
     unsigned int NumRows;
     unsigned int NumCols;
     int maxX = 0;
@@ -504,14 +705,18 @@ int ToolsItk::changeSizeImage(ImageType2D::Pointer imageOrigin, ImageType2D::Poi
         //std::cout << "NumRows = " << NumRows << std::endl;
         maxX = sizeOrigin[0];
         maxY = sizeOrigin[1];      
-    } else {
-        NumCols = endX - beginX + 1;
-        NumRows = endY - beginY + 1;
+    } else { // one pixel every factorResize pixels of the window
+        NumCols = (endX - beginX)/factorResize+1;
+        NumRows = (endY - beginY)/factorResize+1;
         minX = beginX;
         minY = beginY;
         maxX = endX+1;
         maxY = endY+1;
     }
+    if(numCols > 0 && numRows > 0) { // the size is imposed, for example for a slice decoded at a lower resolution
+        NumCols = numCols;
+        NumRows = numRows;
+    }
            
     sizeNew[0] = NumCols;
     sizeNew[1] = NumRows;
@@ -521,10 +726,10 @@ int ToolsItk::changeSizeImage(ImageType2D::Pointer imageOrigin, ImageType2D::Poi
     //std::cout << "maxY = " << maxY << std::endl;
     //std::cout << "minX = " << minX << std::endl;
     //std::cout << "maxX = " << maxX << std::endl;
-    ImageType2D::RegionType region(corner, sizeNew);
+    typename ImageType2D::RegionType region(corner, sizeNew);
     imageNew->SetRegions(region);
     imageNew->Allocate();
-    ImageType2D::IndexType indexNew;
+    typename ImageType2D::IndexType indexNew;
     for(uint y=0; y<NumRows; y++) {
         for(uint x=0; x<NumCols; x++) {
             indexNew[1] = y;
@@ -535,10 +740,10 @@ int ToolsItk::changeSizeImage(ImageType2D::Pointer imageOrigin, ImageType2D::Poi
     // mettre un iterator
     uint cpty =0;
     uint cptx =0;    
-    for(int y=minY; y<maxY; y= y+factorResize) { 
+    for(int y=minY; y<maxY && cpty<NumRows; y= y+factorResize) { 
       indexOrigin[1]= y;
       cptx=0;          
-      for(int x=minX; x<maxX; x= x+factorResize) { 
+      for(int x=minX; x<maxX && cptx<NumCols; x= x+factorResize) { 
         indexOrigin[0]= x;        
         indexNew[1] = cpty;
         indexNew[0] = cptx;
@@ -554,18 +759,18 @@ int ToolsItk::changeSizeImage(ImageType2D::Pointer imageOrigin, ImageType2D::Poi
     using ImageType2D = itk::Image<PixelType, Dimension2D>;    
     using ConstIteratorType = itk::ImageRegionConstIterator<ImageType2D>;
     using IteratorType = itk::ImageRegionIterator<ImageType2D>;
-    ImageType2D::RegionType inputRegion;
-    ImageType2D::RegionType::IndexType inputStart;
-    ImageType2D::RegionType::SizeType inputSize;
+    typename ImageType2D::RegionType inputRegion;
+    typename ImageType2D::RegionType::IndexType inputStart;
+    typename ImageType2D::RegionType::SizeType inputSize;
     inputStart[0] = minX;
     inputStart[1] = minY;
     inputSize[0] = maxX;
     inputSize[1] = maxY;
     inputRegion.SetSize(inputSize);
     inputRegion.SetIndex(inputStart);
-    ImageType2D::RegionType outputRegion;
-    ImageType2D::RegionType::IndexType outputStart;
-    ImageType2D::RegionType::SizeType outputSize;
+    typename ImageType2D::RegionType outputRegion;
+    typename ImageType2D::RegionType::IndexType outputStart;
+    typename ImageType2D::RegionType::SizeType outputSize;
     outputStart[0] = 0;
     outputStart[1] = 0;    
     outputSize[0] = maxX / factorResize;
@@ -592,6 +797,140 @@ int ToolsItk::changeSizeImage(ImageType2D::Pointer imageOrigin, ImageType2D::Poi
     return 0;
 }
 
+/** 
+ * @brief read a 2D image, a JPEG 2000 image is decoded at the lowest resolution level compatible with factorResize
+ * 
+ * A JPEG 2000 codestream stores several resolution levels, the level r is 2^r times smaller than the full resolution.
+ * The level chosen is the highest power of 2 that divides factorResize, the remaining reduction factorResize/factorDecoded 
+ * is done by changeSizeImage. The other formats, or if OpenJPEG is not available, are read at full resolution.
+ * If a window is given, only the window is decoded: the largest possible region of the returned image is the whole 
+ * slice at the decoded level and its buffered region is the window at that level, divided by factorDecoded.
+ * 
+ * @param filename the name of the image file
+ * @param factorResize the image reduction factor
+ * @param factorDecoded the reduction factor applied by the decoder, 1 if the image is read at full resolution
+ * @param beginX the first position of the window in the x axis at full resolution, -1 for the whole slice
+ * @param endX the last position of the window in the x axis at full resolution
+ * @param beginY the first position of the window in the y axis at full resolution, -1 for the whole slice
+ * @param endY the last position of the window in the y axis at full resolution
+ * @return returns the pointer to the image
+*/
+template <typename TPixel>
+typename itk::Image<TPixel, 2>::Pointer ToolsItk::readImageReduced(std::string filename, int factorResize, int &factorDecoded, int beginX, int endX, int beginY, int endY) {
+    using PixelType = TPixel;
+    using ImageType2D = itk::Image<PixelType, 2>;
+    factorDecoded = 1;
+    bool window = beginX != -1 && beginY != -1;
+#ifdef CITRUS_WITH_OPENJPEG
+    std::string extension = filename.substr(filename.find_last_of(".") + 1);
+    OPJ_CODEC_FORMAT format = OPJ_CODEC_UNKNOWN;
+    if(extension.compare("jp2") == 0) format = OPJ_CODEC_JP2;
+    if(extension.compare("j2k") == 0 || extension.compare("j2c") == 0) format = OPJ_CODEC_J2K;
+    uint reduce = 0;
+    while(factorResize % (1 << (reduce+1)) == 0) reduce++;
+    if(format != OPJ_CODEC_UNKNOWN && reduce > 0) {
+        opj_dparameters_t parameters;
+        opj_set_default_decoder_parameters(&parameters);
+        opj_codec_t * codec = opj_create_decompress(format);
+        opj_stream_t * stream = opj_stream_create_default_file_stream(filename.c_str(), OPJ_TRUE);
+        opj_image_t * imageOpj = NULL;
+        bool ok = stream != NULL && opj_setup_decoder(codec, &parameters) && opj_read_header(stream, codec, &imageOpj);
+        if(ok) {
+            opj_codestream_info_v2_t * info = opj_get_cstr_info(codec);
+            uint numResolutions = info->m_default_tile_info.tccp_info[0].numresolutions;
+            opj_destroy_cstr_info(&info);
+            if(reduce > numResolutions-1) reduce = numResolutions-1;
+            int factor = 1 << reduce;
+            ok = reduce > 0 && opj_set_decoded_resolution_factor(codec, reduce);
+            if(ok && window) { // the window is extended to the pixels of the decoded level which contain it
+                ok = opj_set_decode_area(codec, imageOpj, (beginX/factor)*factor, (beginY/factor)*factor, 
+                                         std::min<OPJ_INT32>(endX+1, imageOpj->x1), std::min<OPJ_INT32>(endY+1, imageOpj->y1));
+            }
+            ok = ok && opj_decode(codec, stream, imageOpj) && opj_end_decompress(codec, stream);
+        }
+        typename ImageType2D::Pointer image;
+        if(ok) {
+            typename ImageType2D::IndexType corner = { { 0, 0 } };
+            typename ImageType2D::SizeType size;
+            size[0] = imageOpj->comps[0].w;
+            size[1] = imageOpj->comps[0].h;
+            typename ImageType2D::RegionType region(corner, size);
+            image = ImageType2D::New();
+            if(window) { // the pixels keep their indexes at the decoded level
+                corner[0] = imageOpj->comps[0].x0;
+                corner[1] = imageOpj->comps[0].y0;
+                region.SetIndex(corner);
+                typename ImageType2D::SizeType sizeSlice;
+                sizeSlice[0] = (imageOpj->x1 + (1 << reduce) - 1) >> reduce;
+                sizeSlice[1] = (imageOpj->y1 + (1 << reduce) - 1) >> reduce;
+                image->SetLargestPossibleRegion(typename ImageType2D::RegionType(sizeSlice));
+                image->SetBufferedRegion(region);
+                image->SetRequestedRegion(region);
+            } else {
+                image->SetRegions(region);
+            }
+            image->Allocate();
+            PixelType * buffer = image->GetBufferPointer();
+            OPJ_INT32 * data = imageOpj->comps[0].data;
+            for(size_t k=0; k<size[0]*size[1]; k++) {
+                buffer[k] = static_cast<PixelType>(data[k]);
+            }
+            factorDecoded = 1 << reduce;
+        }
+        if(imageOpj != NULL) opj_image_destroy(imageOpj);
+        if(stream != NULL) opj_stream_destroy(stream);
+        opj_destroy_codec(codec);
+        if(ok) return image;
+        std::cout << "readImageReduced can't decode " << filename << " at a lower resolution" << std::endl;
+    }
+#endif
+    if(window) {
+        return readImageRegion<PixelType>(filename, beginX, endX, beginY, endY);
+    }
+    return itk::ReadImage<ImageType2D>(filename);
+}
+
+/** 
+ * @brief read only a window of a 2D image
+ * 
+ * The requested region is given to the reader, the image IO which can stream (JPEG 2000 by tiles and precincts, 
+ * TIFF by strips or tiles) decodes only the part of the file covering the window. The largest possible region of 
+ * the returned image is the whole slice and its buffered region is the window, so the pixels keep their indexes.
+ * 
+ * @param filename the name of the image file
+ * @param beginX the first position of the pixel in the x axis
+ * @param endX the last position of the pixel in the x axis
+ * @param beginY the first position of the pixel in the y axis
+ * @param endY the last position of the pixel in the y axis
+ * @return returns the pointer to the image
+*/
+template <typename TPixel>
+typename itk::Image<TPixel, 2>::Pointer ToolsItk::readImageRegion(std::string filename, int beginX, int endX, int beginY, int endY) {
+    using PixelType = TPixel;
+    using ImageType2D = itk::Image<PixelType, 2>;
+    using ImageType3D = itk::Image<PixelType, 3>;
+    using ImageReaderType = itk::ImageFileReader<ImageType2D>;
+    typename ImageReaderType::Pointer reader = ImageReaderType::New();
+    reader->SetFileName(filename);
+    reader->UpdateOutputInformation();
+    typename ImageType2D::RegionType largestRegion = reader->GetOutput()->GetLargestPossibleRegion();
+    typename ImageType2D::IndexType corner;
+    corner[0] = beginX;
+    corner[1] = beginY;
+    typename ImageType2D::SizeType size;
+    size[0] = endX - beginX + 1;
+    size[1] = endY - beginY + 1;
+    typename ImageType2D::RegionType region(corner, size);
+    if(!region.Crop(largestRegion)) { // the window is outside the slice, changeSizeImage reports the error
+        return reader->GetOutput();
+    }
+    reader->GetOutput()->SetRequestedRegion(region);
+    reader->Update();
+    typename ImageType2D::Pointer image = reader->GetOutput();
+    image->DisconnectPipeline();
+    return image;
+}
+
 /** 
  * @brief create a region of interest (ROI)
  * 
@@ -642,6 +981,10 @@ int ToolsItk::createRoi(std::string inputDirectory, int sizeX, int sizeY, int si
     int endX = difX + sizeX - 1;
     int endY = difY + sizeY - 1;
     int endZ = difZ + sizeZ - 1;
+    std::string storeDirectory = findBrickStore(inputDirectory, extension);
+    if(storeDirectory != "" && factorResize == 1) { // only the bricks which intersect the ROI are read
+        return createRoiBricks(storeDirectory, beginX, endX, beginY, endY, beginZ, endZ, outputFile);
+    }
     //res = stack2Dto3D(inputDirectory, beginX, endX, beginY, endY, beginZ, endZ, outputFile, true, factorResize);  
     res = stack2Dto3DParall(inputDirectory, beginX, endX, beginY, endY, beginZ, endZ, outputFile, true, factorResize, extension);    
     //std::cout << "res = " << res << std::endl;
@@ -650,6 +993,199 @@ int ToolsItk::createRoi(std::string inputDirectory, int sizeX, int sizeY, int si
 
 
 
+/** 
+ * @brief create several regions of interest (ROI) in one pass over the slices, the pixel type of the slices is kept
+ * 
+ * @param inputDirectory the directory that contains all the slices
+ * @param roiFile the file of the ROIs, one ROI by line: sizeX sizeY sizeZ px py pz positionInArea outputFile
+ * @param extension the format of the slices to be processed, example: jp2
+ * @return the return value of the function createRoiBatchTyped 
+*/
+int ToolsItk::createRoiBatch(std::string inputDirectory, std::string roiFile, std::string extension) {
+    return dispatchPixelType(inputDirectory, extension, [&](auto pixel) {
+        return createRoiBatchTyped<decltype(pixel)>(inputDirectory, roiFile, extension);
+    });
+}
+
+
+/** 
+ * @brief create several regions of interest (ROI) in one pass over the slices
+ * 
+ * Each slice needed by at least one ROI is decoded once (only the window covering the ROIs which contain it), 
+ * then its crops are copied in all the ROIs, the slices are processed in parallel and in order. A ROI is 
+ * allocated when its first slice is read and written then released when its last slice is copied, so only the 
+ * ROIs of the slices being read are in memory. If the input directory has a brick store, each ROI is read from 
+ * the bricks.
+ * 
+ * @param inputDirectory the directory that contains all the slices
+ * @param roiFile the file of the ROIs, one ROI by line: sizeX sizeY sizeZ px py pz positionInArea outputFile, 
+ * positionInArea = c for center or o for origin, outputFile is the end of the line and can contain spaces
+ * @param extension the format of the slices to be processed, example: jp2
+ * @return returns 0 if all the ROIs are written, -1 otherwise
+*/
+template <typename TPixel>
+int ToolsItk::createRoiBatchTyped(std::string inputDirectory, std::string roiFile, std::string extension) {
+    using PixelType = TPixel;
+    using ImageType2D = itk::Image<PixelType, 2>;
+    using ImageType3D = itk::Image<PixelType, 3>;
+    using ImageReaderType = itk::ImageFileReader<ImageType2D>;
+    struct Roi {
+        int beginX, endX, beginY, endY, beginZ, endZ;
+        std::string outputFile;
+        typename ImageType3D::Pointer image;
+        int remainingSlices; // slices not yet copied in the ROI
+    };
+    std::cout << "omp_get_num_procs () = " << omp_get_num_procs() << std::endl;
+    omp_set_num_threads(omp_get_num_procs());
+    std::vector<std::string> names ;
+    std::vector<std::string> namesClean;
+    listSlices(inputDirectory, extension, names); // sorted list of the slices, from the slice index if it is up to date
+    cleanList(names, namesClean, extension);
+    if(namesClean.size() == 0) {
+        std::cerr << "There are no files with extension " << extension << std::endl;
+        return -1;
+    }
+    typename ImageReaderType::Pointer readerTemp = ImageReaderType::New();
+    readerTemp->SetFileName(namesClean.at(0));
+    readerTemp->UpdateOutputInformation(); // only the header is read
+    typename ImageType2D::SizeType sizeTemp = readerTemp->GetOutput()->GetLargestPossibleRegion().GetSize();
+    int sizeImageX = sizeTemp[0];
+    int sizeImageY = sizeTemp[1];
+    int sizeImageZ = namesClean.size();
+
+    std::ifstream file(roiFile);
+    if(!file) {
+        std::cerr << "Can't open the file of the ROIs " << roiFile << std::endl;
+        return -1;
+    }
+    int error = 0;
+    std::vector<Roi> rois;
+    std::string line;
+    while(std::getline(file, line)) {
+        std::istringstream stream(line);
+        int sizeX, sizeY, sizeZ, px, py, pz;
+        std::string positionInArea;
+        Roi roi;
+        if(!(stream >> sizeX >> sizeY >> sizeZ >> px >> py >> pz >> positionInArea) || !std::getline(stream >> std::ws, roi.outputFile)) {
+            continue;
+        }
+        while(!roi.outputFile.empty() && (roi.outputFile.back() == '\r' || roi.outputFile.back() == ' ')) {
+            roi.outputFile.pop_back();
+        }
+        if(positionInArea.compare("c")==0) {
+            px = px-sizeX/2;
+            py = py-sizeY/2;
+            pz = pz-sizeZ/2;
+        }
+        roi.beginX = px;
+        roi.beginY = py;
+        roi.beginZ = pz;
+        roi.endX = px + sizeX - 1;
+        roi.endY = py + sizeY - 1;
+        roi.endZ = pz + sizeZ - 1;
+        if(sizeX <= 0 || sizeY <= 0 || sizeZ <= 0 || px < 0 || py < 0 || pz < 0 || roi.endX > sizeImageX-1 || roi.endY > sizeImageY-1 || roi.endZ > sizeImageZ-1) {
+            std::cout << "The point can't be in the area, ROI " << roi.outputFile << std::endl;
+            error = -1;
+            continue;
+        }
+        rois.push_back(roi);
+    }
+    std::cout << "number of ROIs = " << rois.size() << std::endl;
+
+    std::string storeDirectory = findBrickStore(inputDirectory, extension);
+    if(storeDirectory != "") { // only the bricks which intersect the ROIs are read
+        for(uint r=0; r<rois.size(); r++) {
+            if(createRoiBricks(storeDirectory, rois[r].beginX, rois[r].endX, rois[r].beginY, rois[r].endY, rois[r].beginZ, rois[r].endZ, rois[r].outputFile) != 0) {
+                error = -1;
+            }
+            std::cout << "progress " << r+1 << "/" << rois.size() << std::endl;
+        }
+        return error;
+    }
+
+    std::vector<std::vector<uint>> roisBySlice(sizeImageZ); // ROIs which contain each slice
+    for(uint r=0; r<rois.size(); r++) {
+        rois[r].remainingSlices = rois[r].endZ - rois[r].beginZ + 1;
+        for(int z=rois[r].beginZ; z<=rois[r].endZ; z++) {
+            roisBySlice[z].push_back(r);
+        }
+    }
+    std::vector<int> slices;
+    for(int z=0; z<sizeImageZ; z++) {
+        if(roisBySlice[z].size() > 0) slices.push_back(z);
+    }
+    std::cout << "number of slices read = " << slices.size() << std::endl;
+    int cpt = 0;
+    #pragma omp parallel for schedule(dynamic, 4)
+    for(uint k=0; k<slices.size(); k++) {
+        int z = slices[k];
+        int beginX = sizeImageX, endX = -1, beginY = sizeImageY, endY = -1; // window covering the ROIs which contain the slice
+        for(uint r : roisBySlice[z]) {
+            beginX = std::min(beginX, rois[r].beginX);
+            endX = std::max(endX, rois[r].endX);
+            beginY = std::min(beginY, rois[r].beginY);
+            endY = std::max(endY, rois[r].endY);
+        }
+        typename ImageType2D::Pointer image = readImageRegion<PixelType>(namesClean.at(z), beginX, endX, beginY, endY);
+        for(uint r : roisBySlice[z]) {
+            PixelType * buffer = nullptr;
+            #pragma omp critical(roiAllocate)
+            {
+            if(!rois[r].image) { // first slice of the ROI
+                typename ImageType3D::IndexType corner = { { 0, 0, 0 } };
+                typename ImageType3D::SizeType size;
+                size[0] = rois[r].endX - rois[r].beginX + 1;
+                size[1] = rois[r].endY - rois[r].beginY + 1;
+                size[2] = rois[r].endZ - rois[r].beginZ + 1;
+                typename ImageType3D::RegionType region(corner, size);
+                rois[r].image = ImageType3D::New();
+                rois[r].image->SetRegions(region);
+                rois[r].image->Allocate();
+            }
+            buffer = rois[r].image->GetBufferPointer();
+            }
+            PixelType * output = buffer + (size_t)(z - rois[r].beginZ) * (rois[r].endX - rois[r].beginX + 1) * (rois[r].endY - rois[r].beginY + 1);
+            typename ImageType2D::IndexType index;
+            for(int y=rois[r].beginY; y<=rois[r].endY; y++) {
+                index[1] = y;
+                for(int x=rois[r].beginX; x<=rois[r].endX; x++) {
+                    index[0] = x;
+                    *output++ = image->GetPixel(index);
+                }
+            }
+            typename ImageType3D::Pointer completed;
+            #pragma omp critical(roiAllocate)
+            {
+            if(--rois[r].remainingSlices == 0) { // last slice of the ROI, it is written and released
+                completed = rois[r].image;
+                rois[r].image = nullptr;
+            }
+            }
+            if(completed) {
+                std::cout << "write " << rois[r].outputFile << std::endl;
+                try
+                {
+                    itk::WriteImage(completed, rois[r].outputFile);
+                }
+                catch (const itk::ExceptionObject & excp)
+                {
+                    std::cerr << excp << std::endl;
+                    #pragma omp atomic write
+                    error = -1;
+                }
+            }
+        }
+        #pragma omp critical
+        {
+        cpt++;
+        std::cout << "progress " << cpt << "/" << slices.size() << std::endl;
+        }
+    }
+    return error;
+}
+
+
+
 /** 
  * @brief resize and stack several 2D images in a 3D image (parallel version)
  * 
@@ -662,6 +1198,11 @@ int ToolsItk::createRoi(std::string inputDirectory, int sizeX, int sizeY, int si
  * @return the return value of the function stack2Dto3DParallV2 
 */
 int ToolsItk::resizeImageParallV2(std::string inputDirectory, int begin, int end, int factorResize, std::string output, std::string extension) {    
+    std::string storeDirectory = findBrickStore(inputDirectory, extension);
+    std::string outputExtension = std::filesystem::path(output).extension().string();
+    if(storeDirectory != "" && (outputExtension == ".nrrd" || outputExtension == ".nhdr")) { // only the bricks of the slices are read
+        return resizeImageBricks(storeDirectory, begin, end, factorResize, output);
+    }
     int res =0;
     if(factorResize == 1) {
         res = stack2Dto3DParallV2(inputDirectory, -1, 0, -1, 0, begin, end, output, false, factorResize, extension);
@@ -673,6 +1214,29 @@ int ToolsItk::resizeImageParallV2(std::string inputDirectory, int begin, int end
 }
 
 
+/** 
+ * @brief stack several 2D images in a 3D image (parallel version 2), the pixel type of the slices is kept
+ * 
+ * @param inputDirectory the directory that contains all the slices
+ * @param beginX the first position of the pixel in the x axis
+ * @param endX the last position of the pixel in the x axis
+ * @param beginY the first position of the pixel in the y axis
+ * @param endY the last position of the pixel in the y axis
+ * @param beginZ the first position of the pixel in the z axis
+ * @param endZ the last position of the pixel in the z axis 
+ * @param output the name of the ouput file
+ * @param resize true if the image must be reduced
+ * @param factorResize the image reduction factor 
+ * @param extension the format of the slices to be processed, example: jp2
+ * @return the return value of the function stack2Dto3DParallV2Typed 
+*/
+int ToolsItk::stack2Dto3DParallV2(std::string inputDirectory,  int beginX, int endX, int beginY, int endY, int beginZ, int endZ, std::string output, bool resize, int factorResize, std::string extension) {
+    return dispatchPixelType(inputDirectory, extension, [&](auto pixel) {
+        return stack2Dto3DParallV2Typed<decltype(pixel)>(inputDirectory, beginX, endX, beginY, endY, beginZ, endZ, output, resize, factorResize, extension);
+    });
+}
+
+
 /** 
  * @brief stack several 2D images in a 3D image (parallel version 2)
  * 
@@ -689,29 +1253,24 @@ int ToolsItk::resizeImageParallV2(std::string inputDirectory, int begin, int end
  * @param extension the format of the slices to be processed, example: jp2
  * @return returns 0 if no problem encountered during image manipulation 
 */
-int ToolsItk::stack2Dto3DParallV2(std::string inputDirectory,  int beginX, int endX, int beginY, int endY, int beginZ, int endZ, std::string output, bool resize, int factorResize, std::string extension) {
-    std::cout << "omp_get_num_procs () = " << omp_get_num_procs() << std::endl;
-    omp_set_num_threads(omp_get_num_procs()); // pour définir le nombre de threads voir si on rajoute un paramètre dans la fonction
-    //std::cout << "number of threads = " << omp_get_num_threads() << std::endl;    
+template <typename TPixel>
+int ToolsItk::stack2Dto3DParallV2Typed(std::string inputDirectory,  int beginX, int endX, int beginY, int endY, int beginZ, int endZ, std::string output, bool resize, int factorResize, std::string extension) {
+    using PixelType = TPixel;
+    using ImageType2D = itk::Image<PixelType, 2>;
+    using ImageType3D = itk::Image<PixelType, 3>;
+    using ImageReaderType = itk::ImageFileReader<ImageType2D>;
     std::vector<std::string> names ;
     std::vector<std::string> namesClean;
-    using PixelType = unsigned int;  
     constexpr unsigned int InputImageDimension = 2;
     constexpr unsigned int OutputImageDimension = 3;    
 
     using InputImageType = itk::Image<PixelType, InputImageDimension>;
     using OutputImageType = itk::Image<PixelType, OutputImageDimension>;
 
-    using ImageReaderType = itk::ImageFileReader<InputImageType>;
 
     using TilerType = itk::TileImageFilter<InputImageType, OutputImageType>;
   
-    for (const auto & entry : std::filesystem::directory_iterator(inputDirectory))
-        {  
-        names.push_back(entry.path());      
-        }
-  
-    std::sort(names.begin(), names.end()); // sort
+    listSlices(inputDirectory, extension, names); // sorted list of the slices, from the slice index if it is up to date
   //std::vector<std::string>::iterator nit;  
   /*for (nit = names.begin(); nit != names.end(); ++nit)
   {
@@ -749,10 +1308,10 @@ int ToolsItk::stack2Dto3DParallV2(std::string inputDirectory,  int beginX, int e
     }*/
  
     // créer une image de taille (endX-beginX+1, endY-beginY+1, endZ-beginZ+1)
-    ImageType3D::Pointer imageOutput;
+    typename ImageType3D::Pointer imageOutput;
     imageOutput = ImageType3D::New();
-    ImageType3D::IndexType cornerOutput = { { 0, 0 , 0} };
-    ImageType3D::SizeType sizeOutput;
+    typename ImageType3D::IndexType cornerOutput = { { 0, 0 , 0} };
+    typename ImageType3D::SizeType sizeOutput;
     unsigned int nbRows = 0;
     unsigned int nbCols = 0;
     unsigned int nbSlices = 0;    
@@ -763,9 +1322,11 @@ int ToolsItk::stack2Dto3DParallV2(std::string inputDirectory,  int beginX, int e
         nbCols = endX-beginX+1;
         nbSlices = endZ-beginZ+1;
     } else if(beginX == -1 && beginY == -1) { // case resize with factorResize        
-        ImageType2D::Pointer imageTemp = itk::ReadImage<ImageType2D>(namesClean.at(0));
-        ImageType2D::RegionType regionTemp = imageTemp->GetLargestPossibleRegion();
-        ImageType2D::SizeType sizeTemp;
+        typename ImageReaderType::Pointer readerTemp = ImageReaderType::New();
+        readerTemp->SetFileName(namesClean.at(0));
+        readerTemp->UpdateOutputInformation(); // only the header is read
+        typename ImageType2D::RegionType regionTemp = readerTemp->GetOutput()->GetLargestPossibleRegion();
+        typename ImageType2D::SizeType sizeTemp;
         sizeTemp = regionTemp.GetSize();
         std::cout << "sizeTemp = " << sizeTemp << std::endl;
         if(resize) { // case resize with factorResize
@@ -795,10 +1356,10 @@ int ToolsItk::stack2Dto3DParallV2(std::string inputDirectory,  int beginX, int e
     //std::cout << "maxX = " << maxX << std::endl;
     std::cout << "cornerOutput = " << cornerOutput << std::endl;
     std::cout << "sizeOutput = " << sizeOutput << std::endl;
-    ImageType3D::RegionType regionOutput(cornerOutput, sizeOutput);    
+    typename ImageType3D::RegionType regionOutput(cornerOutput, sizeOutput);    
     imageOutput->SetRegions(regionOutput);    
     imageOutput->Allocate();
-    ImageType3D::IndexType indexOutput;
+    typename ImageType3D::IndexType indexOutput;
     /*uint cpty =0;
     uint cptx =0;    
     for(int y=minY; y<maxY; y= y+factorResize) { 
@@ -818,11 +1379,11 @@ int ToolsItk::stack2Dto3DParallV2(std::string inputDirectory,  int beginX, int e
 
     auto reader = ImageReaderType::New();
 
-    InputImageType::Pointer inputImageTile;
-    InputImageType::RegionType region;
+    typename InputImageType::Pointer inputImageTile;
+    typename InputImageType::RegionType region;
     int cpt =0;
 
-    //std::vector<ImageType2D::Pointer> tabImages((endZ-beginZ+1)/factorResize+1);
+    //std::vector<typename ImageType2D::Pointer> tabImages((endZ-beginZ+1)/factorResize+1);
     std::vector<int> tabIndex((endZ-beginZ+1)/factorResize+1);
     //std::cout << "tabImages size = " << tabImages.size() << std::endl;
     std::cout << "tabIndex size = " << tabIndex.size() << std::endl;
@@ -845,71 +1406,66 @@ int ToolsItk::stack2Dto3DParallV2(std::string inputDirectory,  int beginX, int e
     std::chrono::duration<double> duration_write_image;
     double totalWriteImage = 0;
     
-    #pragma omp parallel for shared(stack) private(th_id) schedule(dynamic, 4)
-    for (int i=beginZ; i<endZ+1; i= i +factorResize)
-    {            
-        th_id = omp_get_thread_num();
-        auto start_timeLoad = std::chrono::high_resolution_clock::now();          
-        ImageType2D::Pointer image = itk::ReadImage<ImageType2D>(namesClean.at(i));
-        auto end_timeLoad = std::chrono::high_resolution_clock::now();
-        duration_load = end_timeLoad - start_timeLoad;
-        totalTimeLoad += duration_load.count();
-        ImageType2D::Pointer imageNew;
-        imageNew = ImageType2D::New();
-        if (resize) {
-            
-            auto start_changeSizeImage = std::chrono::high_resolution_clock::now();             
-            int res = changeSizeImage(image, imageNew, factorResize, beginX, endX, beginY, endY);
-            auto end_changeSizeImage = std::chrono::high_resolution_clock::now();
-            duration_changeSizeImage = end_changeSizeImage - start_changeSizeImage;
-            totalTimeChangeSizeImage +=  duration_changeSizeImage.count();
-            //tabImages[(i-beginZ)/factorResize] = imageNew;
-        
-        } else {
-            //tabImages[i-beginZ] = image; 
-            imageNew = image;               
-        }
+    std::vector<std::string> files;
+    for (int i=beginZ; i<endZ+1; i= i +factorResize) {
+        files.push_back(namesClean.at(i));
+    }
+    std::mutex mutexTime;
+    int slicesDone = 0; // number of slices copied, for the progress of the job
+    // the files are read ahead entirely only if the decode reads the whole slices, else only their header
+    bool wholeSlices = !(resize && beginX == -1 && beginY == -1) && !(beginX != -1 && beginY != -1);
+    SlicePipeline pipeline(ioThreads, decodeThreads);
+    int error = pipeline.run<typename ImageType2D::Pointer>(files, 
+        [&](size_t k, typename ImageType2D::Pointer &imageNew) -> int { // decode threads
+            auto start_timeLoad = std::chrono::high_resolution_clock::now();          
+            typename ImageType2D::Pointer image;
+            int factorDecoded = 1;
+            if (resize && beginX == -1 && beginY == -1) { // the whole slice is resized, the codec can skip the finest resolutions
+                image = readImageReduced<PixelType>(files[k], factorResize, factorDecoded);
+            } else if (beginX != -1 && beginY != -1 && resize) { // only the window is decoded, at the lowest resolution level compatible with factorResize
+                image = readImageReduced<PixelType>(files[k], factorResize, factorDecoded, beginX, endX, beginY, endY);
+            } else if (beginX != -1 && beginY != -1) { // only the window of the region of interest is decoded
+                image = readImageRegion<PixelType>(files[k], beginX, endX, beginY, endY);
+            } else {
+                image = itk::ReadImage<ImageType2D>(files[k]);
+            }
+            auto end_timeLoad = std::chrono::high_resolution_clock::now();
+            std::chrono::duration<double> duration_load = end_timeLoad - start_timeLoad;
+            double timeChangeSizeImage = 0;
+            if (resize) {
+                imageNew = ImageType2D::New();
+                auto start_changeSizeImage = std::chrono::high_resolution_clock::now();             
+                int res = changeSizeImage<PixelType>(image, imageNew, factorResize/factorDecoded, beginX == -1 ? -1 : beginX/factorDecoded, endX/factorDecoded, beginY == -1 ? -1 : beginY/factorDecoded, endY/factorDecoded, nbCols, nbRows);
+                auto end_changeSizeImage = std::chrono::high_resolution_clock::now();
+                std::chrono::duration<double> duration_changeSizeImage = end_changeSizeImage - start_changeSizeImage;
+                timeChangeSizeImage = duration_changeSizeImage.count();
+            } else {
+                imageNew = image;               
+            }
+            std::lock_guard<std::mutex> lock(mutexTime);
+            totalTimeLoad += duration_load.count();
+            totalTimeChangeSizeImage += timeChangeSizeImage;
+            return 0;
+        },
+        [&](size_t k, typename ImageType2D::Pointer &imageNew) -> int { // calling thread, the slice is copied in the volume
             auto start_writeImage = std::chrono::high_resolution_clock::now();
-            uint cpty =0;
-            uint cptx =0;
-            ImageType3D::IndexType indexOutput;
-            ImageType2D::IndexType indexImageNew;
+            int i = beginZ + k*factorResize;
             uint sizeXImageNew = nbCols;
             uint sizeYImageNew = nbRows;
-            // voir si on peut remplacer par un iterator   
-            /*for(int y=0; y<sizeYImageNew; y++) { 
-                indexImageNew[1]= y;
-                cptx=0;          
-                for(int x=0; x<sizeXImageNew; x++) { 
-                    indexImageNew[0]= x;        
-                    indexOutput[1] = cpty;
-                    indexOutput[0] = cptx;
-                    indexOutput[2] = i/factorResize;                    
-                    //printf("i = %d sizeXImageNew = %d sizeYImageNew = %d (%ld, %ld ) -> (%ld, %ld, %ld)\n" , i, sizeXImageNew, sizeYImageNew, indexImageNew[0], indexImageNew[1], indexOutput[0], indexOutput[1], indexOutput[2]);        
-                    imageOutput->SetPixel(indexOutput, imageNew->GetPixel(indexImageNew));            
-                    cptx++;              
-                }
-                cpty++;
-            }*/
-            constexpr unsigned int Dimension2D = 2;
-            constexpr unsigned int Dimension3D = 3;
-            using PixelType = unsigned int;
-            using ImageType2D = itk::Image<PixelType, Dimension2D>;
-            using ImageType3D = itk::Image<PixelType, Dimension3D>;
             using ConstIteratorType = itk::ImageRegionConstIterator<ImageType2D>;
             using IteratorType = itk::ImageRegionIterator<ImageType3D>;
-            ImageType2D::RegionType inputRegion;
-            ImageType2D::RegionType::IndexType inputStart;
-            ImageType2D::RegionType::SizeType inputSize;
+            typename ImageType2D::RegionType inputRegion;
+            typename ImageType2D::RegionType::IndexType inputStart;
+            typename ImageType2D::RegionType::SizeType inputSize;
             inputStart[0] = 0;
             inputStart[1] = 0;
             inputSize[0] = sizeXImageNew;
             inputSize[1] = sizeYImageNew;
             inputRegion.SetSize(inputSize);
             inputRegion.SetIndex(inputStart);
-            ImageType3D::RegionType outputRegion;
-            ImageType3D::RegionType::IndexType outputStart;
-            ImageType3D::RegionType::SizeType outputSize;
+            typename ImageType3D::RegionType outputRegion;
+            typename ImageType3D::RegionType::IndexType outputStart;
+            typename ImageType3D::RegionType::SizeType outputSize;
             outputStart[0] = 0;
             outputStart[1] = 0;
             outputStart[2] = i/factorResize;
@@ -928,39 +1484,16 @@ int ToolsItk::stack2Dto3DParallV2(std::string inputDirectory,  int beginX, int e
                 ++inputIt;
                 ++outputIt;
             }
-
-
             auto end_writeImage = std::chrono::high_resolution_clock::now();
             duration_write_image = end_writeImage - start_writeImage;
             totalWriteImage +=  duration_write_image.count();
-
-        
-            
-        tabIndex[(i-beginZ)/factorResize] = 1;
-            printf("Hello World from thread %d i = %d imod = %d stack = %d\n", th_id, i, (i-beginZ)/factorResize, stack);
-            std::cout << "tabIndex : ";
-            for(uint i=0; i<tabIndex.size(); i++ ) {
-                std::cout << tabIndex[i] << " ";
-            }
-            std::cout << std::endl;          
-        //#pragma omp critical
-        //{
-        //auto start_stack = std::chrono::high_resolution_clock::now();
-        //while(tabIndex[stack+1] == 1) {
-            //std::cout << namesClean.at((stack+1)*factorResize+beginZ) << std::endl;                
-            //tiler->SetInput(inputImageNumber++, tabImages[stack+1]);   
-            //tabImages[stack+1] = NULL;
-            //tabIndex[stack+1] = -1;
-            //stack++;                
-        //}
-        //auto end_stack = std::chrono::high_resolution_clock::now();
-        //duration_stack = end_stack - start_stack;
-        //totalStack +=  duration_stack.count(); 
-        //}
-
-
-
-        cpt++;
+            tabIndex[k] = 1;
+            slicesDone++;
+            std::cout << "progress " << slicesDone << "/" << files.size() << std::endl;
+            return 0;
+        }, wholeSlices);
+    if(error != 0) {
+        return -1;
     }
     std::cout << "Time load mean = " << totalTimeLoad/((endZ-beginZ+1)/factorResize) << std::endl;
     std::cout << "Time changeSizeImage mean = " << totalTimeChangeSizeImage/((endZ-beginZ+1)/factorResize) << std::endl;
@@ -998,48 +1531,850 @@ int ToolsItk::stack2Dto3DParallV2(std::string inputDirectory,  int beginX, int e
 }
 
 /** 
- * @brief compute the density profile
+ * @brief resize and stack several 2D images in a 3D NRRD file written slice by slice (parallel streaming version)
  * 
- * @param x the x coordinate of the origin point
- * @param y the y coordinate of the origin point
- * @param z the z coordinate of the origin point
- * @param vectorX the x coordinate of the direction vector
- * @param vectorY the y coordinate of the direction vector
- * @param vectorZ the z coordinate of the direction vector
- * @param nbpoints the number of points to be taken into account for calculating the profile
  * @param inputDirectory the directory that contains all the slices
- * @param outputFilename the name of the ouput file
- * @param inputFile the name of the input file
- * @param distanceNeighbors the neighborhood distance
- * @param measurement the nature of the  statistical instrument, m for mean, d for median, n for min, x for max
+ * @param begin the first slice
+ * @param end the last slice
+ * @param factorResize the image reduction factor
+ * @param output the name of the output file, .nrrd or .nhdr
+ * @param extension the extension of the slices
+ * @return the return value of the function stack2Dto3DParallStream 
+*/
+int ToolsItk::resizeImageParallStream(std::string inputDirectory, int begin, int end, int factorResize, std::string output, std::string extension) {    
+    std::string storeDirectory = findBrickStore(inputDirectory, extension);
+    std::string outputExtension = std::filesystem::path(output).extension().string();
+    if(storeDirectory != "" && (outputExtension == ".nrrd" || outputExtension == ".nhdr")) { // only the bricks of the slices are read
+        return resizeImageBricks(storeDirectory, begin, end, factorResize, output);
+    }
+    int res =0;
+    if(factorResize == 1) {
+        res = stack2Dto3DParallStream(inputDirectory, -1, 0, -1, 0, begin, end, output, false, factorResize, extension);
+    } else {
+        res = stack2Dto3DParallStream(inputDirectory, -1, 0, -1, 0, begin, end, output, true, factorResize, extension);
+    }    
+    std::cout << "res = " << res << std::endl;
+    return res;
+}
+
+
+/** 
+ * @brief stack several 2D images in a 3D NRRD file written slice by slice (parallel streaming version), the pixel type of the slices is kept
+ * 
+ * @param inputDirectory the directory that contains all the slices
+ * @param beginX the first position of the pixel in the x axis
+ * @param endX the last position of the pixel in the x axis
+ * @param beginY the first position of the pixel in the y axis
+ * @param endY the last position of the pixel in the y axis
+ * @param beginZ the first position of the pixel in the z axis
+ * @param endZ the last position of the pixel in the z axis 
+ * @param output the name of the ouput file
+ * @param resize true if the image must be reduced
+ * @param factorResize the image reduction factor 
+ * @param extension the format of the slices to be processed, example: jp2
+ * @return the return value of the function stack2Dto3DParallStreamTyped 
+*/
+int ToolsItk::stack2Dto3DParallStream(std::string inputDirectory,  int beginX, int endX, int beginY, int endY, int beginZ, int endZ, std::string output, bool resize, int factorResize, std::string extension) {
+    return dispatchPixelType(inputDirectory, extension, [&](auto pixel) {
+        return stack2Dto3DParallStreamTyped<decltype(pixel)>(inputDirectory, beginX, endX, beginY, endY, beginZ, endZ, output, resize, factorResize, extension);
+    });
+}
+
+
+/** 
+ * @brief stack several 2D images in a 3D NRRD file written slice by slice (parallel streaming version)
+ * 
+ * Contrary to stack2Dto3DParall and stack2Dto3DParallV2, the output volume is never in memory: each slice 
+ * is given to a NrrdStreamWriter as soon as it is decoded and resized, the writer appends it to the file 
+ * when all the previous slices have been written. The memory used stays around the number of threads 
+ * times the size of a slice.
+ * 
+ * @param inputDirectory the directory that contains all the slices
+ * @param beginX the first position of the pixel in the x axis
+ * @param endX the last position of the pixel in the x axis
+ * @param beginY the first position of the pixel in the y axis
+ * @param endY the last position of the pixel in the y axis
+ * @param beginZ the first position of the pixel in the z axis
+ * @param endZ the last position of the pixel in the z axis 
+ * @param output the name of the ouput file, .nrrd or .nhdr
+ * @param resize true if the image must be reduced
+ * @param factorResize the image reduction factor 
+ * @param extension the format of the slices to be processed, example: jp2
+ * @return returns 0 if no problem encountered, -1 otherwise
+*/
+template <typename TPixel>
+int ToolsItk::stack2Dto3DParallStreamTyped(std::string inputDirectory,  int beginX, int endX, int beginY, int endY, int beginZ, int endZ, std::string output, bool resize, int factorResize, std::string extension) {
+    std::cout << "outputImage = " << output << std::endl;
+    NrrdStreamWriter writer;
+    // the slices in progress before a missing one must fit in the writer: read, queued and decoded slices
+    SlicePipeline pipeline(ioThreads, decodeThreads);
+    writer.setCapacity(pipeline.getIoThreads() + pipeline.getQueueSize() + pipeline.getDecodeThreads() + 1);
+    int error = stackSlicesTyped<TPixel>(inputDirectory, beginX, endX, beginY, endY, beginZ, endZ, resize, factorResize, extension, 
+        [&](uint nbCols, uint nbRows, uint nbSlices) { return writer.open<TPixel>(output, nbCols, nbRows, nbSlices); },
+        [&](uint z, const TPixel * slice) { return writer.writeSlice(z, slice); });
+    if(writer.close() != 0) {
+        error = -1;
+    }
+    return error;
+}
+
+
+/** 
+ * @brief decode, crop and resize the slices in parallel and give each one to a function as soon as it is ready
+ * 
+ * The output volume is never in memory, the memory used stays around the number of threads times the size 
+ * of a slice. The volume has the size of the files written by stack2Dto3DParallV2. The decode threads give 
+ * each slice to writeSlice, a slice which can't be read or decoded is given with a null pointer.
+ * 
+ * @param inputDirectory the directory that contains all the slices
+ * @param beginX the first position of the pixel in the x axis
+ * @param endX the last position of the pixel in the x axis
+ * @param beginY the first position of the pixel in the y axis
+ * @param endY the last position of the pixel in the y axis
+ * @param beginZ the first position of the pixel in the z axis
+ * @param endZ the last position of the pixel in the z axis 
+ * @param resize true if the image must be reduced
+ * @param factorResize the image reduction factor 
+ * @param extension the format of the slices to be processed, example: jp2
+ * @param open called once with the size of the volume before the first slice
+ * @param writeSlice called with the index and the pixels of each slice, or a null pointer if the slice can't be 
+ * decoded, from several threads and in any order
+ * @return returns 0 if no problem encountered, -1 otherwise
+*/
+template <typename TPixel>
+int ToolsItk::stackSlicesTyped(std::string inputDirectory, int beginX, int endX, int beginY, int endY, int beginZ, int endZ, bool resize, int factorResize, std::string extension, 
+        std::function<int(uint nbCols, uint nbRows, uint nbSlices)> open, std::function<int(uint z, const TPixel * slice)> writeSlice) {
+    using PixelType = TPixel;
+    using ImageType2D = itk::Image<PixelType, 2>;
+    using ImageType3D = itk::Image<PixelType, 3>;
+    using ImageReaderType = itk::ImageFileReader<ImageType2D>;
+    std::vector<std::string> names ;
+    std::vector<std::string> namesClean;
+    listSlices(inputDirectory, extension, names); // sorted list of the slices, from the slice index if it is up to date
+    cleanList(names, namesClean, extension);
+    if(namesClean.size() < (endZ-beginZ+1)) {
+        std::cerr << "There are not enough files with extension " << extension << std::endl;
+        return -1;
+    }
+    std::cout << "inputDirectory = " << inputDirectory << std::endl;
+    std::cout << "factorResize = " << factorResize << std::endl;
+    std::cout << "beginX = " << beginX << std::endl;
+    std::cout << "endX = " << endX << std::endl;
+    std::cout << "beginY = " << beginY << std::endl;
+    std::cout << "endY = " << endY << std::endl;
+    std::cout << "beginZ = " << beginZ << std::endl;
+    std::cout << "endZ = " << endZ << std::endl;
+    if(endZ > namesClean.size()-1) {
+        std::cout << "The point can't be in the area, axis Z." << std::endl;
+        return -1;
+    } 
+
+    // same size of the output volume as stack2Dto3DParallV2
+    unsigned int nbRows = 0;
+    unsigned int nbCols = 0;
+    unsigned int nbSlices = 0;    
+    if(beginX != -1 && beginY != -1) { // case ROI
+        std::cout << "case ROI" << std::endl;
+        nbRows = (endY-beginY)/factorResize+1;
+        nbCols = (endX-beginX)/factorResize+1;
+        nbSlices = (endZ-beginZ)/factorResize+1;
+    } else {
+        typename ImageReaderType::Pointer readerTemp = ImageReaderType::New();
+        readerTemp->SetFileName(namesClean.at(beginZ));
+        readerTemp->UpdateOutputInformation(); // only the header is read
+        typename ImageType2D::SizeType sizeTemp = readerTemp->GetOutput()->GetLargestPossibleRegion().GetSize();
+        std::cout << "sizeTemp = " << sizeTemp << std::endl;
+        if(resize) { // case resize with factorResize
+            std::cout << "case resize Image" << std::endl;
+            nbRows = sizeTemp[1]/factorResize+1;
+            nbCols = sizeTemp[0]/factorResize+1;
+            nbSlices = (endZ-beginZ+1)/factorResize+1;
+        } else { // stack  without resize
+            std::cout << "stack without resize" << std::endl;
+            nbRows = sizeTemp[1];
+            nbCols = sizeTemp[0];
+            nbSlices = endZ-beginZ+1;
+        }        
+    }    
+    std::cout << "nbRows = " << nbRows << std::endl;
+    std::cout << "nbCols = " << nbCols << std::endl;
+    std::cout << "nbSlices = " << nbSlices << std::endl;
+
+    if(open(nbCols, nbRows, nbSlices) != 0) {
+        return -1;
+    }
+    std::vector<std::string> files;
+    for (int i=beginZ; i<endZ+1; i= i +factorResize) {
+        files.push_back(namesClean.at(i));
+    }
+    double totalTimeLoad = 0;
+    std::mutex mutexTime;
+    double totalWrite = 0;
+    int slicesDone = 0; // number of slices written, for the progress of the job
+    
+    // the files are read ahead entirely only if the decode reads the whole slices, else only their header
+    bool wholeSlices = !(resize && beginX == -1 && beginY == -1) && !(beginX != -1 && beginY != -1);
+    SlicePipeline pipeline(ioThreads, decodeThreads);
+    int error = pipeline.run<typename ImageType2D::Pointer>(files, 
+        [&](size_t k, typename ImageType2D::Pointer &imageNew) -> int { // decode threads, each slice is given to writeSlice as soon as it is ready
+            auto start_timeLoad = std::chrono::high_resolution_clock::now();          
+            int res = 0;
+            try {
+                typename ImageType2D::Pointer image;
+                int factorDecoded = 1;
+                if (resize && beginX == -1 && beginY == -1) { // the whole slice is resized, the codec can skip the finest resolutions
+                    image = readImageReduced<PixelType>(files[k], factorResize, factorDecoded);
+                } else if (beginX != -1 && beginY != -1 && resize) { // only the window is decoded, at the lowest resolution level compatible with factorResize
+                    image = readImageReduced<PixelType>(files[k], factorResize, factorDecoded, beginX, endX, beginY, endY);
+                } else if (beginX != -1 && beginY != -1) { // only the window of the region of interest is decoded
+                    image = readImageRegion<PixelType>(files[k], beginX, endX, beginY, endY);
+                } else {
+                    image = itk::ReadImage<ImageType2D>(files[k]);
+                }
+                imageNew = image;
+                if (resize || (beginX != -1 && beginY != -1)) {
+                    imageNew = ImageType2D::New();
+                    res = changeSizeImage<PixelType>(image, imageNew, factorResize/factorDecoded, beginX == -1 ? -1 : beginX/factorDecoded, endX/factorDecoded, beginY == -1 ? -1 : beginY/factorDecoded, endY/factorDecoded, nbCols, nbRows);
+                }
+            } catch (const std::exception & excp) { // the slice is given as missing, so the writer doesn't wait for it
+                std::cerr << "stackSlices " << files[k] << " " << excp.what() << std::endl;
+                res = -1;
+            }
+            std::chrono::duration<double> duration_load = std::chrono::high_resolution_clock::now() - start_timeLoad;
+            auto start_write = std::chrono::high_resolution_clock::now();
+            if(writeSlice(k, res == 0 ? imageNew->GetBufferPointer() : nullptr) != 0) {
+                res = -1;
+            }
+            std::chrono::duration<double> duration_write = std::chrono::high_resolution_clock::now() - start_write;
+            imageNew = nullptr; // the slice is written, the calling thread only counts it
+            std::lock_guard<std::mutex> lock(mutexTime);
+            totalTimeLoad += duration_load.count();
+            totalWrite += duration_write.count();
+            return res;
+        },
+        [&](size_t k, typename ImageType2D::Pointer &imageNew) -> int { // calling thread, progress of the job
+            slicesDone++;
+            std::cout << "progress " << slicesDone << "/" << files.size() << std::endl;
+            return 0;
+        }, wholeSlices);
+    std::cout << "Time load mean = " << totalTimeLoad/files.size() << std::endl;
+    std::cout << "Time write mean = " << totalWrite/files.size() << std::endl;
+    return error;  
+}
+
+
+/** 
+ * @brief stack several 2D images in a buffer given by the caller, the pixel type of the slices is kept
+ * 
+ * The volume has the size of the files written by stack2Dto3DParallV2, it is used by the Python module 
+ * citrusToolsItk to fill a NumPy array without writing a file.
+ * 
+ * @param inputDirectory the directory that contains all the slices
+ * @param beginX the first position of the pixel in the x axis
+ * @param endX the last position of the pixel in the x axis
+ * @param beginY the first position of the pixel in the y axis
+ * @param endY the last position of the pixel in the y axis
+ * @param beginZ the first position of the pixel in the z axis
+ * @param endZ the last position of the pixel in the z axis 
+ * @param resize true if the image must be reduced
+ * @param factorResize the image reduction factor 
+ * @param extension the format of the slices to be processed, example: jp2
+ * @param allocate called with the size of the volume and the pixel type, returns a buffer of nbCols*nbRows*nbSlices 
+ * pixels filled with 0 (x fastest, then y, then z), or a null pointer if it can't be allocated
+ * @return returns 0 if no problem encountered, -1 otherwise
+*/
+int ToolsItk::stack2Dto3DParallBuffer(std::string inputDirectory, int beginX, int endX, int beginY, int endY, int beginZ, int endZ, bool resize, int factorResize, std::string extension, 
+        std::function<void *(uint nbCols, uint nbRows, uint nbSlices, itk::ImageIOBase::IOComponentEnum componentType)> allocate) {
+    return dispatchPixelType(inputDirectory, extension, [&](auto pixel) {
+        using PixelType = decltype(pixel);
+        PixelType * buffer = nullptr;
+        size_t sizeSlice = 0;
+        uint nbSlicesBuffer = 0;
+        return stackSlicesTyped<PixelType>(inputDirectory, beginX, endX, beginY, endY, beginZ, endZ, resize, factorResize, extension, 
+            [&](uint nbCols, uint nbRows, uint nbSlices) {
+                buffer = static_cast<PixelType *>(allocate(nbCols, nbRows, nbSlices, itk::ImageIOBase::MapPixelType<PixelType>::CType));
+                sizeSlice = (size_t)nbCols * nbRows;
+                nbSlicesBuffer = nbSlices;
+                return buffer == nullptr ? -1 : 0;
+            },
+            [&](uint z, const PixelType * slice) {
+                if(z >= nbSlicesBuffer) return -1;
+                if(slice == nullptr) return 0; // the slice can't be decoded, it stays filled with 0
+                std::copy(slice, slice + sizeSlice, buffer + z * sizeSlice);
+                return 0;
+            });
+    });
+}
+
+
+/** 
+ * @brief build the volumes of an acquisition directory resized by 2, 4, 8, 16 and 32 in one pass, the pixel type of the slices is kept
+ * 
+ * @param inputDirectory the directory that contains all the slices
+ * @param begin the first slice
+ * @param end the last slice
+ * @param outputDirectory the directory of the pyramid
+ * @param extension the format of the slices, example: jp2
+ * @return the return value of the function buildPyramidTyped 
+*/
+int ToolsItk::buildPyramid(std::string inputDirectory, int begin, int end, std::string outputDirectory, std::string extension) {
+    return dispatchPixelType(inputDirectory, extension, [&](auto pixel) {
+        return buildPyramidTyped<decltype(pixel)>(inputDirectory, begin, end, outputDirectory, extension);
+    });
+}
+
+
+/** 
+ * @brief build the volumes of an acquisition directory resized by 2, 4, 8, 16 and 32 in one pass
+ * 
+ * Each slice used by a level is decoded once (at half resolution for JPEG 2000, see readImageReduced) and 
+ * resized for all the levels which keep it. The levels are written slice by slice with NrrdStreamWriter in 
+ * outputDirectory/pyramid_<factor>.nrrd, they have the size of the files built by resizeImageParall. 
+ * The manifest outputDirectory/pyramid.json describes the levels, the module t_ZoomRoi adds the input directory 
+ * and the signature of the slices to it.
+ * 
+ * @param inputDirectory the directory that contains all the slices
+ * @param begin the first slice
+ * @param end the last slice
+ * @param outputDirectory the directory of the pyramid, created if it doesn't exist
+ * @param extension the format of the slices, example: jp2
+ * @return returns 0 if no problem encountered, -1 otherwise
+*/
+template <typename TPixel>
+int ToolsItk::buildPyramidTyped(std::string inputDirectory, int begin, int end, std::string outputDirectory, std::string extension) {
+    using PixelType = TPixel;
+    using ImageType2D = itk::Image<PixelType, 2>;
+    using ImageReaderType = itk::ImageFileReader<ImageType2D>;
+    std::cout << "omp_get_num_procs () = " << omp_get_num_procs() << std::endl;
+    omp_set_num_threads(omp_get_num_procs());
+    std::vector<std::string> names ;
+    std::vector<std::string> namesClean;
+    listSlices(inputDirectory, extension, names); // sorted list of the slices, from the slice index if it is up to date
+    cleanList(names, namesClean, extension);
+    if(end > (int)namesClean.size()-1 || begin < 0 || begin > end) {
+        std::cerr << "There are not enough files with extension " << extension << std::endl;
+        return -1;
+    }
+    std::filesystem::create_directories(outputDirectory);
+    typename ImageReaderType::Pointer readerTemp = ImageReaderType::New();
+    readerTemp->SetFileName(namesClean.at(begin));
+    readerTemp->UpdateOutputInformation(); // only the header is read
+    typename ImageType2D::SizeType sizeTemp = readerTemp->GetOutput()->GetLargestPossibleRegion().GetSize();
+    std::cout << "sizeTemp = " << sizeTemp << std::endl;
+
+    std::vector<int> factors = {2, 4, 8, 16, 32};
+    std::vector<NrrdStreamWriter> writers(factors.size());
+    std::vector<std::vector<uint>> sizes(factors.size());
+    for(uint l=0; l<factors.size(); l++) {
+        sizes[l] = {(uint)(sizeTemp[0]/factors[l]+1), (uint)(sizeTemp[1]/factors[l]+1), (uint)((end-begin+1)/factors[l]+1)};
+        std::string filename = outputDirectory + "/pyramid_" + std::to_string(factors[l]) + ".nrrd";
+        if(writers[l].open<PixelType>(filename, sizes[l][0], sizes[l][1], sizes[l][2]) != 0) {
+            return -1;
+        }
+    }
+    int error = 0;
+    std::chrono::duration<double> duration_load;
+    double totalTimeLoad = 0;
+
+    int slicesDone = 0; // number of slices read, for the progress of the job
+    #pragma omp parallel for schedule(dynamic, 4)
+    for (int i=begin; i<end+1; i= i + factors[0]) // the slices not used by the first level are not used by the others
+    {
+        auto start_timeLoad = std::chrono::high_resolution_clock::now();          
+        int factorDecoded = 1;
+        typename ImageType2D::Pointer image = readImageReduced<PixelType>(namesClean.at(i), factors[0], factorDecoded);
+        auto end_timeLoad = std::chrono::high_resolution_clock::now();
+        duration_load = end_timeLoad - start_timeLoad;
+        #pragma omp critical
+        {
+        totalTimeLoad += duration_load.count();
+        slicesDone++;
+        std::cout << "progress " << slicesDone << "/" << (end-begin)/factors[0]+1 << std::endl;
+        }
+        for(uint l=0; l<factors.size(); l++) {
+            if((i-begin) % factors[l] != 0) break; // the factors are multiples of the previous ones
+            typename ImageType2D::Pointer imageNew = ImageType2D::New();
+            int res = changeSizeImage<PixelType>(image, imageNew, factors[l]/factorDecoded, -1, 0, -1, 0, sizes[l][0], sizes[l][1]);
+            // a slice which can't be resized is given as missing, the threads waiting for it go on
+            if(writers[l].writeSlice((i-begin)/factors[l], res == 0 ? imageNew->GetBufferPointer() : nullptr) != 0 || res != 0) {
+                #pragma omp atomic write
+                error = -1;
+            }
+        }
+    }
+    for(uint l=0; l<factors.size(); l++) {
+        if(writers[l].close() != 0) {
+            error = -1;
+        }
+    }
+    std::cout << "Time load mean = " << totalTimeLoad/((end-begin)/factors[0]+1) << std::endl;
+    if(error != 0) {
+        return error;
+    }
+
+    std::ofstream manifest(outputDirectory + "/pyramid.json");
+    manifest << "{" << std::endl;
+    manifest << "    \"extension\": \"" << extension << "\"," << std::endl;
+    manifest << "    \"begin\": " << begin << "," << std::endl;
+    manifest << "    \"end\": " << end << "," << std::endl;
+    manifest << "    \"numberOfSlices\": " << namesClean.size() << "," << std::endl;
+    manifest << "    \"size\": [" << sizeTemp[0] << ", " << sizeTemp[1] << ", " << end-begin+1 << "]," << std::endl;
+    manifest << "    \"levels\": [" << std::endl;
+    for(uint l=0; l<factors.size(); l++) {
+        manifest << "        {\"factor\": " << factors[l] << ", \"file\": \"pyramid_" << factors[l] << ".nrrd\", \"size\": [" 
+                 << sizes[l][0] << ", " << sizes[l][1] << ", " << sizes[l][2] << "]}" << (l+1 < factors.size() ? "," : "") << std::endl;
+    }
+    manifest << "    ]" << std::endl;
+    manifest << "}" << std::endl;
+    return manifest ? 0 : -1;
+}
+
+
+/** 
+ * @brief find the brick store of an acquisition directory
+ * 
+ * The store is looked for in the directory itself, in its subdirectory citrusSkinBricks and in 
+ * $HOME/.citrusSkin/bricks/ under the path of the directory where "/" is replaced by "_". 
+ * A store whose number of slices is not the number of slices of the directory is ignored.
+ * 
+ * @param inputDirectory the directory that contains all the slices
+ * @param extension the format of the slices, example: jp2
+ * @return returns the directory of the store, an empty string if there is no store
+*/
+std::string ToolsItk::findBrickStore(std::string inputDirectory, std::string extension) {
+    std::string directory = std::filesystem::absolute(inputDirectory).lexically_normal().string();
+    while(directory.size() > 1 && directory.back() == '/') directory.pop_back();
+    std::string nameStore = directory;
+    std::replace(nameStore.begin(), nameStore.end(), '/', '_');
+    std::vector<std::string> storeDirectories = {directory, directory + "/citrusSkinBricks"};
+    if(getenv("HOME") != NULL) {
+        storeDirectories.push_back(std::string(getenv("HOME")) + "/.citrusSkin/bricks/" + nameStore);
+    }
+    std::string signature;
+    bool listed = false;
+    for(uint k=0; k<storeDirectories.size(); k++) {
+        BrickStore store;
+        if(store.open(storeDirectories.at(k)) != 0) continue;
+        if(!listed) {
+            std::vector<std::string> names;
+            std::vector<std::string> namesClean;
+            listSlices(inputDirectory, extension, names);
+            cleanList(names, namesClean, extension);
+            signature = namesClean.empty() ? "" : slicesSignature(namesClean);
+            listed = true;
+        }
+        if(k == 0 && signature.empty()) return storeDirectories.at(k); // the directory is a store, not a directory of slices
+        if(!signature.empty() && store.slicesSignature == signature) {
+            return storeDirectories.at(k);
+        }
+        std::cout << "findBrickStore " << storeDirectories.at(k) << " is out of date, the slices are read" << std::endl;
+    }
+    return "";
+}
+
+
+/** 
+ * @brief compute the signature of the slices of a directory, it changes when a slice is added, removed or rewritten
+ * 
+ * The signature is the number of slices and a hash (FNV-1a) of the name, the size and the modification time of 
+ * each slice. It is stored in the brick store when it is built (see buildBricksTyped) and compared by 
+ * findBrickStore before the store is used.
+ * 
+ * @param namesClean the sorted list of the slices
+ * @return returns the signature, example: 2048:9f3c0a17b2d45e61
+*/
+std::string ToolsItk::slicesSignature(const std::vector<std::string> &namesClean) {
+    uint64_t hash = 14695981039346656037ULL;
+    auto add = [&hash](const std::string &text) {
+        for(unsigned char c : text) {
+            hash ^= c;
+            hash *= 1099511628211ULL;
+        }
+    };
+    for(const std::string &name : namesClean) {
+        struct stat statSlice;
+        long long size = -1;
+        long long mtime = -1;
+        if(stat(name.c_str(), &statSlice) == 0) {
+            size = statSlice.st_size;
+#ifdef __APPLE__
+            mtime = (long long)statSlice.st_mtimespec.tv_sec * 1000000000LL + statSlice.st_mtimespec.tv_nsec;
+#else
+            mtime = (long long)statSlice.st_mtim.tv_sec * 1000000000LL + statSlice.st_mtim.tv_nsec;
+#endif
+        }
+        add(std::filesystem::path(name).filename().string() + " " + std::to_string(size) + " " + std::to_string(mtime) + "\n");
+    }
+    std::ostringstream signature;
+    signature << namesClean.size() << ":" << std::hex << std::setw(16) << std::setfill('0') << hash;
+    return signature.str();
+}
+
+
+/** 
+ * @brief build the brick store of an acquisition directory, the pixel type of the slices is kept
+ * 
+ * @param inputDirectory the directory that contains all the slices
+ * @param outputDirectory the directory of the store
+ * @param extension the format of the slices, example: jp2
+ * @param memoryMB the memory used to hold the slices being cut in bricks, in Mo
+ * @return the return value of the function buildBricksTyped 
+*/
+int ToolsItk::buildBricks(std::string inputDirectory, std::string outputDirectory, std::string extension, int memoryMB) {
+    itk::ImageIOBase::IOComponentEnum componentType = readComponentType(inputDirectory, extension);
+    return dispatchComponentType(componentType, [&](auto pixel) {
+        return buildBricksTyped<decltype(pixel)>(inputDirectory, outputDirectory, extension, memoryMB, itk::ImageIOBase::GetComponentTypeAsString(componentType));
+    });
+}
+
+
+/** 
+ * @brief build the brick store of an acquisition directory
+ * 
+ * The slices are processed by layers of brickSize slices. To bound the memory, a layer is read by bands of rows 
+ * (a multiple of brickSize rows) with readImageRegion, then the bricks of the band are compressed in parallel.
+ * 
+ * @param inputDirectory the directory that contains all the slices
+ * @param outputDirectory the directory of the store
+ * @param extension the format of the slices, example: jp2
+ * @param memoryMB the memory used to hold the slices being cut in bricks, in Mo
+ * @param componentType the ITK name of the pixel type
+ * @return returns 0 if no problem encountered, -1 otherwise
+*/
+template <typename TPixel>
+int ToolsItk::buildBricksTyped(std::string inputDirectory, std::string outputDirectory, std::string extension, int memoryMB, std::string componentType) {
+    using PixelType = TPixel;
+    using ImageType2D = itk::Image<PixelType, 2>;
+    using ImageReaderType = itk::ImageFileReader<ImageType2D>;
+    using ConstIteratorType = itk::ImageRegionConstIterator<ImageType2D>;
+    std::cout << "omp_get_num_procs () = " << omp_get_num_procs() << std::endl;
+    omp_set_num_threads(omp_get_num_procs());
+    std::vector<std::string> names ;
+    std::vector<std::string> namesClean;
+    listSlices(inputDirectory, extension, names); // sorted list of the slices, from the slice index if it is up to date
+    cleanList(names, namesClean, extension);
+    if(namesClean.size() == 0) {
+        std::cerr << "There are no files with extension " << extension << std::endl;
+        return -1;
+    }
+    typename ImageReaderType::Pointer readerTemp = ImageReaderType::New();
+    readerTemp->SetFileName(namesClean.at(0));
+    readerTemp->UpdateOutputInformation(); // only the header is read
+    typename ImageType2D::SizeType sizeTemp = readerTemp->GetOutput()->GetLargestPossibleRegion().GetSize();
+    uint sizeX = sizeTemp[0];
+    uint sizeY = sizeTemp[1];
+    uint sizeZ = namesClean.size();
+
+    BrickStore store;
+    if(store.create(outputDirectory, sizeX, sizeY, sizeZ, componentType, sizeof(PixelType)) != 0) {
+        return -1;
+    }
+    store.slicesSignature = slicesSignature(namesClean); // computed before the slices are read, a slice rewritten meanwhile makes the store out of date
+    uint brickSize = store.brickSize;
+    size_t rowsPerPass = ((size_t)memoryMB * 1000 * 1000 / ((size_t)sizeX * brickSize * sizeof(PixelType))) / brickSize * brickSize;
+    rowsPerPass = std::max<size_t>(rowsPerPass, brickSize);
+    std::cout << "rowsPerPass = " << rowsPerPass << std::endl;
+    int error = 0;
+    std::vector<PixelType> band;
+    for(uint bz=0; bz<store.nbBricksZ; bz++) {
+        uint beginZ = bz * brickSize;
+        uint nbZ = std::min<uint>(brickSize, sizeZ - beginZ);
+        for(uint beginY=0; beginY<sizeY; beginY += rowsPerPass) {
+            uint nbY = std::min<uint>(rowsPerPass, sizeY - beginY);
+            band.assign((size_t)nbZ * nbY * sizeX, 0);
+            #pragma omp parallel for schedule(dynamic)
+            for(uint k=0; k<nbZ; k++) {
+                typename ImageType2D::Pointer image;
+                if(nbY == sizeY) {
+                    image = itk::ReadImage<ImageType2D>(namesClean.at(beginZ + k));
+                } else {
+                    image = readImageRegion<PixelType>(namesClean.at(beginZ + k), 0, sizeX-1, beginY, beginY+nbY-1);
+                }
+                typename ImageType2D::IndexType corner;
+                corner[0] = 0;
+                corner[1] = beginY;
+                typename ImageType2D::SizeType size;
+                size[0] = sizeX;
+                size[1] = nbY;
+                typename ImageType2D::RegionType region(corner, size);
+                ConstIteratorType inputIt(image, region);
+                PixelType * output = band.data() + (size_t)k * nbY * sizeX;
+                for(inputIt.GoToBegin(); !inputIt.IsAtEnd(); ++inputIt) {
+                    *output++ = inputIt.Get();
+                }
+            }
+            uint beginBY = beginY / brickSize;
+            uint nbBY = (nbY + brickSize - 1) / brickSize;
+            #pragma omp parallel for schedule(dynamic)
+            for(uint b=0; b<nbBY * store.nbBricksX; b++) {
+                uint bx = b % store.nbBricksX;
+                uint by = beginBY + b / store.nbBricksX;
+                std::vector<PixelType> brick((size_t)brickSize * brickSize * brickSize, 0);
+                uint nbX = std::min<uint>(brickSize, sizeX - bx * brickSize);
+                uint nbRows = std::min<uint>(brickSize, sizeY - by * brickSize);
+                for(uint z=0; z<nbZ; z++) {
+                    for(uint y=0; y<nbRows; y++) {
+                        const PixelType * input = band.data() + ((size_t)z * nbY + (by * brickSize + y - beginY)) * sizeX + bx * brickSize;
+                        std::copy(input, input + nbX, brick.data() + ((size_t)z * brickSize + y) * brickSize);
+                    }
+                }
+                if(store.writeBrick(bx, by, bz, brick.data()) != 0) {
+                    #pragma omp atomic write
+                    error = -1;
+                }
+            }
+        }
+        std::cout << "progress " << bz+1 << "/" << store.nbBricksZ << std::endl;
+    }
+    if(store.close() != 0) {
+        error = -1;
+    }
+    return error;
+}
+
+
+/** 
+ * @brief read a box of a brick store in an image, the pixels are converted to TPixel
+ * 
+ * @param store the brick store, opened
+ * @param beginX the first position of the pixel in the x axis
+ * @param endX the last position of the pixel in the x axis
+ * @param beginY the first position of the pixel in the y axis
+ * @param endY the last position of the pixel in the y axis
+ * @param beginZ the first position of the pixel in the z axis
+ * @param endZ the last position of the pixel in the z axis 
+ * @param keepIndex true if the pixels keep their index in the volume (the largest possible region of the image is 
+ * the volume and its buffered region is the box), false if the image is the box
+ * @return returns the pointer to the image, a null pointer if the box can't be read
+*/
+template <typename TPixel>
+typename itk::Image<TPixel, 3>::Pointer ToolsItk::readBricks(BrickStore &store, int beginX, int endX, int beginY, int endY, int beginZ, int endZ, bool keepIndex) {
+    using ImageType3D = itk::Image<TPixel, 3>;
+    typename ImageType3D::IndexType cornerVolume = { { 0, 0, 0 } };
+    typename ImageType3D::SizeType sizeVolume;
+    sizeVolume[0] = store.sizeX;
+    sizeVolume[1] = store.sizeY;
+    sizeVolume[2] = store.sizeZ;
+    typename ImageType3D::IndexType corner = { { 0, 0, 0 } };
+    if(keepIndex) {
+        corner[0] = beginX;
+        corner[1] = beginY;
+        corner[2] = beginZ;
+    }
+    typename ImageType3D::SizeType size;
+    size[0] = endX - beginX + 1;
+    size[1] = endY - beginY + 1;
+    size[2] = endZ - beginZ + 1;
+    typename ImageType3D::RegionType region(corner, size);
+    typename ImageType3D::Pointer image = ImageType3D::New();
+    image->SetLargestPossibleRegion(keepIndex ? typename ImageType3D::RegionType(cornerVolume, sizeVolume) : region);
+    image->SetBufferedRegion(region);
+    image->SetRequestedRegion(region);
+    image->Allocate();
+    int res = dispatchComponentType(itk::ImageIOBase::GetComponentTypeFromString(store.componentType), [&](auto pixel) {
+        std::vector<decltype(pixel)> box((size_t)size[0] * size[1] * size[2]);
+        if(store.readBox(beginX, endX, beginY, endY, beginZ, endZ, box.data()) != 0) {
+            return -1;
+        }
+        std::transform(box.begin(), box.end(), image->GetBufferPointer(), [](decltype(pixel) value) { return static_cast<TPixel>(value); });
+        return 0;
+    });
+    if(res != 0) {
+        return nullptr;
+    }
+    return image;
+}
+
+
+/** 
+ * @brief create a region of interest (ROI) from a brick store, the pixel type of the store is kept
+ * 
+ * @param storeDirectory the directory of the brick store
+ * @param beginX the first position of the pixel in the x axis
+ * @param endX the last position of the pixel in the x axis
+ * @param beginY the first position of the pixel in the y axis
+ * @param endY the last position of the pixel in the y axis
+ * @param beginZ the first position of the pixel in the z axis
+ * @param endZ the last position of the pixel in the z axis 
+ * @param outputFile the name of the ouput file
+ * @return returns 0 if no problem encountered, -1 otherwise
+*/
+int ToolsItk::createRoiBricks(std::string storeDirectory, int beginX, int endX, int beginY, int endY, int beginZ, int endZ, std::string outputFile) {
+    BrickStore store;
+    if(store.open(storeDirectory) != 0) {
+        return -1;
+    }
+    if(endX > (int)store.sizeX-1 || endY > (int)store.sizeY-1 || endZ > (int)store.sizeZ-1) {
+        std::cout << "The point can't be in the area." << std::endl;
+        return -1;
+    }
+    return dispatchComponentType(itk::ImageIOBase::GetComponentTypeFromString(store.componentType), [&](auto pixel) {
+        using ImageType3D = itk::Image<decltype(pixel), 3>;
+        typename ImageType3D::Pointer image = readBricks<decltype(pixel)>(store, beginX, endX, beginY, endY, beginZ, endZ, false);
+        if(!image) {
+            return -1;
+        }
+        try
+        {
+            itk::WriteImage(image, outputFile);
+        }
+        catch (const itk::ExceptionObject & excp)
+        {
+            std::cerr << excp << std::endl;
+            return -1;
+        }
+        return 0;
+    });
+}
+
+
+/** 
+ * @brief resize the slices begin to end of a brick store in a 3D NRRD file written slice by slice, the pixel type of the store is kept
+ * 
+ * @param storeDirectory the directory of the brick store
+ * @param begin the first slice
+ * @param end the last slice
+ * @param factorResize the image reduction factor
+ * @param output the name of the output file, .nrrd or .nhdr
+ * @return the return value of the function resizeImageBricksTyped 
+*/
+int ToolsItk::resizeImageBricks(std::string storeDirectory, int begin, int end, int factorResize, std::string output) {
+    BrickStore store;
+    if(store.open(storeDirectory) != 0) {
+        return -1;
+    }
+    return dispatchComponentType(itk::ImageIOBase::GetComponentTypeFromString(store.componentType), [&](auto pixel) {
+        return resizeImageBricksTyped<decltype(pixel)>(store, begin, end, factorResize, output);
+    });
+}
+
+
+/** 
+ * @brief resize the slices begin to end of a brick store in a 3D NRRD file written slice by slice
+ * 
+ * The store is read by layers of bricks along z and by rows of bricks along y, only the layers which contain 
+ * slices kept by factorResize are read. The output has the size of the files built by stack2Dto3DParallV2.
+ * 
+ * @param store the brick store, opened
+ * @param begin the first slice
+ * @param end the last slice
+ * @param factorResize the image reduction factor
+ * @param output the name of the output file, .nrrd or .nhdr
+ * @return returns 0 if no problem encountered, -1 otherwise
+*/
+template <typename TPixel>
+int ToolsItk::resizeImageBricksTyped(BrickStore &store, int begin, int end, int factorResize, std::string output) {
+    using PixelType = TPixel;
+    if(begin < 0 || end > (int)store.sizeZ-1 || begin > end) {
+        std::cout << "The point can't be in the area, axis Z." << std::endl;
+        return -1;
+    }
+    uint nbCols = store.sizeX;
+    uint nbRows = store.sizeY;
+    uint nbSlices = end-begin+1;
+    if(factorResize > 1) {
+        nbCols = store.sizeX/factorResize+1;
+        nbRows = store.sizeY/factorResize+1;
+        nbSlices = (end-begin+1)/factorResize+1;
+    }
+    NrrdStreamWriter writer;
+    if(writer.open<PixelType>(output, nbCols, nbRows, nbSlices) != 0) {
+        return -1;
+    }
+    int error = 0;
+    uint brickSize = store.brickSize;
+    for(uint bz=begin/brickSize; bz<=end/brickSize; bz++) {
+        std::vector<int> slicesZ; // slices of the layer kept by factorResize
+        for(int z=std::max<int>(begin, bz*brickSize); z<=std::min<int>(end, (bz+1)*brickSize-1); z++) {
+            if((z-begin) % factorResize == 0) slicesZ.push_back(z);
+        }
+        if(slicesZ.size() == 0) continue;
+        std::vector<std::vector<PixelType>> slices(slicesZ.size(), std::vector<PixelType>((size_t)nbCols * nbRows, 0));
+        for(uint by=0; by<store.nbBricksY; by++) {
+            int beginY = by * brickSize;
+            int endY = std::min<int>(store.sizeY-1, (by+1)*brickSize-1);
+            int firstY = (beginY + factorResize - 1) / factorResize * factorResize; // first row kept by factorResize
+            if(firstY > endY) continue;
+            size_t boxY = endY - beginY + 1;
+            std::vector<PixelType> band((size_t)store.sizeX * boxY * (slicesZ.back() - slicesZ.front() + 1));
+            if(store.readBox(0, store.sizeX-1, beginY, endY, slicesZ.front(), slicesZ.back(), band.data()) != 0) {
+                error = -1;
+                break;
+            }
+            for(uint s=0; s<slicesZ.size(); s++) {
+                for(int y=firstY; y<=endY; y+=factorResize) {
+                    const PixelType * input = band.data() + ((size_t)(slicesZ[s] - slicesZ.front()) * boxY + (y - beginY)) * store.sizeX;
+                    PixelType * outputRow = slices[s].data() + (size_t)(y / factorResize) * nbCols;
+                    for(uint x=0; x<store.sizeX; x+=factorResize) {
+                        outputRow[x / factorResize] = input[x];
+                    }
+                }
+            }
+        }
+        for(uint s=0; s<slicesZ.size() && error == 0; s++) {
+            if(writer.writeSlice((slicesZ[s]-begin)/factorResize, slices[s].data()) != 0) {
+                error = -1;
+            }
+        }
+        std::cout << "progress " << bz+1 << "/" << end/brickSize+1 << std::endl;
+    }
+    if(writer.close() != 0) {
+        error = -1;
+    }
+    return error;
+}
+
+
+/** 
+ * @brief compute the values of the density profile in an image
+ * 
+ * @param image3D the image of unsigned char, unsigned short or unsigned int, its buffered region must contain the points of the profile and their neighbors
+ * @param x the x coordinate of the origin point
+ * @param y the y coordinate of the origin point
+ * @param z the z coordinate of the origin point
+ * @param vectorX the x coordinate of the direction vector
+ * @param vectorY the y coordinate of the direction vector
+ * @param vectorZ the z coordinate of the direction vector
+ * @param nbpoints the number of points of the profile
+ * @param distanceNeighbors the neighborhood distance
+ * @param measurement the nature of the  statistical instrument, m for mean, d for median, n for min, x for max, v for variance
  * @param typeBlock the shape of the neighborhood, 3 for a 3D block, 2 for an orthogonal plan 
- * @return returns 0 if no problem encountered during image manipulation 
+ * @param tab the values of the profile, one by point
+ * @param progress true to print the progress of the points
+ * @return returns 0 if no problem encountered 
+ *
+ * The mean and the variance of a 3D block are computed with the sums of a SummedVolumeTable built around 
+ * the profile (see buildProfileTable), in constant time whatever the neighborhood distance. The median, 
+ * the min and the max of a 3D block are read in a SlidingHistogram updated from the block of the previous 
+ * point (see slideNeighbors). The voxels of an orthogonal plane are read with an OffsetStencil computed once
+ * for the profile (see buildPlaneStencil).
 */
-int ToolsItk::computeProfile(int x, int y, int z, double vectorX, double vectorY, double vectorZ, int nbpoints, std::string outputFilename, std::string inputFile, int distanceNeighbors, char measurement, int typeBlock) {
+template <typename TPixel>
+int ToolsItk::computeProfileValues(typename itk::Image<TPixel, 3>::Pointer image3D, int x, int y, int z, double vectorX, double vectorY, double vectorZ, int nbpoints, int distanceNeighbors, char measurement, int typeBlock, std::vector<int> &tab, bool progress) {
     IndexType3D index3D;    
-    ImageType3D::Pointer image3D;    
-
-    std::chrono::duration<double> duration_load;
-    double totalTimeLoad = 0;    
     int nvPx = 0;
     int nvPy = 0;
     int nvPz = 0;
     int valPixel = 0;
-    int tab[nbpoints];
-    std::ofstream outP(outputFilename);
-
     double vector[3];
-    double baseVector1[3] = {0,0,0};
-    double baseVector2[3] = {0,0,0};
+    OffsetStencil stencil;
     vector[0] = vectorX;
     vector[1] = vectorY;
     vector[2] = vectorZ;   
-    
-    std::cout << "load file = " << inputFile << std::endl;
-    image3D = itk::ReadImage<ImageType3D>(inputFile);
+    tab.assign(nbpoints, 0);
+    bool blockTable = summedTable && typeBlock == 3 && distanceNeighbors > 0 && (measurement == 'm' || measurement == 'v');
+    int lastTablePoint = -1;
+    SummedVolumeTable table;
+    int size = (2*distanceNeighbors+1) * (2*distanceNeighbors+1) * (2*distanceNeighbors+1);
+    bool sliding = typeBlock == 3 && distanceNeighbors > 0 && (measurement == 'd' || measurement == 'n' || measurement == 'x');
+    SlidingHistogram histogram;
+    int window[6] = {0, -1, 0, -1, 0, -1}; // the block in the histogram, empty at first
+    IndexType3D firstCorner;
+    IndexType3D lastCorner;
+    typename itk::Image<TPixel, 3>::RegionType region = image3D->GetBufferedRegion();
 
     if(typeBlock == 2) {
-        computeBaseVector(vector, baseVector1,  baseVector2);
+        buildPlaneStencil<TPixel>(image3D, vector, distanceNeighbors, stencil);
     }
 
 
@@ -1048,31 +2383,480 @@ int ToolsItk::computeProfile(int x, int y, int z, double vectorX, double vectorY
         nvPx = static_cast<int>(round(x + k * vectorX));
         nvPy = static_cast<int>(round(y + k * vectorY));
         nvPz = static_cast<int>(round(z + k * vectorZ));               
-        auto start_timeLoad = std::chrono::high_resolution_clock::now();          
         index3D[0]= nvPx;
         index3D[1]= nvPy;
         index3D[2]= nvPz;
-        if(distanceNeighbors>0) {                
-            valPixel = computeMeasurement(nvPx, nvPy, nvPz, baseVector1, baseVector2, distanceNeighbors, image3D, measurement, typeBlock);
+        int block[6] = {nvPx-distanceNeighbors, nvPx+distanceNeighbors, nvPy-distanceNeighbors, nvPy+distanceNeighbors, nvPz-distanceNeighbors, nvPz+distanceNeighbors};
+        firstCorner[0] = block[0];
+        firstCorner[1] = block[2];
+        firstCorner[2] = block[4];
+        lastCorner[0] = block[1];
+        lastCorner[1] = block[3];
+        lastCorner[2] = block[5];
+        if(blockTable && k > lastTablePoint) {
+            lastTablePoint = buildProfileTable<TPixel>(image3D, x, y, z, vectorX, vectorY, vectorZ, k, nbpoints, distanceNeighbors, measurement == 'v', table);
+        }
+        if(blockTable && table.contains(block[0], block[1], block[2], block[3], block[4], block[5])) {
+            if(measurement == 'm') {
+                valPixel = table.blockSum(block[0], block[1], block[2], block[3], block[4], block[5]) / size;
+            } else {
+                valPixel = int(table.blockVariance(block[0], block[1], block[2], block[3], block[4], block[5]));
+            }
+        } else if(sliding && region.IsInside(firstCorner) && region.IsInside(lastCorner)) {
+            if(slideNeighbors<TPixel>(image3D, window, block, histogram) == 0) {
+                std::copy(block, block+6, window);
+                if(measurement == 'd') {
+                    valPixel = histogram.kth(histogram.count()/2);
+                } else if(measurement == 'n') {
+                    valPixel = histogram.min();
+                } else {
+                    valPixel = histogram.max();
+                }
+            } else { // the values are too large for the histogram
+                sliding = false;
+                valPixel = computeMeasurement<TPixel>(nvPx, nvPy, nvPz, stencil, distanceNeighbors, image3D, measurement, typeBlock);
+            }
+        } else if(distanceNeighbors>0) {                
+            valPixel = computeMeasurement<TPixel>(nvPx, nvPy, nvPz, stencil, distanceNeighbors, image3D, measurement, typeBlock);
         } else {
             valPixel = image3D->GetPixel(index3D);
         }            
         //std::cout << "valPixel = " << valPixel << std::endl ;        
         tab[k] = valPixel;
+        if(progress && ((k+1) % std::max(1, nbpoints/100) == 0 || k == nbpoints-1)) {
+            std::cout << "progress " << k+1 << "/" << nbpoints << std::endl;
+        }
+    }
+    
+    return 0;
+}
+
+
+/** 
+ * @brief build the SummedVolumeTable of the blocks of the next points of a profile
+ * 
+ * The box of the table contains the blocks of the points from firstPoint, as many points as the size of the 
+ * table (maxTableSize) allows. The box is limited to the buffered region of the image, 
+ * the blocks which are not in the box are computed without the table.
+ * 
+ * @param image3D the image
+ * @param x the x coordinate of the origin point
+ * @param y the y coordinate of the origin point
+ * @param z the z coordinate of the origin point
+ * @param vectorX the x coordinate of the direction vector
+ * @param vectorY the y coordinate of the direction vector
+ * @param vectorZ the z coordinate of the direction vector
+ * @param firstPoint the first point of the profile in the box
+ * @param nbpoints the number of points of the profile
+ * @param distanceNeighbors the neighborhood distance
+ * @param squares true to build also the table of the squares, for the variance
+ * @param table the table built, empty if the block of firstPoint is too large
+ * @return returns the last point of the profile in the box
+*/
+template <typename TPixel>
+int ToolsItk::buildProfileTable(typename itk::Image<TPixel, 3>::Pointer image3D, int x, int y, int z, double vectorX, double vectorY, double vectorZ, int firstPoint, int nbpoints, int distanceNeighbors, bool squares, SummedVolumeTable &table) {
+    typename itk::Image<TPixel, 3>::RegionType region = image3D->GetBufferedRegion();
+    int bufferIndex[3];
+    int bufferSize[3];
+    int begin[3];
+    int end[3];
+    int box[6];
+    for(int i=0; i<3; i++) {
+        bufferIndex[i] = region.GetIndex()[i];
+        bufferSize[i] = region.GetSize()[i];
+    }
+    int lastPoint = firstPoint - 1;
+    for(int k=firstPoint; k<nbpoints; k++) {
+        int point[3] = {static_cast<int>(round(x + k * vectorX)), static_cast<int>(round(y + k * vectorY)), static_cast<int>(round(z + k * vectorZ))};
+        for(int i=0; i<3; i++) {
+            int first = std::max(point[i] - distanceNeighbors, bufferIndex[i]);
+            int last = std::min(point[i] + distanceNeighbors, bufferIndex[i] + bufferSize[i] - 1);
+            begin[i] = k == firstPoint ? first : std::min(box[2*i], first);
+            end[i] = k == firstPoint ? last : std::max(box[2*i+1], last);
+        }
+        if(SummedVolumeTable::tableSize(begin[0], end[0], begin[1], end[1], begin[2], end[2]) > maxTableSize) {
+            break;
+        }
+        for(int i=0; i<3; i++) {
+            box[2*i] = begin[i];
+            box[2*i+1] = end[i];
+        }
+        lastPoint = k;
+    }
+    if(lastPoint < firstPoint || SummedVolumeTable::tableSize(box[0], box[1], box[2], box[3], box[4], box[5]) == 0) {
+        table = SummedVolumeTable();
+        return firstPoint;
+    }
+    std::cout << "buildProfileTable points " << firstPoint << " to " << lastPoint << " box (" << box[0] << ", " << box[2] << ", " << box[4] 
+              << ") - (" << box[1] << ", " << box[3] << ", " << box[5] << ")" << std::endl;
+    table.build(image3D->GetBufferPointer(), bufferIndex, bufferSize, box[0], box[1], box[2], box[3], box[4], box[5], squares);
+    return lastPoint;
+}
+
+
+/** 
+ * @brief compute several statistics of the neighborhoods of the points of a profile, each neighborhood is read once
+ * 
+ * @param image3D the image, its buffered region must contain the points of the profile and their neighbors
+ * @param x the x coordinate of the origin point
+ * @param y the y coordinate of the origin point
+ * @param z the z coordinate of the origin point
+ * @param vectorX the x coordinate of the direction vector
+ * @param vectorY the y coordinate of the direction vector
+ * @param vectorZ the z coordinate of the direction vector
+ * @param nbpoints the number of points of the profile
+ * @param distanceNeighbors the neighborhood distance, 0 for the value of the point
+ * @param statistics the statistics, see parseStatistics
+ * @param typeBlock the shape of the neighborhood, 3 for a 3D block, 2 for an orthogonal plan 
+ * @param columns the values of the profile, one column by statistic with one value by point
+ * @param progress true to print the progress of the points
+ * @return returns 0 if no problem encountered 
+*/
+int ToolsItk::computeProfileStatistics(ImageType3D::Pointer image3D, int x, int y, int z, double vectorX, double vectorY, double vectorZ, int nbpoints, int distanceNeighbors, const std::vector<std::string> &statistics, int typeBlock, std::vector<std::vector<double>> &columns, bool progress) {
+    IndexType3D index3D;
+    double vector[3] = {vectorX, vectorY, vectorZ};
+    OffsetStencil stencil;
+    std::vector<uint> tab;
+    columns.assign(statistics.size(), std::vector<double>(nbpoints, 0));
+
+    if(typeBlock == 2) {
+        buildPlaneStencil<PixelType>(image3D, vector, distanceNeighbors, stencil);
+    }
+
+    for(int k=0; k<nbpoints; k++) {
+        index3D[0] = static_cast<int>(round(x + k * vectorX));
+        index3D[1] = static_cast<int>(round(y + k * vectorY));
+        index3D[2] = static_cast<int>(round(z + k * vectorZ));
+        tab.clear();
+        if(distanceNeighbors > 0 && typeBlock == 3) {
+            listOfValuesFromNeighbors<PixelType>(index3D[0], index3D[1], index3D[2], distanceNeighbors, image3D, tab);
+        } else if(distanceNeighbors > 0) {
+            listOfValuesFromNeighbors2D<PixelType>(index3D[0], index3D[1], index3D[2], stencil, image3D, tab);
+        } else {
+            tab.push_back(image3D->GetPixel(index3D));
+        }
+        for(size_t i=0; i<statistics.size(); i++) {
+            columns[i][k] = computeStatistic(tab, statistics[i]);
+        }
+        if(progress && ((k+1) % std::max(1, nbpoints/100) == 0 || k == nbpoints-1)) {
+            std::cout << "progress " << k+1 << "/" << nbpoints << std::endl;
+        }
+    }
+
+    return 0;
+}
+
+
+/** 
+ * @brief compute the statistics of a profile, one measurement with computeProfileValues, several with computeProfileStatistics
+ * 
+ * @param image3D the image, its buffered region must contain the points of the profile and their neighbors
+ * @param x the x coordinate of the origin point
+ * @param y the y coordinate of the origin point
+ * @param z the z coordinate of the origin point
+ * @param vectorX the x coordinate of the direction vector
+ * @param vectorY the y coordinate of the direction vector
+ * @param vectorZ the z coordinate of the direction vector
+ * @param nbpoints the number of points of the profile
+ * @param distanceNeighbors the neighborhood distance, 0 for the value of the point
+ * @param statistics the statistics, see parseStatistics
+ * @param typeBlock the shape of the neighborhood, 3 for a 3D block, 2 for an orthogonal plan 
+ * @param columns the values of the profile, one column by statistic with one value by point
+ * @param progress true to print the progress of the points
+ * @return returns 0 if no problem encountered 
+*/
+int ToolsItk::computeProfileColumns(ImageType3D::Pointer image3D, int x, int y, int z, double vectorX, double vectorY, double vectorZ, int nbpoints, int distanceNeighbors, const std::vector<std::string> &statistics, int typeBlock, std::vector<std::vector<double>> &columns, bool progress) {
+    if(statistics.size() == 1 && statistics[0] != "s" && statistics[0][0] != 'p') { // the faster computations of one measurement
+        std::vector<int> tab;
+        computeProfileValues<PixelType>(image3D, x, y, z, vectorX, vectorY, vectorZ, nbpoints, distanceNeighbors, statistics[0][0], typeBlock, tab, progress);
+        columns.assign(1, std::vector<double>(tab.begin(), tab.end()));
+        return 0;
+    }
+    return computeProfileStatistics(image3D, x, y, z, vectorX, vectorY, vectorZ, nbpoints, distanceNeighbors, statistics, typeBlock, columns, progress);
+}
+
+
+/** 
+ * @brief read the volume of the profiles
+ * 
+ * @param inputFile the name of the input file, or the directory of a brick store
+ * @param minX the first column of the box of the profiles and their neighbors
+ * @param maxX the last column of the box
+ * @param minY the first row of the box
+ * @param maxY the last row of the box
+ * @param minZ the first slice of the box
+ * @param maxZ the last slice of the box
+ * @return returns the image, only the box limited to the volume if the input is a brick store, nullptr if it can't be read
+*/
+ImageType3D::Pointer ToolsItk::readProfileImage(std::string inputFile, int minX, int maxX, int minY, int maxY, int minZ, int maxZ) {
+    std::cout << "load file = " << inputFile << std::endl;
+    if(BrickStore::exists(inputFile)) { // only the bricks around the profiles are read
+        BrickStore store;
+        store.open(inputFile);
+        return readBricks<PixelType>(store, std::max(minX, 0), std::min<int>(maxX, store.sizeX-1), std::max(minY, 0), std::min<int>(maxY, store.sizeY-1), 
+            std::max(minZ, 0), std::min<int>(maxZ, store.sizeZ-1), true);
+    }
+    return itk::ReadImage<ImageType3D>(inputFile);
+}
+
+
+/** 
+ * @brief compute the density profile
+ * 
+ * @param x the x coordinate of the origin point
+ * @param y the y coordinate of the origin point
+ * @param z the z coordinate of the origin point
+ * @param vectorX the x coordinate of the direction vector
+ * @param vectorY the y coordinate of the direction vector
+ * @param vectorZ the z coordinate of the direction vector
+ * @param nbpoints the number of points to be taken into account for calculating the profile
+ * @param inputDirectory the directory that contains all the slices
+ * @param outputFilename the name of the ouput file, a NumPy array if it ends with .npy (see ProfileWriter)
+ * @param inputFile the name of the input file
+ * @param distanceNeighbors the neighborhood distance
+ * @param measurement the statistics separated by commas, see parseStatistics, example: m,d,s,p90
+ * @param typeBlock the shape of the neighborhood, 3 for a 3D block, 2 for an orthogonal plan 
+ * @return returns 0 if no problem encountered during image manipulation 
+ *
+ * The output file begins with the line "# x y z" followed by the names of the statistics (see statisticName), 
+ * then a line by point with its coordinates and a column by statistic.
+*/
+int ToolsItk::computeProfile(int x, int y, int z, double vectorX, double vectorY, double vectorZ, int nbpoints, std::string outputFilename, std::string inputFile, int distanceNeighbors, std::string measurement, int typeBlock) {
+    ImageType3D::Pointer image3D;    
+
+    double totalTimeLoad = 0;    
+    int nvPx = 0;
+    int nvPy = 0;
+    int nvPz = 0;
+    std::vector<std::string> statistics;
+    std::vector<std::string> names;
+    if(parseStatistics(measurement, statistics) != 0) {
+        return -1;
+    }
+    for(const std::string &statistic : statistics) {
+        names.push_back(statisticName(statistic));
+    }
+    ProfileWriter writer;
+    if(writer.open(outputFilename, names, false, nbpoints) != 0) {
+        return -1;
+    }
+    int margin = 2*distanceNeighbors+1; // the plan of the neighbors can be oblique
+    image3D = readProfileImage(inputFile, std::min<int>(x, round(x + (nbpoints-1) * vectorX)) - margin, std::max<int>(x, round(x + (nbpoints-1) * vectorX)) + margin, 
+        std::min<int>(y, round(y + (nbpoints-1) * vectorY)) - margin, std::max<int>(y, round(y + (nbpoints-1) * vectorY)) + margin, 
+        std::min<int>(z, round(z + (nbpoints-1) * vectorZ)) - margin, std::max<int>(z, round(z + (nbpoints-1) * vectorZ)) + margin);
+    if(!image3D) {
+        return -1;
     }
+
+    std::vector<std::vector<double>> columns;
+    computeProfileColumns(image3D, x, y, z, vectorX, vectorY, vectorZ, nbpoints, distanceNeighbors, statistics, typeBlock, columns);
     
     for(int k=0; k<nbpoints; k++) {
         nvPx = static_cast<int>(round(x + k * vectorX));
         nvPy = static_cast<int>(round(y + k * vectorY));
         nvPz = static_cast<int>(round(z + k * vectorZ));
-        outP << nvPx << " " << nvPy << " " << nvPz << " " << tab[k]  << std::endl;
+        writer.write(0, nvPx, nvPy, nvPz, columns, k);
         //std::cout << "k " << k << " " << tab[k] << std::endl; 
     }
-    outP.close();
     std::cout << "Time load mean = " << totalTimeLoad/nbpoints << std::endl;    
     
+    return writer.close();
+
+}
+
+/** 
+ * @brief compute many density profiles on the same volume, the volume is read once and the profiles are computed in parallel
+ * 
+ * The output file begins with the line "# profile x y z" followed by the names of the statistics (see statisticName), 
+ * then a line by point with the number of its profile (from 0, in the order of the jobs file), its coordinates and 
+ * a column by statistic. The profiles are written in order as soon as they are computed.
+ * 
+ * @param jobsFile the file of the profiles, one by line: x y z vectorX vectorY vectorZ nbpoints, the lines beginning with # are ignored
+ * @param outputFilename the name of the ouput file, a NumPy array if it ends with .npy (see ProfileWriter)
+ * @param inputFile the name of the input file
+ * @param distanceNeighbors the neighborhood distance
+ * @param measurement the statistics separated by commas, see parseStatistics, example: m,d,s,p90
+ * @param typeBlock the shape of the neighborhood, 3 for a 3D block, 2 for an orthogonal plan 
+ * @return returns 0 if no problem encountered, -1 if the jobs or the volume can't be read
+*/
+int ToolsItk::computeProfileBatch(std::string jobsFile, std::string outputFilename, std::string inputFile, int distanceNeighbors, std::string measurement, int typeBlock) {
+    struct Job {
+        int x, y, z;
+        double vectorX, vectorY, vectorZ;
+        int nbpoints;
+    };
+    std::vector<std::string> statistics;
+    if(parseStatistics(measurement, statistics) != 0) {
+        return -1;
+    }
+    std::ifstream file(jobsFile);
+    if(!file) {
+        std::cerr << "Can't open the file of the profiles " << jobsFile << std::endl;
+        return -1;
+    }
+    std::vector<Job> jobs;
+    std::string line;
+    int margin = 2*distanceNeighbors+1; // the plan of the neighbors can be oblique
+    int box[6] = {INT_MAX, INT_MIN, INT_MAX, INT_MIN, INT_MAX, INT_MIN};
+    while(std::getline(file, line)) {
+        std::istringstream stream(line);
+        Job job;
+        if(line.empty() || line[0] == '#' || !(stream >> job.x >> job.y >> job.z >> job.vectorX >> job.vectorY >> job.vectorZ >> job.nbpoints) || job.nbpoints <= 0) {
+            continue;
+        }
+        int first[3] = {job.x, job.y, job.z};
+        int last[3] = {static_cast<int>(round(job.x + (job.nbpoints-1) * job.vectorX)), static_cast<int>(round(job.y + (job.nbpoints-1) * job.vectorY)), 
+            static_cast<int>(round(job.z + (job.nbpoints-1) * job.vectorZ))};
+        for(int i=0; i<3; i++) {
+            box[2*i] = std::min(box[2*i], std::min(first[i], last[i]) - margin);
+            box[2*i+1] = std::max(box[2*i+1], std::max(first[i], last[i]) + margin);
+        }
+        jobs.push_back(job);
+    }
+    std::cout << "number of profiles = " << jobs.size() << std::endl;
+    if(jobs.empty()) {
+        std::cerr << "There are no profiles in " << jobsFile << std::endl;
+        return -1;
+    }
+    ImageType3D::Pointer image3D = readProfileImage(inputFile, box[0], box[1], box[2], box[3], box[4], box[5]);
+    if(!image3D) {
+        return -1;
+    }
+
+    std::vector<std::string> names;
+    uint64_t nbRows = 0;
+    for(const std::string &statistic : statistics) {
+        names.push_back(statisticName(statistic));
+    }
+    for(const Job &job : jobs) {
+        nbRows += job.nbpoints;
+    }
+    ProfileWriter writer;
+    if(writer.open(outputFilename, names, true, nbRows) != 0) {
+        return -1;
+    }
+
+    std::cout << "omp_get_num_procs () = " << omp_get_num_procs() << std::endl;
+    omp_set_num_threads(omp_get_num_procs());
+    maxTableSize = SummedVolumeTable::maxTableSize / omp_get_max_threads(); // a table by thread
+    std::vector<std::vector<std::vector<double>>> results(jobs.size());
+    std::vector<char> done(jobs.size(), 0);
+    size_t nextJob = 0; // the next profile to write
+    size_t finished = 0;
+    std::mutex mutexOutput;
+
+    #pragma omp parallel for schedule(dynamic)
+    for(int j=0; j<(int)jobs.size(); j++) {
+        const Job &job = jobs[j];
+        std::vector<std::vector<double>> columns;
+        computeProfileColumns(image3D, job.x, job.y, job.z, job.vectorX, job.vectorY, job.vectorZ, job.nbpoints, distanceNeighbors, statistics, typeBlock, columns, false);
+        std::lock_guard<std::mutex> lock(mutexOutput);
+        results[j].swap(columns);
+        done[j] = 1;
+        finished++;
+        while(nextJob < jobs.size() && done[nextJob]) {
+            const Job &jobOut = jobs[nextJob];
+            for(int k=0; k<jobOut.nbpoints; k++) {
+                writer.write(nextJob, static_cast<int>(round(jobOut.x + k * jobOut.vectorX)), static_cast<int>(round(jobOut.y + k * jobOut.vectorY)), 
+                             static_cast<int>(round(jobOut.z + k * jobOut.vectorZ)), results[nextJob], k);
+            }
+            std::vector<std::vector<double>>().swap(results[nextJob]); // the memory of the written profile is released
+            nextJob++;
+        }
+        std::cout << "progress " << finished << "/" << jobs.size() << std::endl;
+    }
+    maxTableSize = SummedVolumeTable::maxTableSize;
+
+    return writer.close();
+}
+
+
+/** 
+ * @brief read the statistics of a profile
+ * 
+ * @param measurement the statistics separated by commas: m for mean, d for median, n for min, x for max, 
+ *                    v for variance, s for standard deviation, p followed by a number between 0 and 100 for a percentile
+ * @param statistics the statistics, one by string
+ * @return returns 0 if no problem encountered, -1 if a statistic is unknown
+*/
+int ToolsItk::parseStatistics(std::string measurement, std::vector<std::string> &statistics) {
+    std::stringstream stream(measurement);
+    std::string statistic;
+    statistics.clear();
+    while(std::getline(stream, statistic, ',')) {
+        statistic.erase(std::remove(statistic.begin(), statistic.end(), ' '), statistic.end());
+        bool known = statistic == "m" || statistic == "d" || statistic == "n" || statistic == "x" || statistic == "v" || statistic == "s";
+        if(!known && statistic.size() > 1 && statistic[0] == 'p') {
+            char * end = nullptr;
+            double percentile = strtod(statistic.c_str() + 1, &end);
+            known = *end == '\0' && percentile >= 0 && percentile <= 100;
+        }
+        if(!known) {
+            std::cout << "Problem with the value of measurement: " << statistic << std::endl;
+            return -1;
+        }
+        statistics.push_back(statistic);
+    }
+    if(statistics.empty()) {
+        std::cout << "Problem with the value of measurement!" << std::endl;
+        return -1;
+    }
     return 0;
+}
+
+/** 
+ * @brief give the name of a statistic in the header of a profile file
+ * 
+ * @param statistic the statistic, see parseStatistics
+ * @return returns the name: mean, median, min, max, variance, std or the percentile as given (p90)
+*/
+std::string ToolsItk::statisticName(const std::string &statistic) {
+    if(statistic == "m") return "mean";
+    if(statistic == "d") return "median";
+    if(statistic == "n") return "min";
+    if(statistic == "x") return "max";
+    if(statistic == "v") return "variance";
+    if(statistic == "s") return "std";
+    return statistic;
+}
 
+/** 
+ * @brief compute a statistic from a set of voxel level values
+ * 
+ * @param tab it contains the voxel values, sorted
+ * @param statistic the statistic, see parseStatistics. The percentile q is the value of rank q * size / 100 
+ *                  in the sorted values, p50 is the median
+ * @return returns the value of the statistic
+*/
+double ToolsItk::computeStatistic(const std::vector<uint> &tab, const std::string &statistic) {
+    switch(statistic[0]) {
+        case 'm':
+            return computeDistanceMean(tab);
+        case 'd':
+            return computeDistanceMedian(tab);
+        case 'n':
+            return computeDistanceMin(tab);
+        case 'x':
+            return computeDistanceMax(tab);
+        case 'v':
+            return computeDistanceVariance(tab);
+        case 's': {
+            double somme = 0.0;
+            double sommeCarres = 0.0;
+            for(uint value : tab) {
+                somme += value;
+                sommeCarres += double(value) * value;
+            }
+            double moy = somme/tab.size();
+            return sqrt(std::max(0.0, sommeCarres/tab.size() - moy*moy));
+        }
+        case 'p': {
+            double percentile = atof(statistic.c_str() + 1);
+            size_t rank = std::min(tab.size() - 1, size_t(percentile * tab.size() / 100));
+            return tab[rank];
+        }
+    }
+    return 0;
 }
 
 /** 
@@ -1105,7 +2889,8 @@ int ToolsItk::displayProfile(std::string filename) {
  * @param tab it contains the voxel values, tab is sorted at the end 
  * @return returns 0 if no problem encountered during image manipulation 
 */
-int ToolsItk::listOfValuesFromNeighbors(int px, int py, int pz, int distance, ImageType3D::Pointer image,  std::vector<uint> &tab) {
+template <typename TPixel>
+int ToolsItk::listOfValuesFromNeighbors(int px, int py, int pz, int distance, typename itk::Image<TPixel, 3>::Pointer image,  std::vector<uint> &tab) {
     int minX = px-distance;
     int maxX = px+distance;
     int minY = py-distance;
@@ -1131,33 +2916,28 @@ int ToolsItk::listOfValuesFromNeighbors(int px, int py, int pz, int distance, Im
 }
 
 /** 
- * @brief computes the values ​​of the voxels of the neighbors of the origin point according to a neighborhood distance and an orthogonal plan
+ * @brief computes the values ​​of the voxels of the neighbors of the origin point in an orthogonal plan
+ * 
+ * The voxels are read in the buffer with the offsets of the stencil, with GetPixel if the neighborhood 
+ * is not in the buffer of the stencil.
  * 
  * @param px  the x coordinate of the origin point
  * @param py  the y coordinate of the origin point
  * @param pz  the z coordinate of the origin point
- * @param baseVector1 the coordinates of the first base vector of the orthogonal plane
- * @param baseVector2 the coordinates of the second base vector of the orthogonal plane
- * @param distance the distance before and after the origin point 
+ * @param stencil the offsets of the voxels of the orthogonal plan, see buildPlaneStencil
  * @param image the pointer to the image
  * @param tab it contains the voxel values, tab is sorted at the end 
  * @return returns 0 if no problem encountered during image manipulation 
 */
-int ToolsItk::listOfValuesFromNeighbors2D(int px, int py, int pz, double baseVector1[], double baseVector2[], int distance, ImageType3D::Pointer image, std::vector<uint> &tab) {
+template <typename TPixel>
+int ToolsItk::listOfValuesFromNeighbors2D(int px, int py, int pz, const OffsetStencil &stencil, typename itk::Image<TPixel, 3>::Pointer image, std::vector<uint> &tab) {
     IndexType3D index3D;
-    int valPixel = 0;
-    int nvPx = 0;
-    int nvPy = 0;
-    int nvPz = 0;    
-    
-    for(int k1=-distance; k1<distance+1; k1++) {
-        for(int k2=-distance; k2<distance+1; k2++) {
-            nvPx = static_cast<int>(round(px + k1 * baseVector1[0] + k2 * baseVector2[0]));
-            nvPy = static_cast<int>(round(py + k1 * baseVector1[1] + k2 * baseVector2[1]));
-            nvPz = static_cast<int>(round(pz + k1 * baseVector1[2] + k2 * baseVector2[2]));
-            index3D[0] = nvPx;
-            index3D[1] = nvPy;
-            index3D[2] = nvPz;
+
+    if(!stencil.gather<TPixel>(px, py, pz, tab)) {
+        for(size_t v=0; v<stencil.size(); v++) {
+            index3D[0] = px + stencil.offsets[3*v];
+            index3D[1] = py + stencil.offsets[3*v+1];
+            index3D[2] = pz + stencil.offsets[3*v+2];
             tab.push_back(image->GetPixel(index3D));
         }
     }
@@ -1168,30 +2948,114 @@ int ToolsItk::listOfValuesFromNeighbors2D(int px, int py, int pz, double baseVec
 }
 
 
+/** 
+ * @brief compute the offsets of the voxels of the orthogonal plans of a profile, once for all its points
+ * 
+ * The plan is a square, or a disk if setDiskFootprint was called, and a voxel is counted once even if 
+ * several points of the plan fall in it.
+ * 
+ * @param image3D the image, the offsets in its buffer are computed too
+ * @param vector the direction vector of the profile
+ * @param distanceNeighbors the neighborhood distance
+ * @param stencil the offsets of the voxels
+ * @return returns the number of voxels of the plan
+*/
+template <typename TPixel>
+int ToolsItk::buildPlaneStencil(typename itk::Image<TPixel, 3>::Pointer image3D, double vector[], int distanceNeighbors, OffsetStencil &stencil) {
+    double baseVector1[3] = {0,0,0};
+    double baseVector2[3] = {0,0,0};
+    typename itk::Image<TPixel, 3>::RegionType region = image3D->GetBufferedRegion();
+    int bufferIndex[3];
+    int bufferSize[3];
+    for(int i=0; i<3; i++) {
+        bufferIndex[i] = region.GetIndex()[i];
+        bufferSize[i] = region.GetSize()[i];
+    }
+    computeBaseVector(vector, baseVector1,  baseVector2);
+    stencil.buildPlane(baseVector1, baseVector2, distanceNeighbors, diskFootprint);
+    stencil.setBuffer(image3D->GetBufferPointer(), bufferIndex, bufferSize);
+    std::cout << "buildPlaneStencil voxels = " << stencil.size() << std::endl;
+    return stencil.size();
+}
+
+
+/** 
+ * @brief update the histogram of a 3D block for the block of the next point of a profile
+ * 
+ * Only the voxels of the previous block which are not in the new block are removed, and the voxels of the 
+ * new block which are not in the previous block are added: for consecutive points, the faces of the blocks.
+ * 
+ * @param image the image, its buffered region must contain the blocks
+ * @param previous the block in the histogram: first and last x, first and last y, first and last z, empty if the first x is larger than the last x
+ * @param current the block of the next point
+ * @param histogram the histogram of the previous block, it becomes the histogram of the current block
+ * @return returns 0 if no problem encountered, -1 if a value is too large for the histogram
+*/
+template <typename TPixel>
+int ToolsItk::slideNeighbors(typename itk::Image<TPixel, 3>::Pointer image, const int previous[6], const int current[6], SlidingHistogram &histogram) {
+    typename itk::Image<TPixel, 3>::RegionType region = image->GetBufferedRegion();
+    const TPixel * buffer = image->GetBufferPointer();
+    const int64_t sizeX = region.GetSize()[0];
+    const int64_t sizeY = region.GetSize()[1];
+    const int indexX = region.GetIndex()[0];
+    const int indexY = region.GetIndex()[1];
+    const int indexZ = region.GetIndex()[2];
+
+    // calls update for the voxels of the block a which are not in the block b, stops if it returns false
+    auto difference = [&](const int a[6], const int b[6], auto update) {
+        for(int z=a[4]; z<=a[5]; z++) {
+            bool sliceInside = z >= b[4] && z <= b[5];
+            for(int y=a[2]; y<=a[3]; y++) {
+                const TPixel * row = buffer + ((z - indexZ) * sizeY + (y - indexY)) * sizeX - indexX;
+                if(sliceInside && y >= b[2] && y <= b[3]) {
+                    for(int x=a[0]; x<=std::min(a[1], b[0]-1); x++) {
+                        if(!update(row[x])) return false;
+                    }
+                    for(int x=std::max(a[0], b[1]+1); x<=a[1]; x++) {
+                        if(!update(row[x])) return false;
+                    }
+                } else {
+                    for(int x=a[0]; x<=a[1]; x++) {
+                        if(!update(row[x])) return false;
+                    }
+                }
+            }
+        }
+        return true;
+    };
+
+    difference(previous, current, [&](TPixel value) { histogram.remove(value); return true; });
+    if(!difference(current, previous, [&](TPixel value) { return histogram.add(value); })) {
+        return -1;
+    }
+    return 0;
+}
+
+
 /** 
  * @brief computes a statistical measure for a given voxel
  * 
  * @param px  the x coordinate of the origin point
  * @param py  the y coordinate of the origin point
  * @param pz  the z coordinate of the origin point
- * @param baseVector1 the coordinates of the first base vector of the orthogonal plane
- * @param baseVector2 the coordinates of the second base vector of the orthogonal plane
+ * @param stencil the offsets of the voxels of the orthogonal plan, see buildPlaneStencil
  * @param distance the distance before and after the origin point 
  * @param image the pointer to the image
  * @param measurement the nature of the  statistical instrument, m for mean, d for median, n for min, x for max
  * @param dimension the shape of the neighborhood, 3 for a 3D block, 2 for an orthogonal plan 
  * @return returns the value for the voxel 
 */
-int ToolsItk::computeMeasurement(int px, int py, int pz, double baseVector1[], double baseVector2[], int distance, ImageType3D::Pointer image, char measurement, int dimension) {
+template <typename TPixel>
+int ToolsItk::computeMeasurement(int px, int py, int pz, const OffsetStencil &stencil, int distance, typename itk::Image<TPixel, 3>::Pointer image, char measurement, int dimension) {
     int valPixel = 0;
     IndexType3D index3D;
     uint size =0;    
     std::vector<uint> tab;    
 
     if(dimension == 3) {
-        listOfValuesFromNeighbors(px, py, pz, distance, image, tab);
+        listOfValuesFromNeighbors<TPixel>(px, py, pz, distance, image, tab);
     } else {
-        listOfValuesFromNeighbors2D(px, py, pz, baseVector1, baseVector2, distance, image, tab);
+        listOfValuesFromNeighbors2D<TPixel>(px, py, pz, stencil, image, tab);
     }
     
     switch(measurement) {
@@ -1207,6 +3071,9 @@ int ToolsItk::computeMeasurement(int px, int py, int pz, double baseVector1[], d
         case 'x': // max            
             valPixel = computeDistanceMax(tab);              
             break;
+        case 'v': // variance
+            valPixel = computeDistanceVariance(tab);
+            break;
         default:
             valPixel = 0;
             std::cout << "Problem with the value of measurement!" << std::endl;
@@ -1220,7 +3087,7 @@ int ToolsItk::computeMeasurement(int px, int py, int pz, double baseVector1[], d
  * @param tab it contains the voxel values
  * @return returns the value for the voxel 
 */
-int ToolsItk::computeDistanceMean(std::vector<uint> tab) {    
+int ToolsItk::computeDistanceMean(const std::vector<uint> &tab) {    
     int somme = 0;
     double moy = 0.0;    
     int valPixel = 0;
@@ -1242,7 +3109,7 @@ int ToolsItk::computeDistanceMean(std::vector<uint> tab) {
  * @param tab it contains the voxel values
  * @return returns the value for the voxel 
 */
-int ToolsItk::computeDistanceMedian(std::vector<uint> tab) {
+int ToolsItk::computeDistanceMedian(const std::vector<uint> &tab) {
     uint middle = tab.size()/2; 
     int valPixel = tab[middle] ;
     return valPixel;
@@ -1254,7 +3121,7 @@ int ToolsItk::computeDistanceMedian(std::vector<uint> tab) {
  * @param tab it contains the voxel values
  * @return returns the value for the voxel 
 */
-int ToolsItk::computeDistanceMin(std::vector<uint> tab) {
+int ToolsItk::computeDistanceMin(const std::vector<uint> &tab) {
     //uint min = *std::min_element(tab.begin(), tab.end());
     uint min = tab[0];
     return min;
@@ -1266,11 +3133,30 @@ int ToolsItk::computeDistanceMin(std::vector<uint> tab) {
  * @param tab it contains the voxel values
  * @return returns the value for the voxel 
 */
-int ToolsItk::computeDistanceMax(std::vector<uint> tab) {   
+int ToolsItk::computeDistanceMax(const std::vector<uint> &tab) {   
     uint max = tab[tab.size()-1];
     return max;
 }
 
+/** 
+ * @brief computes the variance from a set of voxel level values
+ * 
+ * @param tab it contains the voxel values
+ * @return returns the value for the voxel 
+*/
+int ToolsItk::computeDistanceVariance(const std::vector<uint> &tab) {
+    double somme = 0.0;
+    double sommeCarres = 0.0;
+    double size = tab.size();
+
+    for(uint value : tab) {
+        somme += value;
+        sommeCarres += double(value) * value;
+    }
+    double moy = somme/size;
+    return int(std::max(0.0, sommeCarres/size - moy*moy));
+}
+
 
 /** 
  * @brief computes the basis vectors of the orthogonal plane to a direction vector
@@ -1301,4 +3187,49 @@ int ToolsItk::computeBaseVector(double vector[], double * baseVector1,  double *
     return 0;
 }
 
+/** 
+ * @brief define the number of threads used to read and to decode the slices (see SlicePipeline)
+ * 
+ * @param ioThreads the number of threads which read the files, 0 for the default
+ * @param decodeThreads the number of threads which decode the slices, 0 for the number of cores
+*/
+void ToolsItk::setThreads(int ioThreads, int decodeThreads) {
+    this->ioThreads = ioThreads;
+    this->decodeThreads = decodeThreads;
+    std::cout << "setThreads ioThreads = " << ioThreads << " decodeThreads = " << decodeThreads << std::endl;
+}
+
+/** 
+ * @brief define if the block means and variances of the profiles are computed with a SummedVolumeTable
+ * 
+ * @param summedTable true to use the table, false to compute each block from its voxels
+*/
+void ToolsItk::setSummedTable(bool summedTable) {
+    this->summedTable = summedTable;
+    std::cout << "setSummedTable summedTable = " << summedTable << std::endl;
+}
+
+/** 
+ * @brief define the shape of the orthogonal plans of the profiles
+ * 
+ * @param diskFootprint true for the disk of radius the neighborhood distance, false for the square
+*/
+void ToolsItk::setDiskFootprint(bool diskFootprint) {
+    this->diskFootprint = diskFootprint;
+    std::cout << "setDiskFootprint diskFootprint = " << diskFootprint << std::endl;
+}
+
+
+
 
+// the Python module citrusToolsItk resizes the slices of all the pixel types
+template int ToolsItk::changeSizeImage<unsigned char>(itk::Image<unsigned char, 2>::Pointer, itk::Image<unsigned char, 2>::Pointer, int, int, int, int, int, int, int);
+template int ToolsItk::changeSizeImage<char>(itk::Image<char, 2>::Pointer, itk::Image<char, 2>::Pointer, int, int, int, int, int, int, int);
+template int ToolsItk::changeSizeImage<unsigned short>(itk::Image<unsigned short, 2>::Pointer, itk::Image<unsigned short, 2>::Pointer, int, int, int, int, int, int, int);
+template int ToolsItk::changeSizeImage<short>(itk::Image<short, 2>::Pointer, itk::Image<short, 2>::Pointer, int, int, int, int, int, int, int);
+template int ToolsItk::changeSizeImage<int>(itk::Image<int, 2>::Pointer, itk::Image<int, 2>::Pointer, int, int, int, int, int, int, int);
+template int ToolsItk::changeSizeImage<float>(itk::Image<float, 2>::Pointer, itk::Image<float, 2>::Pointer, int, int, int, int, int, int, int);
+template int ToolsItk::changeSizeImage<unsigned int>(itk::Image<unsigned int, 2>::Pointer, itk::Image<unsigned int, 2>::Pointer, int, int, int, int, int, int, int);
+template int ToolsItk::computeProfileValues<unsigned char>(itk::Image<unsigned char, 3>::Pointer, int, int, int, double, double, double, int, int, char, int, std::vector<int> &, bool);
+template int ToolsItk::computeProfileValues<unsigned short>(itk::Image<unsigned short, 3>::Pointer, int, int, int, double, double, double, int, int, char, int, std::vector<int> &, bool);
+template int ToolsItk::computeProfileValues<unsigned int>(itk::Image<unsigned int, 3>::Pointer, int, int, int, double, double, double, int, int, char, int, std::vector<int> &, bool);
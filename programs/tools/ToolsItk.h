@@ -2,9 +2,17 @@
 #define TOOLSITK_H
 
 #include <string>
+#include <functional>
 
 #include "itkImage.h"
 #include "itkImageFileReader.h"
+#include "itkImageIOBase.h"
+
+#include "BrickStore.h"
+#include "SummedVolumeTable.h"
+#include "SlidingHistogram.h"
+#include "OffsetStencil.h"
+#include "ProfileWriter.h"
 
 using PixelType = unsigned int;
 using ImageType2D = itk::Image<PixelType, 2>;
@@ -21,27 +29,95 @@ class ToolsItk{
 public:
     int resizeImage(std::string inputDirectory, int begin, int end,  int factorResize, std::string output, std::string extension);
     int stack2Dto3D(std::string inputDirectory, int beginX, int endX, int beginY, int endY, int beginZ, int endZ, std::string output, bool resize, int factorResize, std::string extension);    
-    int changeSizeImage(ImageType2D::Pointer imageOrigin, ImageType2D::Pointer imageNew, int factorResize, int beginX, int endX, int beginY, int endY);
+    template <typename TPixel>
+    int changeSizeImage(typename itk::Image<TPixel, 2>::Pointer imageOrigin, typename itk::Image<TPixel, 2>::Pointer imageNew, int factorResize, int beginX, int endX, int beginY, int endY, int numCols = -1, int numRows = -1);
+    template <typename TPixel>
+    typename itk::Image<TPixel, 2>::Pointer readImageReduced(std::string filename, int factorResize, int &factorDecoded, int beginX = -1, int endX = -1, int beginY = -1, int endY = -1);
+    template <typename TPixel>
+    typename itk::Image<TPixel, 2>::Pointer readImageRegion(std::string filename, int beginX, int endX, int beginY, int endY);
+    itk::ImageIOBase::IOComponentEnum readComponentType(std::string inputDirectory, std::string extension);
+    template <typename TFunction>
+    int dispatchPixelType(std::string inputDirectory, std::string extension, TFunction function);
+    template <typename TFunction>
+    int dispatchComponentType(itk::ImageIOBase::IOComponentEnum componentType, TFunction function);
     int createRoi(std::string inputDirectory, int sizeX, int sizeY, int sizeZ, int px, int py, int pz, std::string positionInArea, std::string outputFile, uint factorResize, std::string extension);
+    int createRoiBatch(std::string inputDirectory, std::string roiFile, std::string extension);
+    template <typename TPixel>
+    int createRoiBatchTyped(std::string inputDirectory, std::string roiFile, std::string extension);
     int resizeImageParall(std::string inputDirectory, int begin, int end,  int factorResize, std::string output, std::string extension);
     int stack2Dto3DParall(std::string inputDirectory, int beginX, int endX, int beginY, int endY, int beginZ, int endZ, std::string output, bool resize, int factorResize, std::string extension); 
+    template <typename TPixel>
+    int stack2Dto3DParallTyped(std::string inputDirectory, int beginX, int endX, int beginY, int endY, int beginZ, int endZ, std::string output, bool resize, int factorResize, std::string extension); 
     int cleanList(std::vector<std::string> names, std::vector<std::string> &namesClean, std::string extension);
+    int listSlices(std::string inputDirectory, std::string extension, std::vector<std::string> &names);
     int resizeImageParallV2(std::string inputDirectory, int begin, int end,  int factorResize, std::string output, std::string extension);
     int stack2Dto3DParallV2(std::string inputDirectory, int beginX, int endX, int beginY, int endY, int beginZ, int endZ, std::string output, bool resize, int factorResize, std::string extension); 
-    int computeProfile(int x, int y, int z, double vectorX, double vectorY, double vectorZ, int nbpoints, std::string outputFilename, std::string inputFile, int distanceNeighbors, char measurement, int typeBlock);
+    template <typename TPixel>
+    int stack2Dto3DParallV2Typed(std::string inputDirectory, int beginX, int endX, int beginY, int endY, int beginZ, int endZ, std::string output, bool resize, int factorResize, std::string extension); 
+    int resizeImageParallStream(std::string inputDirectory, int begin, int end,  int factorResize, std::string output, std::string extension);
+    int stack2Dto3DParallStream(std::string inputDirectory, int beginX, int endX, int beginY, int endY, int beginZ, int endZ, std::string output, bool resize, int factorResize, std::string extension); 
+    template <typename TPixel>
+    int stack2Dto3DParallStreamTyped(std::string inputDirectory, int beginX, int endX, int beginY, int endY, int beginZ, int endZ, std::string output, bool resize, int factorResize, std::string extension); 
+    template <typename TPixel>
+    int stackSlicesTyped(std::string inputDirectory, int beginX, int endX, int beginY, int endY, int beginZ, int endZ, bool resize, int factorResize, std::string extension, 
+        std::function<int(uint nbCols, uint nbRows, uint nbSlices)> open, std::function<int(uint z, const TPixel * slice)> writeSlice);
+    int stack2Dto3DParallBuffer(std::string inputDirectory, int beginX, int endX, int beginY, int endY, int beginZ, int endZ, bool resize, int factorResize, std::string extension, 
+        std::function<void *(uint nbCols, uint nbRows, uint nbSlices, itk::ImageIOBase::IOComponentEnum componentType)> allocate);
+    int buildPyramid(std::string inputDirectory, int begin, int end, std::string outputDirectory, std::string extension);
+    template <typename TPixel>
+    int buildPyramidTyped(std::string inputDirectory, int begin, int end, std::string outputDirectory, std::string extension);
+    std::string findBrickStore(std::string inputDirectory, std::string extension);
+    std::string slicesSignature(const std::vector<std::string> &namesClean);
+    int buildBricks(std::string inputDirectory, std::string outputDirectory, std::string extension, int memoryMB);
+    template <typename TPixel>
+    int buildBricksTyped(std::string inputDirectory, std::string outputDirectory, std::string extension, int memoryMB, std::string componentType);
+    template <typename TPixel>
+    typename itk::Image<TPixel, 3>::Pointer readBricks(BrickStore &store, int beginX, int endX, int beginY, int endY, int beginZ, int endZ, bool keepIndex);
+    int createRoiBricks(std::string storeDirectory, int beginX, int endX, int beginY, int endY, int beginZ, int endZ, std::string outputFile);
+    int resizeImageBricks(std::string storeDirectory, int begin, int end, int factorResize, std::string output);
+    template <typename TPixel>
+    int resizeImageBricksTyped(BrickStore &store, int begin, int end, int factorResize, std::string output);
+    template <typename TPixel>
+    int computeProfileValues(typename itk::Image<TPixel, 3>::Pointer image3D, int x, int y, int z, double vectorX, double vectorY, double vectorZ, int nbpoints, int distanceNeighbors, char measurement, int typeBlock, std::vector<int> &tab, bool progress = true);
+    template <typename TPixel>
+    int buildProfileTable(typename itk::Image<TPixel, 3>::Pointer image3D, int x, int y, int z, double vectorX, double vectorY, double vectorZ, int firstPoint, int nbpoints, int distanceNeighbors, bool squares, SummedVolumeTable &table);
+    int computeProfileStatistics(ImageType3D::Pointer image3D, int x, int y, int z, double vectorX, double vectorY, double vectorZ, int nbpoints, int distanceNeighbors, const std::vector<std::string> &statistics, int typeBlock, std::vector<std::vector<double>> &columns, bool progress = true);
+    int computeProfileColumns(ImageType3D::Pointer image3D, int x, int y, int z, double vectorX, double vectorY, double vectorZ, int nbpoints, int distanceNeighbors, const std::vector<std::string> &statistics, int typeBlock, std::vector<std::vector<double>> &columns, bool progress = true);
+    ImageType3D::Pointer readProfileImage(std::string inputFile, int minX, int maxX, int minY, int maxY, int minZ, int maxZ);
+    int computeProfile(int x, int y, int z, double vectorX, double vectorY, double vectorZ, int nbpoints, std::string outputFilename, std::string inputFile, int distanceNeighbors, std::string measurement, int typeBlock);
+    int computeProfileBatch(std::string jobsFile, std::string outputFilename, std::string inputFile, int distanceNeighbors, std::string measurement, int typeBlock);
+    int parseStatistics(std::string measurement, std::vector<std::string> &statistics);
+    std::string statisticName(const std::string &statistic);
+    double computeStatistic(const std::vector<uint> &tab, const std::string &statistic);
     int displayProfile(std::string filename);    
-    int computeMeasurement(int px, int py, int pz, double baseVector1[], double baseVector2[], int distance, ImageType3D::Pointer image, char measurement, int dimension);
-    int listOfValuesFromNeighbors(int px, int py, int pz, int distance, ImageType3D::Pointer image, std::vector<uint> &tab);    
-    int listOfValuesFromNeighbors2D(int px, int py, int pz, double baseVector1[], double baseVector2[], int distance, ImageType3D::Pointer image, std::vector<uint> &tab);
-    int computeDistanceMean(std::vector<uint> tab);
-    int computeDistanceMedian(std::vector<uint> tab);
-    int computeDistanceMin(std::vector<uint> tab);
-    int computeDistanceMax(std::vector<uint> tab);
+    template <typename TPixel>
+    int slideNeighbors(typename itk::Image<TPixel, 3>::Pointer image, const int previous[6], const int current[6], SlidingHistogram &histogram);
+    template <typename TPixel>
+    int computeMeasurement(int px, int py, int pz, const OffsetStencil &stencil, int distance, typename itk::Image<TPixel, 3>::Pointer image, char measurement, int dimension);
+    template <typename TPixel>
+    int listOfValuesFromNeighbors(int px, int py, int pz, int distance, typename itk::Image<TPixel, 3>::Pointer image, std::vector<uint> &tab);    
+    template <typename TPixel>
+    int listOfValuesFromNeighbors2D(int px, int py, int pz, const OffsetStencil &stencil, typename itk::Image<TPixel, 3>::Pointer image, std::vector<uint> &tab);
+    template <typename TPixel>
+    int buildPlaneStencil(typename itk::Image<TPixel, 3>::Pointer image3D, double vector[], int distanceNeighbors, OffsetStencil &stencil);
+    int computeDistanceMean(const std::vector<uint> &tab);
+    int computeDistanceMedian(const std::vector<uint> &tab);
+    int computeDistanceMin(const std::vector<uint> &tab);
+    int computeDistanceMax(const std::vector<uint> &tab);
+    int computeDistanceVariance(const std::vector<uint> &tab);
     int computeBaseVector(double * vector, double * baseVector1,  double * baseVector2);
+    void setThreads(int ioThreads, int decodeThreads);
+    void setSummedTable(bool summedTable);
+    void setDiskFootprint(bool diskFootprint);
 
 protected:
 
 private:
+    int ioThreads = 0; // threads which read the slices, 0 for the default of SlicePipeline
+    int decodeThreads = 0; // threads which decode the slices, 0 for the number of cores
+    bool summedTable = true; // the block means and variances of the profiles are computed with a SummedVolumeTable
+    bool diskFootprint = false; // the orthogonal plans of the profiles are disks instead of squares
+    uint64_t maxTableSize = SummedVolumeTable::maxTableSize; // size of the SummedVolumeTable of a profile, divided between the threads of a batch
 
 };
 #endif